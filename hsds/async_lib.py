@@ -18,6 +18,7 @@ from aiohttp.web_exceptions import HTTPForbidden
 from .util.idUtil import isValidUuid, isSchema2Id, getS3Key, isS3ObjKey
 from .util.idUtil import getObjId, isValidChunkId, getCollectionForId
 from .util.chunkUtil import getDatasetId, getNumChunks, ChunkIterator
+from .util.shardUtil import getShardObjId
 from .util.hdf5dtype import getItemSize, createDataType
 from .util.arrayUtil import getNumElements, bytesToArray
 from .util.dsetUtil import getHyperslabSelection, getFilterOps, getChunkDims, getFilters
@@ -264,6 +265,21 @@ def scanRootCallback(app, s3keys):
     checksums = results["checksums"]
     for s3key in s3keys.keys():
 
+        shard_objid = getShardObjId(s3key)
+        if shard_objid:
+            # links or attributes shard, count it as metadata of the object
+            if s3key in scanRoot_keyset:
+                log.warn(f"scanRoot - dejavu for key: {s3key}")
+                continue
+            scanRoot_keyset.add(s3key)
+            item = s3keys[s3key]
+            log.debug(f"scanRoot - got shard key {s3key} for {shard_objid}")
+            if "Size" in item:
+                results["metadata_bytes"] += item["Size"]
+            lastModified = item.get("LastModified")
+            if lastModified and lastModified > results["lastModified"]:
+                results["lastModified"] = lastModified
+            continue
         if not isS3ObjKey(s3key):
             log.info(f"not s3obj key, ignoring: {s3key}")
             continue
@@ -138,6 +138,67 @@ def _getAttribute(attr_name, obj_json, include_data=True, max_data_size=0, encod
     return des_attr
 
 
+def getAttributeList(obj_id, obj_json, create_order=False, marker=None, limit=None,
+                     pattern=None, include_data=False, max_data_size=0, encoding=None):
+    """ return the list of attribute jsons for a GET attributes request """
+    if "attributes" not in obj_json:
+        msg = f"unexpected data for obj id: {obj_id}"
+        log.error(msg)
+        raise HTTPInternalServerError()
+
+    # return a list of attributes based on sorted dictionary keys
+    attr_dict = obj_json["attributes"]
+
+    titles = []
+    if create_order:
+        order_dict = {}
+        for title in attr_dict:
+            item = attr_dict[title]
+            if "created" not in item:
+                log.warning(f"expected to find 'created' key in attr item {title}")
+                continue
+            order_dict[title] = item["created"]
+        log.debug(f"order_dict: {order_dict}")
+        # now sort by created
+        for k in sorted(order_dict.items(), key=lambda item: item[1]):
+            titles.append(k[0])
+        log.debug(f"attrs by create order: {titles}")
+    else:
+        titles = list(attr_dict.keys())
+        titles.sort()  # sort by key
+        log.debug(f"attrs by lexographic order: {titles}")
+
+    start_index = 0
+    if marker is not None:
+        start_index = _index(titles, marker, create_order=create_order) + 1
+        if start_index == 0:
+            # marker not found, return 404
+            msg = f"attribute marker: {marker}, not found"
+            log.warn(msg)
+            raise HTTPNotFound()
+
+    end_index = len(titles)
+    if limit is not None and (end_index - start_index) > limit:
+        end_index = start_index + limit
+
+    attr_list = []
+    for i in range(start_index, end_index):
+        attr_name = titles[i]
+        if pattern:
+            if not globmatch(attr_name, pattern):
+                log.debug(f"attr_name: {attr_name} did not match pattern: {pattern}")
+                continue
+
+        kwargs = {"include_data": include_data, "encoding": encoding}
+        if include_data:
+            kwargs["max_data_size"] = max_data_size
+        log.debug(f"_getAttribute kwargs: {kwargs}")
+        des_attr = _getAttribute(attr_name, obj_json, **kwargs)
+        attr_list.append(des_attr)
+
+    return attr_list
+
+
 async def GET_Attributes(request):
     """ Return JSON for attribute collection
     """
@@ -195,60 +256,12 @@ async def GET_Attributes(request):
     obj_json = await get_metadata_obj(app, obj_id, bucket=bucket)
 
     log.debug(f"GET attributes obj_id: {obj_id} got json")
-    if "attributes" not in obj_json:
-        msg = f"unexpected data for obj id: {obj_id}"
-        msg.error(msg)
-        raise HTTPInternalServerError()
-
-    # return a list of attributes based on sorted dictionary keys
-    attr_dict = obj_json["attributes"]
-
-    titles = []
-    if create_order:
-        order_dict = {}
-        for title in attr_dict:
-            item = attr_dict[title]
-            if "created" not in item:
-                log.warning(f"expected to find 'created' key in attr item {title}")
-                continue
-            order_dict[title] = item["created"]
-        log.debug(f"order_dict: {order_dict}")
-        # now sort by created
-        for k in sorted(order_dict.items(), key=lambda item: item[1]):
-            titles.append(k[0])
-        log.debug(f"attrs by create order: {titles}")
-    else:
-        titles = list(attr_dict.keys())
-        titles.sort()  # sort by key
-        log.debug(f"attrs by lexographic order: {titles}")
-
-    start_index = 0
-    if marker is not None:
-        start_index = _index(titles, marker, create_order=create_order) + 1
-        if start_index == 0:
-            # marker not found, return 404
-            msg = f"attribute marker: {marker}, not found"
-            log.warn(msg)
-            raise HTTPNotFound()
-
-    end_index = len(titles)
-    if limit is not None and (end_index - start_index) > limit:
-        end_index = start_index + limit
-
-    attr_list = []
-    for i in range(start_index, end_index):
-        attr_name = titles[i]
-        if pattern:
-            if not globmatch(attr_name, pattern):
-                log.debug(f"attr_name: {attr_name} did not match pattern: {pattern}")
-                continue
-
-        kwargs = {"include_data": include_data, "encoding": encoding}
-        if include_data:
-            kwargs["max_data_size"] = max_data_size
-        log.debug(f"_getAttribute kwargs: {kwargs}")
-        des_attr = _getAttribute(attr_name, obj_json, **kwargs)
-        attr_list.append(des_attr)
+    kwargs = {"create_order": create_order, "marker": marker, "limit": limit}
+    kwargs["pattern"] = pattern
+    kwargs["include_data"] = include_data
+    kwargs["max_data_size"] = max_data_size
+    kwargs["encoding"] = encoding
+    attr_list = getAttributeList(obj_id, obj_json, **kwargs)
 
     resp_json = {"attributes": attr_list}
     resp = json_response(resp_json)
@@ -19,6 +19,7 @@ from aiohttp.web import StreamResponse
 from json import JSONDecodeError
 
 from .util.httpUtil import getAcceptType, jsonResponse, getHref, getBooleanParam
+from .util.httpUtil import isNdjsonRequest, ndjsonResponse
 from .util.globparser import globmatch
 from .util.idUtil import isValidUuid, getRootObjId
 from .util.authUtil import getUserPasswordFromRequest, validateUserPassword
@@ -124,7 +125,7 @@ async def GET_Attributes(request):
     else:
         pattern = None
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -151,6 +152,13 @@ async def GET_Attributes(request):
         if create_order:
             kwargs["create_order"] = True
         items = [obj_id, ]
+        if isNdjsonRequest(request):
+            # return a line for each object as it's fetched
+            kwargs["stream"] = True
+            crawler = DomainCrawler(app, items, **kwargs)
+            resp = await ndjsonResponse(request, crawler.results(), ignore_nan=ignore_nan)
+            log.response(request, resp=resp)
+            return resp
         crawler = DomainCrawler(app, items, **kwargs)
         # will raise exception on NotFound, etc.
         await crawler.crawl()
@@ -221,7 +229,7 @@ async def GET_Attribute(request):
     attr_name = request.match_info.get("name")
     validateAttributeName(attr_name)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -556,7 +564,7 @@ async def PUT_Attribute(request):
         validateAttributeName(attr_name)
 
     log.info(f"PUT Attributes id: {req_obj_id} name: {attr_name}")
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     # write actions need auth
     await validateUserPassword(app, username, pswd)
 
@@ -619,7 +627,7 @@ async def PUT_Attributes(request):
 
     log.debug("PUT_Attributes")
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     # write actions need auth
     await validateUserPassword(app, username, pswd)
 
@@ -782,7 +790,7 @@ async def DELETE_Attribute(request):
     log.debug(f"Attribute name: [{attr_name}]")
     validateAttributeName(attr_name)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     await validateUserPassword(app, username, pswd)
 
     domain = getDomainFromRequest(request)
@@ -829,7 +837,7 @@ async def GET_AttributeValue(request):
     attr_name = request.match_info.get("name")
     validateAttributeName(attr_name)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -1001,7 +1009,7 @@ async def PUT_AttributeValue(request):
     validateAttributeName(attr_name)
 
     log.info(f"PUT Attribute Value id: {obj_id} name: {attr_name}")
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     # write actions need auth
     await validateUserPassword(app, username, pswd)
 
@@ -1241,7 +1249,7 @@ async def POST_Attributes(request):
             log.warn(msg)
             raise HTTPBadRequest(reason=msg)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -1259,6 +1267,8 @@ async def POST_Attributes(request):
         msg = f"{accept_type} response requested for POST Attributes, "
         msg += "but only json is supported"
         log.warn(msg)
+    # return a line for each object as it's fetched if ndjson is requested
+    stream = isNdjsonRequest(request)
 
     # get domain JSON
     domain_json = await getDomainJson(app, domain)
@@ -1300,7 +1310,7 @@ async def POST_Attributes(request):
         msg = "no obj ids specified for POST Attributes"
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
-    elif len(items) == 1:
+    elif len(items) == 1 and not stream:
         # just make a request the datanode
         obj_id = list(items.keys())[0]
         attr_names = items[obj_id]
@@ -1333,8 +1343,15 @@ async def POST_Attributes(request):
         if encoding:
             pass
             # TBD: crawler_params["encoding"] = encoding
+        if stream:
+            kwargs["stream"] = True
         log.debug(f"DomainCrawler kwargs: {kwargs}")
         crawler = DomainCrawler(app, items, **kwargs)
+        if stream:
+            # errors are returned as the status for each object
+            resp = await ndjsonResponse(request, crawler.results(), ignore_nan=ignore_nan)
+            log.response(request, resp=resp)
+            return resp
         # will raise exception on NotFound, etc.
         await crawler.crawl()
 
@@ -1410,7 +1427,7 @@ async def DELETE_Attributes(request):
     else:
         log.debug(f"attr_names: deleting {len(attr_names)} attributes")
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     await validateUserPassword(app, username, pswd)
 
     domain = getDomainFromRequest(request)
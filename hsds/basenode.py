@@ -24,13 +24,17 @@ from aiohttp.web import Application
 from aiohttp.web_exceptions import HTTPNotFound, HTTPGone
 from aiohttp.web_exceptions import HTTPInternalServerError
 from aiohttp.web_exceptions import HTTPServiceUnavailable
+from aiohttp.web_exceptions import HTTPBadRequest, HTTPForbidden, HTTPConflict
 
 from . import config
-from .util.httpUtil import http_get, http_post, jsonResponse
+from .util.httpUtil import http_get, http_post, jsonResponse, get_http_client
 from .util.idUtil import createNodeId, getNodeNumber, getNodeCount
 from .util.authUtil import getUserPasswordFromRequest, validateUserPassword
 from .util.authUtil import isAdminUser
 from .util.k8sClient import getDnLabelSelector, getPodIps
+from .util.traceUtil import isTracingEnabled, traceMiddleware, flushSpans, getTraceStats
+from .util.profileUtil import sampleEventLoop, LoopMonitor, monitorEventLoop
+from .util.profileUtil import loopMonitorMiddleware
 from . import hsds_logger as log
 
 HSDS_VERSION = "0.9.4"
@@ -415,12 +419,49 @@ async def healthCheck(app):
         await asyncio.sleep(sleep_secs)
 
 
+async def traceExport(app):
+    """Periodic method to export finished trace spans to the configured
+    trace file and/or collector
+    """
+    sleep_secs = config.get("trace_flush_interval", default=5)
+    trace_collector = config.get("trace_collector", default=None)
+    log.info(f"trace export start, flush interval: {sleep_secs}")
+
+    while True:
+        await asyncio.sleep(sleep_secs)
+        if trace_collector:
+            client = get_http_client(app, url=trace_collector)
+        else:
+            client = None
+        try:
+            await flushSpans(client=client)
+        except Exception as e:
+            msg = f"Unexpected {e.__class__.__name__} exception in "
+            msg += f"flushSpans: {e}"
+            log.error(msg)
+
+
+async def start_trace_export(app):
+    loop = asyncio.get_event_loop()
+    loop.create_task(traceExport(app))
+
+
+async def start_loop_monitor(app):
+    interval = float(config.get("loop_monitor_interval", default=0.1))
+    stall_threshold = float(config.get("loop_stall_threshold", default=1.0))
+    log.info(f"loop monitor interval: {interval} stall_threshold: {stall_threshold}")
+    monitor = LoopMonitor(interval=interval, stall_threshold=stall_threshold)
+    app["loop_monitor"] = monitor
+    loop = asyncio.get_event_loop()
+    loop.create_task(monitorEventLoop(monitor))
+
+
 async def about(request):
     """HTTP Method to return general info about the service"""
     log.request(request)
 
     app = request.app
-    (username, pswd) = getUserPasswordFromRequest(request)
+    (username, pswd) = await getUserPasswordFromRequest(request)
     if username:
         await validateUserPassword(app, username, pswd)
     answer = {}
@@ -512,33 +553,88 @@ async def info(request):
         answer["s3_stats"] = app["s3_stats"]
     elif "azure_stats" in app:
         answer["azure_stats"] = app["azure_stats"]
-    mc_stats = {}
-    if "meta_cache" in app:
-        mc = app["meta_cache"]  # only DN nodes have this
-        mc_stats["count"] = len(mc)
-        mc_stats["dirty_count"] = mc.dirtyCount
-        mc_stats["utililization_per"] = mc.cacheUtilizationPercent
-        mc_stats["mem_used"] = mc.memUsed
-        mc_stats["mem_target"] = mc.memTarget
-    answer["meta_cache_stats"] = mc_stats
-    cc_stats = {}
-    if "chunk_cache" in app:
-        cc = app["chunk_cache"]  # only DN nodes have this
-        cc_stats["count"] = len(cc)
-        cc_stats["dirty_count"] = cc.dirtyCount
-        cc_stats["utililization_per"] = cc.cacheUtilizationPercent
-        cc_stats["mem_used"] = cc.memUsed
-        cc_stats["mem_target"] = cc.memTarget
-    answer["chunk_cache_stats"] = cc_stats
-    dc_stats = {}
-    if "domain_cache" in app:
-        dc = app["domain_cache"]  # only DN nodes have this
-        dc_stats["count"] = len(dc)
-        dc_stats["dirty_count"] = dc.dirtyCount
-        dc_stats["utililization_per"] = dc.cacheUtilizationPercent
-        dc_stats["mem_used"] = dc.memUsed
-        dc_stats["mem_target"] = dc.memTarget
-    answer["domain_cache_stats"] = dc_stats
+    # cache stats - only DN nodes have a chunk cache (and optionally
+    # a shared chunk cache), SN and DN nodes have meta caches, and only SN
+    # nodes have domain, acl, and link caches
+    cache_names = ("meta_cache", "chunk_cache", "shared_chunk_cache",
+                   "domain_cache", "acl_cache", "link_cache")
+    for cache_name in cache_names:
+        cache_stats = {}
+        if cache_name in app:
+            cache_stats = app[cache_name].getStats()
+        answer[f"{cache_name}_stats"] = cache_stats
+    if "loop_monitor" in app:
+        answer["loop_stats"] = app["loop_monitor"].getStats()
+    if isTracingEnabled():
+        answer["trace_stats"] = getTraceStats()
+
+    resp = await jsonResponse(request, answer)
+    log.response(request, resp=resp)
+    return resp
+
+
+async def profile(request):
+    """HTTP Method to run a sampling profiler on the node's event loop
+    for the requested duration.  Returns the sampled stacks in collapsed
+    (flame graph) format along with the currently pending asyncio tasks.
+    Admin only.  On SN nodes, use the node param to profile a DN.
+    """
+    log.request(request)
+    app = request.app
+    params = request.rel_url.query
+
+    if app["node_type"] == "sn":
+        (username, pswd) = await getUserPasswordFromRequest(request)
+        await validateUserPassword(app, username, pswd)
+        if not isAdminUser(app, username):
+            log.warn(f"profile request for non-admin user: {username}")
+            raise HTTPForbidden()
+
+    max_duration = float(config.get("profile_max_duration", default=20))
+    try:
+        duration = float(params.get("duration", 5))
+        interval = float(params.get("interval", 0.01))
+    except ValueError:
+        msg = "invalid duration or interval param for profile request"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    if duration <= 0 or duration > max_duration:
+        msg = f"profile duration must be greater than 0 and at most {max_duration}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    if interval < 0.001 or interval > duration:
+        msg = "profile interval must be at least 0.001 and less than duration"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+
+    if "node" in params and app["node_type"] == "sn":
+        # forward the request to the given dn
+        dn_urls = app["dn_urls"]
+        try:
+            node_number = int(params["node"])
+        except ValueError:
+            node_number = -1
+        if node_number < 0 or node_number >= len(dn_urls):
+            msg = f"invalid node param for profile request: {params['node']}"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
+        req = dn_urls[node_number] + "/profile"
+        dn_params = {"duration": duration, "interval": interval}
+        answer = await http_get(app, req, params=dn_params)
+    else:
+        if app.get("profile_running"):
+            log.warn("profile request while another profile is in progress")
+            raise HTTPConflict()
+        app["profile_running"] = True
+        try:
+            answer = await sampleEventLoop(duration, interval=interval)
+        finally:
+            app["profile_running"] = False
+        answer["node_id"] = app["id"]
+        answer["node_type"] = app["node_type"]
+        msg = f"profile for {duration:.1f}s got {answer['sample_count']} samples, "
+        msg += f"{len(answer['stacks'])} distinct stacks"
+        log.info(msg)
 
     resp = await jsonResponse(request, answer)
     log.response(request, resp=resp)
@@ -561,7 +657,14 @@ def baseInit(node_type):
 
     # create the app object
     log.info("Application baseInit")
-    app = Application()
+    middlewares = []
+    if config.get("loop_monitor_interval", default=0.1) > 0:
+        if config.get("loop_stall_threshold", default=1.0) > 0:
+            middlewares.append(loopMonitorMiddleware)
+    if isTracingEnabled():
+        log.info("request tracing enabled")
+        middlewares.append(traceMiddleware)
+    app = Application(middlewares=middlewares)
 
     app["node_state"] = "INITIALIZING"
     app["node_number"] = -1
@@ -701,6 +804,12 @@ def baseInit(node_type):
 
     app.router.add_get("/info", info)
     app.router.add_get("/about", about)
+    app.router.add_get("/profile", profile)
+
+    if isTracingEnabled():
+        app.on_startup.append(start_trace_export)
+    if config.get("loop_monitor_interval", default=0.1) > 0:
+        app.on_startup.append(start_loop_monitor)
 
     if is_standalone:
         # can go straight to ready state
@@ -34,6 +34,8 @@ from .util.chunkUtil import getChunkCoverage, getDataCoverage
 from .util.chunkUtil import getChunkIdForPartition, getQueryDtype
 from .util.arrayUtil import jsonToArray, getNumpyValue
 from .util.arrayUtil import getNumElements, arrayToBytes, bytesToArray
+from .util.traceUtil import startSpan
+from .util.costUtil import addRequestCost
 
 from . import config
 from . import hsds_logger as log
@@ -153,6 +155,39 @@ async def write_chunk_hyperslab(
     log.debug(msg)
 
 
+def _getChunkLocationParams(chunk_info):
+    """ return query params for the storage location of a chunk (if any) """
+    params = {}
+    if "s3path" in chunk_info:
+        params["s3path"] = chunk_info["s3path"]
+
+    if "s3offset" in chunk_info:
+        s3offset = chunk_info["s3offset"]
+        if isinstance(s3offset, list):
+            # convert to a colon seperated string
+            s3offset = ":".join(map(str, s3offset))
+        else:
+            s3offset = int(s3offset)
+        params["s3offset"] = s3offset
+
+    if "s3size" in chunk_info:
+        s3size = chunk_info["s3size"]
+        if isinstance(s3size, list):
+            # convert to a colon seperated string
+            s3size = ":".join(map(str, s3size))
+        else:
+            s3size = int(s3size)
+        params["s3size"] = s3size
+
+    if "hyper_dims" in chunk_info:
+        hyper_dims = chunk_info["hyper_dims"]
+        if isinstance(hyper_dims, list):
+            # convert to colon seperated string
+            hyper_dims = ":".join(map(str, hyper_dims))
+        params["hyper_dims"] = hyper_dims
+    return params
+
+
 async def read_chunk_hyperslab(
     app,
     chunk_id,
@@ -259,35 +294,8 @@ async def read_chunk_hyperslab(
     array_data = None
 
     # pass dset json and selection as query params
-    params = {}
+    params = _getChunkLocationParams(chunk_info)
     # params["select"] = select
-    if "s3path" in chunk_info:
-        params["s3path"] = chunk_info["s3path"]
-
-    if "s3offset" in chunk_info:
-        s3offset = chunk_info["s3offset"]
-        if isinstance(s3offset, list):
-            # convert to a colon seperated string
-            s3offset = ":".join(map(str, s3offset))
-        else:
-            s3offset = int(s3offset)
-        params["s3offset"] = s3offset
-
-    if "s3size" in chunk_info:
-        s3size = chunk_info["s3size"]
-        if isinstance(s3size, list):
-            # convert to a colon seperated string
-            s3size = ":".join(map(str, s3size))
-        else:
-            s3size = int(s3size)
-        params["s3size"] = s3size
-
-    if "hyper_dims" in chunk_info:
-        hyper_dims = chunk_info["hyper_dims"]
-        if isinstance(hyper_dims, list):
-            # convert to colon seperated string
-            hyper_dims = ":".join(map(str, hyper_dims))
-        params["hyper_dims"] = hyper_dims
 
     if len(select_dtype) < len(dset_dt):
         # field selection, pass in the field names
@@ -419,6 +427,67 @@ async def read_chunk_hyperslab(
     log.debug(f"read_chunk_hyperslab {chunk_id} - done")
 
 
+async def reduce_chunk_hyperslab(
+    app,
+    chunk_id,
+    dset_json,
+    reduction,
+    chunk_map=None,
+    bucket=None,
+    client=None,
+):
+    """get the partial stats for the chunk selection from the DN and add
+    them to the reduction
+    """
+    log.info(f"reduce_chunk_hyperslab, chunk_id: {chunk_id}, op: {reduction.op}")
+    if chunk_map is None or chunk_id not in chunk_map:
+        log.error(f"expected to find {chunk_id} in chunk_map")
+        raise HTTPInternalServerError()
+    chunk_info = chunk_map[chunk_id]
+    chunk_sel = chunk_info["chunk_sel"]
+    data_sel = chunk_info["data_sel"]
+
+    partition_chunk_id = getChunkIdForPartition(chunk_id, dset_json)
+    if partition_chunk_id != chunk_id:
+        log.debug(f"using partition_chunk_id: {partition_chunk_id}")
+        chunk_id = partition_chunk_id  # replace the chunk_id
+
+    params = _getChunkLocationParams(chunk_info)
+    params.update(reduction.getParams())
+    params["select"] = getSliceQueryParam(chunk_sel)
+    params["bucket"] = bucket
+
+    req = getDataNodeUrl(app, chunk_id)
+    req += "/chunks/" + chunk_id
+    try:
+        partial = await http_get(app, req, params=params, client=client)
+    except HTTPNotFound:
+        if "s3path" in params:
+            # external HDF5 file, should exist
+            log.warn(f"chunk {chunk_id} with s3path: {params['s3path']} not found")
+        partial = None
+
+    if partial is None:
+        # chunk hasn't been written, so the selection is all fill value
+        log.debug(f"reduce_chunk_hyperslab - using fill value for chunk: {chunk_id}")
+        dt = createDataType(dset_json["type"])
+        arr = np.zeros(getSelectionShape(chunk_sel), dtype=dt)
+        fill_value = getFillValue(dset_json)
+        if fill_value is not None:
+            arr[...] = fill_value
+        partial = reduction.getPartial(arr)
+    elif not isinstance(partial, dict):
+        log.warn(f"reduce_chunk_hyperslab - expected dict but got: {type(partial)}")
+        raise HTTPInternalServerError()
+
+    try:
+        reduction.addPartial(partial, data_sel=data_sel)
+    except (KeyError, ValueError) as e:
+        log.warn(f"reduce_chunk_hyperslab - unable to use partial for {chunk_id}: {e}")
+        raise HTTPInternalServerError()
+    log.debug(f"reduce_chunk_hyperslab {chunk_id} - done")
+
+
 async def read_point_sel(
     app,
     chunk_id,
@@ -525,9 +594,7 @@ async def read_point_sel(
         raise HTTPInternalServerError()
 
     # Fill in the return array based on passed in index values
-    for i in range(num_points):
-        index = point_index[i]
-        np_arr[index] = np_arr_rsp[i]
+    np_arr[np.asarray(point_index)] = np_arr_rsp
 
 
 async def write_point_sel(
@@ -570,7 +637,9 @@ async def write_point_sel(
     # create a numpy array with point_data
 
     # if point data was already decoded from binary, don't decode again
-    if len(point_data) > 0 and isinstance(point_data[0], np.ndarray):
+    if isinstance(point_data, np.ndarray):
+        data_arr = point_data
+    elif len(point_data) > 0 and isinstance(point_data[0], np.ndarray):
         data_arr = point_data
     else:
         data_arr = jsonToArray((num_points,), dset_dtype, point_data)
@@ -586,12 +655,8 @@ async def write_point_sel(
     np_arr = np.zeros((num_points,), dtype=comp_type)
 
     # Zip together coordinate and point_data to one numpy array
-    for i in range(num_points):
-        if rank == 1:
-            elem = (point_list[i], data_arr[i])
-        else:
-            elem = (tuple(point_list[i]), data_arr[i])
-        np_arr[i] = elem
+    np_arr["coord"] = np.asarray(point_list, dtype=np.uint64).reshape(np_arr["coord"].shape)
+    np_arr["value"] = data_arr
 
     post_data = arrayToBytes(np_arr)
 
@@ -623,6 +688,7 @@ class ChunkCrawler:
         query_update=None,
         limit=0,
         points=None,
+        reduction=None,
         action=None,
     ):
 
@@ -642,6 +708,7 @@ class ChunkCrawler:
         self._arr = arr
         self._select_dtype = select_dtype
         self._points = points
+        self._reduction = reduction
         self._query = query
         self._query_update = query_update
         self._hits = 0
@@ -761,6 +828,8 @@ class ChunkCrawler:
         log.debug(f"ChunkCrawler - retry_exp: {retry_exp:.3f}")
         retry = 0
         status_code = None
+        span = startSpan(f"ChunkCrawler.{self._action}", chunk_id=chunk_id)
+        addRequestCost("chunks")
         while retry < max_retries:
             try:
                 if self._action == "read_chunk_hyperslab":
@@ -780,6 +849,19 @@ class ChunkCrawler:
                     msg = f"read_chunk_hyperslab - got 200 status for chunk_id: {chunk_id}"
                     log.debug(msg)
                     status_code = 200
+                elif self._action == "reduce_chunk_hyperslab":
+                    await reduce_chunk_hyperslab(
+                        self._app,
+                        chunk_id,
+                        self._dset_json,
+                        self._reduction,
+                        chunk_map=self._chunk_map,
+                        bucket=self._bucket,
+                        client=client,
+                    )
+                    msg = f"reduce_chunk_hyperslab - got 200 status for chunk_id: {chunk_id}"
+                    log.debug(msg)
+                    status_code = 200
                 elif self._action == "write_chunk_hyperslab":
                     await write_chunk_hyperslab(
                         self._app,
@@ -897,10 +979,13 @@ class ChunkCrawler:
                 msg = f"ChunkCrawler action: {self._action} failed after: {retry} retries"
                 log.error(msg)
             else:
+                addRequestCost("retries")
                 sleep_time = retry_exp * 2 ** retry + random.uniform(0, 0.1)
                 msg = f"ChunkCrawler.doWork - retry: {retry}, sleeping for {sleep_time:.2f}"
                 await asyncio.sleep(sleep_time)
 
+        span.finish(status_code=status_code, retry=retry)
+
         # save status_code
         self._status_map[chunk_id] = status_code
         if self._query is not None and status_code == 200:
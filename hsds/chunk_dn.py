@@ -14,6 +14,7 @@
 # handles regauests to read/write chunk data
 #
 
+import asyncio
 import numpy as np
 import traceback
 from aiohttp.web_exceptions import HTTPBadRequest, HTTPInternalServerError
@@ -32,7 +33,9 @@ from .util.chunkUtil import chunkWriteSelection, chunkReadSelection
 from .util.chunkUtil import chunkWritePoints, chunkReadPoints
 from .util.domainUtil import isValidBucketName
 from .util.boolparser import BooleanParser
-from .datanode_lib import get_metadata_obj, get_chunk, save_chunk
+from .util.reduceUtil import REDUCE_STATS, getPartial
+from .util.costUtil import startRequestCost, getRequestCostHeaders
+from .datanode_lib import get_metadata_obj, get_chunk, save_chunk, readAhead
 
 from . import hsds_logger as log
 from . import config
@@ -43,6 +46,7 @@ async def PUT_Chunk(request):
     Update the requested chunk/selection
     """
     log.request(request)
+    startRequestCost()
     app = request.app
     params = request.rel_url.query
     query = None
@@ -247,6 +251,7 @@ async def PUT_Chunk(request):
         try:
             resp = StreamResponse()
             resp.headers["Content-Type"] = "application/octet-stream"
+            resp.headers.update(getRequestCostHeaders())
             resp.content_length = len(read_resp)
             await resp.prepare(request)
             await resp.write(read_resp)
@@ -309,7 +314,7 @@ async def PUT_Chunk(request):
     else:
         status_code = 200
 
-    resp = json_response(resp, status=status_code)
+    resp = json_response(resp, status=status_code, headers=getRequestCostHeaders())
     log.response(request, resp=resp)
     return resp
 
@@ -319,6 +324,7 @@ async def GET_Chunk(request):
     Return data from requested chunk and selection
     """
     log.request(request)
+    startRequestCost()
 
     bucket = None
     s3path = None
@@ -415,6 +421,37 @@ async def GET_Chunk(request):
             log.error(f"invalid Limit param: {param_limit}")
             raise HTTPBadRequest()
 
+    reduce_stats = None  # partial aggregates to return rather than the data
+    reduce_kwargs = {}
+    if "reduce" in params:
+        reduce_stats = params["reduce"].split(",")
+        for stat in reduce_stats:
+            if stat not in REDUCE_STATS:
+                msg = f"invalid reduce stat: {stat}"
+                log.warn(msg)
+                raise HTTPBadRequest(reason=msg)
+        if query:
+            msg = "reduce can not be used with query"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
+        try:
+            if "axis" in params:
+                reduce_kwargs["axis"] = int(params["axis"])
+            if "bins" in params:
+                reduce_kwargs["bins"] = int(params["bins"])
+            if "range" in params:
+                hist_range = tuple(map(float, params["range"].split(":")))
+                if len(hist_range) != 2:
+                    raise ValueError("expected two values for range")
+                reduce_kwargs["hist_range"] = hist_range
+        except ValueError as ve:
+            msg = f"invalid reduce params: {ve}"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
+        if "skipnan" in params and params["skipnan"]:
+            reduce_kwargs["skipnan"] = True
+        log.debug(f"GET_Chunk - reduce: {reduce_stats} {reduce_kwargs}")
+
     if s3path:
         # calculate how many chunk bytes we'll read
         num_bytes = 0
@@ -484,6 +521,9 @@ async def GET_Chunk(request):
 
     if chunk_init:
         save_chunk(app, chunk_id, dset_json, chunk_arr, bucket=bucket)
+    elif not s3path:
+        # prefetch the following chunks if this is a sequential read
+        readAhead(app, chunk_id, dset_json, bucket=bucket)
 
     if select_fields:
         try:
@@ -551,6 +591,21 @@ async def GET_Chunk(request):
         # read selected data from chunk
         output_arr = chunkReadSelection(chunk_arr, slices=selection, select_dt=select_dt)
 
+    if reduce_stats:
+        # return partial aggregates for the selection rather than the data
+        try:
+            partial = getPartial(output_arr, reduce_stats, **reduce_kwargs)
+        except (TypeError, ValueError) as e:
+            msg = f"unable to reduce selection: {e}"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
+        rsp_json = {}
+        for stat in partial:
+            rsp_json[stat] = np.asarray(partial[stat]).tolist()
+        resp = json_response(rsp_json, headers=getRequestCostHeaders())
+        log.response(request, resp=resp)
+        return resp
+
     # write response
     if output_arr is not None:
         log.debug(f"GET_Chunk - returning arr: {output_arr.shape}")
@@ -559,6 +614,7 @@ async def GET_Chunk(request):
         try:
             resp = StreamResponse()
             resp.headers["Content-Type"] = "application/octet-stream"
+            resp.headers.update(getRequestCostHeaders())
             resp.content_length = len(read_resp)
             await resp.prepare(request)
             await resp.write(read_resp)
@@ -580,6 +636,7 @@ async def POST_Chunk(request):
     Return data from requested chunk and point selection
     """
     log.request(request)
+    startRequestCost()
     app = request.app
     params = request.rel_url.query
     content_type = getContentType(request)
@@ -808,13 +865,14 @@ async def POST_Chunk(request):
 
     if output_arr is None:
         # write empty response
-        resp = json_response({})
+        resp = json_response({}, headers=getRequestCostHeaders())
     else:
         output_data = arrayToBytes(output_arr)
         # write response
         try:
             resp = StreamResponse()
             resp.headers["Content-Type"] = "application/octet-stream"
+            resp.headers.update(getRequestCostHeaders())
             resp.content_length = len(output_data)
             await resp.prepare(request)
             await resp.write(output_data)
@@ -869,6 +927,8 @@ async def DELETE_Chunk(request):
 
     if chunk_id in chunk_cache:
         del chunk_cache[chunk_id]
+    if "shared_chunk_cache" in app:
+        app["shared_chunk_cache"].invalidate(chunk_id, bucket=bucket)
 
     filter_map = app["filter_map"]
     dset_id = getDatasetId(chunk_id)
@@ -888,3 +948,117 @@ async def DELETE_Chunk(request):
     resp = json_response(resp_json)
     log.response(request, resp=resp)
     return resp
+
+
+async def _getDatasetChunksBody(request):
+    """ return the body of a request with a dset_id, bucket, and a list of
+    chunk_ids of the dataset owned by this node """
+    app = request.app
+    if not request.has_body:
+        msg = "request with no body"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    body = await request.json()
+    for key in ("dset_id", "chunk_ids", "bucket"):
+        if key not in body:
+            msg = f"expected {key} in body"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
+    dset_id = body["dset_id"]
+    bucket = body["bucket"]
+    if not isValidBucketName(bucket):
+        msg = f"Invalid bucket name: {bucket}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    for chunk_id in body["chunk_ids"]:
+        if not isValidUuid(chunk_id, "Chunk") or getDatasetId(chunk_id) != dset_id:
+            msg = f"invalid chunk id: {chunk_id}"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
+        try:
+            validateInPartition(app, chunk_id)
+        except KeyError:
+            msg = f"invalid partition for obj id: {chunk_id}"
+            log.error(msg)
+            raise HTTPInternalServerError()
+    return body
+
+
+async def POST_Prewarm(request):
+    """
+    Load the given chunks into the chunk cache, optionally pinning them
+    """
+    log.request(request)
+    app = request.app
+
+    body = await _getDatasetChunksBody(request)
+    dset_id = body["dset_id"]
+    chunk_ids = body["chunk_ids"]
+    bucket = body["bucket"]
+    pin_ttl = body.get("pin_ttl")
+
+    if pin_ttl:
+        max_pin_ttl = float(config.get("prewarm_max_pin_ttl", default=3600))
+        pin_ttl = min(float(pin_ttl), max_pin_ttl)
+
+    dset_json = await get_metadata_obj(app, dset_id, bucket=bucket)
+    chunk_cache = app["chunk_cache"]
+    counts = {"cached": 0, "loaded": 0, "not_found": 0, "skipped": 0, "pinned": 0}
+    counts["not_pinned"] = 0
+    max_concurrent = int(config.get("prewarm_max_concurrent", default=16))
+    semaphore = asyncio.Semaphore(max(max_concurrent, 1))
+
+    async def prewarmChunk(chunk_id):
+        if chunk_id in chunk_cache:
+            counts["cached"] += 1
+        else:
+            try:
+                async with semaphore:
+                    await get_chunk(app, chunk_id, dset_json, bucket=bucket)
+            except HTTPNotFound:
+                # chunk hasn't been written
+                counts["not_found"] += 1
+                return
+            if chunk_id not in chunk_cache:
+                # no room in the cache
+                counts["skipped"] += 1
+                return
+            counts["loaded"] += 1
+        if pin_ttl:
+            if chunk_cache.pin(chunk_id, pin_ttl):
+                counts["pinned"] += 1
+            else:
+                # over the chunk_cache_max_pinned limit
+                counts["not_pinned"] += 1
+
+    await asyncio.gather(*[prewarmChunk(chunk_id) for chunk_id in chunk_ids])
+    log.info(f"POST_Prewarm {dset_id} - {counts}")
+
+    resp = json_response(counts)
+    log.response(request, resp=resp)
+    return resp
+
+
+async def POST_PyramidRebuild(request):
+    """
+    Queue pyramid level updates for the given chunks, so that levels left
+    stale (e.g. by a restart before a pending update ran) can be rebuilt
+    """
+    log.request(request)
+    app = request.app
+
+    body = await _getDatasetChunksBody(request)
+    dset_id = body["dset_id"]
+    chunk_ids = body["chunk_ids"]
+    bucket = body["bucket"]
+
+    pyramid_update_ids = app["pyramid_update_ids"]
+    for chunk_id in chunk_ids:
+        if chunk_id not in pyramid_update_ids:
+            # a timestamp of zero gets the update run on the next pass
+            pyramid_update_ids[chunk_id] = (0, bucket)
+    log.info(f"POST_PyramidRebuild {dset_id} - queued {len(chunk_ids)} chunks")
+
+    resp = json_response({"queued": len(chunk_ids)})
+    log.response(request, resp=resp)
+    return resp
@@ -26,7 +26,7 @@ from aiohttp.web_exceptions import HTTPConflict, HTTPInternalServerError
 from aiohttp.web import StreamResponse
 
 from .util.httpUtil import getHref, getAcceptType, getContentType
-from .util.httpUtil import request_read, jsonResponse, isAWSLambda
+from .util.httpUtil import request_read, jsonResponse, isAWSLambda, getBooleanParam
 from .util.idUtil import isValidUuid
 from .util.domainUtil import getDomainFromRequest, isValidDomain
 from .util.domainUtil import getBucketForDomain
@@ -34,19 +34,26 @@ from .util.hdf5dtype import getItemSize, getDtypeItemSize, getSubType, createDat
 from .util.dsetUtil import isNullSpace, isScalarSpace, get_slices, getShapeDims
 from .util.dsetUtil import isExtensible, getSelectionPagination
 from .util.dsetUtil import getSelectionShape, getDsetMaxDims, getChunkLayout
-from .util.chunkUtil import getNumChunks, getChunkIds, getChunkId
-from .util.arrayUtil import bytesArrayToList, jsonToArray
+from .util.chunkUtil import getNumChunks, getChunkIds, groupPointsByChunk, getQueryDtype
+from .util.arrayUtil import jsonToArray
 from .util.arrayUtil import getNumElements, arrayToBytes, bytesToArray
 from .util.arrayUtil import squeezeArray, getBroadcastShape
 from .util.authUtil import getUserPasswordFromRequest, validateUserPassword
+from .util.traceUtil import traceSpan
+from .util.costUtil import startRequestCost, getRequestCostHeaders
+from .util.reduceUtil import REDUCE_OPS, Reduction, isReducibleType
+from .util.pyramidUtil import getPyramid, getLevelSelection
+from .util.arrowUtil import ARROW_STREAM_TYPE, ArrowStreamEncoder, arrayToArrowStream
+from .util.jsonUtil import JsonArrayWriter, dumpJson, toJsonValue
 from .servicenode_lib import getDsetJson, validateAction
-from .dset_lib import getSelectionData, getParser, extendShape
+from .dset_lib import getSelectionData, getSelectionReduction, getParser, extendShape
 from .chunk_crawl import ChunkCrawler
 from . import config
 from . import hsds_logger as log
 
 
 VARIABLE_AVG_ITEM_SIZE = 512  # guess at avg variable type length
+MAX_HISTOGRAM_BINS = 10000  # max number of bins for histogram reductions
 
 
 def get_hrefs(request, dset_json):
@@ -87,6 +94,14 @@ def _isIgnoreNan(params, body=None):
     return ignore_nan
 
 
+def _isIncludeCost(params):
+    """ return True if the per-request cost counters should be returned """
+    kw = "include_cost"
+    if kw in params and params[kw]:
+        return True
+    return False
+
+
 def _isAppend(params, body=None):
     """ return True if append values are specified in params or body """
     kw = "append"
@@ -316,6 +331,26 @@ def _getPoints(body, rank=1):
     return points
 
 
+def _isPointShapeValid(points, rank):
+    """ return True if the points array has one coordinate per dimension """
+    if len(points.shape) == 1:
+        return rank == 1
+    return len(points.shape) == 2 and points.shape[1] == rank
+
+
+def _getOutOfBoundsPoint(points, dims):
+    """ return the first point that is outside the dataset extent
+    or None if all points are valid """
+    if len(points) == 0:
+        return None
+    coords = points.reshape((len(points), len(dims)))
+    invalid = (coords >= np.asarray(dims, dtype=points.dtype)).any(axis=1)
+    if not invalid.any():
+        return None
+    point = points[np.argmax(invalid)]
+    return point.tolist()
+
+
 def _getQuery(params, dtype, rank=1, body=None):
     """ get query parameter and validate if set """
 
@@ -372,6 +407,134 @@ def _getElementCount(params, body=None):
     return element_count
 
 
+def _getReduceArgs(params, rank):
+    """ return the reduce op and Reduction kwargs given by the query params """
+    op = params["reduce"]
+    if op not in REDUCE_OPS:
+        msg = f"invalid reduce value: {op}, expected one of: {REDUCE_OPS}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    kwargs = {}
+    try:
+        if "axis" in params:
+            axis = int(params["axis"])
+            if axis < 0:
+                axis += rank
+            if axis < 0 or axis >= rank:
+                raise ValueError(f"axis out of range for dataset of rank {rank}")
+            if op == "histogram":
+                raise ValueError("axis can not be used with histogram")
+            kwargs["axis"] = axis
+        if "bins" in params:
+            bins = int(params["bins"])
+            if bins < 1 or bins > MAX_HISTOGRAM_BINS:
+                raise ValueError(f"bins must be between 1 and {MAX_HISTOGRAM_BINS}")
+            kwargs["bins"] = bins
+        if "range" in params:
+            hist_range = tuple(map(float, params["range"].split(":")))
+            if len(hist_range) != 2 or hist_range[0] > hist_range[1]:
+                raise ValueError("expected range in the form min:max")
+            kwargs["hist_range"] = hist_range
+    except ValueError as ve:
+        msg = f"invalid reduce params: {ve}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    if "skipnan" in params and params["skipnan"]:
+        kwargs["skipnan"] = True
+    return op, kwargs
+
+
+async def _doReduction(request, dset_id, dset_json, slices, bucket=None, ignore_nan=False):
+    """ compute the reduction given by the request params over the selection
+    and return the response """
+    app = request.app
+    params = request.rel_url.query
+    dset_dtype = createDataType(dset_json["type"])
+    if not isReducibleType(dset_dtype):
+        msg = "reduce is only supported for integer and float types"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    if "fields" in params or "query" in params:
+        msg = "reduce can not be used with fields or query params"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+
+    np_shape = getSelectionShape(slices)
+    op, kwargs = _getReduceArgs(params, len(np_shape))
+    log.info(f"GET Value reduce: {op} {kwargs} for selection: {np_shape}")
+
+    if op == "histogram" and "hist_range" not in kwargs:
+        # get the min and max of the selection to use as the range
+        range_reduction = Reduction("range", dset_dtype, np_shape, skipnan=True)
+        await getSelectionReduction(
+            app, dset_id, dset_json, slices, range_reduction, bucket=bucket)
+        hist_range = range_reduction.getResult()
+        if np.isnan(hist_range[0]):
+            hist_range = (0.0, 1.0)  # all values are NaN
+        log.debug(f"using histogram range: {hist_range}")
+        kwargs["hist_range"] = hist_range
+
+    try:
+        reduction = Reduction(op, dset_dtype, np_shape, **kwargs)
+    except (TypeError, ValueError) as e:
+        msg = f"invalid reduce request: {e}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    await getSelectionReduction(app, dset_id, dset_json, slices, reduction, bucket=bucket)
+    arr = reduction.getResult()
+
+    if op != "histogram" and getAcceptType(request) != "json":
+        # the result type usually differs from the dataset type, so give
+        # the type and shape for binary responses
+        headers = {"X-HSDS-Result-Type": arr.dtype.str}
+        headers["X-HSDS-Result-Shape"] = ",".join(str(extent) for extent in arr.shape)
+        resp = await arrayResponse(arr, request, dset_json, headers=headers)
+    else:
+        resp_json = {"value": arr.tolist()}
+        if op == "histogram":
+            resp_json["bin_edges"] = reduction.getBinEdges().tolist()
+        resp_json["hrefs"] = get_hrefs(request, dset_json)
+        resp = await jsonResponse(request, resp_json, ignore_nan=ignore_nan)
+    log.response(request, resp=resp)
+    return resp
+
+
+def _getJsonArrayWriter(params, slices, pages, ignore_nan=False):
+    """ return a JsonArrayWriter for streaming the selection as the given pages """
+    # pages are split along the first dimension that differs from the selection
+    page_dim = 0
+    for dim in range(len(slices)):
+        if pages[0][dim] != slices[dim]:
+            page_dim = dim
+            break
+    squeeze = "reduce_dim" in params and params["reduce_dim"]
+    np_shape = getSelectionShape(slices)
+    kwargs = {"squeeze": squeeze, "ignore_nan": ignore_nan}
+    return JsonArrayWriter(np_shape, page_dim, **kwargs)
+
+
+async def _getPyramidLevel(app, dset_json, slices, bucket=None):
+    """ return the id, json, and selection of the pyramid level that holds
+    every element of the selection.  Returns the dataset itself if there is
+    no such level """
+    dset_id = dset_json["id"]
+    pyramid = getPyramid(dset_json)
+    if pyramid is None:
+        log.debug(f"dataset {dset_id} has no pyramid, ignoring pyramid param")
+        return dset_id, dset_json, slices
+    item = getLevelSelection(slices, pyramid["factor"], len(pyramid["ids"]))
+    if item is None:
+        log.debug(f"no pyramid level of {dset_id} matches selection: {slices}")
+        return dset_id, dset_json, slices
+    level, level_slices = item
+    level_id = pyramid["ids"][level - 1]
+    msg = f"GET Value using pyramid level {level} of {dset_id}: {level_id}, "
+    msg += f"selection: {level_slices}"
+    log.info(msg)
+    level_json = await getDsetJson(app, level_id, bucket=bucket)
+    return level_id, level_json, level_slices
+
+
 async def _getRequestData(request, http_streaming=True):
     """ get input data from request
         return dict for json input, bytes for non-streaming binary
@@ -425,12 +588,19 @@ async def _getRequestData(request, http_streaming=True):
     return input_data
 
 
-async def arrayResponse(arr, request, dset_json):
-    """ return the array as binary or json response based on accept type """
+async def arrayResponse(arr, request, dset_json, cost=None, headers=None):
+    """ return the array as binary, arrow, or json response based on accept type.
+    If cost is set, the request cost counters are included in the response.
+    Any headers given are added to binary and arrow responses """
     response_type = getAcceptType(request)
 
-    if response_type == "binary":
-        output_data = arr.tobytes()
+    if response_type in ("binary", "arrow"):
+        if response_type == "arrow":
+            output_data = arrayToArrowStream(arr)
+            content_type = ARROW_STREAM_TYPE
+        else:
+            output_data = arr.tobytes()
+            content_type = "application/octet-stream"
         msg = f"PUT_Value query - returning {len(output_data)} bytes binary data"
         log.debug(msg)
 
@@ -440,8 +610,12 @@ async def arrayResponse(arr, request, dset_json):
             if config.get("http_compression"):
                 log.debug("enabling http_compression")
                 resp.enable_compression()
-            resp.headers["Content-Type"] = "application/octet-stream"
+            resp.headers["Content-Type"] = content_type
             resp.content_length = len(output_data)
+            if cost is not None:
+                resp.headers.update(getRequestCostHeaders(cost))
+            if headers:
+                resp.headers.update(headers)
             await resp.prepare(request)
             await resp.write(output_data)
             await resp.write_eof()
@@ -450,17 +624,20 @@ async def arrayResponse(arr, request, dset_json):
     else:
         log.debug("PUT Value query - returning JSON data")
         rsp_json = {}
-        data = arr.tolist()
-        log.debug(f"got rsp data {len(data)} points")
+        log.debug(f"got rsp data {len(arr)} points")
         try:
-            json_query_data = bytesArrayToList(data)
+            json_query_data = toJsonValue(arr)
         except ValueError as err:
             msg = f"Cannot decode provided bytes to list: {err}"
             raise HTTPBadRequest(reason=msg)
         rsp_json["value"] = json_query_data
         rsp_json["hrefs"] = get_hrefs(request, dset_json)
+        if cost is not None:
+            rsp_json["cost"] = cost
 
         resp = await jsonResponse(request, rsp_json)
+        if cost is not None:
+            resp.headers.update(getRequestCostHeaders(cost))
     return resp
 
 
@@ -481,46 +658,23 @@ async def _doPointWrite(app,
     dims = getShapeDims(datashape)
     rank = len(dims)
 
-    chunk_dict = {}  # chunk ids to list of points in chunk
+    if not _isPointShapeValid(points, rank):
+        msg = "PUT Value point value did not match dataset rank"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    bad_point = _getOutOfBoundsPoint(points, dims)
+    if bad_point is not None:
+        msg = f"PUT Value point: {bad_point} is not within the "
+        msg += "bounds of the dataset"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
 
-    for pt_indx in range(num_points):
-        if rank == 1:
-            point = int(points[pt_indx])
-        else:
-            point_tuple = points[pt_indx]
-            point = []
-            for i in range(len(point_tuple)):
-                point.append(int(point_tuple[i]))
-        if rank == 1:
-            if point < 0 or point >= dims[0]:
-                msg = f"PUT Value point: {point} is not within the "
-                msg += "bounds of the dataset"
-                log.warn(msg)
-                raise HTTPBadRequest(reason=msg)
-        else:
-            if len(point) != rank:
-                msg = "PUT Value point value did not match dataset rank"
-                log.warn(msg)
-                raise HTTPBadRequest(reason=msg)
-            for i in range(rank):
-                if point[i] < 0 or point[i] >= dims[i]:
-                    msg = f"PUT Value point: {point} is not within the "
-                    msg += "bounds of the dataset"
-                    log.warn(msg)
-                    raise HTTPBadRequest(reason=msg)
-        chunk_id = getChunkId(dset_id, point, layout)
-        # get the pt_indx element from the input data
-        value = data[pt_indx]
-        if chunk_id not in chunk_dict:
-            point_list = [point, ]
-            point_data = [value, ]
-            chunk_dict[chunk_id] = {"indices": point_list, "points": point_data}
-        else:
-            item = chunk_dict[chunk_id]
-            point_list = item["indices"]
-            point_list.append(point)
-            point_data = item["points"]
-            point_data.append(value)
+    chunk_dict = {}  # chunk ids to list of points in chunk
+    chunk_points = groupPointsByChunk(dset_id, points, layout)
+    for chunk_id, point_index in chunk_points.items():
+        point_list = points[point_index]
+        point_data = data[point_index]
+        chunk_dict[chunk_id] = {"indices": point_list, "points": point_data}
 
     num_chunks = len(chunk_dict)
     log.debug(f"num_chunks: {num_chunks}")
@@ -669,6 +823,8 @@ async def PUT_Value(request):
         raise HTTPBadRequest(reason=msg)
 
     log.request(request)
+    cost = startRequestCost()
+    include_cost = _isIncludeCost(params)
 
     domain = getDomainFromRequest(request)
     if not isValidDomain(domain):
@@ -688,7 +844,7 @@ async def PUT_Value(request):
         raise HTTPBadRequest(reason=msg)
 
     # authenticate and authorize action
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     await validateUserPassword(app, username, pswd)
 
     await validateAction(app, domain, dset_id, username, "update")
@@ -768,7 +924,11 @@ async def PUT_Value(request):
             limit=limit,
             query_update=body,
         )
-        resp = await arrayResponse(arr_rsp, request, dset_json)
+        if include_cost:
+            kwargs = {"cost": cost}
+        else:
+            kwargs = {}
+        resp = await arrayResponse(arr_rsp, request, dset_json, **kwargs)
         log.response(request, resp=resp)
         return resp
 
@@ -951,7 +1111,11 @@ async def PUT_Value(request):
     # write successful
 
     resp_json = {}
+    if include_cost:
+        resp_json["cost"] = cost
     resp = await jsonResponse(request, resp_json)
+    if include_cost:
+        resp.headers.update(getRequestCostHeaders(cost))
     return resp
 
 
@@ -962,6 +1126,8 @@ async def GET_Value(request):
     log.request(request)
     app = request.app
     params = request.rel_url.query
+    cost = startRequestCost()
+    include_cost = _isIncludeCost(params)
 
     dset_id = request.match_info.get("id")
     if not dset_id:
@@ -973,7 +1139,7 @@ async def GET_Value(request):
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -1029,14 +1195,24 @@ async def GET_Value(request):
 
     query = _getQuery(params, dset_dtype, rank=rank)
 
-    response_type = getAcceptType(request)
+    if "reduce" in params:
+        # return aggregates of the selection rather than the values
+        kwargs = {"bucket": bucket, "ignore_nan": ignore_nan}
+        return await _doReduction(request, dset_id, dset_json, slices, **kwargs)
 
-    if response_type == "binary" and use_http_streaming(request, rank):
-        stream_pagination = True
-        log.debug("use stream_pagination")
-    else:
-        stream_pagination = False
-        log.debug("no stream_pagination")
+    href_json = dset_json  # hrefs refer to the requested dataset
+    if getBooleanParam(params, "pyramid"):
+        if query:
+            # query results would give indices of the level, not the dataset
+            msg = "pyramid can not be used with query param"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
+        # read strided selections from a downsampled level if possible
+        kwargs = {"bucket": bucket}
+        dset_id, dset_json, slices = await _getPyramidLevel(app, dset_json, slices, **kwargs)
+        dims = getShapeDims(dset_json["shape"])
+
+    response_type = getAcceptType(request)
 
     # for non query requests with non-variable types we can fetch
     # the expected response bytes length now
@@ -1059,6 +1235,17 @@ async def GET_Value(request):
         # reduce max size to account for hex_encoding and other JSON content
         max_request_size -= 1000
         max_request_size /= 2
+
+    if not use_http_streaming(request, rank):
+        stream_pagination = False
+    elif response_type in ("binary", "arrow"):
+        stream_pagination = True
+    elif response_type == "json" and not query and request_size >= max_request_size:
+        # stream large JSON responses a page at a time
+        stream_pagination = True
+    else:
+        stream_pagination = False
+    log.debug(f"stream_pagination: {stream_pagination}")
     if request_size >= max_request_size and not stream_pagination:
         msg = "GET value request too large"
         log.warn(msg)
@@ -1069,6 +1256,21 @@ async def GET_Value(request):
     else:
         content_length = None
 
+    if response_type == "arrow":
+        # each page is written as a record batch of the arrow stream
+        if query:
+            arrow_dtype = getQueryDtype(select_dtype)
+        else:
+            arrow_dtype = select_dtype
+        try:
+            arrow_encoder = ArrowStreamEncoder(arrow_dtype)
+        except TypeError as te:
+            msg = f"arrow response not supported for this type: {te}"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
+    else:
+        arrow_encoder = None
+
     resp_json = {"status": 200}  # will over-write if there's a problem
     # write response
     try:
@@ -1082,13 +1284,17 @@ async def GET_Value(request):
                 log.debug("content_length could not be determined")
             else:
                 resp.content_length = content_length
+        elif response_type == "arrow":
+            resp.headers["Content-Type"] = ARROW_STREAM_TYPE
         else:
             resp.headers["Content-Type"] = "application/json"
-        log.debug("prepare request")
-        await resp.prepare(request)
         arr = None  # will be set based on returned data
 
         if stream_pagination:
+            # response headers are sent before any data is read, so
+            # cost counters can't be returned for streamed responses
+            log.debug("prepare request")
+            await resp.prepare(request)
             # example
             # get binary data a page at a time and write back to response
             if item_size == "H5T_VARIABLE":
@@ -1097,6 +1303,11 @@ async def GET_Value(request):
                 page_item_size = item_size
             pages = getSelectionPagination(slices, dims, page_item_size, max_request_size)
             log.debug(f"getSelectionPagination returned: {len(pages)} pages")
+            if response_type == "json":
+                json_writer = _getJsonArrayWriter(params, slices, pages, ignore_nan=ignore_nan)
+                await resp.write(('{"value": ' + json_writer.start()).encode("utf-8"))
+            else:
+                json_writer = None
             bytes_streamed = 0
             try:
                 for page_number in range(len(pages)):
@@ -1122,8 +1333,15 @@ async def GET_Value(request):
                         log.warn(f"no data returned for streaming page: {page_number}")
                         continue
 
-                    log.debug("preparing binary response")
-                    output_data = arrayToBytes(arr)
+                    if arrow_encoder:
+                        log.debug("preparing arrow record batch")
+                        output_data = arrow_encoder.encode(arr)
+                    elif json_writer:
+                        log.debug("preparing json rows")
+                        output_data = json_writer.encode(arr).encode("utf-8")
+                    else:
+                        log.debug("preparing binary response")
+                        output_data = arrayToBytes(arr)
                     log.debug(f"got {len(output_data)} bytes for resp")
                     bytes_streamed += len(output_data)
                     log.debug("write request")
@@ -1146,11 +1364,20 @@ async def GET_Value(request):
                 #
             except Exception as e:
                 log.error(f"got {type(e)} exception doing getSelectionData: {e}")
+                resp_json["status"] = 500
             finally:
                 msg = f"streaming data for {len(pages)} pages complete, "
                 msg += f"{bytes_streamed} bytes written"
                 log.info(msg)
 
+                if arrow_encoder and resp_json["status"] == 200:
+                    # only end the arrow stream if all pages were written
+                    await resp.write(arrow_encoder.close())
+                if json_writer and resp_json["status"] == 200:
+                    # only complete the JSON document if all pages were written
+                    resp_json["hrefs"] = get_hrefs(request, href_json)
+                    text = json_writer.end() + ", " + dumpJson(resp_json)[1:]
+                    await resp.write(text.encode("utf-8"))
                 await resp.write_eof()
                 return resp
 
@@ -1175,6 +1402,12 @@ async def GET_Value(request):
             resp_json["status"] = he.status_code
             # can't raise a HTTPException here since write is in progress
 
+        if include_cost:
+            resp.headers.update(getRequestCostHeaders(cost))
+            resp_json["cost"] = cost
+        log.debug("prepare request")
+        await resp.prepare(request)
+
         if arr is None:
             # no array (OPTION request?)  Return empty json response
             log.warn("got None response from getSelectionData")
@@ -1190,10 +1423,22 @@ async def GET_Value(request):
                 log.warn(f"GET Value - got error status: {resp_json['status']}")
             else:
                 log.debug("preparing binary response")
-                output_data = arrayToBytes(arr)
-                log.debug(f"got {len(output_data)} bytes for resp")
-                log.debug("write request")
-                await resp.write(output_data)
+                with traceSpan("write_response", format="binary") as span:
+                    output_data = arrayToBytes(arr)
+                    log.debug(f"got {len(output_data)} bytes for resp")
+                    span.setTag("bytes", len(output_data))
+                    log.debug("write request")
+                    await resp.write(output_data)
+        elif response_type == "arrow":
+            if resp_json["status"] != 200:
+                log.warn(f"GET Value - got error status: {resp_json['status']}")
+            else:
+                log.debug("preparing arrow response")
+                with traceSpan("write_response", format="arrow") as span:
+                    output_data = arrow_encoder.encode(arr) + arrow_encoder.close()
+                    log.debug(f"got {len(output_data)} bytes for resp")
+                    span.setTag("bytes", len(output_data))
+                    await resp.write(output_data)
         else:
             # return json
             log.debug("GET Value - returning JSON data")
@@ -1201,26 +1446,27 @@ async def GET_Value(request):
             if "reduce_dim" in params and params["reduce_dim"]:
                 arr = squeezeArray(arr)
 
-            data = arr.tolist()
-            try:
-                json_data = bytesArrayToList(data)
-            except ValueError as err:
-                msg = f"Cannot decode bytes to list: {err}"
-                raise HTTPBadRequest(reason=msg)
-            datashape = dset_json["shape"]
+            with traceSpan("write_response", format="json") as span:
+                try:
+                    json_data = toJsonValue(arr)
+                except ValueError as err:
+                    msg = f"Cannot decode bytes to list: {err}"
+                    raise HTTPBadRequest(reason=msg)
+                datashape = dset_json["shape"]
 
-            if datashape["class"] == "H5S_SCALAR":
-                # convert array response to value
-                resp_json["value"] = json_data[0]
-            else:
-                resp_json["value"] = json_data
-            resp_json["hrefs"] = get_hrefs(request, dset_json)
-            resp_body = await jsonResponse(
-                resp, resp_json, ignore_nan=ignore_nan, body_only=True
-            )
-            log.debug(f"jsonResponse returned: {len(resp_body)} items")
-            resp_body = resp_body.encode("utf-8")
-            await resp.write(resp_body)
+                if datashape["class"] == "H5S_SCALAR":
+                    # convert array response to value
+                    resp_json["value"] = json_data[0]
+                else:
+                    resp_json["value"] = json_data
+                resp_json["hrefs"] = get_hrefs(request, href_json)
+                resp_body = await jsonResponse(
+                    resp, resp_json, ignore_nan=ignore_nan, body_only=True
+                )
+                log.debug(f"jsonResponse returned: {len(resp_body)} items")
+                resp_body = resp_body.encode("utf-8")
+                await resp.write(resp_body)
+                span.setTag("bytes", len(resp_body))
         await resp.write_eof()
     except Exception as e:
         log.error(f"{type(e)} Exception during data write: {e}")
@@ -1261,7 +1507,7 @@ async def POST_Value(request):
         raise HTTPBadRequest(reason=msg)
     bucket = getBucketForDomain(domain)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -1273,6 +1519,8 @@ async def POST_Value(request):
 
     params = request.rel_url.query
     ignore_nan = _isIgnoreNan(params)
+    cost = startRequestCost()
+    include_cost = _isIncludeCost(params)
 
     request_type = getContentType(request)
     log.debug(f"POST value - request_type is {request_type}")
@@ -1396,25 +1644,16 @@ async def POST_Value(request):
 
     if points is not None:
         # validate content of points input array
-        for i in range(len(points)):
-            point = points[i]
-            if rank == 1:
-                if point < 0 or point >= dims[0]:
-                    msg = f"POST Value point: {point} is not within the bounds "
-                    msg += "of the dataset"
-                    log.warn(msg)
-                    raise HTTPBadRequest(reason=msg)
-            else:
-                if len(point) != rank:
-                    msg = "POST Value point value did not match dataset rank"
-                    log.warn(msg)
-                    raise HTTPBadRequest(reason=msg)
-                for i in range(rank):
-                    if point[i] < 0 or point[i] >= dims[i]:
-                        msg = f"POST Value point: {point} is not within the "
-                        msg += "bounds of the dataset"
-                        log.warn(msg)
-                        raise HTTPBadRequest(reason=msg)
+        if not _isPointShapeValid(points, rank):
+            msg = "POST Value point value did not match dataset rank"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
+        bad_point = _getOutOfBoundsPoint(points, dims)
+        if bad_point is not None:
+            msg = f"POST Value point: {bad_point} is not within the bounds "
+            msg += "of the dataset"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
 
     # write response
     resp = StreamResponse()
@@ -1428,10 +1667,10 @@ async def POST_Value(request):
                 log.debug("content_length could not be determined")
             else:
                 resp.content_length = content_length
+        elif response_type == "arrow":
+            resp.headers["Content-Type"] = ARROW_STREAM_TYPE
         else:
             resp.headers["Content-Type"] = "application/json"
-        log.debug("prepare request...")
-        await resp.prepare(request)
 
         kwargs = {"bucket": bucket}
         if points is None:
@@ -1447,6 +1686,11 @@ async def POST_Value(request):
             log.error(msg)
             raise ValueError(msg)
 
+        if include_cost:
+            resp.headers.update(getRequestCostHeaders(cost))
+        log.debug("prepare request...")
+        await resp.prepare(request)
+
         log.debug(f"arr shape: {arr_rsp.shape}")
         if response_type == "binary":
             log.debug("preparing binary response")
@@ -1454,18 +1698,24 @@ async def POST_Value(request):
             msg = f"POST Value - returning {len(output_data)} bytes binary data"
             log.debug(msg)
             await resp.write(output_data)
+        elif response_type == "arrow":
+            output_data = arrayToArrowStream(arr_rsp)
+            msg = f"POST Value - returning {len(output_data)} bytes arrow stream"
+            log.debug(msg)
+            await resp.write(output_data)
         else:
             log.debug("POST Value - returning JSON data")
             resp_json = {}
-            data = arr_rsp.tolist()
-            log.debug(f"got rsp data {len(data)} points")
+            log.debug(f"got rsp data {len(arr_rsp)} points")
             try:
-                json_data = bytesArrayToList(data)
+                json_data = toJsonValue(arr_rsp)
             except ValueError as err:
                 msg = f"Cannot decode bytes to list: {err}"
                 raise HTTPBadRequest(reason=msg)
             resp_json["value"] = json_data
             resp_json["hrefs"] = get_hrefs(request, dset_json)
+            if include_cost:
+                resp_json["cost"] = cost
             resp_body = await jsonResponse(
                 resp, resp_json, ignore_nan=ignore_nan, body_only=True
             )
@@ -1480,6 +1730,8 @@ async def POST_Value(request):
         print("traceback:", tb)
 
     # finalize response
+    if not resp.prepared:
+        await resp.prepare(request)
     await resp.write_eof()
 
     log.response(request, resp=resp)
@@ -26,6 +26,20 @@ from .util.timeUtil import getNow
 from . import hsds_logger as log
 
 
+def getDatatypeResponse(ctype_json, include_attrs=False):
+    """ return the GET response json for the given datatype json """
+    resp_json = {}
+    resp_json["id"] = ctype_json["id"]
+    resp_json["root"] = ctype_json["root"]
+    resp_json["created"] = ctype_json["created"]
+    resp_json["lastModified"] = ctype_json["lastModified"]
+    resp_json["type"] = ctype_json["type"]
+    resp_json["attributeCount"] = len(ctype_json["attributes"])
+    if include_attrs:
+        resp_json["attributes"] = ctype_json["attributes"]
+    return resp_json
+
+
 async def GET_Datatype(request):
     """HTTP GET method to return JSON for /groups/"""
     log.request(request)
@@ -49,15 +63,8 @@ async def GET_Datatype(request):
 
     ctype_json = await get_metadata_obj(app, ctype_id, bucket=bucket)
 
-    resp_json = {}
-    resp_json["id"] = ctype_json["id"]
-    resp_json["root"] = ctype_json["root"]
-    resp_json["created"] = ctype_json["created"]
-    resp_json["lastModified"] = ctype_json["lastModified"]
-    resp_json["type"] = ctype_json["type"]
-    resp_json["attributeCount"] = len(ctype_json["attributes"])
-    if "include_attrs" in params and params["include_attrs"]:
-        resp_json["attributes"] = ctype_json["attributes"]
+    include_attrs = "include_attrs" in params and params["include_attrs"]
+    resp_json = getDatatypeResponse(ctype_json, include_attrs=bool(include_attrs))
 
     resp = json_response(resp_json)
     log.response(request, resp=resp)
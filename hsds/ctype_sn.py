@@ -79,7 +79,7 @@ async def GET_Datatype(request):
             msg += f" group_id: {group_id}"
         log.info(msg)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -148,7 +148,7 @@ async def POST_Datatype(request):
     app = request.app
     params = request.rel_url.query
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     # write actions need auth
     await validateUserPassword(app, username, pswd)
 
@@ -276,7 +276,7 @@ async def DELETE_Datatype(request):
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     await validateUserPassword(app, username, pswd)
 
     domain = getDomainFromRequest(request)
@@ -15,10 +15,12 @@
 
 import asyncio
 import traceback
+from collections import OrderedDict
 from aiohttp.web import run_app
 
 from . import config
 from .util.lruCache import LruCache
+from .util.sharedCache import SharedChunkCache
 from .util.idUtil import isValidUuid, isSchema2Id, getCollectionForId
 from .util.idUtil import isRootObjId
 from .util.httpUtil import isUnixDomainUrl, bindToSocket, getPortFromUrl
@@ -37,10 +39,12 @@ from .ctype_dn import GET_Datatype, POST_Datatype, DELETE_Datatype
 from .dset_dn import GET_Dataset, POST_Dataset, DELETE_Dataset
 from .dset_dn import PUT_DatasetShape
 from .chunk_dn import PUT_Chunk, GET_Chunk, POST_Chunk, DELETE_Chunk
-from .datanode_lib import s3syncCheck
+from .chunk_dn import POST_Prewarm, POST_PyramidRebuild
+from .obj_dn import POST_Objects, POST_ObjectAttributes, POST_ObjectLinks
+from .datanode_lib import s3syncCheck, update_pyramid
 from .async_lib import scanRoot, removeKeys
 from aiohttp.web_exceptions import HTTPNotFound, HTTPInternalServerError
-from aiohttp.web_exceptions import HTTPForbidden, HTTPBadRequest
+from aiohttp.web_exceptions import HTTPForbidden, HTTPBadRequest, HTTPServiceUnavailable
 
 
 async def init():
@@ -81,10 +85,15 @@ async def init():
     app.router.add_route("POST", "/datasets/{id}/attributes", POST_Attributes)
     app.router.add_route("DELETE", "/datasets/{id}/attributes", DELETE_Attributes)
     app.router.add_route("PUT", "/datasets/{id}/attributes", PUT_Attributes)
+    app.router.add_route("POST", "/objects", POST_Objects)
+    app.router.add_route("POST", "/objects/attributes", POST_ObjectAttributes)
+    app.router.add_route("POST", "/objects/links", POST_ObjectLinks)
     app.router.add_route("PUT", "/chunks/{id}", PUT_Chunk)
     app.router.add_route("GET", "/chunks/{id}", GET_Chunk)
     app.router.add_route("POST", "/chunks/{id}", POST_Chunk)
     app.router.add_route("DELETE", "/chunks/{id}", DELETE_Chunk)
+    app.router.add_route("POST", "/prewarm", POST_Prewarm)
+    app.router.add_route("POST", "/pyramid", POST_PyramidRebuild)
     app.router.add_route("POST", "/roots/{id}", POST_Root)
     app.router.add_route("DELETE", "/prestop", preStop)
 
@@ -180,6 +189,53 @@ async def bucketScan(app):
     log.error("bucketScan terminating unexpectedly")
 
 
+async def pyramidUpdate(app):
+    """Update the pyramid levels of datasets for recently written chunks"""
+    pyramid_sleep_time = float(config.get("pyramid_sleep_time", default=1.0))
+    pyramid_wait_time = float(config.get("pyramid_wait_time", default=5.0))
+    log.info(f"pyramidUpdate start - pyramid_wait_time: {pyramid_wait_time}")
+
+    while True:
+        if app["node_state"] != "READY":
+            log.info("pyramidUpdate - waiting for Node state to be READY")
+            await asyncio.sleep(pyramid_sleep_time)
+            continue  # wait for READY state
+
+        pyramid_update_ids = app["pyramid_update_ids"]
+        now = getNow(app)
+        # wait for writes to a chunk to settle before updating the level
+        update_ids = {}
+        for chunk_id in pyramid_update_ids:
+            timestamp, bucket = pyramid_update_ids[chunk_id]
+            if now - timestamp > pyramid_wait_time:
+                update_ids[chunk_id] = bucket
+        for chunk_id in update_ids:
+            del pyramid_update_ids[chunk_id]
+
+        for chunk_id in update_ids:
+            bucket = update_ids[chunk_id]
+            try:
+                await update_pyramid(app, chunk_id, bucket=bucket)
+            except HTTPServiceUnavailable:
+                log.warn(f"pyramidUpdate - service unavailable for {chunk_id}, will retry")
+                if chunk_id not in pyramid_update_ids:
+                    pyramid_update_ids[chunk_id] = (getNow(app), bucket)
+            except HTTPNotFound as nfe:
+                # dataset or level has been deleted
+                log.warn(f"pyramidUpdate - HTTPNotFound updating {chunk_id}: {nfe}")
+            except Exception as e:
+                msg = "pyramidUpdate - Unexpected exception updating "
+                msg += f"{chunk_id}: {e}"
+                log.error(msg)
+                tb = traceback.format_exc()
+                print("traceback:", tb)
+
+        await asyncio.sleep(pyramid_sleep_time)
+
+    # shouldn't ever get here
+    log.error("pyramidUpdate terminating unexpectedly")
+
+
 def get_gc_count(app):
     """Return number of items in gc queue"""
     count = 0
@@ -254,6 +310,9 @@ async def start_background_tasks(app):
         # run root/dataset GC
         loop.create_task(bucketGC(app))
 
+        # run pyramid level updates
+        loop.create_task(pyramidUpdate(app))
+
 
 def create_app():
     """Create datanode aiohttp application
@@ -274,6 +333,14 @@ def create_app():
     log.debug(f"Using chunk memory cache size of: {chunk_mem_cache_size}")
     chunk_mem_cache_expire = int(config.get("chunk_mem_cache_expire"))
     log.debug(f"Setting chunk cache expire time to: {chunk_mem_cache_expire}")
+    metadata_mem_cache_policy = config.get("metadata_mem_cache_policy", default="lru")
+    chunk_mem_cache_policy = config.get("chunk_mem_cache_policy", default="lru")
+    msg = f"Using cache policy: {metadata_mem_cache_policy} for metadata, "
+    msg += f"{chunk_mem_cache_policy} for chunks"
+    log.info(msg)
+    mem_cache_rss_limit = int(config.get("mem_cache_rss_limit", default=0))
+    if mem_cache_rss_limit:
+        log.info(f"Using memory cache rss limit of: {mem_cache_rss_limit}")
     blosc_nthreads = int(config.get("blosc_nthreads"))
     if blosc_nthreads > 0:
         log.debug(f"Setting blosc nthreads to: {blosc_nthreads}")
@@ -290,17 +357,41 @@ def create_app():
         "mem_target": metadata_mem_cache_size,
         "name": "MetaCache",
         "expire_time": metadata_mem_cache_expire,
+        "policy": metadata_mem_cache_policy,
+        "rss_limit": mem_cache_rss_limit,
     }
     app["meta_cache"] = LruCache(**kwargs)
     kwargs = {
         "mem_target": chunk_mem_cache_size,
         "name": "ChunkCache",
         "expire_time": chunk_mem_cache_expire,
+        "policy": chunk_mem_cache_policy,
+        "rss_limit": mem_cache_rss_limit,
     }
+    # limit the part of the chunk cache that prewarm requests can pin, so
+    # there's always room to evict for regular reads
+    chunk_cache_max_pinned = float(config.get("chunk_cache_max_pinned", default=0.5))
+    kwargs["max_pinned"] = int(chunk_mem_cache_size * chunk_cache_max_pinned)
     app["chunk_cache"] = LruCache(**kwargs)
+    shared_chunk_cache_size = int(config.get("shared_chunk_cache_size", default=0))
+    if shared_chunk_cache_size > 0:
+        # host level read cache shared with other DN processes
+        kwargs = {
+            "name": config.get("shared_chunk_cache_name", default="hsds_chunk_cache"),
+            "mem_size": shared_chunk_cache_size,
+            "slot_size": int(config.get("shared_chunk_cache_slot_size", default=4194304)),
+        }
+        log.info(f"Using shared chunk cache: {kwargs}")
+        try:
+            app["shared_chunk_cache"] = SharedChunkCache(**kwargs)
+        except (OSError, ValueError) as e:
+            log.error(f"Unable to initialize shared chunk cache: {e}")
     app["deleted_ids"] = set()
     app["deleted_attrs"] = {}  # map of objectid to set of deleted attribute names
     app["deleted_links"] = {}  # map of objecctid to set of deleted link names
+    app["link_indexes"] = OrderedDict()  # map of group id to LinkIndex
+    # map of objid to shard checksums for objects with sharded links or attributes
+    app["meta_shards"] = {}
     # map of objids to timestamp and bucket of which they were last updated
     app["dirty_ids"] = {}
     # map of dataset ids to deflate levels (if compressed)
@@ -317,6 +408,8 @@ def create_app():
     app["root_scan_ids"] = {}
     # set of root or dataset ids for deletion
     app["gc_buckets"] = {}
+    # map of chunk ids to timestamp and bucket for pending pyramid level updates
+    app["pyramid_update_ids"] = {}
     app["objDelete_prefix"] = None  # used by async_lib removeKeys
 
     # TODO - there's nothing to prevent the deflate_map from getting
@@ -366,6 +459,10 @@ async def on_shutdown(app):
     # finally release any http_clients
     await release_http_client(app)
 
+    if "shared_chunk_cache" in app:
+        app["shared_chunk_cache"].close()
+        del app["shared_chunk_cache"]
+
     log.info("on_shutdown - done")
 
 
@@ -15,29 +15,42 @@
 
 import asyncio
 import json
+from collections import OrderedDict
 import numpy as np
 from aiohttp.web_exceptions import HTTPGone, HTTPInternalServerError
 from aiohttp.web_exceptions import HTTPNotFound, HTTPForbidden
 from aiohttp.web_exceptions import HTTPServiceUnavailable, HTTPBadRequest
 from .util.idUtil import validateInPartition, getS3Key, isValidUuid
 from .util.idUtil import isValidChunkId, getDataNodeUrl, isSchema2Id
-from .util.idUtil import getRootObjId, isRootObjId
+from .util.idUtil import getRootObjId, isRootObjId, getObjPartition
+from .util.idUtil import getNodeNumber, getNodeCount
 from .util.storUtil import getStorJSONObj, putStorJSONObj, putStorBytes
 from .util.storUtil import getStorBytes, isStorObj, deleteStorObj, getHyperChunks
 from .util.storUtil import getBucketFromStorURI, getKeyFromStorURI, getURIFromKey
 from .util.domainUtil import isValidDomain, getBucketForDomain
+from .util.shardUtil import SHARD_COLLECTIONS, getShardKey, getShards, getShardChecksum
+from .util.shardUtil import readShards, deleteShards
 from .util.attrUtil import getRequestCollectionName
 from .util.httpUtil import http_post
 from .util.dsetUtil import getChunkLayout, getFilterOps, getLayoutClass, getShapeDims
 from .util.dsetUtil import getChunkInitializer, getSliceQueryParam, getFilters
-from .util.chunkUtil import getDatasetId, getChunkSelection, getChunkIndex
+from .util.chunkUtil import getDatasetId, getChunkSelection, getChunkIndex, getChunkIds
+from .util.chunkUtil import getChunkIdForPartition
 from .util.arrayUtil import arrayToBytes, bytesToArray, jsonToArray
-from .util.hdf5dtype import createDataType
+from .util.hdf5dtype import createDataType, getItemSize
 from .util.rangegetUtil import ChunkLocation, chunkMunge, getHyperChunkIndex, getHyperChunkFactors
 from .util.timeUtil import getNow
+from .util.traceUtil import traceSpan
+from .util.costUtil import addRequestCost
+from .util.pyramidUtil import getPyramid, getLevelJson, getDecimatedChunk
 from . import config
 from . import hsds_logger as log
 from .dset_lib import getFillValue
+from .chunk_crawl import write_chunk_hyperslab
+
+READ_AHEAD_MIN_HITS = 2  # sequential reads needed before reading ahead
+READ_AHEAD_MAX_DATASETS = 1000  # max number of datasets to track access for
+READ_AHEAD_MAX_STREAMS = 4  # max number of sequential readers tracked per dataset
 
 # supported initializer commands
 INITIALIZER_CMDS = ["chunklocator", "arange"]
@@ -123,6 +136,67 @@ async def check_metadata_obj(app, obj_id, bucket=None):
     return found
 
 
+async def _put_metadata_json(app, obj_id, obj_json, bucket=None):
+    """Write the object json to storage.  Links and attributes of objects
+    with more than metadata_shard_threshold of them are written to separate
+    shard objects, and only shards that have changed are re-written"""
+    s3key = getS3Key(obj_id)
+    meta_shards = app["meta_shards"]
+    if obj_id in meta_shards:
+        checksums = meta_shards[obj_id]
+    else:
+        checksums = {}
+    shard_threshold = int(config.get("metadata_shard_threshold", default=0))
+    collections = []
+    if isValidUuid(obj_id) and isSchema2Id(obj_id):
+        for collection in SHARD_COLLECTIONS:
+            if collection not in obj_json:
+                continue
+            if collection in checksums:
+                collections.append(collection)
+            elif shard_threshold > 0 and len(obj_json[collection]) > shard_threshold:
+                log.info(f"sharding {collection} for {obj_id}")
+                collections.append(collection)
+
+    if not collections:
+        await putStorJSONObj(app, s3key, obj_json, bucket=bucket)
+        return
+
+    root_json = {}
+    for key in obj_json:
+        if key not in collections:
+            root_json[key] = obj_json[key]
+    layout = {}
+    new_checksums = {}
+    shard_writes = []
+    for collection in collections:
+        if collection in checksums:
+            shard_count = len(checksums[collection])
+            old_crcs = checksums[collection]
+        else:
+            shard_count = int(config.get("metadata_shard_count", default=64))
+            old_crcs = [None, ] * shard_count
+        shards = getShards(obj_json[collection], shard_count)
+        crcs = []
+        for index in range(shard_count):
+            shard = shards[index]
+            crc = getShardChecksum(shard)
+            if crc != old_crcs[index]:
+                shard_key = getShardKey(obj_id, collection, index)
+                shard_writes.append(putStorJSONObj(app, shard_key, shard, bucket=bucket))
+            crcs.append(crc)
+        layout[collection] = shard_count
+        new_checksums[collection] = crcs
+    root_json["shards"] = layout
+
+    msg = f"write_s3_obj {obj_id} - writing {len(shard_writes)} shards for {layout}"
+    log.debug(msg)
+    # write the shards before the object that references them
+    await asyncio.gather(*shard_writes)
+    await putStorJSONObj(app, s3key, root_json, bucket=bucket)
+    meta_shards[obj_id] = new_checksums
+
+
 async def write_s3_obj(app, obj_id, bucket=None):
     """writes the given object to s3"""
     s3key = getS3Key(obj_id)
@@ -242,7 +316,7 @@ async def write_s3_obj(app, obj_id, bucket=None):
                 raise ValueError("bad dirty state for obj")
             obj_json = meta_cache[obj_id]
 
-            await putStorJSONObj(app, s3key, obj_json, bucket=bucket)
+            await _put_metadata_json(app, obj_id, obj_json, bucket=bucket)
             success = True
             # should still be in meta_cache...
             if obj_id in deleted_ids:
@@ -347,6 +421,7 @@ async def get_metadata_obj(app, obj_id, bucket=None):
         log.debug(f"{obj_id} found in meta cache")
         obj_json = meta_cache[obj_id]
     else:
+        meta_cache.countMiss()
         s3_key = getS3Key(obj_id)
         log.debug(f"get_metadata_obj - using s3_key: {s3_key}")
         pending_s3_read = app["pending_s3_read"]
@@ -379,6 +454,12 @@ async def get_metadata_obj(app, obj_id, bucket=None):
             # read S3 object as JSON
             try:
                 obj_json = await getStorJSONObj(app, s3_key, bucket=bucket)
+                meta_shards = app["meta_shards"]
+                if "shards" in obj_json:
+                    kwargs = {"bucket": bucket}
+                    meta_shards[obj_id] = await readShards(app, obj_id, obj_json, **kwargs)
+                elif obj_id in meta_shards:
+                    del meta_shards[obj_id]
                 # read complete - remove from pending map
                 if obj_id in pending_s3_read:
                     elapsed_time = getNow(app) - pending_s3_read[obj_id]
@@ -512,6 +593,23 @@ async def delete_metadata_obj(app, obj_id, notify=True, root_id=None, bucket=Non
         log.debug(f"adding {obj_id} to deleted ids")
         deleted_ids.add(obj_id)
 
+    meta_shards = app["meta_shards"]
+    shard_layout = None
+    shard_threshold = int(config.get("metadata_shard_threshold", default=0))
+    if obj_id in meta_shards:
+        shard_layout = {}
+        for collection in meta_shards[obj_id]:
+            shard_layout[collection] = len(meta_shards[obj_id][collection])
+        del meta_shards[obj_id]
+    elif isValidUuid(obj_id) and obj_id not in meta_cache and shard_threshold > 0:
+        # object hasn't been loaded, check the stored json for shards.
+        # Skipped when sharding is disabled to save a read per delete
+        try:
+            obj_json = await getStorJSONObj(app, getS3Key(obj_id), bucket=bucket)
+            shard_layout = obj_json.get("shards")
+        except HTTPNotFound:
+            pass  # never written
+
     if obj_id in meta_cache:
         log.debug(f"removing {obj_id} from meta_cache")
         del meta_cache[obj_id]
@@ -520,6 +618,10 @@ async def delete_metadata_obj(app, obj_id, notify=True, root_id=None, bucket=Non
         log.debug(f"removing dirty_ids for: {obj_id}")
         del dirty_ids[obj_id]
 
+    if shard_layout:
+        log.debug(f"delete_metadata_obj - removing shards: {shard_layout} for {obj_id}")
+        await deleteShards(app, obj_id, shard_layout, bucket=bucket)
+
     # remove from S3 (if present)
     s3key = getS3Key(obj_id)
 
@@ -1036,7 +1138,10 @@ async def get_chunk(
     if chunk_id in chunk_cache:
         log.debug(f"getChunk chunkid: {chunk_id} found in cache")
         chunk_arr = chunk_cache[chunk_id]
+        addRequestCost("cache_hits")
     else:
+        chunk_cache.countMiss()
+        addRequestCost("cache_misses")
         # TBD - potential race condition?
         pending_s3_read = app["pending_s3_read"]
 
@@ -1064,6 +1169,12 @@ async def get_chunk(
                 msg += "initiating a new read"
                 log.warn(msg)
 
+        shared_cache = app.get("shared_chunk_cache")
+        if chunk_arr is None and shared_cache is not None:
+            chunk_arr = shared_cache.get(chunk_id, dt, dims, bucket=bucket)
+            if chunk_arr is not None:
+                log.debug(f"getChunk chunkid: {chunk_id} found in shared cache")
+
         if chunk_arr is None:
             if chunk_id not in pending_s3_read:
                 pending_s3_read[chunk_id] = getNow(app)
@@ -1082,7 +1193,10 @@ async def get_chunk(
                     "bucket": bucket,
                 }
 
-                chunk_arr = await get_chunk_bytes(app, s3key, **kwargs)
+                with traceSpan("get_chunk_bytes", chunk_id=chunk_id, key=s3key):
+                    chunk_arr = await get_chunk_bytes(app, s3key, **kwargs)
+                if chunk_arr is not None and shared_cache is not None:
+                    shared_cache.put(chunk_id, chunk_arr, bucket=bucket)
 
                 if chunk_id in pending_s3_read:
                     # read complete - remove from pending map
@@ -1110,9 +1224,10 @@ async def get_chunk(
                 chunk_cache[chunk_id] = chunk_arr  # store in cache
             else:
                 # no room in the cache, just skip caching
+                chunk_cache.countSkip()
                 msg = "getChunk, cache utilization: "
                 msg += f"{chunk_cache.cacheUtilizationPercent}, "
-                msg += "skip cache for chunk_id {chunk_id}"
+                msg += f"skip cache for chunk_id {chunk_id}"
                 log.warn(msg)
 
         if chunk_arr is None and chunk_init:
@@ -1175,6 +1290,9 @@ def save_chunk(app, chunk_id, dset_json, chunk_arr, bucket=None):
 
     chunk_cache[chunk_id] = chunk_arr
     chunk_cache.setDirty(chunk_id)
+    if "shared_chunk_cache" in app:
+        # shared cache only holds clean chunks
+        app["shared_chunk_cache"].invalidate(chunk_id, bucket=bucket)
     log.debug(f"chunk cache dirty count: {chunk_cache.dirtyCount}")
 
     # async write to S3
@@ -1182,6 +1300,159 @@ def save_chunk(app, chunk_id, dset_json, chunk_arr, bucket=None):
     now = getNow(app)
     dirty_ids[chunk_id] = (now, bucket)
 
+    if getPyramid(dset_json):
+        # update the next pyramid level once writes to the chunk settle
+        app["pyramid_update_ids"][chunk_id] = (now, bucket)
+
+
+async def update_pyramid(app, chunk_id, bucket=None):
+    """ write the decimated values of the given chunk to the next level
+    of the dataset's pyramid """
+    dset_id = getDatasetId(chunk_id)
+    dset_json = await get_metadata_obj(app, dset_id, bucket=bucket)
+    pyramid = getPyramid(dset_json)
+    if not pyramid:
+        log.warn(f"update_pyramid - dataset {dset_id} has no pyramid")
+        return
+    chunk_arr = await get_chunk(app, chunk_id, dset_json, bucket=bucket)
+    if chunk_arr is None:
+        log.warn(f"update_pyramid - chunk {chunk_id} not found")
+        return
+    dims = getShapeDims(dset_json["shape"])
+    layout = getChunkLayout(dset_json)
+    item = getDecimatedChunk(chunk_id, chunk_arr, dims, layout, pyramid["factor"])
+    if item is None:
+        log.debug(f"update_pyramid - no values of {chunk_id} in the next level")
+        return
+    level_slices, level_arr = item
+    level_json = getLevelJson(dset_json)
+    level_id = level_json["id"]
+    level_layout = getChunkLayout(level_json)
+    level_chunk_ids = getChunkIds(level_id, level_slices, level_layout)
+    msg = f"update_pyramid - {chunk_id} updating {len(level_chunk_ids)} chunks "
+    msg += f"of {level_id}, selection: {level_slices}"
+    log.info(msg)
+    for level_chunk_id in level_chunk_ids:
+        kwargs = {"bucket": bucket}
+        await write_chunk_hyperslab(
+            app, level_chunk_id, level_json, level_slices, level_arr, **kwargs)
+
+
+def getReadAheadChunkIds(app, chunk_id, dset_json):
+    """Return the ids of chunks owned by this node that should be
+    prefetched if the dataset appears to be read sequentially along
+    its first dimension, otherwise an empty list."""
+
+    read_ahead_count = int(config.get("read_ahead_chunks", default=0))
+    if read_ahead_count <= 0:
+        return []
+    dset_id = dset_json["id"]
+    index = getChunkIndex(chunk_id)
+    row = index[0]
+    node_count = getNodeCount(app)
+    if "read_ahead_state" not in app:
+        app["read_ahead_state"] = OrderedDict()
+    read_ahead_state = app["read_ahead_state"]
+    if dset_id in read_ahead_state:
+        # list of {"row", "hits"} for each sequential reader of the dataset,
+        # least recently used first
+        streams = read_ahead_state[dset_id]
+        read_ahead_state.move_to_end(dset_id)
+    else:
+        streams = []
+        read_ahead_state[dset_id] = streams
+        if len(read_ahead_state) > READ_AHEAD_MAX_DATASETS:
+            read_ahead_state.popitem(last=False)
+
+    stream = None
+    for item in streams:
+        if item["row"] == row:
+            # another chunk from the same page
+            return []
+        # since chunks are spread across the DNs, this node may only see
+        # every nth row of chunks
+        if item["row"] < row <= item["row"] + node_count:
+            if stream is None or item["hits"] > stream["hits"]:
+                stream = item
+    if stream is None:
+        # random access, or the start of a new sequential reader
+        streams.append({"row": row, "hits": 0})
+        if len(streams) > READ_AHEAD_MAX_STREAMS:
+            streams.pop(0)
+        return []
+    streams.remove(stream)
+    streams.append(stream)
+    stream["row"] = row
+    stream["hits"] += 1
+    if stream["hits"] < READ_AHEAD_MIN_HITS:
+        return []
+
+    dims = getShapeDims(dset_json["shape"])
+    layout = getChunkLayout(dset_json)
+    num_rows = -(-dims[0] // layout[0])  # ceiling division
+    node_number = getNodeNumber(app)
+    chunk_cache = app["chunk_cache"]
+    pending_s3_read = app["pending_s3_read"]
+    prefix = "c-" + dset_id[2:] + "_"
+    suffix = "".join(f"_{i}" for i in index[1:])
+    chunk_ids = []
+    # look ahead as many rows as it takes to find read_ahead_count
+    # chunks for this node
+    for next_row in range(row + 1, min(row + read_ahead_count * node_count + 1, num_rows)):
+        next_id = getChunkIdForPartition(f"{prefix}{next_row}{suffix}", dset_json)
+        if getObjPartition(next_id, node_count) != node_number:
+            continue
+        if next_id not in chunk_cache and next_id not in pending_s3_read:
+            chunk_ids.append(next_id)
+        if len(chunk_ids) >= read_ahead_count:
+            break
+    return chunk_ids
+
+
+async def _readAheadChunk(app, chunk_id, dset_json, bucket=None):
+    try:
+        await get_chunk(app, chunk_id, dset_json, bucket=bucket)
+    except HTTPNotFound:
+        log.debug(f"readAhead - chunk {chunk_id} not found")
+    except Exception as e:
+        log.warn(f"readAhead - exception reading {chunk_id}: {e}")
+    finally:
+        del app["read_ahead_tasks"][chunk_id]
+
+
+def readAhead(app, chunk_id, dset_json, bucket=None):
+    """Start prefetching the next chunks if the dataset is being read
+    sequentially.  Prefetches are limited by the chunk cache free space
+    and the read_ahead_max_pending config."""
+    if getItemSize(dset_json["type"]) == "H5T_VARIABLE":
+        # the size of variable length chunks can't be estimated up front,
+        # so the free space check below wouldn't bound them
+        return
+    chunk_ids = getReadAheadChunkIds(app, chunk_id, dset_json)
+    if not chunk_ids:
+        return
+    if "read_ahead_tasks" not in app:
+        app["read_ahead_tasks"] = {}  # map of chunk id to prefetch task
+    read_ahead_tasks = app["read_ahead_tasks"]
+    max_pending = int(config.get("read_ahead_max_pending", default=16))
+    chunk_cache = app["chunk_cache"]
+    dt = createDataType(dset_json["type"])
+    chunk_size = dt.itemsize * int(np.prod(getChunkLayout(dset_json)))
+    mem_free = chunk_cache.memFree - (len(read_ahead_tasks) * chunk_size)
+    for next_id in chunk_ids:
+        if next_id in read_ahead_tasks:
+            continue
+        if len(read_ahead_tasks) >= max_pending:
+            log.debug("readAhead - max pending reads reached")
+            break
+        if mem_free < chunk_size:
+            log.debug("readAhead - not enough free space in chunk cache")
+            break
+        log.debug(f"readAhead - prefetching {next_id}")
+        mem_free -= chunk_size
+        task = asyncio.create_task(_readAheadChunk(app, next_id, dset_json, bucket=bucket))
+        read_ahead_tasks[next_id] = task
+
 
 async def s3sync(app, s3_age_time=0):
     """Periodic method that writes dirty objects in
@@ -22,7 +22,18 @@ from .util.httpUtil import isOK
 from .util.idUtil import getCollectionForId, getDataNodeUrl
 from .util.globparser import globmatch
 from .servicenode_lib import getObjectJson, getAttributes, putAttributes, getLinks, putLinks
+from .servicenode_lib import getMultiObjectJson, getMultiAttributes, getMultiLinks
 from . import hsds_logger as log
+from . import config
+
+# exceptions to raise for the status of a prefetched object
+_STATUS_EXCEPTIONS = {
+    400: HTTPBadRequest,
+    404: HTTPNotFound,
+    409: HTTPConflict,
+    410: HTTPGone,
+    503: HTTPServiceUnavailable,
+}
 
 
 class DomainCrawler:
@@ -45,7 +56,9 @@ class DomainCrawler:
         replace=False,
         ignore_error=False,
         max_tasks=40,
-        max_objects_limit=0
+        max_objects_limit=0,
+        stream=False,
+        batch_size=None
     ):
         log.info(f"DomainCrawler.__init__  action: {action} - {len(objs)} objs")
         self._app = app
@@ -68,6 +81,30 @@ class DomainCrawler:
         self._obj_dict = {}
         self.seen_ids = set()
         self._ignore_error = ignore_error
+        self._stream = stream
+        if stream:
+            # results are passed to the consumer rather than kept in
+            # _obj_dict.  Workers block when the queue is full, so the
+            # crawl can't get ahead of the response being written
+            queue_size = int(config.get("crawler_stream_queue_size", default=100))
+            self._results = asyncio.Queue(maxsize=queue_size)
+            self._status = None
+        else:
+            self._results = None
+        if batch_size is None:
+            batch_size = int(config.get("domain_crawl_batch_size", default=100))
+        if "dn_urls" not in app:
+            batch_size = 1  # no DNs to send batch requests to
+        elif action not in ("get_obj", "get_attr", "get_link"):
+            batch_size = 1
+        elif isinstance(objs, dict) and any(v is not None for v in objs.values()):
+            batch_size = 1  # named attributes or links are fetched per object
+        self._batch_size = max(batch_size, 1)
+        # results from batch requests, keyed by obj id for each type of request
+        self._prefetched = {"obj": {}, "attr": {}, "link": {}}
+        # the objects of a batch are fetched concurrently, limited to
+        # max_tasks fetches overall as for an unbatched crawl
+        self._fetch_limit = asyncio.Semaphore(max_tasks)
         if not objs:
             log.error("no objs for crawler to crawl!")
             raise ValueError()
@@ -78,6 +115,8 @@ class DomainCrawler:
         for obj_id in objs:
             log.debug(f"adding {obj_id} to the queue")
             self._q.put_nowait(obj_id)
+            if stream:
+                self.seen_ids.add(obj_id)
         if isinstance(objs, dict):
             self._objs = objs
         else:
@@ -109,17 +148,26 @@ class DomainCrawler:
                 log.debug("not hard link, continue")
                 continue
             link_id = link_obj["id"]
+            if link_id == grp_id:
+                log.debug(f"link {title} is to the group itself, continue")
+                continue
             link_collection = getCollectionForId(link_id)
             if self._action in ("get_link", "put_link") and link_collection != "groups":
                 # only groups can have links
                 log.debug(f"link id: {link_id} is not for a group, continue")
                 continue
-            num_objects = len(self._obj_dict)
+            num_objects = self.get_object_count()
             if self._max_objects_limit and num_objects >= self._max_objects_limit:
                 msg = f"DomainCrawler reached limit of {self._max_objects_limit}"
                 log.info(msg)
                 break
-            if link_id not in self._obj_dict:
+            if self._stream and link_id not in self.seen_ids:
+                # haven't seen this object yet, get obj json
+                log.debug(f"DomainCrawler - adding link_id: {link_id} to queue")
+                self.seen_ids.add(link_id)
+                self._q.put_nowait(link_id)
+                link_count += 1
+            elif not self._stream and link_id not in self._obj_dict:
                 # haven't seen this object yet, get obj json
                 log.debug(f"DomainCrawler - adding link_id: {link_id} to queue")
                 self._obj_dict[link_id] = {}  # placeholder for obj id
@@ -129,13 +177,26 @@ class DomainCrawler:
                 log.debug(f"link: {link_id} already in object dict")
         log.debug(f"follow links done, added {link_count} ids to queue")
 
-    async def get_attributes(self, obj_id, attr_names):
-        # get the given attributes for the obj_id
-        msg = f"get_attributes for {obj_id}"
-        if attr_names:
-            msg += f", {len(attr_names)} attributes"
-        log.debug(msg)
-
+    def get_object_count(self):
+        """ return the number of objects found so far """
+        if self._stream:
+            return len(self.seen_ids)
+        return len(self._obj_dict)
+
+    async def set_result(self, obj_id, item):
+        """ save the result for obj_id.  In stream mode, add it to the
+        results queue instead, waiting if the queue is full """
+        if not self._stream:
+            self._obj_dict[obj_id] = item
+            return
+        if "status" in item:
+            item_status = item["status"]
+            if self._status is None or item_status > self._status:
+                self._status = item_status
+        await self._results.put((obj_id, item))
+
+    def get_attr_kwargs(self, attr_names=None):
+        """ return the getAttributes kwargs for the given attribute names """
         kwargs = {"bucket": self._bucket}
         if self._include_data:
             kwargs["include_data"] = True
@@ -155,13 +216,105 @@ class DomainCrawler:
                 kwargs["pattern"] = self._pattern
             if self._max_data_size > 0:
                 kwargs["max_data_size"] = self._max_data_size
+        return kwargs
+
+    def get_link_kwargs(self, titles=None):
+        """ return the getLinks kwargs for the given link titles """
+        kwargs = {"bucket": self._bucket}
+        if titles:
+            kwargs["titles"] = titles
+        else:
+            # only apply these parameters if we are attempting to fetch all links
+            if self._limit:
+                kwargs["limit"] = self._limit
+            if self._create_order:
+                kwargs["create_order"] = True
+            if self._pattern and not self._follow_links:
+                # with follow_links, the pattern is applied by get_links
+                kwargs["pattern"] = self._pattern
+        return kwargs
+
+    async def fetch_prefetched(self, kind, obj_id, func, **kwargs):
+        """ return the result of a batch request for obj_id if there is one,
+        otherwise return func(app, obj_id, **kwargs) """
+        prefetched = self._prefetched[kind]
+        if obj_id not in prefetched:
+            return await func(self._app, obj_id, **kwargs)
+        result = prefetched.pop(obj_id)
+        if isinstance(result, dict) and "status" in result:
+            status = result["status"]
+            raise _STATUS_EXCEPTIONS.get(status, HTTPInternalServerError)()
+        return result
+
+    async def prefetch(self, obj_ids):
+        """ get the results for obj_ids with one request to each DN, for the
+        objects that would otherwise need a DN request each """
+        kind_ids = {"obj": [], "attr": [], "link": []}
+        meta_cache = self._app["meta_cache"]
+        for obj_id in obj_ids:
+            collection = getCollectionForId(obj_id)
+            if self._action == "get_obj":
+                refresh = self._include_attrs
+                if collection == "groups" and self._follow_links:
+                    refresh = True
+                if refresh or obj_id not in meta_cache:
+                    kind_ids["obj"].append(obj_id)
+            elif self._action == "get_attr":
+                if self._objs and self._objs.get(obj_id) is not None:
+                    continue  # fetching named attributes
+                kind_ids["attr"].append(obj_id)
+                if collection == "groups" and self._follow_links:
+                    kind_ids["link"].append(obj_id)
+            elif self._action == "get_link":
+                if self._objs and self._objs.get(obj_id) is not None:
+                    continue  # fetching links by title
+                if collection == "groups":
+                    kind_ids["link"].append(obj_id)
+
+        tasks = []
+        kinds = []
+        if kind_ids["obj"]:
+            kwargs = {"bucket": self._bucket, "include_attrs": self._include_attrs}
+            kwargs["include_links"] = self._follow_links
+            tasks.append(getMultiObjectJson(self._app, kind_ids["obj"], **kwargs))
+            kinds.append("obj")
+        if kind_ids["attr"]:
+            kwargs = self.get_attr_kwargs()
+            tasks.append(getMultiAttributes(self._app, kind_ids["attr"], **kwargs))
+            kinds.append("attr")
+        if kind_ids["link"]:
+            if self._action == "get_link":
+                kwargs = self.get_link_kwargs()
+            else:
+                kwargs = {"bucket": self._bucket}  # links to follow
+            tasks.append(getMultiLinks(self._app, kind_ids["link"], **kwargs))
+            kinds.append("link")
+        if not tasks:
+            return
+        log.debug(f"DomainCrawler - prefetch for {len(obj_ids)} objects: {kinds}")
+        rsps = await asyncio.gather(*tasks, return_exceptions=True)
+        for kind, rsp in zip(kinds, rsps):
+            if isinstance(rsp, Exception):
+                # objects will be fetched one at a time instead
+                log.warn(f"DomainCrawler - prefetch of {kind} failed: {rsp}")
+                continue
+            self._prefetched[kind].update(rsp)
+
+    async def get_attributes(self, obj_id, attr_names):
+        # get the given attributes for the obj_id
+        msg = f"get_attributes for {obj_id}"
+        if attr_names:
+            msg += f", {len(attr_names)} attributes"
+        log.debug(msg)
+
+        kwargs = self.get_attr_kwargs(attr_names)
         log.debug(f"using kwargs: {kwargs}")
 
         status = 200
         # make sure to catch all expected exceptions, otherwise
         # the task will never complete
         try:
-            attributes = await getAttributes(self._app, obj_id, **kwargs)
+            attributes = await self.fetch_prefetched("attr", obj_id, getAttributes, **kwargs)
         except HTTPBadRequest:
             status = 400
         except HTTPNotFound:
@@ -189,10 +342,10 @@ class DomainCrawler:
                     attributes = attributes[:left]
                     follow_links = False
             self._count += len(attributes)
-            self._obj_dict[obj_id] = attributes
+            await self.set_result(obj_id, attributes)
         else:
             log.warn(f"Domain crawler - got {status} status for obj_id {obj_id}")
-            self._obj_dict[obj_id] = {"status": status}
+            await self.set_result(obj_id, {"status": status})
 
         collection = getCollectionForId(obj_id)
 
@@ -200,7 +353,8 @@ class DomainCrawler:
             links = None
             status = 200
             try:
-                links = await getLinks(self._app, obj_id, bucket=self._bucket)
+                kwargs = {"bucket": self._bucket}
+                links = await self.fetch_prefetched("link", obj_id, getLinks, **kwargs)
             except HTTPNotFound:
                 status = 404
             except HTTPServiceUnavailable:
@@ -241,7 +395,7 @@ class DomainCrawler:
             log.error(f"unexpected exception {e}")
 
         log.debug(f"DomainCrawler fetch for {obj_id} - returning status: {status}")
-        self._obj_dict[obj_id] = {"status": status}
+        await self.set_result(obj_id, {"status": status})
 
     async def get_obj_json(self, obj_id):
         """ get the given obj_json for the obj_id.
@@ -263,7 +417,7 @@ class DomainCrawler:
         obj_json = None
         status = 200
         try:
-            obj_json = await getObjectJson(self._app, obj_id, **kwargs)
+            obj_json = await self.fetch_prefetched("obj", obj_id, getObjectJson, **kwargs)
         except HTTPNotFound:
             status = 404
         except HTTPServiceUnavailable:
@@ -287,13 +441,8 @@ class DomainCrawler:
                 log.warn(msg)
             return
 
-        self._obj_dict[obj_id] = {"status": status}
-
         log.debug(f"DomainCrawler - got json for {obj_id}")
 
-        log.debug("store obj json")
-        self._obj_dict[obj_id] = obj_json  # store the obj_json
-
         # for groups iterate through all the hard links and
         # add to the lookup ids set
 
@@ -302,13 +451,16 @@ class DomainCrawler:
         if collection == "groups" and follow_links:
             if "links" not in obj_json:
                 log.error("expected links key in obj_json")
-                return
-            links = obj_json["links"]
-            self.follow_links(obj_id, links)
+            else:
+                links = obj_json["links"]
+                self.follow_links(obj_id, links)
 
-            if not self._include_links:
-                # don't keep the links
-                del obj_json["links"]
+                if not self._include_links:
+                    # don't keep the links
+                    del obj_json["links"]
+
+        log.debug("store obj json")
+        await self.set_result(obj_id, obj_json)
 
     async def get_links(self, grp_id, titles=None):
         """ if titles is set, get all the links in grp_id that
@@ -321,25 +473,13 @@ class DomainCrawler:
         if collection != "groups":
             log.warn(f"get_links, expected groups id but got: {grp_id}")
             return
-        kwargs = {"bucket": self._bucket}
-        if titles:
-            kwargs["titles"] = titles
-        else:
-            # only apply these parameters if we are attempting to fetch all links
-            if self._limit:
-                kwargs["limit"] = self._limit
-            if self._create_order:
-                kwargs["create_order"] = True
-
-            if self._pattern:
-                if self._follow_links:
-                    # apply the pattern after we get the links back,
-                    # otherwise we won't get the groups links that we
-                    # need to follow
-                    log.debug("will apply pattern on return")
-                    pattern = self._pattern
-                else:
-                    kwargs["pattern"] = self._pattern
+        kwargs = self.get_link_kwargs(titles)
+        if not titles and self._pattern and self._follow_links:
+            # apply the pattern after we get the links back,
+            # otherwise we won't get the groups links that we
+            # need to follow
+            log.debug("will apply pattern on return")
+            pattern = self._pattern
 
         log.debug(f"follow_links: {self._follow_links}")
         log.debug(f"getLinks kwargs: {kwargs}")
@@ -347,7 +487,7 @@ class DomainCrawler:
         links = None
         status = 200
         try:
-            links = await getLinks(self._app, grp_id, **kwargs)
+            links = await self.fetch_prefetched("link", grp_id, getLinks, **kwargs)
         except HTTPNotFound:
             status = 404
         except HTTPServiceUnavailable:
@@ -398,7 +538,7 @@ class DomainCrawler:
                 follow_links = False  # no need to search more
         self._count += len(new_links)
         log.debug(f"adding {len(new_links)} to obj_dict for {grp_id}")
-        self._obj_dict[grp_id] = new_links
+        await self.set_result(grp_id, new_links)
 
         # if follow_links, add any group links to the lookup ids set
         if follow_links:
@@ -424,10 +564,12 @@ class DomainCrawler:
             log.error(f"unexpected exception {e}")
 
         log.debug(f"DomainCrawler fetch for {grp_id} - returning status: {status}")
-        self._obj_dict[grp_id] = {"status": status}
+        await self.set_result(grp_id, {"status": status})
 
     def get_status(self):
         """ return the highest status of any of the returned objects """
+        if self._stream:
+            return self._status
         status = None
         for obj_id in self._obj_dict:
             item = self._obj_dict[obj_id]
@@ -443,16 +585,24 @@ class DomainCrawler:
         workers = [asyncio.Task(self.work()) for _ in range(self._max_tasks)]
         # When all work is done, exit.
         msg = "DomainCrawler - await queue.join - "
-        msg += f"count: {len(self._obj_dict)}"
+        msg += f"count: {self.get_object_count()}"
         log.info(msg)
-        await self._q.join()
+        try:
+            await self._q.join()
+        finally:
+            # also stop the workers if a stream consumer has gone away
+            for w in workers:
+                w.cancel()
+            log.debug("DomainCrawler - workers canceled")
         msg = "DomainCrawler - join complete - "
-        msg += f"count: {len(self._obj_dict)}"
+        msg += f"count: {self.get_object_count()}"
         log.info(msg)
 
-        for w in workers:
-            w.cancel()
-        log.debug("DomainCrawler - workers canceled")
+        if self._stream:
+            # let the consumer know there are no more results.  Errors
+            # have been passed on as the status for each object
+            await self._results.put(None)
+            return
 
         status = self.get_status()
         if status:
@@ -484,11 +634,48 @@ class DomainCrawler:
                     log.error(f"DomainCrawler - unexpected status: {status}")
                     raise HTTPInternalServerError()
 
+    async def results(self):
+        """ crawl in stream mode, yielding an (obj_id, result) tuple as
+        the result for each object becomes available """
+        if not self._stream:
+            raise ValueError("DomainCrawler results requires stream mode")
+        crawl_task = asyncio.create_task(self.crawl())
+        try:
+            while True:
+                result = await self._results.get()
+                if result is None:
+                    break
+                yield result
+            await crawl_task
+        finally:
+            if not crawl_task.done():
+                log.info("DomainCrawler - results not consumed, canceling crawl")
+                crawl_task.cancel()
+
     async def work(self):
         while True:
             obj_id = await self._q.get()
+            if self._batch_size == 1:
+                await self.fetch(obj_id)
+                self._q.task_done()
+                continue
+            # take any other queued ids (up to the batch size) and fetch
+            # them with one request for each DN
+            obj_ids = [obj_id, ]
+            while len(obj_ids) < self._batch_size and not self._q.empty():
+                obj_ids.append(self._q.get_nowait())
+            await self.prefetch(obj_ids)
+            await asyncio.gather(*[self.fetch_batched(obj_id) for obj_id in obj_ids])
+
+    async def fetch_batched(self, obj_id):
+        """ fetch an object of a prefetched batch.  Objects that weren't
+        prefetched (e.g. if the batch request failed) need a DN request
+        each, so these run concurrently like an unbatched crawl """
+        async with self._fetch_limit:
             await self.fetch(obj_id)
-            self._q.task_done()
+        for prefetched in self._prefetched.values():
+            prefetched.pop(obj_id, None)  # in case it wasn't used
+        self._q.task_done()
 
     async def fetch(self, obj_id):
         log.debug(f"DomainCrawler fetch for id: {obj_id}")
@@ -560,6 +747,5 @@ class DomainCrawler:
             log.error(msg)
 
         msg = f"DomainCrawler - fetch complete obj_id: {obj_id}, "
-        msg += f"{len(self._obj_dict)} objects found"
+        msg += f"{self.get_object_count()} objects found"
         log.debug(msg)
-        log.debug(f"obj_dict: {len(self._obj_dict)} items")
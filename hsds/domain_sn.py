@@ -14,6 +14,7 @@
 #
 
 import asyncio
+import bisect
 import json
 import os.path as op
 
@@ -24,7 +25,7 @@ from aiohttp.web import json_response
 
 from .util.httpUtil import getObjectClass, http_post, http_put, http_delete
 from .util.httpUtil import getHref, respJsonAssemble
-from .util.httpUtil import jsonResponse
+from .util.httpUtil import jsonResponse, isNdjsonRequest, ndjsonResponse
 from .util.idUtil import getDataNodeUrl, createObjId, getCollectionForId
 from .util.idUtil import isValidUuid, isSchema2Id, getNodeCount
 from .util.authUtil import getUserPasswordFromRequest, aclCheck, isAdminUser
@@ -38,6 +39,7 @@ from .util.globparser import globmatch
 from .util.timeUtil import getNow
 from .servicenode_lib import getDomainJson, getObjectJson, getObjectIdByPath
 from .servicenode_lib import getRootInfo, checkBucketAccess, doFlush, getDomainResponse
+from .servicenode_lib import invalidateAclCache, getFolderDomains, updateFolderCache
 from .basenode import getVersion
 from .domain_crawl import DomainCrawler
 from .folder_crawl import FolderCrawler
@@ -126,6 +128,27 @@ async def getDomainObjects(app, root_id, include_attrs=False, bucket=None):
         return crawler._obj_dict
 
 
+def streamDomainObjects(app, root_id, include_attrs=False, bucket=None):
+    """Return an async iterator of (obj_id, obj_json) tuples for all objects
+    in the heirarchy.  Unlike getDomainObjects, no limit is applied to the
+    number of objects since they don't need to be held in memory.
+    """
+
+    log.info(f"streamDomainObjects for root: {root_id}, include_attrs: {include_attrs}")
+
+    kwargs = {
+        "action": "get_obj",
+        "include_attrs": include_attrs,
+        "include_links": True,
+        "follow_links": True,
+        "bucket": bucket,
+        "stream": True,
+    }
+
+    crawler = DomainCrawler(app, [root_id, ], **kwargs)
+    return crawler.results()
+
+
 def getIdList(objs, marker=None, limit=None):
     """takes a map of ids to objs and returns ordered list
     of ids, optionally reduced by marker and limit"""
@@ -236,28 +259,18 @@ async def get_domains(request, include_hrefs=False):
             # split multiple domains by comma char
             domainNames = domainNames.split(",")
     else:
-        s3prefix = prefix[1:]
-        log.debug(f"get_domains - listing keys for {s3prefix}")
-        kwargs = {
-            "include_stats": False,
-            "prefix": s3prefix,
-            "deliminator": "/",
-            "bucket": bucket,
-        }
-        s3keys = await getStorKeys(app, **kwargs)
-        log.debug(f"get_domains - getStorKeys returned: {len(s3keys)} keys")
+        # use the cached folder listing if available, so paging through
+        # a large folder doesn't need to list the keys for each page
+        folder_domains = await getFolderDomains(app, prefix, bucket=bucket)
+        log.debug(f"get_domains - {len(folder_domains)} domains in folder")
+        start = 0
+        if marker:
+            # folder_domains is sorted, so start with the first domain
+            # after the marker
+            start = bisect.bisect_right(folder_domains, marker)
+            log.debug(f"get_domains - marker {marker} at index: {start}")
 
-        for s3key in s3keys:
-            if s3key[-1] != "/":
-                log.debug(f"get_domains - ignoring key: {s3key}")
-                continue
-            if prefix == '/' and s3key == "db":
-                log.debug("get_domains - ignoring db key at top level")
-            if len(s3key) > 1 and s3key[-2] == "/":
-                # trim off double slash
-                s3key = s3key[:-1]
-            log.debug(f"get_domains - got key: {s3key}")
-            domain = "/" + s3key[:-1]
+        for domain in folder_domains[start:]:
             if pattern:
                 # do a pattern match on the basename
                 basename = op.basename(domain)
@@ -277,14 +290,6 @@ async def get_domains(request, include_hrefs=False):
                     log.debug(msg)
                     continue
 
-            if marker:
-                msg = f"get_domains - compare marker {marker} and {domain}"
-                log.debug(msg)
-                if marker == domain:
-                    log.debug("get_domains - clearing marker")
-                    marker = None
-                continue
-
             log.debug(f"get_domains - adding domain: {domain} to domain list")
             domainNames.append(domain)
 
@@ -403,7 +408,7 @@ async def GET_Domains(request):
     log.request(request)
     app = request.app
 
-    (username, pswd) = getUserPasswordFromRequest(request)
+    (username, pswd) = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -451,7 +456,7 @@ async def GET_Domain(request):
     if "follow_external_links" in params and params["follow_external_links"]:
         follow_external_links = True
 
-    (username, pswd) = getUserPasswordFromRequest(request)
+    (username, pswd) = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -576,14 +581,19 @@ async def GET_Domain(request):
     rsp_json = await getDomainResponse(app, domain_json, **kwargs)
 
     # include domain objects if requested
+    domain_objs = None
     if params.get("getobjs") and "root" in domain_json:
-
-        log.debug("getting all domain objects")
         root_id = domain_json["root"]
         kwargs = {"include_attrs": include_attrs, "bucket": bucket}
-        domain_objs = await getDomainObjects(app, root_id, **kwargs)
-        if domain_objs:
-            rsp_json["domain_objs"] = domain_objs
+        if isNdjsonRequest(request):
+            # objects will be written a line at a time after the domain json
+            log.debug("streaming all domain objects")
+            domain_objs = streamDomainObjects(app, root_id, **kwargs)
+        else:
+            log.debug("getting all domain objects")
+            objs = await getDomainObjects(app, root_id, **kwargs)
+            if objs:
+                rsp_json["domain_objs"] = objs
 
     # include dn_ids if requested
     if "getdnids" in params and params["getdnids"]:
@@ -625,7 +635,10 @@ async def GET_Domain(request):
         domain_json["compressors"] = getCompressors()
         domain_json["version"] = getVersion()
     log.debug(f"returning domain json: {domain_json}")
-    resp = await jsonResponse(request, rsp_json)
+    if domain_objs is not None:
+        resp = await ndjsonResponse(request, domain_objs, first=rsp_json)
+    else:
+        resp = await jsonResponse(request, rsp_json)
     log.response(request, resp=resp)
     return resp
 
@@ -693,7 +706,7 @@ async def POST_Domain(request):
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
 
-    (username, pswd) = getUserPasswordFromRequest(request)
+    (username, pswd) = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -784,7 +797,7 @@ async def PUT_Domain(request):
     params = request.rel_url.query
     log.debug(f"PUT_domain params: {dict(params)}")
     # verify username, password
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     await validateUserPassword(app, username, pswd)
 
     # inital perms for owner and default
@@ -1091,6 +1104,7 @@ async def PUT_Domain(request):
     domain_json = await http_put(app, req, data=body)
 
     # domain creation successful
+    updateFolderCache(app, domain)
     # mixin limits
     domain_json["limits"] = getLimits()
     domain_json["compressors"] = getCompressors()
@@ -1156,10 +1170,11 @@ async def DELETE_Domain(request):
         if domain in domain_cache:
             log.info(f"deleting {domain} from domain_cache")
             del domain_cache[domain]
+        invalidateAclCache(app, domain)
         resp = await jsonResponse(request, {})
         return resp
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     await validateUserPassword(app, username, pswd)
 
     parent_domain = getParentDomain(domain)
@@ -1219,6 +1234,8 @@ async def DELETE_Domain(request):
     domain_cache = app["domain_cache"]
     if domain in domain_cache:
         del domain_cache[domain]
+    invalidateAclCache(app, domain)
+    updateFolderCache(app, domain, deleted=True)
 
     resp = await jsonResponse(request, rsp_json)
     log.response(request, resp=resp)
@@ -1236,7 +1253,7 @@ async def GET_ACL(request):
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
 
-    (username, pswd) = getUserPasswordFromRequest(request)
+    (username, pswd) = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -1312,7 +1329,7 @@ async def GET_ACLs(request):
     log.request(request)
     app = request.app
 
-    (username, pswd) = getUserPasswordFromRequest(request)
+    (username, pswd) = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -1378,7 +1395,7 @@ async def PUT_ACL(request):
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
 
-    (username, pswd) = getUserPasswordFromRequest(request)
+    (username, pswd) = await getUserPasswordFromRequest(request)
     await validateUserPassword(app, username, pswd)
 
     if not request.has_body:
@@ -1427,6 +1444,12 @@ async def PUT_ACL(request):
     put_rsp = await http_put(app, req, data=body)
     log.info("PUT ACL resp: " + str(put_rsp))
 
+    # cached domain json and access decisions are now stale
+    domain_cache = app["domain_cache"]
+    if domain in domain_cache:
+        del domain_cache[domain]
+    invalidateAclCache(app, domain)
+
     # ACL update successful
     resp = await jsonResponse(request, put_rsp, status=201)
     log.response(request, resp=resp)
@@ -1439,7 +1462,7 @@ async def GET_Datasets(request):
     app = request.app
     params = request.rel_url.query
 
-    (username, pswd) = getUserPasswordFromRequest(request)
+    (username, pswd) = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -1508,7 +1531,7 @@ async def GET_Groups(request):
     app = request.app
     params = request.rel_url.query
 
-    (username, pswd) = getUserPasswordFromRequest(request)
+    (username, pswd) = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -1576,7 +1599,7 @@ async def GET_Datatypes(request):
     app = request.app
     params = request.rel_url.query
 
-    (username, pswd) = getUserPasswordFromRequest(request)
+    (username, pswd) = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
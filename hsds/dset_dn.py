@@ -15,17 +15,37 @@
 
 from aiohttp.web_exceptions import HTTPBadRequest, HTTPNotFound, HTTPConflict
 from aiohttp.web_exceptions import HTTPInternalServerError
-from aiohttp.web import json_response
+from aiohttp.web import json_response, Response
 
 
 from .util.idUtil import isValidUuid, validateUuid
 from .util.domainUtil import isValidBucketName
+from .util.httpUtil import getETag
 from .util.timeUtil import getNow
 from .datanode_lib import get_obj_id, check_metadata_obj, get_metadata_obj
 from .datanode_lib import save_metadata_obj, delete_metadata_obj
 from . import hsds_logger as log
 
 
+def getDatasetResponse(dset_json, include_attrs=False):
+    """ return the GET response json for the given dataset json """
+    resp_json = {}
+    resp_json["id"] = dset_json["id"]
+    resp_json["root"] = dset_json["root"]
+    resp_json["created"] = dset_json["created"]
+    resp_json["lastModified"] = dset_json["lastModified"]
+    resp_json["type"] = dset_json["type"]
+    resp_json["shape"] = dset_json["shape"]
+    resp_json["attributeCount"] = len(dset_json["attributes"])
+    if "creationProperties" in dset_json:
+        resp_json["creationProperties"] = dset_json["creationProperties"]
+    if "layout" in dset_json:
+        resp_json["layout"] = dset_json["layout"]
+    if include_attrs:
+        resp_json["attributes"] = dset_json["attributes"]
+    return resp_json
+
+
 async def GET_Dataset(request):
     """HTTP GET method to return JSON for /groups/"""
     log.request(request)
@@ -48,22 +68,18 @@ async def GET_Dataset(request):
 
     dset_json = await get_metadata_obj(app, dset_id, bucket=bucket)
 
-    resp_json = {}
-    resp_json["id"] = dset_json["id"]
-    resp_json["root"] = dset_json["root"]
-    resp_json["created"] = dset_json["created"]
-    resp_json["lastModified"] = dset_json["lastModified"]
-    resp_json["type"] = dset_json["type"]
-    resp_json["shape"] = dset_json["shape"]
-    resp_json["attributeCount"] = len(dset_json["attributes"])
-    if "creationProperties" in dset_json:
-        resp_json["creationProperties"] = dset_json["creationProperties"]
-    if "layout" in dset_json:
-        resp_json["layout"] = dset_json["layout"]
-    if "include_attrs" in params and params["include_attrs"]:
-        resp_json["attributes"] = dset_json["attributes"]
+    include_attrs = "include_attrs" in params and params["include_attrs"]
+    resp_json = getDatasetResponse(dset_json, include_attrs=bool(include_attrs))
 
-    resp = json_response(resp_json)
+    # the SN sends the tag of its cached copy to check if it's still valid
+    etag = getETag(resp_json)
+    if etag is None:
+        resp = json_response(resp_json)
+    elif request.headers.get("If-None-Match") == etag:
+        log.debug(f"GET_Dataset - {dset_id} not modified")
+        resp = Response(status=304, headers={"ETag": etag})
+    else:
+        resp = json_response(resp_json, headers={"ETag": etag})
     log.response(request, resp=resp)
     return resp
 
@@ -297,6 +313,9 @@ async def PUT_DatasetShape(request):
         for i in range(len(dims)):
             dims[i] = shape_update[i]
 
+    # update the timestamp so the SN's cached copies are revalidated
+    dset_json["lastModified"] = getNow(app)
+
     # write back to S3, save to metadata cache
     log.info(f"Updated dimensions: {dims}")
     await save_metadata_obj(app, dset_id, dset_json, bucket=bucket)
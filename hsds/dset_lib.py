@@ -21,11 +21,11 @@ from .util.boolparser import BooleanParser
 from .util.dsetUtil import isNullSpace, getDatasetLayout, getDatasetLayoutClass, get_slices
 from .util.dsetUtil import getChunkLayout, getSelectionShape, getShapeDims
 from .util.chunkUtil import getChunkCoordinate, getChunkIndex, getChunkSuffix
-from .util.chunkUtil import getNumChunks, getChunkIds, getChunkId
+from .util.chunkUtil import getNumChunks, getChunkIds, groupPointsByChunk
 from .util.chunkUtil import getChunkCoverage, getDataCoverage
-from .util.chunkUtil import getQueryDtype, get_chunktable_dims
+from .util.chunkUtil import getQueryDtype, get_chunktable_dims, getChunkIdForPartition
 from .util.hdf5dtype import createDataType, getItemSize
-from .util.httpUtil import http_delete, http_put
+from .util.httpUtil import http_delete, http_put, http_post
 from .util.idUtil import getDataNodeUrl, isSchema2Id, getS3Key, getObjId
 from .util.rangegetUtil import getHyperChunkFactors
 from .util.storUtil import getStorKeys
@@ -42,6 +42,8 @@ CHUNK_REF_LAYOUTS = (
     "H5D_CHUNKED_REF_INDIRECT",
 )
 
+PREWARM_BATCH_SIZE = 100  # max chunks per prewarm request to a DN
+
 
 def getFillValue(dset_json):
     """ Return the fill value of the given dataset as a numpy array.
@@ -458,30 +460,12 @@ async def getSelectionData(
         chunk_ids = getChunkIds(dset_id, slices, layout)
     else:
         # points - already checked it is not None
-        num_points = len(points)
-        chunk_ids = []
-        for pt_indx in range(num_points):
-            point = points[pt_indx]
-            chunk_id = getChunkId(dset_id, point, layout)
-            if chunk_id in chunkinfo:
-                chunk_entry = chunkinfo[chunk_id]
-            else:
-                chunk_entry = {}
-                chunkinfo[chunk_id] = chunk_entry
-                chunk_ids.append(chunk_id)
-            if "points" in chunk_entry:
-                point_list = chunk_entry["points"]
-            else:
-                point_list = []
-                chunk_entry["points"] = point_list
-            if "indices" in chunk_entry:
-                point_index = chunk_entry["indices"]
-            else:
-                point_index = []
-                chunk_entry["indices"] = point_index
-
-            point_list.append(point)
-            point_index.append(pt_indx)
+        chunk_points = groupPointsByChunk(dset_id, points, layout)
+        chunk_ids = list(chunk_points.keys())
+        for chunk_id in chunk_ids:
+            point_index = chunk_points[chunk_id]
+            chunk_entry = {"points": points[point_index], "indices": point_index}
+            chunkinfo[chunk_id] = chunk_entry
 
     # Get information about where chunks are located
     #   Will be None except for H5D_CHUNKED_REF_INDIRECT type
@@ -653,6 +637,44 @@ async def doReadSelection(
     return arr
 
 
+async def getSelectionReduction(app, dset_id, dset_json, slices, reduction, bucket=None):
+    """Compute the reduction over the selected slices.  Each DN returns
+    partial stats for its chunks, which are combined into reduction"""
+    log.info(f"getSelectionReduction - {reduction.op} for {dset_id}")
+    layout = getChunkLayout(dset_json)
+    num_chunks = getNumChunks(slices, layout)
+    log.debug(f"getSelectionReduction - num_chunks: {num_chunks}")
+
+    chunk_ids = getChunkIds(dset_id, slices, layout)
+    chunkinfo = {}
+    # Get information about where chunks are located
+    #   Will be None except for H5D_CHUNKED_REF_INDIRECT type
+    await getChunkLocations(app, dset_id, dset_json, chunkinfo, chunk_ids, bucket=bucket)
+    get_chunk_selections(chunkinfo, chunk_ids, slices, dset_json)
+
+    crawler = ChunkCrawler(
+        app,
+        chunk_ids,
+        dset_json=dset_json,
+        chunk_map=chunkinfo,
+        bucket=bucket,
+        slices=slices,
+        reduction=reduction,
+        action="reduce_chunk_hyperslab",
+    )
+    await crawler.crawl()
+
+    crawler_status = crawler.get_status()
+    log.info(f"getSelectionReduction complete - status:  {crawler_status}")
+    if crawler_status == 400:
+        raise HTTPBadRequest()
+    if crawler_status not in (200, 201):
+        msg = f"getSelectionReduction raising HTTPInternalServerError for status: {crawler_status}"
+        log.info(msg)
+        raise HTTPInternalServerError()
+    return reduction
+
+
 async def removeChunks(app, chunk_ids, bucket=None):
     """ Remove chunks with the given ids """
 
@@ -759,6 +781,14 @@ async def getAllocatedChunkIds(app, dset_id, bucket=None):
     return chunk_ids
 
 
+def _invalidateDsetJson(app, dset_id):
+    """ drop the cached json for a dataset whose shape has changed """
+    meta_cache = app.get("meta_cache")
+    if meta_cache is not None and dset_id in meta_cache:
+        log.debug(f"removing {dset_id} from meta_cache")
+        del meta_cache[dset_id]
+
+
 async def extendShape(app, dset_json, nelements, axis=0, bucket=None):
     """ extend the shape of the dataset by nelements along given axis """
     dset_id = dset_json["id"]
@@ -785,6 +815,7 @@ async def extendShape(app, dset_json, nelements, axis=0, bucket=None):
     try:
         shape_rsp = await http_put(app, req, data=body, params=params)
         log.info(f"got shape put rsp: {shape_rsp}")
+        _invalidateDsetJson(app, dset_id)
         if "selection" in shape_rsp:
             selection = shape_rsp["selection"]
     except HTTPConflict:
@@ -1031,6 +1062,7 @@ async def updateShape(app, dset_json, shape_update, bucket=None):
         raise
 
     log.info(f"got shape put rsp: {put_rsp}")
+    _invalidateDsetJson(app, dset_id)
     if "selection" in put_rsp:
         return put_rsp["selection"]
     else:
@@ -1053,3 +1085,83 @@ async def deleteAllChunks(app, dset_id, bucket=None):
         await removeChunks(app, chunk_ids, bucket=bucket)
     else:
         log.info(f"deleteAllChunks for {dset_id} - no chunks need deletion")
+
+
+async def prewarmChunks(app, dset_json, selection, bucket=None, pin_ttl=None):
+    """ Have the DNs load the chunks for the given selection into their
+    chunk caches.  Returns the counts reported by the DNs """
+
+    dset_id = dset_json["id"]
+    layout = getChunkLayout(dset_json)
+    chunk_ids = getChunkIds(dset_id, selection, layout)
+    log.info(f"prewarmChunks for {dset_id} - {len(chunk_ids)} chunks")
+
+    # group the chunk ids by the DN that owns them
+    dn_chunk_ids = {}
+    for chunk_id in chunk_ids:
+        # use the partitioned id if the dataset has a partition_count
+        chunk_id = getChunkIdForPartition(chunk_id, dset_json)
+        dn_url = getDataNodeUrl(app, chunk_id)
+        if dn_url not in dn_chunk_ids:
+            dn_chunk_ids[dn_url] = []
+        dn_chunk_ids[dn_url].append(chunk_id)
+
+    totals = {"chunk_count": len(chunk_ids)}
+    progress = {"count": 0}
+
+    async def prewarm_dn(dn_url, dn_ids):
+        # send the chunk ids in batches so that each request returns
+        # in a reasonable time
+        req = dn_url + "/prewarm"
+        for i in range(0, len(dn_ids), PREWARM_BATCH_SIZE):
+            batch = dn_ids[i:i + PREWARM_BATCH_SIZE]
+            body = {"dset_id": dset_id, "chunk_ids": batch, "bucket": bucket}
+            if pin_ttl:
+                body["pin_ttl"] = pin_ttl
+            rsp_json = await http_post(app, req, data=body)
+            for key in rsp_json:
+                totals[key] = totals.get(key, 0) + rsp_json[key]
+            progress["count"] += len(batch)
+            msg = f"prewarmChunks for {dset_id} - {progress['count']} of "
+            msg += f"{len(chunk_ids)} chunks done"
+            log.info(msg)
+
+    tasks = []
+    for dn_url in dn_chunk_ids:
+        tasks.append(prewarm_dn(dn_url, dn_chunk_ids[dn_url]))
+    await asyncio.gather(*tasks)
+    log.info(f"prewarmChunks for {dset_id} - {totals}")
+
+    return totals
+
+
+async def rebuildPyramid(app, dset_id, bucket=None):
+    """ Have the DNs update the next pyramid level from each allocated chunk
+    of the dataset.  Levels below that are updated in turn as the level
+    chunks are written.  Returns the number of chunks queued """
+
+    chunk_ids = await getAllocatedChunkIds(app, dset_id, bucket=bucket)
+    chunk_ids = sorted(chunk_ids)
+    log.info(f"rebuildPyramid for {dset_id} - {len(chunk_ids)} chunks")
+
+    # group the chunk ids by the DN that owns them
+    dn_chunk_ids = {}
+    for chunk_id in chunk_ids:
+        dn_url = getDataNodeUrl(app, chunk_id)
+        if dn_url not in dn_chunk_ids:
+            dn_chunk_ids[dn_url] = []
+        dn_chunk_ids[dn_url].append(chunk_id)
+
+    async def rebuild_dn(dn_url, dn_ids):
+        req = dn_url + "/pyramid"
+        for i in range(0, len(dn_ids), PREWARM_BATCH_SIZE):
+            batch = dn_ids[i:i + PREWARM_BATCH_SIZE]
+            body = {"dset_id": dset_id, "chunk_ids": batch, "bucket": bucket}
+            await http_post(app, req, data=body)
+
+    tasks = []
+    for dn_url in dn_chunk_ids:
+        tasks.append(rebuild_dn(dn_url, dn_chunk_ids[dn_url]))
+    await asyncio.gather(*tasks)
+
+    return len(chunk_ids)
@@ -16,27 +16,29 @@
 
 import math
 from json import JSONDecodeError
-from aiohttp.web_exceptions import HTTPBadRequest, HTTPNotFound
+from aiohttp.web_exceptions import HTTPBadRequest, HTTPNotFound, HTTPForbidden
 
 from .util.httpUtil import getHref, respJsonAssemble
 from .util.httpUtil import jsonResponse, getBooleanParam
-from .util.idUtil import isValidUuid, isSchema2Id
+from .util.idUtil import isValidUuid, isSchema2Id, createObjId
 from .util.dsetUtil import getPreviewQuery, getFilterItem, getShapeDims
+from .util.dsetUtil import getSelectionList, getLayoutClass, getChunkLayout
 from .util.arrayUtil import getNumElements, getNumpyValue
 from .util.chunkUtil import getChunkSize, guessChunk, expandChunk, shrinkChunk
-from .util.chunkUtil import getContiguousLayout
+from .util.chunkUtil import getContiguousLayout, getNumChunks
 from .util.authUtil import getUserPasswordFromRequest, aclCheck
-from .util.authUtil import validateUserPassword
+from .util.authUtil import validateUserPassword, isAdminUser
 from .util.domainUtil import getDomainFromRequest, getPathForDomain, isValidDomain
 from .util.domainUtil import getBucketForDomain, verifyRoot
 from .util.storUtil import getSupportedFilters
 from .util.hdf5dtype import validateTypeItem, createDataType, getBaseTypeJson
 from .util.hdf5dtype import getItemSize
 from .util.linkUtil import validateLinkName
+from .util.pyramidUtil import getPyramid, getLevelJson, getPreviewSelect
 from .servicenode_lib import getDomainJson, getObjectJson, getDsetJson, getPathForObjectId
 from .servicenode_lib import getObjectIdByPath, validateAction, getRootInfo
 from .servicenode_lib import createObject, createObjectByPath, deleteObject
-from .dset_lib import updateShape, deleteAllChunks
+from .dset_lib import updateShape, deleteAllChunks, prewarmChunks, rebuildPyramid
 from . import config
 from . import hsds_logger as log
 
@@ -234,6 +236,62 @@ async def validateChunkLayout(app, shape_json, item_size, layout, bucket=None):
         raise HTTPBadRequest(reason=msg)
 
 
+def validatePyramid(pyramid, shape_json, item_size, layout):
+    """ check the pyramid creation property and return the property with
+    defaults filled in """
+    if not isinstance(pyramid, dict):
+        msg = "pyramid creation property must be an object"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    factor = pyramid.get("factor", 2)
+    levels = pyramid.get("levels", 1)
+    max_levels = int(config.get("pyramid_max_levels", default=8))
+    if not isinstance(factor, int) or factor < 2:
+        msg = f"invalid pyramid factor: {factor}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    if not isinstance(levels, int) or levels < 1 or levels > max_levels:
+        msg = f"pyramid levels must be an integer between 1 and {max_levels}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    if not layout or layout["class"] != "H5D_CHUNKED":
+        msg = "pyramid can only be used with chunked datasets"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    if shape_json["class"] != "H5S_SIMPLE" or "maxdims" in shape_json:
+        msg = "pyramid can only be used with fixed size simple dataspaces"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    if item_size == "H5T_VARIABLE":
+        msg = "pyramid can not be used with variable length types"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    return {"factor": factor, "levels": levels}
+
+
+async def createPyramidLevels(app, dset_json, bucket=None):
+    """ create the level datasets for the pyramid of the dataset to be
+    created with the given json.  The ids of the levels are added to the
+    pyramid creation property of dset_json """
+    root_id = dset_json["root"]
+    pyramid = dset_json["creationProperties"]["pyramid"]
+    ids = []
+    for i in range(pyramid["levels"]):
+        ids.append(createObjId("datasets", rootid=root_id))
+    pyramid["ids"] = ids
+
+    level_json = dset_json
+    for level_id in ids:
+        level_json = getLevelJson(level_json)
+        log.info(f"creating pyramid level dataset: {level_id} shape: {level_json['shape']}")
+        kwargs = {"obj_id": level_id, "root_id": root_id, "bucket": bucket}
+        kwargs["obj_type"] = level_json["type"]
+        kwargs["obj_shape"] = level_json["shape"]
+        kwargs["layout"] = level_json["layout"]
+        kwargs["creation_props"] = level_json["creationProperties"]
+        await createObject(app, **kwargs)
+
+
 async def getDatasetDetails(app, dset_id, root_id, bucket=None):
     """Get extra information about the given dataset"""
     # Gather additional info on the domain
@@ -312,7 +370,7 @@ async def GET_Dataset(request):
             msg += f" group_id: {group_id}"
         log.info(msg)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -390,7 +448,14 @@ async def GET_Dataset(request):
             hrefs.append({"rel": "data", "href": href})
         else:
             # large number of values, create preview link
-            previewQuery = getPreviewQuery(dset_shape["dims"])
+            pyramid = getPyramid(dset_json)
+            if pyramid:
+                # strided preview that can be served from the pyramid
+                kwargs = {"factor": pyramid["factor"], "levels": len(pyramid["ids"])}
+                select = getPreviewSelect(dset_shape["dims"], **kwargs)
+                previewQuery = f"select={select}&pyramid=1"
+            else:
+                previewQuery = getPreviewQuery(dset_shape["dims"])
             kwargs = {"query": previewQuery}
             href = getHref(request, dset_uri + "/value", **kwargs)
             hrefs.append({"rel": "preview", "href": href})
@@ -430,7 +495,7 @@ async def GET_DatasetType(request):
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -482,7 +547,7 @@ async def GET_DatasetShape(request):
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -539,7 +604,7 @@ async def PUT_DatasetShape(request):
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     await validateUserPassword(app, username, pswd)
 
     # validate request
@@ -648,13 +713,140 @@ async def PUT_DatasetShape(request):
     return resp
 
 
+async def POST_DatasetPrewarm(request):
+    """HTTP method to load the chunks of a dataset selection into the DN
+    chunk caches ahead of use.  Admin only."""
+    log.request(request)
+    app = request.app
+
+    dset_id = request.match_info.get("id")
+    if not dset_id:
+        msg = "Missing dataset id"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    if not isValidUuid(dset_id, "Dataset"):
+        msg = f"Invalid dataset id: {dset_id}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+
+    username, pswd = await getUserPasswordFromRequest(request)
+    await validateUserPassword(app, username, pswd)
+    if not isAdminUser(app, username):
+        log.warn(f"prewarm request for non-admin user: {username}")
+        raise HTTPForbidden()
+
+    body = {}
+    if request.has_body:
+        try:
+            body = await request.json()
+        except JSONDecodeError:
+            msg = "Unable to load JSON body"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
+
+    pin_ttl = None
+    if "pin_ttl" in body:
+        try:
+            pin_ttl = float(body["pin_ttl"])
+        except (TypeError, ValueError):
+            pin_ttl = -1
+        if pin_ttl <= 0:
+            msg = "pin_ttl must be a positive number of seconds"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
+        max_pin_ttl = float(config.get("prewarm_max_pin_ttl", default=3600))
+        if pin_ttl > max_pin_ttl:
+            log.info(f"prewarm - reducing pin_ttl of {pin_ttl} to {max_pin_ttl}")
+            pin_ttl = max_pin_ttl
+
+    domain = getDomainFromRequest(request)
+    if not isValidDomain(domain):
+        msg = f"Invalid domain: {domain}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    bucket = getBucketForDomain(domain)
+
+    dset_json = await getDsetJson(app, dset_id, bucket=bucket)
+    layout_class = getLayoutClass(dset_json)
+    if layout_class != "H5D_CHUNKED":
+        msg = f"prewarm is not supported for datasets with layout: {layout_class}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    dims = getShapeDims(dset_json["shape"])
+
+    try:
+        selection = getSelectionList(body.get("select"), dims)
+    except ValueError as ve:
+        msg = f"Invalid selection: {ve}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    layout = getChunkLayout(dset_json)
+    num_chunks = getNumChunks(selection, layout)
+    max_chunks = int(config.get("prewarm_max_chunks", default=10000))
+    if num_chunks > max_chunks:
+        msg = f"prewarm selection has {num_chunks} chunks, max is {max_chunks}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+
+    kwargs = {"bucket": bucket, "pin_ttl": pin_ttl}
+    json_resp = await prewarmChunks(app, dset_json, selection, **kwargs)
+
+    resp = await jsonResponse(request, json_resp)
+    log.response(request, resp=resp)
+    return resp
+
+
+async def POST_DatasetPyramid(request):
+    """HTTP method to rebuild the pyramid levels of a dataset from its
+    allocated chunks.  Level updates are queued on the DNs and run in the
+    background, so the levels are up to date some time after this returns.
+    Admin only."""
+    log.request(request)
+    app = request.app
+
+    dset_id = request.match_info.get("id")
+    if not dset_id:
+        msg = "Missing dataset id"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    if not isValidUuid(dset_id, "Dataset"):
+        msg = f"Invalid dataset id: {dset_id}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+
+    username, pswd = await getUserPasswordFromRequest(request)
+    await validateUserPassword(app, username, pswd)
+    if not isAdminUser(app, username):
+        log.warn(f"pyramid rebuild request for non-admin user: {username}")
+        raise HTTPForbidden()
+
+    domain = getDomainFromRequest(request)
+    if not isValidDomain(domain):
+        msg = f"Invalid domain: {domain}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    bucket = getBucketForDomain(domain)
+
+    dset_json = await getDsetJson(app, dset_id, bucket=bucket)
+    if not getPyramid(dset_json):
+        msg = f"dataset {dset_id} has no pyramid levels"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+
+    chunk_count = await rebuildPyramid(app, dset_id, bucket=bucket)
+
+    resp = await jsonResponse(request, {"chunk_count": chunk_count})
+    log.response(request, resp=resp)
+    return resp
+
+
 async def POST_Dataset(request):
     """HTTP method to create a new dataset object"""
     log.request(request)
     app = request.app
     params = request.rel_url.query
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     # write actions need auth
     await validateUserPassword(app, username, pswd)
 
@@ -1098,6 +1290,11 @@ async def POST_Dataset(request):
             log.debug(f"setting filters to: {f_out}")
             creationProperties["filters"] = f_out
 
+        if "pyramid" in creationProperties:
+            pyramid = creationProperties["pyramid"]
+            pyramid = validatePyramid(pyramid, shape_json, item_size, layout)
+            creationProperties["pyramid"] = pyramid
+
         log.debug(f"set dataset json creationPropries: {creationProperties}")
 
     parent_id = None
@@ -1132,6 +1329,13 @@ async def POST_Dataset(request):
         else:
             parent_id = body["parent_id"]
 
+    if creationProperties.get("pyramid"):
+        # create the level datasets before the dataset that refers to them
+        pyramid_json = {"root": root_id, "type": datatype, "shape": shape_json}
+        pyramid_json["layout"] = layout
+        pyramid_json["creationProperties"] = creationProperties
+        await createPyramidLevels(app, pyramid_json, bucket=bucket)
+
     # setup args to createObject
     kwargs = {"bucket": bucket, "obj_type": datatype, "obj_shape": shape_json}
     if creationProperties:
@@ -1174,7 +1378,7 @@ async def DELETE_Dataset(request):
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     await validateUserPassword(app, username, pswd)
 
     domain = getDomainFromRequest(request)
@@ -1191,12 +1395,22 @@ async def DELETE_Dataset(request):
     # check authority to do a delete
     await validateAction(app, domain, dset_id, username, "delete")
 
+    dset_json = await getDsetJson(app, dset_id, bucket=bucket)
+    pyramid = getPyramid(dset_json)
+
     # free any allocated chunks
     await deleteAllChunks(app, dset_id, bucket=bucket)
 
     # delete the dataset object
     await deleteObject(app, dset_id, bucket=bucket)
 
+    if pyramid:
+        # delete the pyramid level datasets
+        for level_id in pyramid["ids"]:
+            log.info(f"deleting pyramid level dataset: {level_id}")
+            await deleteAllChunks(app, level_id, bucket=bucket)
+            await deleteObject(app, level_id, bucket=bucket)
+
     resp = await jsonResponse(request, {})
     log.response(request, resp=resp)
     return resp
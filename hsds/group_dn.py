@@ -28,6 +28,25 @@ from . import hsds_logger as log
 from . import config
 
 
+def getGroupResponse(group_json, include_links=False, include_attrs=False):
+    """ return the GET response json for the given group json """
+    resp_json = {}
+    resp_json["id"] = group_json["id"]
+    resp_json["root"] = group_json["root"]
+    resp_json["created"] = group_json["created"]
+    resp_json["lastModified"] = group_json["lastModified"]
+    resp_json["linkCount"] = len(group_json["links"])
+    resp_json["attributeCount"] = len(group_json["attributes"])
+
+    if include_links:
+        resp_json["links"] = group_json["links"]
+    if include_attrs:
+        resp_json["attributes"] = group_json["attributes"]
+    if "creationProperties" in group_json:
+        resp_json["creationProperties"] = group_json["creationProperties"]
+    return resp_json
+
+
 async def GET_Group(request):
     """HTTP GET method to return JSON for /groups/"""
     log.request(request)
@@ -52,20 +71,12 @@ async def GET_Group(request):
 
     group_json = await get_metadata_obj(app, group_id, bucket=bucket)
 
-    resp_json = {}
-    resp_json["id"] = group_json["id"]
-    resp_json["root"] = group_json["root"]
-    resp_json["created"] = group_json["created"]
-    resp_json["lastModified"] = group_json["lastModified"]
-    resp_json["linkCount"] = len(group_json["links"])
-    resp_json["attributeCount"] = len(group_json["attributes"])
-
+    kwargs = {}
     if "include_links" in params and params["include_links"]:
-        resp_json["links"] = group_json["links"]
+        kwargs["include_links"] = True
     if "include_attrs" in params and params["include_attrs"]:
-        resp_json["attributes"] = group_json["attributes"]
-    if "creationProperties" in group_json:
-        resp_json["creationProperties"] = group_json["creationProperties"]
+        kwargs["include_attrs"] = True
+    resp_json = getGroupResponse(group_json, **kwargs)
 
     resp = json_response(resp_json)
     log.response(request, resp=resp)
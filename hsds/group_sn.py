@@ -71,7 +71,7 @@ async def GET_Group(request):
     include_links = getBooleanParam(params, "include_links")
     include_attrs = getBooleanParam(params, "include_attrs")
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -161,7 +161,7 @@ async def POST_Group(request):
     app = request.app
     params = request.rel_url.query
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     # write actions need auth
     await validateUserPassword(app, username, pswd)
 
@@ -265,7 +265,7 @@ async def DELETE_Group(request):
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     await validateUserPassword(app, username, pswd)
 
     domain = getDomainFromRequest(request)
@@ -37,6 +37,8 @@ NODE_STAT_KEYS = (
     "s3_stats",
     "azure_stats",
     "chunk_cache_stats",
+    "meta_cache_stats",
+    "domain_cache_stats",
 )
 
 
@@ -136,6 +136,7 @@ def request(req):
         "/nodeinfo",
         "/nodestate",
         "/register",
+        "/profile",
     )
     if req.path in INFO_METHODS:
         # always service these state requests regardles of node state and
@@ -14,56 +14,92 @@
 #
 
 from copy import copy
-from bisect import bisect_left
 
 from aiohttp.web_exceptions import HTTPBadRequest, HTTPNotFound, HTTPGone, HTTPConflict
 from aiohttp.web_exceptions import HTTPInternalServerError
 from aiohttp.web import json_response
 
 from .util.idUtil import isValidUuid
-from .util.globparser import globmatch
+from .util.linkIndex import LinkIndex
 from .util.linkUtil import validateLinkName, getLinkClass, isEqualLink
 from .util.domainUtil import isValidBucketName
 from .util.timeUtil import getNow
 from .datanode_lib import get_obj_id, get_metadata_obj, save_metadata_obj
 from . import hsds_logger as log
 
+LINK_INDEX_MAX_GROUPS = 100  # max number of groups to keep link indexes for
+
+
+def _getLinkIndex(app, group_id, links):
+    """ return the LinkIndex for the given group, creating it if needed """
+    link_indexes = app["link_indexes"]
+    link_index = link_indexes.get(group_id)
+    if link_index is not None and link_index.isValidFor(links):
+        link_indexes.move_to_end(group_id)
+        return link_index
+    log.debug(f"creating link index for {group_id} with {len(links)} links")
+    link_index = LinkIndex(links)
+    link_indexes[group_id] = link_index
+    if len(link_indexes) > LINK_INDEX_MAX_GROUPS:
+        link_indexes.popitem(last=False)  # drop the least recently used index
+    return link_index
+
+
+def _updateLinkIndex(app, group_id, links, added=None, removed=None):
+    """ keep the group's index (if any) in sync with changes to links.
+    removed titles should be passed before they are removed from links,
+    and added titles after they are added """
+    link_indexes = app["link_indexes"]
+    link_index = link_indexes.get(group_id)
+    if link_index is None:
+        return
+    if not link_index.isValidFor(links, check_count=False):
+        # group json was reloaded, index will be rebuilt on next use
+        del link_indexes[group_id]
+        return
+    if removed:
+        for title in removed:
+            link_index.remove(title)
+    if added:
+        for title in added:
+            link_index.add(title)
+
+
+def getLinkList(app, group_id, group_json, create_order=False, marker=None, limit=None,
+                pattern=None):
+    """ return the list of link jsons for a GET links request """
+    if "links" not in group_json:
+        log.error(f"unexpected group data for id: {group_id}")
+        raise HTTPInternalServerError()
 
-def _index(items, marker, create_order=False):
-    """Locate the leftmost value exactly equal to x"""
-    if create_order:
-        # list is not ordered, juse search linearly
-        for i in range(len(items)):
-            if items[i] == marker:
-                return i
-    else:
-        i = bisect_left(items, marker)
-        if i != len(items) and items[i] == marker:
-            return i
-    # not found
-    return -1
-
-
-def _getTitles(links, create_order=False):
-    titles = []
-    if create_order:
-        order_dict = {}
-        for title in links:
-            item = links[title]
-            if "created" not in item:
-                log.warning(f"expected to find 'created' key in link item {title}")
-                continue
-            order_dict[title] = item["created"]
-        log.debug(f"order_dict: {order_dict}")
-        # now sort by created
-        for k in sorted(order_dict.items(), key=lambda item: item[1]):
-            titles.append(k[0])
-        log.debug(f"links by create order: {titles}")
-    else:
-        titles = list(links.keys())
-        titles.sort()
-        log.debug(f"links by lexographic order: {titles}")
-    return titles
+    # return a list of links based on sorted dictionary keys
+    link_dict = group_json["links"]
+
+    link_index = _getLinkIndex(app, group_id, link_dict)
+    kwargs = {"create_order": create_order, "marker": marker, "limit": limit}
+    kwargs["pattern"] = pattern
+    try:
+        titles = link_index.getTitles(**kwargs)
+    except KeyError:
+        # marker not found, return 404
+        msg = f"Link marker: {marker}, not found"
+        log.warn(msg)
+        raise HTTPNotFound()
+    except ValueError:
+        msg = f"exception getting links using pattern: {pattern}"
+        log.error(msg)
+        raise HTTPBadRequest(reason=msg)
+    if pattern:
+        msg = f"getLinks with pattern: {pattern} returning {len(titles)} "
+        msg += f"links from {len(link_dict)}"
+        log.debug(msg)
+
+    link_list = []
+    for title in titles:
+        link = copy(link_dict[title])
+        link["title"] = title
+        link_list.append(link)
+    return link_list
 
 
 async def GET_Links(request):
@@ -116,45 +152,9 @@ async def GET_Links(request):
     group_json = await get_metadata_obj(app, group_id, bucket=bucket)
 
     log.debug(f"for id: {group_id} got group json: {group_json}")
-    if "links" not in group_json:
-        msg.error(f"unexpected group data for id: {group_id}")
-        raise HTTPInternalServerError()
-
-    # return a list of links based on sorted dictionary keys
-    link_dict = group_json["links"]
-
-    titles = _getTitles(link_dict, create_order=create_order)
-
-    if pattern:
-        try:
-            titles = [x for x in titles if globmatch(x, pattern)]
-        except ValueError:
-            log.error(f"exception getting links using pattern: {pattern}")
-            raise HTTPBadRequest(reason=msg)
-        msg = f"getLinks with pattern: {pattern} returning {len(titles)} "
-        msg += f"links from {len(link_dict)}"
-        log.debug(msg)
-
-    start_index = 0
-    if marker is not None:
-        start_index = _index(titles, marker, create_order=create_order) + 1
-        if start_index == 0:
-            # marker not found, return 404
-            msg = f"Link marker: {marker}, not found"
-            log.warn(msg)
-            raise HTTPNotFound()
-
-    end_index = len(titles)
-    if limit is not None and (end_index - start_index) > limit:
-        end_index = start_index + limit
-
-    link_list = []
-    for i in range(start_index, end_index):
-        title = titles[i]
-        link = copy(link_dict[title])
-        log.debug(f"link list[{i}: {link}")
-        link["title"] = title
-        link_list.append(link)
+    kwargs = {"create_order": create_order, "marker": marker, "limit": limit}
+    kwargs["pattern"] = pattern
+    link_list = getLinkList(app, group_id, group_json, **kwargs)
 
     resp_json = {"links": link_list}
     resp = json_response(resp_json)
@@ -374,6 +374,7 @@ async def PUT_Links(request):
         log.debug(f"added link {title}: {item}")
         if title in link_delete_set:
             link_delete_set.remove(title)
+    _updateLinkIndex(app, group_id, links, added=new_links)
 
     if new_links:
         # update the group lastModified
@@ -467,6 +468,7 @@ async def DELETE_Links(request):
             log.warn(msg)
             raise HTTPNotFound()
 
+        _updateLinkIndex(app, group_id, links, removed=[title, ])
         del links[title]  # remove the link from dictionary
         link_delete_set.add(title)
         save_obj = True
@@ -17,7 +17,7 @@ from aiohttp.web_exceptions import HTTPBadRequest
 from json import JSONDecodeError
 
 from .util.httpUtil import getHref, getBooleanParam
-from .util.httpUtil import jsonResponse
+from .util.httpUtil import jsonResponse, isNdjsonRequest, ndjsonResponse
 from .util.globparser import globmatch
 from .util.idUtil import isValidUuid, getDataNodeUrl, getCollectionForId
 from .util.authUtil import getUserPasswordFromRequest, validateUserPassword
@@ -30,6 +30,20 @@ from .domain_crawl import DomainCrawler
 from . import hsds_logger as log
 
 
+async def _filterLinks(results, pattern):
+    """ yield the (group id, links) tuples from results with just the
+    links that match the given pattern """
+    try:
+        async for grp_id, grp_links in results:
+            if isinstance(grp_links, list):
+                grp_links = [link for link in grp_links if globmatch(link["title"], pattern)]
+            yield grp_id, grp_links
+    finally:
+        # if the response is closed early (e.g. the client went away), close
+        # results too, so the crawl is canceled now rather than on gc
+        await results.aclose()
+
+
 async def GET_Links(request):
     """HTTP method to return JSON for link collection"""
     log.request(request)
@@ -48,7 +62,7 @@ async def GET_Links(request):
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -103,6 +117,16 @@ async def GET_Links(request):
         if limit:
             kwargs["limit"] = limit
         items = [group_id, ]
+        if isNdjsonRequest(request):
+            # return a line for each group as it's fetched
+            kwargs["stream"] = True
+            crawler = DomainCrawler(app, items, **kwargs)
+            results = crawler.results()
+            if pattern:
+                results = _filterLinks(results, pattern)
+            resp = await ndjsonResponse(request, results)
+            log.response(request, resp=resp)
+            return resp
         crawler = DomainCrawler(app, items, **kwargs)
 
         # will raise exception on NotFound, etc.
@@ -185,7 +209,7 @@ async def GET_Link(request):
     except ValueError:
         raise HTTPBadRequest(reason="invalid link name")
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -260,7 +284,7 @@ async def PUT_Link(request):
     link_title = request.match_info.get("title")
     log.info(f"PUT Link_title: [{link_title}]")
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     # write actions need auth
     await validateUserPassword(app, username, pswd)
 
@@ -311,7 +335,7 @@ async def PUT_Links(request):
 
     log.debug("PUT_Links")
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     # write actions need auth
     await validateUserPassword(app, username, pswd)
 
@@ -516,7 +540,7 @@ async def DELETE_Links(request):
         except ValueError:
             raise HTTPBadRequest(reason="invalid link name")
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     await validateUserPassword(app, username, pswd)
 
     domain = getDomainFromRequest(request)
@@ -660,7 +684,7 @@ async def POST_Links(request):
             log.warn(msg)
             raise HTTPBadRequest(reason=msg)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     if username is None and app["allow_noauth"]:
         username = "default"
     else:
@@ -679,13 +703,16 @@ async def POST_Links(request):
 
     await validateAction(app, domain, req_id, username, "read")
 
+    # return a line for each group as it's fetched if ndjson is requested
+    stream = isNdjsonRequest(request)
+
     resp_json = {}
 
     if len(items) == 0:
         msg = "no group ids specified for POST Links"
         log.warn(msg)
         raise HTTPBadRequest(reason=msg)
-    elif len(items) == 1 and not follow_links:
+    elif len(items) == 1 and not follow_links and not stream:
         # just make a request to the datanode
         group_id = list(items.keys())[0]
         kwargs = {"bucket": bucket}
@@ -721,7 +748,14 @@ async def POST_Links(request):
             for i in items:
                 items[i] = titles
 
+        if stream:
+            kwargs["stream"] = True
         crawler = DomainCrawler(app, items, **kwargs)
+        if stream:
+            # errors are returned as the status for each group
+            resp = await ndjsonResponse(request, crawler.results())
+            log.response(request, resp=resp)
+            return resp
         # will raise exception on NotFound, etc.
         await crawler.crawl()
 
@@ -754,7 +788,7 @@ async def DELETE_Link(request):
     link_title = request.match_info.get("title")
     validateLinkName(link_title)
 
-    username, pswd = getUserPasswordFromRequest(request)
+    username, pswd = await getUserPasswordFromRequest(request)
     await validateUserPassword(app, username, pswd)
 
     domain = getDomainFromRequest(request)
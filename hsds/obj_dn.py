@@ -0,0 +1,198 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+#
+# data node of hsds cluster
+#
+# Batch requests for the json, attributes, or links of a list of objects
+# owned by this node.  Used by the SN DomainCrawler so that it doesn't need
+# to make a request for each object.  Errors for any one object are returned
+# as {"status": <code>} for that object rather than failing the request.
+#
+
+import asyncio
+from json import JSONDecodeError
+
+from aiohttp.web_exceptions import HTTPException, HTTPBadRequest
+from aiohttp.web import json_response
+
+from .util.idUtil import isValidUuid, validateInPartition, getCollectionForId
+from .util.domainUtil import isValidBucketName
+from .datanode_lib import get_metadata_obj
+from .group_dn import getGroupResponse
+from .dset_dn import getDatasetResponse
+from .ctype_dn import getDatatypeResponse
+from .attr_dn import getAttributeList
+from .link_dn import getLinkList
+from . import hsds_logger as log
+
+
+async def _getRequestIds(request, obj_class=None):
+    """ return the list of obj ids in the request body and the bucket """
+    params = request.rel_url.query
+    bucket = params.get("bucket")
+    if not bucket:
+        msg = "batch request without bucket param"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    if not isValidBucketName(bucket):
+        msg = f"Invalid bucket name: {bucket}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+
+    if not request.has_body:
+        msg = "batch request with no body"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    try:
+        body = await request.json()
+    except JSONDecodeError:
+        msg = "Unable to load JSON body"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    obj_ids = body.get("obj_ids")
+    if not isinstance(obj_ids, list):
+        msg = "expected list of obj_ids in body"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    for obj_id in obj_ids:
+        if not isValidUuid(obj_id, obj_class=obj_class):
+            msg = f"Invalid obj id: {obj_id}"
+            log.warn(msg)
+            raise HTTPBadRequest(reason=msg)
+    return obj_ids, bucket
+
+
+def _getIntParam(params, key):
+    """ return the int value of the given query param, or None if it's
+    not set """
+    if not params.get(key):
+        return None
+    try:
+        value = int(params[key])
+    except ValueError:
+        value = -1
+    if value < 0:
+        msg = f"Bad Request: Expected non-negative int for {key}"
+        log.warn(msg)
+        raise HTTPBadRequest(reason=msg)
+    return value
+
+
+async def _getObjResult(app, obj_id, bucket, func):
+    """ return func(obj_id, obj_json) for the given object, or a status json if
+    the object couldn't be read """
+    try:
+        validateInPartition(app, obj_id)
+    except KeyError:
+        log.error(f"Object {obj_id} not in partition")
+        return {"status": 500}
+    try:
+        obj_json = await get_metadata_obj(app, obj_id, bucket=bucket)
+        return func(obj_id, obj_json)
+    except HTTPException as he:
+        log.warn(f"batch request - got status: {he.status_code} for {obj_id}")
+        return {"status": he.status_code}
+    except Exception as e:
+        log.error(f"batch request - unexpected exception for {obj_id}: {e}")
+        return {"status": 500}
+
+
+async def _getResults(app, obj_ids, bucket, func):
+    """ return a dict of obj_id to the result of func for each object """
+    tasks = [_getObjResult(app, obj_id, bucket, func) for obj_id in obj_ids]
+    results = await asyncio.gather(*tasks)
+    return dict(zip(obj_ids, results))
+
+
+async def POST_Objects(request):
+    """HTTP POST method to return the JSON for a list of objects"""
+    log.request(request)
+    app = request.app
+    params = request.rel_url.query
+    obj_ids, bucket = await _getRequestIds(request)
+    log.info(f"POST_Objects - {len(obj_ids)} objects, bucket: {bucket}")
+    include_links = bool(params.get("include_links"))
+    include_attrs = bool(params.get("include_attrs"))
+
+    def getObjResponse(obj_id, obj_json):
+        collection = getCollectionForId(obj_id)
+        if collection == "groups":
+            kwargs = {"include_links": include_links, "include_attrs": include_attrs}
+            return getGroupResponse(obj_json, **kwargs)
+        elif collection == "datasets":
+            return getDatasetResponse(obj_json, include_attrs=include_attrs)
+        else:
+            return getDatatypeResponse(obj_json, include_attrs=include_attrs)
+
+    objects = await _getResults(app, obj_ids, bucket, getObjResponse)
+    resp = json_response({"objects": objects})
+    log.response(request, resp=resp)
+    return resp
+
+
+async def POST_ObjectAttributes(request):
+    """HTTP POST method to return all the attributes for a list of objects"""
+    log.request(request)
+    app = request.app
+    params = request.rel_url.query
+    obj_ids, bucket = await _getRequestIds(request)
+    log.info(f"POST_ObjectAttributes - {len(obj_ids)} objects, bucket: {bucket}")
+
+    kwargs = {}
+    if params.get("CreateOrder"):
+        kwargs["create_order"] = True
+    if params.get("encoding"):
+        kwargs["encoding"] = params["encoding"]
+    if params.get("IncludeData"):
+        kwargs["include_data"] = True
+    max_data_size = _getIntParam(params, "max_data_size")
+    if max_data_size is not None:
+        kwargs["max_data_size"] = max_data_size
+    if params.get("pattern"):
+        kwargs["pattern"] = params["pattern"]
+    limit = _getIntParam(params, "Limit")
+    if limit is not None:
+        kwargs["limit"] = limit
+
+    def getAttributes(obj_id, obj_json):
+        return getAttributeList(obj_id, obj_json, **kwargs)
+
+    attributes = await _getResults(app, obj_ids, bucket, getAttributes)
+    resp = json_response({"attributes": attributes})
+    log.response(request, resp=resp)
+    return resp
+
+
+async def POST_ObjectLinks(request):
+    """HTTP POST method to return all the links for a list of groups"""
+    log.request(request)
+    app = request.app
+    params = request.rel_url.query
+    group_ids, bucket = await _getRequestIds(request, obj_class="group")
+    log.info(f"POST_ObjectLinks - {len(group_ids)} groups, bucket: {bucket}")
+
+    kwargs = {}
+    if params.get("CreateOrder"):
+        kwargs["create_order"] = True
+    if params.get("pattern"):
+        kwargs["pattern"] = params["pattern"]
+    limit = _getIntParam(params, "Limit")
+    if limit is not None:
+        kwargs["limit"] = limit
+
+    def getLinks(group_id, group_json):
+        return getLinkList(app, group_id, group_json, **kwargs)
+
+    links = await _getResults(app, group_ids, bucket, getLinks)
+    resp = json_response({"links": links})
+    log.response(request, resp=resp)
+    return resp
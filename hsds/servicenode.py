@@ -36,6 +36,7 @@ from .attr_sn import DELETE_Attributes, DELETE_Attribute, GET_AttributeValue, PU
 from .ctype_sn import GET_Datatype, POST_Datatype, DELETE_Datatype
 from .dset_sn import GET_Dataset, POST_Dataset, DELETE_Dataset
 from .dset_sn import GET_DatasetShape, PUT_DatasetShape, GET_DatasetType
+from .dset_sn import POST_DatasetPrewarm, POST_DatasetPyramid
 from .chunk_sn import PUT_Value, GET_Value, POST_Value
 
 
@@ -155,6 +156,12 @@ async def init():
     app.router.add_route("GET", path, GET_DatasetShape)
     app.router.add_route("PUT", path, PUT_DatasetShape)
 
+    path = "/datasets/{id}/prewarm"
+    app.router.add_route("POST", path, POST_DatasetPrewarm)
+
+    path = "/datasets/{id}/pyramid"
+    app.router.add_route("POST", path, POST_DatasetPyramid)
+
     path = "/datasets/{id}/type"
     app.router.add_route("GET", path, GET_DatasetType)
 
@@ -244,10 +251,35 @@ def create_app():
     log.info(msg)
     kwargs = {"mem_target": metadata_mem_cache_size}
     kwargs["name"] = "MetaCache"
+    kwargs["policy"] = config.get("metadata_mem_cache_policy", default="lru")
+    kwargs["rss_limit"] = int(config.get("mem_cache_rss_limit", default=0))
     app["meta_cache"] = LruCache(**kwargs)
     kwargs["name"] = "DomainCache"
     app["domain_cache"] = LruCache(**kwargs)
 
+    acl_cache_expire = int(config.get("acl_cache_expire", default=10))
+    if acl_cache_expire > 0:
+        # access decisions keyed by domain, user and action.  Entries are
+        # small, so 1MB allows for about a thousand
+        kwargs = {"mem_target": 1024 * 1024, "expire_time": acl_cache_expire}
+        kwargs["name"] = "AclCache"
+        app["acl_cache"] = LruCache(**kwargs)
+
+    link_cache_expire = int(config.get("link_cache_expire", default=10))
+    if link_cache_expire > 0:
+        # link json keyed by group id and link title, used to resolve h5paths
+        kwargs = {"mem_target": 4 * 1024 * 1024, "expire_time": link_cache_expire}
+        kwargs["name"] = "LinkCache"
+        app["link_cache"] = LruCache(**kwargs)
+
+    folder_cache_expire = int(config.get("folder_cache_expire", default=5))
+    if folder_cache_expire > 0:
+        # sorted domain names keyed by bucket and folder path, used for
+        # folder listings
+        kwargs = {"mem_target": 16 * 1024 * 1024, "expire_time": folder_cache_expire}
+        kwargs["name"] = "FolderCache"
+        app["folder_cache"] = LruCache(**kwargs)
+
     if config.get("allow_noauth"):
         allow_noauth = config.get("allow_noauth")
         if isinstance(allow_noauth, str):
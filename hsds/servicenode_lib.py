@@ -14,10 +14,13 @@
 #
 
 import asyncio
+import bisect
 import json
+import time
+from copy import copy
 
 from aiohttp.web_exceptions import HTTPBadRequest, HTTPForbidden, HTTPGone, HTTPConflict
-from aiohttp.web_exceptions import HTTPNotFound, HTTPInternalServerError
+from aiohttp.web_exceptions import HTTPNotFound, HTTPInternalServerError, HTTPException
 from aiohttp.client_exceptions import ClientOSError, ClientError
 from aiohttp import ClientResponseError
 
@@ -26,14 +29,17 @@ from .util.arrayUtil import encodeData
 from .util.idUtil import getDataNodeUrl, getCollectionForId, createObjId, getRootObjId
 from .util.idUtil import isSchema2Id, getS3Key, isValidUuid
 from .util.linkUtil import h5Join, validateLinkName, getLinkClass
-from .util.storUtil import getStorJSONObj, isStorObj
+from .util.storUtil import getStorJSONObj, isStorObj, getStorKeys
 from .util.authUtil import aclCheck
-from .util.httpUtil import http_get, http_put, http_post, http_delete
+from .util.httpUtil import http_get, http_put, http_post, http_delete, getETag
 from .util.domainUtil import getBucketForDomain, verifyRoot, getLimits
+from .util.domainUtil import getParentDomain, getPathForDomain
 from .util.storUtil import getCompressors
+from .util.shardUtil import readShards
 from .basenode import getVersion
 
 from . import hsds_logger as log
+from . import config
 
 
 async def getDomainJson(app, domain, reload=False):
@@ -51,12 +57,16 @@ async def getDomainJson(app, domain, reload=False):
 
     domain_cache = app["domain_cache"]
 
+    old_acls = None
     if domain in domain_cache:
         if reload:
+            old_acls = domain_cache[domain].get("acls")
             del domain_cache[domain]
         else:
             log.debug("returning domain_cache value")
             return domain_cache[domain]
+    else:
+        domain_cache.countMiss()
 
     req = getDataNodeUrl(app, domain)
     req += "/domains"
@@ -68,9 +78,11 @@ async def getDomainJson(app, domain, reload=False):
         domain_json = await http_get(app, req, params=params)
     except HTTPNotFound:
         log.warn(f"domain: {domain} not found")
+        invalidateAclCache(app, domain)
         raise
     except HTTPGone:
         log.warn(f"domain: {domain} has been removed")
+        invalidateAclCache(app, domain)
         raise
     except ClientResponseError as ce:
         # shouldn't get this if we are catching relevant exceptions
@@ -100,6 +112,9 @@ async def getDomainJson(app, domain, reload=False):
         log.warn("No acls key found in domain")
         raise HTTPInternalServerError()
 
+    if old_acls is not None and domain_json["acls"] != old_acls:
+        # drop any access decisions based on the previous ACLs
+        invalidateAclCache(app, domain)
     domain_cache[domain] = domain_json  # add to cache
     return domain_json
 
@@ -217,6 +232,25 @@ async def validateAction(app, domain, obj_id, username, action):
     if bucket:
         checkBucketAccess(app, bucket, action=action)
 
+    acl_keys = getAclKeys()
+    if action not in acl_keys:
+        log.error(f"unexpected action: {action}")
+        raise HTTPInternalServerError()
+
+    # check for a cached decision before fetching the domain and object
+    acl_cache = app.get("acl_cache")
+    acl_entry = None
+    if acl_cache is not None:
+        acl_entry = _getAclCacheEntry(app, domain)
+        allowed = _getAclDecision(acl_entry, obj_id, username, action)
+        if allowed:
+            log.debug(f"validateAction - {action} allowed by acl_cache")
+            return
+        if allowed is not None:
+            log.warn(f"Action: {action} not permitted for user: {username} (acl_cache)")
+            raise HTTPForbidden()
+        acl_cache.countMiss()
+
     # get domain JSON
     domain_json = await getDomainJson(app, domain)
     verifyRoot(domain_json)
@@ -227,6 +261,7 @@ async def validateAction(app, domain, obj_id, username, action):
         obj_json = meta_cache[obj_id]
     else:
         # fetch from DN
+        meta_cache.countMiss()
         log.debug(f"validateAction - fetch {obj_id}")
         collection = getCollectionForId(obj_id)
         req = getDataNodeUrl(app, obj_id)
@@ -250,11 +285,6 @@ async def validateAction(app, domain, obj_id, username, action):
             log.warn(msg)
             raise HTTPBadRequest(reason=msg)
 
-    acl_keys = getAclKeys()
-    if action not in acl_keys:
-        log.error(f"unexpected action: {action}")
-        raise HTTPInternalServerError()
-
     reload = False
     try:
         # throws exception if not allowed
@@ -267,7 +297,154 @@ async def validateAction(app, domain, obj_id, username, action):
         reload = True
     if reload:
         domain_json = await getDomainJson(app, domain, reload=True)
-        aclCheck(app, domain_json, action, username)
+        try:
+            aclCheck(app, domain_json, action, username)
+        except HTTPForbidden:
+            _setAclDecision(app, domain, domain_json, acl_entry, username, action, False)
+            raise
+    _setAclDecision(app, domain, domain_json, acl_entry, username, action, True)
+
+
+def _getAclCacheEntry(app, domain):
+    """ Return the acl_cache entry for the domain, or None.  Entries are
+    keyed by domain so they can be dropped without a scan of the cache, and
+    hold the domain root id and the decisions made for each user and action """
+    acl_cache = app["acl_cache"]
+    if domain not in acl_cache:
+        return None
+    entry = acl_cache[domain]
+    acl_cache_expire = int(config.get("acl_cache_expire", default=10))
+    if time.time() - entry["created"] > acl_cache_expire:
+        # decisions are added to the entry over time, so expire by the
+        # time it was created rather than the last update
+        del acl_cache[domain]
+        return None
+    return entry
+
+
+def _getAclDecision(acl_entry, obj_id, username, action):
+    """ Return True or False if the acl_cache entry has a decision for the
+    user and action, or None if it doesn't.  Only v2 ids can be checked
+    against the domain root without fetching the object, so other ids
+    always miss """
+    if acl_entry is None:
+        return None
+    try:
+        if not isSchema2Id(obj_id) or getRootObjId(obj_id) != acl_entry["root"]:
+            return None
+    except ValueError:
+        return None
+    return acl_entry["decisions"].get(f"{username}|{action}")
+
+
+def _setAclDecision(app, domain, domain_json, acl_entry, username, action, allowed):
+    """ record an access decision in the acl_cache """
+    acl_cache = app.get("acl_cache")
+    if acl_cache is None:
+        return
+    root_id = domain_json["root"]
+    if acl_entry is not None and domain in acl_cache and acl_entry["root"] == root_id:
+        # keep decisions from the entry unless it's been invalidated since
+        decisions = dict(acl_entry["decisions"])
+        created = acl_entry["created"]
+    else:
+        decisions = {}
+        created = time.time()
+    decisions[f"{username}|{action}"] = allowed
+    # set a new dict so the cache memory size is updated
+    acl_cache[domain] = {"root": root_id, "created": created, "decisions": decisions}
+
+
+def invalidateAclCache(app, domain):
+    """ remove any cached access decisions for the given domain """
+    acl_cache = app.get("acl_cache")
+    if acl_cache is None:
+        return
+    if domain in acl_cache:
+        del acl_cache[domain]
+        log.debug(f"removed acl_cache entry for domain: {domain}")
+
+
+def _getFolderCacheKey(bucket, folder_path):
+    """ key for folder_cache lookups """
+    if not folder_path.endswith("/"):
+        folder_path += "/"
+    return f"{bucket}{folder_path}"
+
+
+async def getFolderDomains(app, folder_path, bucket=None):
+    """ Return the sorted list of domain paths in the given folder, using
+    the folder_cache if available """
+    if not bucket:
+        bucket = app.get("bucket_name")
+    folder_cache = app.get("folder_cache")
+    folder_cache_key = _getFolderCacheKey(bucket, folder_path)
+    if folder_cache is not None:
+        if folder_cache_key in folder_cache:
+            log.debug(f"getFolderDomains - {folder_cache_key} found in folder_cache")
+            return folder_cache[folder_cache_key]["domains"]
+        folder_cache.countMiss()
+
+    s3prefix = folder_path[1:]
+    log.debug(f"getFolderDomains - listing keys for {s3prefix}")
+    kwargs = {
+        "include_stats": False,
+        "prefix": s3prefix,
+        "deliminator": "/",
+        "bucket": bucket,
+    }
+    s3keys = await getStorKeys(app, **kwargs)
+    log.debug(f"getFolderDomains - getStorKeys returned: {len(s3keys)} keys")
+
+    domain_names = []
+    for s3key in s3keys:
+        if s3key[-1] != "/":
+            log.debug(f"getFolderDomains - ignoring key: {s3key}")
+            continue
+        if folder_path == "/" and s3key == "db":
+            log.debug("getFolderDomains - ignoring db key at top level")
+        if len(s3key) > 1 and s3key[-2] == "/":
+            # trim off double slash
+            s3key = s3key[:-1]
+        domain_names.append("/" + s3key[:-1])
+    domain_names.sort()
+
+    if folder_cache is not None:
+        folder_cache[folder_cache_key] = {"domains": domain_names}
+    return domain_names
+
+
+def updateFolderCache(app, domain, deleted=False):
+    """ add (or remove if deleted is set) the given domain in the cached
+    listing of its parent folder, if there is one """
+    folder_cache = app.get("folder_cache")
+    if folder_cache is None:
+        return
+    parent_domain = getParentDomain(domain)
+    if not parent_domain:
+        return
+    bucket = getBucketForDomain(domain)
+    if not bucket:
+        bucket = app.get("bucket_name")
+    folder_cache_key = _getFolderCacheKey(bucket, getPathForDomain(parent_domain))
+    if folder_cache_key not in folder_cache:
+        return
+    domain_path = getPathForDomain(domain)
+    if len(domain_path) > 1 and domain_path.endswith("/"):
+        domain_path = domain_path[:-1]
+    domain_names = folder_cache[folder_cache_key]["domains"]
+    index = bisect.bisect_left(domain_names, domain_path)
+    found = index < len(domain_names) and domain_names[index] == domain_path
+    if deleted == found:
+        # replace the list rather than updating in place so that the
+        # cache memory size is updated
+        domain_names = list(domain_names)
+        if deleted:
+            del domain_names[index]
+        else:
+            domain_names.insert(index, domain_path)
+        folder_cache[folder_cache_key] = {"domains": domain_names}
+        log.debug(f"updateFolderCache - updated {folder_cache_key} for {domain_path}")
 
 
 async def getObjectJson(app,
@@ -296,6 +473,8 @@ async def getObjectJson(app,
         # links and attributes are subject to change, so always refresh
         refresh = True
     log.info(f"getObjectJson {obj_id}")
+    if not refresh and obj_id not in meta_cache:
+        meta_cache.countMiss()
     if obj_id in meta_cache and not refresh:
         log.debug(f"found {obj_id} in meta_cache")
         obj_json = meta_cache[obj_id]
@@ -309,6 +488,8 @@ async def getObjectJson(app,
                 log.warn(f"key: {s3_key} not found")
                 raise HTTPNotFound()
             obj_json = await getStorJSONObj(app, s3_key)
+            if "shards" in obj_json:
+                await readShards(app, obj_id, obj_json)
         except ValueError as ve:
             log.error(f"Got ValueError exception: {ve}")
             raise HTTPInternalServerError()
@@ -327,9 +508,20 @@ async def getObjectJson(app,
         if bucket:
             params["bucket"] = bucket
         req += "/" + collection + "/" + obj_id
+        headers = None
+        cached_json = None
+        if collection == "datasets" and not include_attrs and obj_id in meta_cache:
+            # revalidate the cached copy rather than fetching the json again
+            cached_json = meta_cache[obj_id]
+            etag = getETag(cached_json)
+            if etag:
+                headers = {"If-None-Match": etag}
         log.debug(f"getObjectJson - fetching {obj_id} from {req}")
         # throws 404 if doesn't exist
-        obj_json = await http_get(app, req, params=params)
+        obj_json = await http_get(app, req, params=params, headers=headers)
+        if obj_json is None and cached_json is not None:
+            log.debug(f"getObjectJson - cached json for {obj_id} is current")
+            obj_json = cached_json
 
     if obj_json is None:
         msg = f"Object: {obj_id} not found, req: {req}, params: {params}"
@@ -359,8 +551,10 @@ async def getDsetJson(app, dset_id,
     kwargs["refresh"] = refresh
     kwargs["include_links"] = include_links
     kwargs["include_attrs"] = include_attrs
+    # if the json isn't cached, it will be fetched from the DN
+    cached = dset_id in app["meta_cache"]
     dset_json = await getObjectJson(app, dset_id, **kwargs)
-    if refresh:
+    if refresh or not cached:
         # can just return the json
         return dset_json
 
@@ -436,6 +630,48 @@ async def getLink(app, group_id, title, bucket=None):
     return link_json
 
 
+def _getLinkCacheKey(group_id, title):
+    """ key for link_cache lookups """
+    return f"{group_id}|{title}"
+
+
+def invalidateLinkCache(app, group_id, titles=None):
+    """ remove cached links for the given group.  If titles is None,
+    all links of the group are removed """
+    link_cache = app.get("link_cache")
+    if link_cache is None:
+        return
+    if titles is None:
+        prefix = f"{group_id}|"
+        keys = [key for key in link_cache if key.startswith(prefix)]
+    else:
+        keys = [_getLinkCacheKey(group_id, title) for title in titles]
+        keys = [key for key in keys if key in link_cache]
+    for key in keys:
+        del link_cache[key]
+    if keys:
+        log.debug(f"removed {len(keys)} link_cache entries for group: {group_id}")
+
+
+async def getCachedLink(app, group_id, title, bucket=None, refresh=False):
+    """ Get the link json for the given title, using the link_cache
+    if available """
+
+    link_cache = app.get("link_cache")
+    if link_cache is None:
+        return await getLink(app, group_id, title, bucket=bucket)
+
+    link_cache_key = _getLinkCacheKey(group_id, title)
+    if not refresh and link_cache_key in link_cache:
+        log.debug(f"getCachedLink - {title} of {group_id} found in link_cache")
+        return copy(link_cache[link_cache_key])
+
+    link_cache.countMiss()
+    link_json = await getLink(app, group_id, title, bucket=bucket)
+    link_cache[link_cache_key] = copy(link_json)
+    return link_json
+
+
 async def putLink(app, group_id, title, tgt_id=None, h5path=None, h5domain=None, bucket=None):
     """ create a new link.  Return 201 if this is a new link,
     or 200 if it's a duplicate of an existing link. """
@@ -485,6 +721,7 @@ async def putLink(app, group_id, title, tgt_id=None, h5path=None, h5domain=None,
     data = {"links": {title: link_json}}
 
     put_rsp = await http_put(app, req, data=data, params=params)
+    invalidateLinkCache(app, group_id, titles=[title, ])
     log.debug(f"PUT Link resp: {put_rsp}")
     if "status" in put_rsp:
         status = put_rsp["status"]
@@ -562,6 +799,7 @@ async def putLinks(app, group_id, items, bucket=None):
     data = {"links": items}
 
     put_rsp = await http_put(app, req, data=data, params=params)
+    invalidateLinkCache(app, group_id, titles=list(items.keys()))
     log.debug(f"PUT Link resp: {put_rsp}")
     if "status" in put_rsp:
         status = put_rsp["status"]
@@ -588,6 +826,7 @@ async def deleteLinks(app, group_id, titles=None, separator="/", bucket=None):
     params["titles"] = titles_param
     log.debug(f"using params: {params}")
     await http_delete(app, req, params=params)
+    invalidateLinkCache(app, group_id, titles=titles)
 
 
 async def getObjectIdByPath(app, obj_id, h5path, bucket=None, refresh=False, domain=None,
@@ -628,7 +867,7 @@ async def getObjectIdByPath(app, obj_id, h5path, bucket=None, refresh=False, dom
         if not link:
             continue  # skip empty link
 
-        link_json = await getLink(app, obj_id, link, bucket=bucket)
+        link_json = await getCachedLink(app, obj_id, link, bucket=bucket, refresh=refresh)
 
         if link_json["class"] == "H5L_TYPE_EXTERNAL":
             if not follow_external_links:
@@ -963,6 +1202,112 @@ async def getAttributes(app, obj_id,
     return attributes
 
 
+async def _postObjectBatch(app, obj_ids, path, key, params):
+    """ post the obj_ids to the DN batch request at path, with one request
+    for each DN.  Return a dict of obj_id to the result for that object,
+    which is a {"status": <code>} json for objects that couldn't be read.
+    Objects are left out if the request to their DN failed. """
+    node_ids = {}
+    for obj_id in obj_ids:
+        node_url = getDataNodeUrl(app, obj_id)
+        if node_url not in node_ids:
+            node_ids[node_url] = []
+        node_ids[node_url].append(obj_id)
+    log.debug(f"batch request {path} for {len(obj_ids)} objects on {len(node_ids)} nodes")
+
+    node_urls = list(node_ids.keys())
+    tasks = []
+    for node_url in node_urls:
+        data = {"obj_ids": node_ids[node_url]}
+        tasks.append(http_post(app, node_url + path, data=data, params=params))
+    rsps = await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = {}
+    for node_url, rsp in zip(node_urls, rsps):
+        if isinstance(rsp, HTTPException):
+            log.warn(f"batch request {path} to {node_url} failed, status: {rsp.status_code}")
+        elif isinstance(rsp, Exception):
+            log.error(f"batch request {path} to {node_url} - unexpected exception: {rsp}")
+        elif not isinstance(rsp, dict) or key not in rsp:
+            log.error(f"batch request {path} to {node_url} - unexpected response")
+        else:
+            dn_results = rsp[key]
+            for obj_id in node_ids[node_url]:
+                if obj_id in dn_results:
+                    results[obj_id] = dn_results[obj_id]
+    return results
+
+
+async def getMultiObjectJson(app, obj_ids, bucket=None, include_links=False, include_attrs=False):
+    """ Return a dict of obj_id to the json for each object, as getObjectJson
+    would with refresh set.  Objects that couldn't be read map to a
+    {"status": <code>} json.  Each DN gets one request for its objects,
+    and objects are left out if that request failed. """
+    params = {"bucket": bucket}
+    if include_links:
+        params["include_links"] = 1
+    if include_attrs:
+        params["include_attrs"] = 1
+    results = await _postObjectBatch(app, obj_ids, "/objects", "objects", params)
+
+    meta_cache = app["meta_cache"]
+    for obj_id in results:
+        obj_json = results[obj_id]
+        if "status" in obj_json:
+            continue
+        # store object in meta_cache without links or attributes as getObjectJson does
+        cache_obj = {}
+        for k in obj_json:
+            if k in ("links", "attributes"):
+                continue
+            cache_obj[k] = obj_json[k]
+        meta_cache[obj_id] = cache_obj
+    return results
+
+
+async def getMultiAttributes(app, obj_ids,
+                             include_data=False,
+                             max_data_size=0,
+                             ignore_nan=False,
+                             create_order=False,
+                             pattern=None,
+                             encoding=None,
+                             limit=0,
+                             bucket=None
+                             ):
+    """ Return a dict of obj_id to the list of all attributes for each object
+    (as with getAttributes with no attr_names), or a {"status": <code>} json """
+    params = {"bucket": bucket}
+    if include_data:
+        params["IncludeData"] = 1
+    if ignore_nan:
+        params["ignore_nan"] = 1
+    if create_order:
+        params["CreateOrder"] = 1
+    if encoding:
+        params["encoding"] = encoding
+    if max_data_size > 0:
+        params["max_data_size"] = max_data_size
+    if limit:
+        params["Limit"] = limit
+    if pattern:
+        params["pattern"] = pattern
+    return await _postObjectBatch(app, obj_ids, "/objects/attributes", "attributes", params)
+
+
+async def getMultiLinks(app, group_ids, create_order=False, limit=None, pattern=None, bucket=None):
+    """ Return a dict of group_id to the list of all links for each group
+    (as with getLinks with no titles), or a {"status": <code>} json """
+    params = {"bucket": bucket}
+    if create_order:
+        params["CreateOrder"] = 1
+    if limit is not None:
+        params["Limit"] = str(limit)
+    if pattern is not None:
+        params["pattern"] = pattern
+    return await _postObjectBatch(app, group_ids, "/objects/links", "links", params)
+
+
 async def putAttributes(app,
                         obj_id,
                         attr_json=None,
@@ -1043,6 +1388,8 @@ async def deleteObject(app, obj_id, bucket=None):
     meta_cache = app["meta_cache"]
     if obj_id in meta_cache:
         del meta_cache[obj_id]  # remove from cache
+    if getCollectionForId(obj_id) == "groups":
+        invalidateLinkCache(app, obj_id)
 
 
 async def createObject(app,
@@ -1051,13 +1398,15 @@ async def createObject(app,
                        obj_shape=None,
                        layout=None,
                        creation_props=None,
-                       bucket=None):
+                       bucket=None,
+                       obj_id=None):
     """ create a group, ctype, or dataset object and return object json
         Determination on whether a group, ctype, or dataset is created is based on:
             1) if obj_type and obj_shape are set, a dataset object will be created
             2) if obj_type is set but not obj_shape, a  datatype object will be created
             3) otherwise (type and shape are both None), a group object will be created
-        The layout parameter only applies to dataset creation
+        The layout parameter only applies to dataset creation.
+        If obj_id is not set, a new id will be created
     """
     if obj_type and obj_shape:
         collection = "datasets"
@@ -1075,7 +1424,8 @@ async def createObject(app,
     if creation_props:
         log.debug(f"    cprops: {creation_props}")
 
-    obj_id = createObjId(collection, rootid=root_id)
+    if not obj_id:
+        obj_id = createObjId(collection, rootid=root_id)
     log.info(f"new obj id: {obj_id}")
     obj_json = {"id": obj_id, "root": root_id}
     if obj_type:
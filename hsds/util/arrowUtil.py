@@ -0,0 +1,139 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+#
+# arrowUtil:
+# Encode numpy arrays as Apache Arrow IPC streams.  Each field of a compound
+# type becomes a column (a single "value" column is used for other types),
+# and multi-dimensional selections are flattened in row-major order.
+# Requires the optional pyarrow package.
+#
+import math
+
+import numpy as np
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+
+# end of stream marker: continuation token followed by a zero length
+_ARROW_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+def isArrowAvailable():
+    """ return True if the pyarrow package is installed """
+    return pyarrow is not None
+
+
+def getArrowType(dt):
+    """ return the arrow type for the given numpy type """
+    if dt.names:
+        fields = [pyarrow.field(name, getArrowType(dt[name])) for name in dt.names]
+        return pyarrow.struct(fields)
+    if dt.subdtype is not None:
+        base_dt, shape = dt.subdtype
+        return pyarrow.list_(getArrowType(base_dt), math.prod(shape))
+    if dt.kind == "O":
+        vlen = dt.metadata.get("vlen") if dt.metadata else None
+        if vlen in (str, bytes):
+            # HSDS returns vlen ascii strings as str as well
+            return pyarrow.string()
+        if isinstance(vlen, np.dtype):
+            return pyarrow.list_(getArrowType(vlen))
+        raise TypeError(f"unable to convert type: {dt} to arrow")
+    if dt.kind == "S":
+        return pyarrow.binary()
+    if dt.kind == "V":
+        return pyarrow.binary(dt.itemsize)
+    return pyarrow.from_numpy_dtype(dt)
+
+
+def _toArrowArray(arr, dt):
+    """ return an arrow array for the one-dimensional array arr """
+    arrow_type = getArrowType(dt)
+    if dt.names:
+        children = [_toArrowArray(arr[name], dt[name]) for name in dt.names]
+        return pyarrow.StructArray.from_arrays(children, fields=list(arrow_type))
+    if dt.subdtype is not None:
+        base_dt, shape = dt.subdtype
+        values = _toArrowArray(arr.reshape((arr.size,)), base_dt)
+        return pyarrow.FixedSizeListArray.from_arrays(values, math.prod(shape))
+    if dt.kind == "V":
+        data = pyarrow.py_buffer(np.ascontiguousarray(arr).view(np.uint8))
+        return pyarrow.FixedSizeBinaryArray.from_buffers(arrow_type, len(arr), [None, data])
+    if dt.kind == "O":
+        vlen = dt.metadata["vlen"]
+        if vlen is bytes:
+            values = [v.decode("utf-8") if isinstance(v, bytes) else v for v in arr]
+            return pyarrow.array(values, type=arrow_type)
+    # for contiguous numeric arrays this doesn't copy the data
+    return pyarrow.array(arr, type=arrow_type)
+
+
+def getArrowSchema(dt):
+    """ return the arrow schema for arrays of the given numpy type """
+    if dt.names:
+        fields = [pyarrow.field(name, getArrowType(dt[name])) for name in dt.names]
+    else:
+        fields = [pyarrow.field("value", getArrowType(dt))]
+    return pyarrow.schema(fields)
+
+
+def arrayToRecordBatch(arr):
+    """ return an arrow record batch for the numpy array """
+    arr = arr.reshape((arr.size,))
+    dt = arr.dtype
+    if dt.names:
+        columns = [_toArrowArray(arr[name], dt[name]) for name in dt.names]
+    else:
+        columns = [_toArrowArray(arr, dt)]
+    return pyarrow.RecordBatch.from_arrays(columns, schema=getArrowSchema(dt))
+
+
+class ArrowStreamEncoder(object):
+    """ Encodes arrays of the given type as the record batches of an arrow
+    IPC stream, so that a response can be written a page at a time """
+
+    def __init__(self, dt):
+        if not isArrowAvailable():
+            raise ImportError("pyarrow is not installed")
+        self._dt = dt
+        # raises TypeError if the type can't be converted
+        self._schema = getArrowSchema(dt)
+        self._schema_written = False
+
+    def _getSchemaBytes(self):
+        if self._schema_written:
+            return b""
+        self._schema_written = True
+        return self._schema.serialize().to_pybytes()
+
+    def encode(self, arr):
+        """ return the bytes for a record batch with the array values,
+        preceded by the stream schema for the first batch """
+        if arr.dtype != self._dt:
+            raise TypeError(f"expected array type: {self._dt} but got: {arr.dtype}")
+        data = self._getSchemaBytes()
+        batch = arrayToRecordBatch(arr)
+        return data + batch.serialize().to_pybytes()
+
+    def close(self):
+        """ return the bytes that end the stream """
+        return self._getSchemaBytes() + _ARROW_EOS
+
+
+def arrayToArrowStream(arr):
+    """ return an arrow IPC stream with the array values as bytes """
+    encoder = ArrowStreamEncoder(arr.dtype)
+    return encoder.encode(arr) + encoder.close()
@@ -31,6 +31,10 @@ GROUP_PREFIX = "g:"
 # keys used for each ACL
 ACL_KEYS = ("create", "read", "update", "delete", "readACL", "updateACL")
 
+# how often (in seconds) to remove expired entries from the token cache
+TOKEN_SWEEP_INTERVAL = 60.0
+_token_sweep_time = 0.0
+
 
 def getDynamoDBClient(app):
     """Return dynamodb handle"""
@@ -217,6 +221,8 @@ def initUserDB(app):
             user_db = loadPasswordFile(password_file)
 
     app["user_db"] = user_db
+    # bearer token -> (username, expiration) for validated tokens
+    app["token_cache"] = {}
 
     log.info(f"user_db initialized: {len(user_db)} users")
 
@@ -357,46 +363,53 @@ async def validateUserPassword(app, username, password):
 
 
 def _checkTokenCache(app, token):
-    # iterate through use_db and return username if this token if found
+    # return username if this token has been validated previously
     # (and it is still valid)
-    # TBD: create reverse lookup table for efficiency
-    if "user_db" not in app:
+    if "token_cache" not in app:
         return None
-    user_db = app["user_db"]
-    expired_ids = set()  # might as well clean up any expired tokens we find
-    user_id = None
-    for username in user_db:
-        user = user_db[username]
-        if "scheme" not in user or user["scheme"] != "bearer":
-            continue
-        if "exp" not in user:
-            msg = "expected to find key: 'exp' in user data "
-            msg += f" for user: {username}"
-            log.warn(msg)
-            continue
-        exp = user["exp"]
-        if "pwd" not in user:
-            msg = "expected to find key: 'pwd' in user data "
-            msg += f"for user: {username}"
-            log.warn(msg)
-            continue
-        if "pwd" not in user or user["pwd"] != token:
-            continue
-        pwd = user["pwd"]
-
-        if time.time() < exp:
-            # still valid!
-            if pwd == token:
-                log.info(f"returning user: {username} from bearer cache")
-                user_id = username
-        else:
-            # add to the expired set
-            expired_ids.add(username)
-    for username in expired_ids:
-        log.debug(f"removing expired token userdb for user: {username}")
-        del user_db[username]
-
-    return user_id
+    token_cache = app["token_cache"]
+    now = time.time()
+    _sweepTokenCache(app, now)
+    if token not in token_cache:
+        return None
+    username, exp = token_cache[token]
+    if now >= exp:
+        log.debug(f"removing expired token for user: {username}")
+        del token_cache[token]
+        return None
+    log.info(f"returning user: {username} from bearer cache")
+    user_data = getPassword(app, username) if "user_db" in app else None
+    if user_data is None or user_data["pwd"] != token:
+        # user may have more than one active token, make this one current
+        # so that validateUserPassword will succeed
+        setPassword(app, username, token, scheme="bearer", exp=exp)
+    return username
+
+
+def _setTokenCache(app, token, username, exp=None):
+    # save token to username mapping
+    if not exp:
+        expiration = float(config.get("auth_expiration"))
+        if expiration <= 0:
+            return  # don't cache tokens without an expiration
+        exp = time.time() + expiration
+    if "token_cache" not in app:
+        app["token_cache"] = {}
+    app["token_cache"][token] = (username, exp)
+
+
+def _sweepTokenCache(app, now):
+    # remove expired tokens, at most once a minute
+    global _token_sweep_time
+    if now - _token_sweep_time < TOKEN_SWEEP_INTERVAL:
+        return
+    _token_sweep_time = now
+    token_cache = app["token_cache"]
+    expired = [token for token in token_cache if token_cache[token][1] <= now]
+    for token in expired:
+        del token_cache[token]
+    if expired:
+        log.debug(f"removed {len(expired)} expired tokens from token cache")
 
 
 def loadGroupsFile(group_file):
@@ -487,7 +500,7 @@ def initGroupDB(app):
     log.info(f"group_db initialized: {len(group_user_db)} groups")
 
 
-def getUserPasswordFromRequest(request):
+async def getUserPasswordFromRequest(request):
     """Return user defined in Auth header (if any)"""
     user = None
     pswd = None
@@ -536,7 +549,7 @@ def getUserPasswordFromRequest(request):
             # put import here to avoid jwt package dependency unless required
             from .jwtUtil import verifyBearerToken
 
-            user, exp, roles = verifyBearerToken(app, token)
+            user, exp, roles = await verifyBearerToken(app, token)
             if exp:
                 msg = f"decoded bearer token for user: {user}, expired: {exp}"
                 # log.info(msg)
@@ -547,6 +560,7 @@ def getUserPasswordFromRequest(request):
                 setPassword(app, user, token, scheme="bearer")
             if user:
                 pswd = token
+                _setTokenCache(app, token, user, exp=exp)
             if roles:
                 if user not in user_group_db:
                     user_group_db[user] = set()
@@ -371,6 +371,36 @@ def getChunkId(dset_id, point, layout):
     return chunk_id
 
 
+def groupPointsByChunk(dset_id, points, layout):
+    """Return a dict mapping chunk ids to the (ascending) indices of the
+    points that fall in that chunk.  points is either a one-dimensional
+    array of coordinates (for rank 1 datasets) or an array of shape
+    (num_points, rank).
+    """
+    rank = len(layout)
+    points = np.asarray(points, dtype=np.uint64)
+    points = points.reshape((len(points), rank))
+    chunk_indices = points // np.asarray(layout, dtype=np.uint64)
+
+    # unique rows are returned in sorted order, inverse maps each point
+    # to its row
+    kwargs = {"axis": 0, "return_inverse": True}
+    unique_indices, inverse = np.unique(chunk_indices, **kwargs)
+    inverse = inverse.reshape(-1)
+    # stable sort keeps the points of each chunk in request order
+    order = np.argsort(inverse, kind="stable")
+    counts = np.bincount(inverse, minlength=len(unique_indices))
+    groups = np.split(order, np.cumsum(counts)[:-1])
+
+    prefix = "c-" + dset_id[2:] + "_"
+    chunk_map = {}
+    for chunk_index, group in zip(unique_indices, groups):
+        chunk_id = prefix + "_".join(str(int(x)) for x in chunk_index)
+        chunk_map[chunk_id] = group
+    log.debug(f"groupPointsByChunk - {len(points)} points in {len(chunk_map)} chunks")
+    return chunk_map
+
+
 def getDatasetId(chunk_id):
     """Get dataset id given a chunk id"""
     n = chunk_id.find("-") + 1
@@ -1044,20 +1074,19 @@ def chunkReadPoints(chunk_id=None,
 
     chunk_coord = getChunkCoordinate(chunk_id, chunk_layout)
 
-    for i in range(num_points):
-        # TBD: there's likely a better way to do this that
-        # doesn't require iterating through each point...
-        point = point_arr[i, :]
-        tr_point = getChunkRelativePoint(chunk_coord, point)
-        val = chunk_arr[tuple(tr_point)]
-        if len(select_dt) < len(dset_dtype):
-            # just update the relevant fields
-            subfield_val = []
-            for (x, field) in zip(val, dset_dtype.names):
-                if field in select_dt.names:
-                    subfield_val.append(x)
-            val = tuple(subfield_val)
-        output_arr[i] = val
+    # chunk-relative coordinates for all points
+    tr_points = point_arr.astype(np.int64) - np.asarray(chunk_coord, dtype=np.int64)
+    if num_points > 0 and tr_points.min() < 0:
+        # negative indices would wrap around rather than raise
+        msg = "unexpected point index"
+        raise IndexError(msg)
+    vals = chunk_arr[tuple(tr_points.T)]
+    if len(select_dt) < len(dset_dtype):
+        # just copy the relevant fields
+        for field in select_dt.names:
+            output_arr[field] = vals[field]
+    else:
+        output_arr[...] = vals
     return output_arr
 
 
@@ -1112,40 +1141,29 @@ def chunkWritePoints(chunk_id=None,
             raise ValueError(msg)
 
     num_points = len(point_arr)
+    log.debug(f"chunkWritePoints - {num_points} points")
 
     chunk_coord = getChunkCoordinate(chunk_id, chunk_layout)
 
-    for i in range(num_points):
-        elem = point_arr[i]
-        log.debug(f"non-relative coordinate: {elem}")
-        if rank == 1:
-            coord = int(elem[0])
-            coord = coord - chunk_coord[0]  # adjust to chunk relative
-            if coord < 0 or coord >= dims[0]:
-                msg = f"chunkWritePoints - invalid index: {int(elem[0])}"
-                log.warn(msg)
-                raise IndexError(msg)
-        else:
-            coord = elem[0]  # index to update
-            for dim in range(rank):
-                # adjust to chunk relative
-                coord[dim] = int(coord[dim]) - chunk_coord[dim]
-            coord = tuple(coord)  # need to convert to a tuple
-        log.debug(f"relative coordinate: {coord}")
-
-        val = elem[1]  # value
-        if len(select_dt) < len(dset_dtype):
-            # get the element from the chunk
-            chunk_val = list(chunk_arr[coord])
-            # and just update the relevant fields
-            index = 0
-            for (x, field) in zip(val, dset_dtype.names):
-                if field in select_dt.names:
-                    chunk_val[index] = x
-                index += 1
-            val = tuple(chunk_val)  # this will get written back
-
-        chunk_arr[coord] = val  # update the point
+    # adjust to chunk relative
+    coords = point_arr[comp_dtype.names[0]].astype(np.int64)
+    coords = coords.reshape((num_points, rank))
+    coords -= np.asarray(chunk_coord, dtype=np.int64)
+    invalid = np.logical_or(coords < 0, coords >= np.asarray(dims)).any(axis=1)
+    if invalid.any():
+        elem = point_arr[np.argmax(invalid)]
+        msg = f"chunkWritePoints - invalid index: {elem[0]}"
+        log.warn(msg)
+        raise IndexError(msg)
+    coords = tuple(coords.T)
+
+    vals = point_arr[comp_dtype.names[1]]
+    if len(select_dt) < len(dset_dtype):
+        # just update the relevant fields
+        for field in select_dt.names:
+            chunk_arr[field][coords] = vals[field]
+    else:
+        chunk_arr[coords] = vals  # update the points
 
 
 def _getWhereFieldName(query):
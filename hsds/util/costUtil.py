@@ -0,0 +1,86 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+#
+# costUtil:
+# per-request cost accounting
+#
+# Handlers call startRequestCost to begin counting for the current request.
+# Since asyncio tasks copy the context they are created in, the counters are
+# shared with any tasks (e.g. ChunkCrawler workers) the handler starts.
+# DNs return their counts to the SN as X-HSDS-* response headers.
+#
+from contextvars import ContextVar
+
+# counter name -> response header
+COST_HEADERS = {
+    "chunks": "X-HSDS-Chunks",
+    "dn_requests": "X-HSDS-DN-Requests",
+    "retries": "X-HSDS-Retries",
+    "cache_hits": "X-HSDS-Cache-Hits",
+    "cache_misses": "X-HSDS-Cache-Misses",
+    "storage_gets": "X-HSDS-Storage-Gets",
+    "storage_bytes": "X-HSDS-Storage-Bytes",
+}
+
+_request_cost = ContextVar("hsds_request_cost", default=None)
+
+
+def startRequestCost():
+    """ start counting costs for the current request and return
+    the counter dict """
+    cost = {}
+    for key in COST_HEADERS:
+        cost[key] = 0
+    _request_cost.set(cost)
+    return cost
+
+
+def getRequestCost():
+    """ return the cost dict for the current request or None """
+    return _request_cost.get()
+
+
+def addRequestCost(key, count=1):
+    """ increment the given counter if costs are being collected """
+    cost = _request_cost.get()
+    if cost is None:
+        return
+    cost[key] += count
+
+
+def updateRequestCost(headers):
+    """ add the counts reported in the X-HSDS-* headers of a
+    response to the current request's costs """
+    cost = _request_cost.get()
+    if cost is None or not headers:
+        return
+    for key in COST_HEADERS:
+        header = COST_HEADERS[key]
+        if header not in headers:
+            continue
+        try:
+            cost[key] += int(headers[header])
+        except ValueError:
+            pass  # ignore malformed values
+
+
+def getRequestCostHeaders(cost=None):
+    """ return a dict of X-HSDS-* headers for any non-zero counts """
+    if cost is None:
+        cost = _request_cost.get()
+    headers = {}
+    if not cost:
+        return headers
+    for key in COST_HEADERS:
+        if cost.get(key):
+            headers[COST_HEADERS[key]] = str(cost[key])
+    return headers
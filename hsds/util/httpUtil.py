@@ -17,8 +17,7 @@ from asyncio import CancelledError, TimeoutError
 import os
 import socket
 import numpy as np
-from aiohttp.web import json_response
-import simplejson
+from aiohttp.web import json_response, StreamResponse
 from aiohttp import ClientSession, UnixConnector, TCPConnector
 from aiohttp.web_exceptions import HTTPForbidden, HTTPNotFound, HTTPConflict
 from aiohttp.web_exceptions import HTTPGone, HTTPInternalServerError
@@ -26,10 +25,16 @@ from aiohttp.web_exceptions import HTTPRequestEntityTooLarge
 from aiohttp.web_exceptions import HTTPServiceUnavailable, HTTPBadRequest
 from aiohttp.client_exceptions import ClientError
 from hsds.util.idUtil import isValidUuid
+from .traceUtil import getTraceHeaders
+from .costUtil import addRequestCost, updateRequestCost
+from .arrowUtil import ARROW_STREAM_TYPE, isArrowAvailable
+from .jsonUtil import dumpJson
 
 from .. import hsds_logger as log
 from .. import config
 
+NDJSON_TYPE = "application/x-ndjson"
+
 
 def isOK(http_response):
     """return True for successful http_status codes"""
@@ -280,9 +285,21 @@ async def request_read(request, count=None) -> bytes:
     return bytes(body)
 
 
-async def http_get(app, url, params=None, client=None):
+def getETag(obj_json):
+    """ return an entity tag for the given json object.  The tag is derived
+    from the object id and lastModified time, so SN and DN nodes compute the
+    same value without serializing the object.  Returns None if the json
+    doesn't have a lastModified time """
+    if "id" not in obj_json or "lastModified" not in obj_json:
+        return None
+    return f'"{obj_json["id"]}-{obj_json["lastModified"]}"'
+
+
+async def http_get(app, url, params=None, headers=None, client=None):
     """
     Helper function  - async HTTP GET
+    Returns None if an If-None-Match header was given and the
+    server responds with 304 (Not Modified)
     """
     log.info(f"http_get('{url}')")
     if client is None:
@@ -290,10 +307,19 @@ async def http_get(app, url, params=None, client=None):
     url = get_http_std_url(url)
     status_code = None
     timeout = config.get("timeout")
+    kwargs = {"params": params, "timeout": timeout}
+    trace_headers = getTraceHeaders()
+    if trace_headers:
+        headers = dict(headers) if headers else {}
+        headers.update(trace_headers)
+    if headers:
+        kwargs["headers"] = headers
     # TBD: use read_bufsize parameter to optimize read for large responses
     try:
-        async with client.get(url, params=params, timeout=timeout) as rsp:
+        async with client.get(url, **kwargs) as rsp:
             log.info(f"http_get status: {rsp.status} for req: {url}")
+            addRequestCost("dn_requests")
+            updateRequestCost(rsp.headers)
             status_code = rsp.status
             if rsp.status == 200:
                 # 200, so read the response
@@ -302,6 +328,9 @@ async def http_get(app, url, params=None, client=None):
                     retval = await rsp.read()  # read response as bytes
                 else:
                     retval = await rsp.json()
+            elif status_code == 304:
+                log.debug(f"http_get - not modified: {url}")
+                retval = None
             elif status_code == 400:
                 log.warn(f"BadRequest to {url}")
                 raise HTTPBadRequest(reason="Bad Request")
@@ -364,12 +393,17 @@ async def http_post(app, url, data=None, params=None, client=None):
     timeout = config.get("timeout")
     if timeout:
         kwargs["timeout"] = timeout
+    headers = getTraceHeaders()
+    if headers:
+        kwargs["headers"] = headers
     if params:
         kwargs["params"] = params
 
     try:
         async with client.post(url, **kwargs) as rsp:
             logmsg(f"http_post status: {rsp.status}")
+            addRequestCost("dn_requests")
+            updateRequestCost(rsp.headers)
             if rsp.status == 200:
                 pass  # ok
             elif rsp.status == 201:
@@ -439,10 +473,15 @@ async def http_put(app, url, data=None, params=None, client=None):
     timeout = config.get("timeout")
     if timeout:
         kwargs["timeout"] = timeout
+    headers = getTraceHeaders()
+    if headers:
+        kwargs["headers"] = headers
 
     try:
         async with client.put(url, **kwargs) as rsp:
             log.info(f"http_put status: {rsp.status}")
+            addRequestCost("dn_requests")
+            updateRequestCost(rsp.headers)
             if rsp.status in (200, 201):
                 pass  # expected
             elif rsp.status == 400:
@@ -499,12 +538,16 @@ async def http_delete(app, url, data=None, params=None, client=None):
     timeout = config.get("timeout")
     if timeout:
         kwargs["timeout"] = timeout
+    headers = getTraceHeaders()
+    if headers:
+        kwargs["headers"] = headers
     if params:
         kwargs["params"] = params
 
     try:
         async with client.delete(url, **kwargs) as rsp:
             log.info(f"http_delete status: {rsp.status}")
+            addRequestCost("dn_requests")
             if rsp.status == 200:
                 pass  # expected
             elif rsp.status == 404:
@@ -544,7 +587,7 @@ async def jsonResponse(resp, data, status=200, ignore_nan=False, body_only=False
     # tbd - remove resp parameter - not used
 
     try:
-        text = simplejson.dumps(data, ignore_nan=ignore_nan, allow_nan=True)
+        text = dumpJson(data, ignore_nan=ignore_nan)
     except ValueError as ve:
         # this exception started to get raised around 04/12/2023
         # "out of range float values" when nan is eturned and ignore_nan is False
@@ -562,6 +605,44 @@ async def jsonResponse(resp, data, status=200, ignore_nan=False, body_only=False
         return json_response(text=text, headers=headers, status=status)
 
 
+async def ndjsonResponse(request, items, first=None, ignore_nan=False):
+    """
+    Helper function, write a newline delimited JSON response with a
+    {key: value} line for each (key, value) tuple from the async iterator
+    items.  If first is set, it is written as the first line.  Each line
+    is written as the item is returned, so the iterator is only advanced
+    as fast as the client reads the response.
+    """
+    resp = StreamResponse()
+    resp.headers["Content-Type"] = NDJSON_TYPE
+    server_name = config.get("server_name")
+    if server_name:
+        resp.headers["Server"] = server_name
+    xss_protection = config.get("xss_protection", default="1; mode=block")
+    if xss_protection:
+        resp.headers["X-XSS-Protection"] = xss_protection
+    if config.get("http_compression"):
+        log.debug("enabling http_compression")
+        resp.enable_compression()
+    await resp.prepare(request)
+    if first is not None:
+        text = dumpJson(first, ignore_nan=ignore_nan) + "\n"
+        await resp.write(text.encode("utf-8"))
+    line_count = 0
+    try:
+        async for key, value in items:
+            text = dumpJson({key: value}, ignore_nan=ignore_nan) + "\n"
+            await resp.write(text.encode("utf-8"))
+            line_count += 1
+    finally:
+        # stop the iterator now if the write failed (e.g. client disconnect)
+        if hasattr(items, "aclose"):
+            await items.aclose()
+    log.debug(f"ndjsonResponse - wrote {line_count} lines")
+    await resp.write_eof()
+    return resp
+
+
 def respJsonAssemble(obj_json, params, id):
     """
     Populate response fields based on object type
@@ -675,21 +756,35 @@ def getHref(request, uri, query=None, domain=None):
     return href
 
 
+def isNdjsonRequest(request):
+    """
+    Return True if the accept header is newline delimited JSON.  Used by
+    requests that can stream a line for each object of a domain.
+    """
+    return request.headers.get("accept") == NDJSON_TYPE
+
+
 def getAcceptType(request):
     """
     Get requested content type.  Returns either "binary" if the accept
-    header is octet stream, otherwise json.
+    header is octet stream, "arrow" if the accept header is the arrow
+    stream type (and pyarrow is installed), otherwise json.
     Currently does not support q fields.
     """
     accept_type = "json"  # default to JSON
     if "accept" in request.headers:
         accept = request.headers["accept"]
-        # treat everything as json unless octet-stream is given
-        if accept != "application/octet-stream":
+        # treat everything as json unless octet-stream or arrow is given
+        if accept == "application/octet-stream":
+            accept_type = "binary"
+        elif accept == ARROW_STREAM_TYPE:
+            if isArrowAvailable():
+                accept_type = "arrow"
+            else:
+                log.warn("pyarrow is not installed, returning json for arrow request")
+        else:
             msg = f"Ignoring accept value: {accept}"
             log.debug(msg)
-        else:
-            accept_type = "binary"
     return accept_type
 
 
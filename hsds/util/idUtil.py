@@ -253,6 +253,9 @@ def getS3Key(id):
 
 def getObjId(s3key):
     """Return object id given valid s3key"""
+    if s3key.find("/.shards/") > 0:
+        # link or attribute shard of an object
+        raise ValueError(f"unexpected S3Key: {s3key}")
     if all(
         (
             len(s3key) >= 44 and s3key[0:5].isalnum(),
@@ -0,0 +1,145 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+#
+# jsonUtil:
+# JSON encoding for responses.  If the optional orjson package is installed
+# it is used to encode responses, including numeric numpy arrays without
+# converting them to lists first.  Otherwise (or for data orjson can't
+# encode the same way) simplejson is used.
+#
+import math
+
+import numpy as np
+import simplejson
+
+from .arrayUtil import bytesArrayToList
+from .. import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+else:
+    _ORJSON_OPTIONS = None
+
+
+def isFastJsonAvailable():
+    """ return True if orjson is installed and enabled by config """
+    if orjson is None:
+        return False
+    return config.get("fast_json", default=True)
+
+
+def _jsonDefault(obj):
+    """ convert numpy values for simplejson """
+    if isinstance(obj, np.ndarray):
+        return bytesArrayToList(obj.tolist())
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _hasNonFinite(data):
+    """ return True if data has any NaN or Infinity float values """
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, dict):
+        for value in data.values():
+            if _hasNonFinite(value):
+                return True
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            if _hasNonFinite(value):
+                return True
+    elif isinstance(data, np.ndarray):
+        if data.dtype.kind == "f":
+            return not np.isfinite(data).all()
+    elif isinstance(data, np.floating):
+        return not np.isfinite(data)
+    return False
+
+
+def toJsonValue(arr):
+    """ return the array in a form that can be passed to dumpJson.
+    Numeric arrays are returned as arrays when orjson is available,
+    otherwise a list is returned """
+    dt = arr.dtype
+    if isFastJsonAvailable() and dt.kind in ("b", "i", "u", "f") and dt.names is None:
+        if dt.kind == "f" and dt.itemsize < 8:
+            # write the same values as for float64 lists
+            arr = arr.astype(np.float64)
+        elif not dt.isnative:
+            # orjson assumes native byte order
+            arr = arr.astype(dt.newbyteorder("="))
+        return np.ascontiguousarray(arr)
+    return bytesArrayToList(arr.tolist())
+
+
+def dumpJson(data, ignore_nan=False):
+    """ return data as a JSON string.  NaN and Infinity values are written
+    as null if ignore_nan is set, otherwise as NaN and Infinity """
+    # orjson writes NaN and Infinity as null, so use simplejson if there
+    # are any and they should be kept
+    if isFastJsonAvailable() and (ignore_nan or not _hasNonFinite(data)):
+        try:
+            return orjson.dumps(data, option=_ORJSON_OPTIONS).decode("utf-8")
+        except (orjson.JSONEncodeError, TypeError):
+            # e.g. bytes values or integers larger than 64 bits
+            pass
+    return simplejson.dumps(data, ignore_nan=ignore_nan, allow_nan=True, default=_jsonDefault)
+
+
+class JsonArrayWriter(object):
+    """ Writes the JSON list for an array of the given shape a page at a time,
+    so that the list for the whole array is never held in memory.  Pages
+    must be consecutive selections along page_dim, and any dimension before
+    page_dim must have an extent of one.  If squeeze is set, dimensions with
+    an extent of one are left out as squeezeArray would """
+
+    def __init__(self, shape, page_dim, squeeze=False, ignore_nan=False):
+        shape = tuple(shape)
+        for extent in shape[:page_dim]:
+            if extent != 1:
+                raise ValueError("dimensions before page_dim must have extent one")
+        if squeeze and len(shape) > 1:
+            self._depth = 0  # the leading dimensions are squeezed
+            self._row_shape = tuple(extent for extent in shape[page_dim + 1:] if extent != 1)
+        else:
+            self._depth = page_dim
+            self._row_shape = shape[page_dim + 1:]
+        self._page_dim = page_dim
+        self._ignore_nan = ignore_nan
+        self._row_count = 0
+
+    def start(self):
+        """ return the text that starts the list """
+        return "[" * (self._depth + 1)
+
+    def encode(self, arr):
+        """ return the text for the rows of the page """
+        row_count = arr.shape[self._page_dim]
+        if row_count == 0:
+            return ""
+        rows = arr.reshape((row_count,) + self._row_shape)
+        text = dumpJson(toJsonValue(rows), ignore_nan=self._ignore_nan)
+        text = text[1:-1]  # strip the brackets of the page list
+        if self._row_count > 0:
+            text = "," + text
+        self._row_count += row_count
+        return text
+
+    def end(self):
+        """ return the text that ends the list """
+        return "]" * (self._depth + 1)
@@ -9,9 +9,11 @@
 # distribution tree.  If you do not have access to this file, you may        #
 # request a copy from help@hdfgroup.org.                                     #
 ##############################################################################
-import requests
+import asyncio
 import base64
-from aiohttp.web_exceptions import HTTPUnauthorized, HTTPForbidden
+import time
+from aiohttp import ClientError, ClientTimeout
+from aiohttp.web_exceptions import HTTPException, HTTPUnauthorized, HTTPForbidden
 from aiohttp.web_exceptions import HTTPNotFound, HTTPServiceUnavailable
 from aiohttp.web_exceptions import HTTPInternalServerError
 import jwt
@@ -21,6 +23,7 @@ from cryptography.x509 import load_pem_x509_certificate
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicNumbers
 
+from .httpUtil import get_http_client
 from .. import hsds_logger as log
 from .. import config
 
@@ -29,8 +32,144 @@ MSONLINE_OPENID_URL = (
 )
 GOOGLE_OPENID_URL = "https://accounts.google.com/.well-known/openid-configuration"
 
+# don't re-fetch the JWK set for an unknown key id more often than this
+MIN_KEY_REFRESH_INTERVAL = 60.0
 
-def verifyBearerToken(app, token):
+# cached openid configuration and JWK set responses, keyed by uri.
+# Each entry is a dict with "json", "fetch_time" and "public_keys" keys
+_openid_cache = {}
+# in-progress fetches, keyed by uri
+_pending_fetches = {}
+
+
+async def _fetchJson(app, uri):
+    """ fetch the given uri, update the cache and return the json response """
+    timeout = float(config.get("openid_fetch_timeout", default=2.0))
+    client = get_http_client(app)
+    rsp_json = None
+    log.info(f"fetching openid data from: {uri}")
+    try:
+        async with client.get(uri, timeout=ClientTimeout(total=timeout)) as rsp:
+            status_code = rsp.status
+            if status_code == 200:
+                rsp_json = await rsp.json(content_type=None)
+    except (ClientError, asyncio.TimeoutError, ValueError) as e:
+        msg = f"{e.__class__.__name__} error for getting openid data "
+        msg += f"from: {uri}"
+        log.warn(msg)
+        raise HTTPInternalServerError()
+
+    if status_code != 200:
+        log.warn(f"Bad response from {uri}: {status_code}")
+        if status_code == 404:
+            raise HTTPNotFound()
+        elif status_code == 401:
+            raise HTTPUnauthorized()
+        elif status_code == 403:
+            raise HTTPForbidden()
+        elif status_code == 503:
+            raise HTTPServiceUnavailable()
+        else:
+            raise HTTPInternalServerError()
+
+    entry = {"json": rsp_json, "fetch_time": time.time(), "public_keys": {}}
+    _openid_cache[uri] = entry
+    return entry
+
+
+def _startFetch(app, uri):
+    """ return task fetching the given uri, creating one if needed """
+    if uri in _pending_fetches:
+        return _pending_fetches[uri]
+
+    async def fetch():
+        try:
+            return await _fetchJson(app, uri)
+        finally:
+            del _pending_fetches[uri]
+
+    task = asyncio.create_task(fetch())
+    _pending_fetches[uri] = task
+    return task
+
+
+async def _refreshJson(app, uri):
+    """ background refresh of a stale cache entry """
+    try:
+        await _startFetch(app, uri)
+    except HTTPException as he:
+        # keep using the cached value
+        log.warn(f"unable to refresh openid data from {uri}: {he.status_code}")
+
+
+async def getOpenIdJson(app, uri, refresh=False):
+    """ return cache entry for the given openid configuration or JWK set
+    uri.  Stale entries (older than openid_cache_ttl) are returned as is
+    while a refresh is done in the background.  If refresh is set, wait for
+    a new fetch """
+    entry = _openid_cache.get(uri)
+    if entry is None or refresh:
+        # asyncio.shield so a cancelled request doesn't cancel the fetch
+        # other requests may be waiting on
+        return await asyncio.shield(_startFetch(app, uri))
+    ttl = float(config.get("openid_cache_ttl", default=3600))
+    age = time.time() - entry["fetch_time"]
+    if age > ttl and uri not in _pending_fetches:
+        log.debug(f"openid data for {uri} is {age:.1f}s old, refreshing")
+        asyncio.create_task(_refreshJson(app, uri))
+    return entry
+
+
+def _getPublicKey(jwk_keys, kid):
+    """ return the public key in the JWK set matching the given key id
+    or None if not found """
+    x5c = None
+    rsa = {}
+
+    # Iterate JWK keys and extract matching x5c chain
+    for key in jwk_keys["keys"]:
+        if key["kid"] == kid:
+            if "x5c" in key:
+                x5c = key["x5c"]
+            elif "e" in key and "n" in key:
+                for field in ["e", "n"]:
+                    val = key[field]
+                    val = val + "=" * ((4 - len(val) % 4) % 4)
+                    val = base64.urlsafe_b64decode(val.encode("utf-8"))
+                    rsa[field] = int.from_bytes(val, "big")
+
+    # Use the X5C chain to load a public key.
+    if x5c:
+        log.debug("using x5c public key")
+        cert = "".join(
+            [
+                "-----BEGIN CERTIFICATE-----\n",
+                x5c[0],
+                "\n-----END CERTIFICATE-----\n",
+            ]
+        )
+        x509 = load_pem_x509_certificate(cert.encode(), default_backend())
+        public_key = x509.public_key()
+        """
+        public_key_bytes = public_key.public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo)
+        log.debug(f"got public key: {public_key_bytes.decode('utf-8')}")
+        """
+
+    # Use RSA numbers to load a public key.
+    elif rsa:
+        log.debug("using rsa public key")
+        public_key = RSAPublicNumbers(**rsa).public_key(default_backend())
+
+    # We cannot load a public key.
+    else:
+        public_key = None
+
+    return public_key
+
+
+async def verifyBearerToken(app, token):
     # Contact OpenID provider to validate bearer token.
     # if valid, return username, exp, and roles
     username = None
@@ -87,75 +226,30 @@ def verifyBearerToken(app, token):
         log.warn(msg)
         raise HTTPUnauthorized()
 
+    entry = await getOpenIdJson(app, openid_url)
     try:
-        res = requests.get(openid_url, timeout=1.0)
-    except requests.exceptions.ConnectionError:
-        msg = "connection error for getting openid configuration "
-        msg += f"from : {openid_url}"
-        log.warn(msg)
+        jwk_uri = entry["json"]["jwks_uri"]
+    except (KeyError, TypeError):
+        log.warn(f"jwks_uri not found in openid configuration from {openid_url}")
         raise HTTPInternalServerError()
-    if res.status_code != 200:
-        log.warn(f"Bad response from {openid_url}: {res.status_code}")
-        if res.status_code == 404:
-            raise HTTPNotFound()
-        elif res.status_code == 401:
-            raise HTTPUnauthorized()
-        elif res.status_code == 403:
-            raise HTTPForbidden()
-        elif res.status_code == 503:
-            raise HTTPServiceUnavailable()
-        else:
-            raise HTTPInternalServerError()
-
-    jwk_uri = res.json()["jwks_uri"]
 
-    # TBD: cache responses by uri
-    res = requests.get(jwk_uri)
-    jwk_keys = res.json()
-    x5c = None
-    rsa = {}
     log.info("_verifyBearerToken")
-
-    # Iterate JWK keys and extract matching x5c chain
-    for key in jwk_keys["keys"]:
-        if key["kid"] == token_header["kid"]:
-            if "x5c" in key:
-                x5c = key["x5c"]
-            elif "e" in key and "n" in key:
-                for field in ["e", "n"]:
-                    val = key[field]
-                    val = val + "=" * ((4 - len(val) % 4) % 4)
-                    val = base64.urlsafe_b64decode(val.encode("utf-8"))
-                    rsa[field] = int.from_bytes(val, "big")
-
-    # Use the X5C chain to load a public key.
-    if x5c:
-        log.debug("using x5c public key")
-        cert = "".join(
-            [
-                "-----BEGIN CERTIFICATE-----\n",
-                x5c[0],
-                "\n-----END CERTIFICATE-----\n",
-            ]
-        )
-        x509 = load_pem_x509_certificate(cert.encode(), default_backend())
-        public_key = x509.public_key()
-        """
-        public_key_bytes = public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo)
-        log.debug(f"got public key: {public_key_bytes.decode('utf-8')}")
-        """
-
-    # Use RSA numbers to load a public key.
-    elif rsa:
-        log.debug("using rsa public key")
-        public_key = RSAPublicNumbers(**rsa).public_key(default_backend())
-
-    # We cannot load a public key.
-    else:
-        log.error("Unable to extract x5c chain or RSA key from JWK keys")
-        raise HTTPInternalServerError()
+    kid = token_header.get("kid")
+    entry = await getOpenIdJson(app, jwk_uri)
+    public_keys = entry["public_keys"]
+    if kid not in public_keys:
+        if time.time() - entry["fetch_time"] > MIN_KEY_REFRESH_INTERVAL:
+            # maybe the keys have been rotated, get the latest set
+            log.info(f"key id: {kid} not found in JWK set, refreshing")
+            entry = await getOpenIdJson(app, jwk_uri, refresh=True)
+            public_keys = entry["public_keys"]
+        if kid not in public_keys:
+            public_key = _getPublicKey(entry["json"], kid)
+            if public_key is None:
+                log.error("Unable to extract x5c chain or RSA key from JWK keys")
+                raise HTTPInternalServerError()
+            public_keys[kid] = public_key
+    public_key = public_keys[kid]
 
     # log.debug(f"bearer token - public_key: {public_key}")
 
@@ -0,0 +1,135 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+#
+# linkIndex:
+# sorted indexes of the link titles of a group, so that large groups can
+# be paged through without sorting all the titles on each request
+#
+from bisect import bisect_left, insort
+
+from .globparser import globmatch
+from .. import hsds_logger as log
+
+
+def getPatternPrefix(pattern):
+    """ return the literal characters at the start of a glob pattern """
+    for i in range(len(pattern)):
+        if pattern[i] in ("*", "?", "["):
+            return pattern[:i]
+    return pattern
+
+
+class LinkIndex(object):
+    """ Index of link titles by name and by creation time.
+    The index keeps a reference to the links dict it was built from,
+    and needs to be updated with add and remove whenever that dict
+    is modified."""
+
+    def __init__(self, links):
+        self._links = links
+        self._titles = sorted(links.keys())
+        self._create_order = None  # built on first create order request
+
+    def isValidFor(self, links, check_count=True):
+        """ return True if the index was built for the given links dict """
+        if self._links is not links:
+            return False
+        if check_count and len(self._titles) != len(links):
+            log.warn("LinkIndex - link count doesn't match index")
+            return False
+        return True
+
+    def _getCreateOrder(self):
+        if self._create_order is None:
+            create_order = []
+            for title in self._titles:
+                item = self._links[title]
+                if "created" not in item:
+                    log.warning(f"expected to find 'created' key in link item {title}")
+                    continue
+                create_order.append((item["created"], title))
+            create_order.sort()
+            self._create_order = create_order
+        return self._create_order
+
+    def add(self, title):
+        """ add title to the index - call after the link is added to links """
+        index = bisect_left(self._titles, title)
+        if index < len(self._titles) and self._titles[index] == title:
+            return  # already indexed
+        self._titles.insert(index, title)
+        item = self._links[title]
+        if self._create_order is not None and "created" in item:
+            # new links are normally the most recent, so this is an append
+            insort(self._create_order, (item["created"], title))
+
+    def remove(self, title):
+        """ remove title from the index - call before the link is removed from links """
+        index = bisect_left(self._titles, title)
+        if index == len(self._titles) or self._titles[index] != title:
+            return  # not indexed
+        del self._titles[index]
+        item = self._links[title]
+        if self._create_order is not None and "created" in item:
+            key = (item["created"], title)
+            index = bisect_left(self._create_order, key)
+            if index < len(self._create_order) and self._create_order[index] == key:
+                del self._create_order[index]
+
+    def getTitles(self, create_order=False, marker=None, limit=None, pattern=None):
+        """ return the titles following marker (if given) that match pattern
+        (if given), up to limit.  Raises KeyError if marker is not found,
+        and ValueError for an invalid pattern """
+        if pattern:
+            prefix = getPatternPrefix(pattern)
+        else:
+            prefix = ""
+        if marker is not None and pattern and not globmatch(marker, pattern):
+            raise KeyError(marker)
+
+        if create_order:
+            keys = self._getCreateOrder()
+            start_index = 0
+            if marker is not None:
+                item = self._links.get(marker)
+                if item is None or "created" not in item:
+                    raise KeyError(marker)
+                key = (item["created"], marker)
+                start_index = bisect_left(keys, key)
+                if start_index == len(keys) or keys[start_index] != key:
+                    raise KeyError(marker)
+                start_index += 1
+            prefix = ""  # create order isn't sorted by title, so no range to scan
+        else:
+            keys = self._titles
+            # titles that start with the pattern prefix are contiguous
+            start_index = bisect_left(keys, prefix)
+            if marker is not None:
+                index = bisect_left(keys, marker)
+                if index == len(keys) or keys[index] != marker:
+                    raise KeyError(marker)
+                start_index = max(start_index, index + 1)
+
+        titles = []
+        for i in range(start_index, len(keys)):
+            if limit is not None and len(titles) >= limit:
+                break
+            if create_order:
+                title = keys[i][1]
+            else:
+                title = keys[i]
+            if prefix and not title.startswith(prefix):
+                break  # past the range of titles with the prefix
+            if pattern and not globmatch(title, pattern):
+                continue
+            titles.append(title)
+        return titles
@@ -9,11 +9,20 @@
 # distribution tree.  If you do not have access to this file, you may        #
 # request a copy from help@hdfgroup.org.                                     #
 ##############################################################################
-import numpy
+from collections import OrderedDict
+from itertools import islice
+import sys
 import time
 
+import numpy
+import psutil
+
 from .. import hsds_logger as log
 
+CACHE_POLICIES = ("lru", "2q")
+SIZE_SAMPLE_COUNT = 64  # max items per container to look at when estimating sizes
+RSS_CHECK_INTERVAL = 1.0  # min seconds between process memory checks
+
 
 def getArraySize(arr):
     """Return size in bytes of numpy array"""
@@ -23,7 +32,63 @@ def getArraySize(arr):
     return nbytes
 
 
+def _getSample(items, count):
+    """return up to SIZE_SAMPLE_COUNT evenly spaced elements of a sequence"""
+    if count <= SIZE_SAMPLE_COUNT:
+        return items
+    step = count // SIZE_SAMPLE_COUNT
+    return items[::step][:SIZE_SAMPLE_COUNT]
+
+
+def _getObjArrayPayloadSize(arr):
+    """Return estimated size of the Python objects referenced by
+    an object (e.g. vlen) array"""
+    if arr.dtype.names:
+        nbytes = 0
+        for name in arr.dtype.names:
+            if arr.dtype[name].hasobject:
+                nbytes += _getObjArrayPayloadSize(arr[name])
+        return nbytes
+    items = arr.ravel()
+    count = items.size
+    if count == 0:
+        return 0
+    sample = _getSample(items, count)
+    nbytes = sum(getObjectSize(item) for item in sample)
+    return nbytes * count // len(sample)
+
+
+def getObjectSize(obj):
+    """Return estimated size in bytes of a numpy array or JSON-style
+    object (including the objects it references).
+    Large containers are estimated by sampling their elements."""
+    if isinstance(obj, numpy.ndarray):
+        nbytes = getArraySize(obj)
+        if obj.dtype.hasobject:
+            nbytes += _getObjArrayPayloadSize(obj)
+        return nbytes
+    nbytes = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        count = len(obj)
+        if count > 0:
+            sample = islice(obj.items(), SIZE_SAMPLE_COUNT)
+            sample_size = 0
+            for k, v in sample:
+                sample_size += getObjectSize(k) + getObjectSize(v)
+            nbytes += sample_size * count // min(count, SIZE_SAMPLE_COUNT)
+    elif isinstance(obj, (list, tuple)):
+        count = len(obj)
+        if count > 0:
+            sample = _getSample(obj, count)
+            sample_size = sum(getObjectSize(item) for item in sample)
+            nbytes += sample_size * count // len(sample)
+    return nbytes
+
+
 class Node(object):
+    __slots__ = ("_id", "_data", "_mem_size", "_isdirty", "_prev", "_next",
+                 "_last_access", "_dirty_time", "_protected")
+
     def __init__(self, id, data, mem_size=1024, isdirty=False, prev=None, next=None):
         self._id = id
         self._data = data
@@ -32,14 +97,27 @@ class Node(object):
         self._prev = prev
         self._next = next
         self._last_access = time.time()
+        self._dirty_time = None
+        self._protected = False
 
 
 class LruCache(object):
     """LRU cache for Numpy arrays that are read/written from S3
     If name is "ChunkCache", chunk items are assumed by be ndarrays
+    Clean nodes are also tracked in a separate LRU ordered dict so that
+    evictions don't need to skip over dirty nodes.
+
+    With policy "2q", new items are admitted to a probation list and only
+    moved to the main LRU list when they are read again.  Evictions are
+    taken from probation first, so a one-pass scan doesn't flush out
+    frequently used items.  Keys of items evicted from probation are
+    remembered for a while so that they go to the main list if re-added.
     """
 
-    def __init__(self, mem_target=32 * 1024 * 1024, name="LruCache", expire_time=None):
+    def __init__(self, mem_target=32 * 1024 * 1024, name="LruCache", expire_time=None,
+                 policy="lru", rss_limit=None, max_pinned=None):
+        if policy not in CACHE_POLICIES:
+            raise ValueError(f"Unexpected cache policy: {policy}")
         self._hash = {}
         self._lru_head = None
         self._lru_tail = None
@@ -48,7 +126,23 @@ class LruCache(object):
         self._mem_target = mem_target
         self._expire_time = expire_time
         self._name = name
-        self._dirty_set = set()
+        self._policy = policy
+        self._rss_limit = rss_limit
+        self._rss_check_time = 0.0
+        self._clean_lru = OrderedDict()  # clean node ids, oldest first
+        self._probation = OrderedDict()  # 2q - clean ids seen once, oldest first
+        self._ghosts = OrderedDict()  # 2q - ids recently evicted from probation
+        self._pinned = {}  # map of pinned node ids to time the pin expires
+        self._pinned_size = 0  # bytes used by pinned nodes
+        self._max_pinned = max_pinned  # limit on pinned bytes, or None
+        self._dirty_set = OrderedDict()  # dirty node ids, in order set dirty
+        # statistics
+        self._hit_count = 0
+        self._miss_count = 0
+        self._eviction_count = 0
+        self._expiration_count = 0
+        self._skip_count = 0
+        self._rss_eviction_count = 0
 
     def _delNode(self, key):
         # remove from LRU
@@ -96,8 +190,46 @@ class LruCache(object):
                 raise KeyError("unexpected error")
             self._lru_tail = prev
         self._lru_head = node
+        if node._isdirty or key in self._pinned:
+            pass
+        elif key in self._probation:
+            self._probation.move_to_end(key)
+        else:
+            self._clean_lru.move_to_end(key)
         return node
 
+    def _addClean(self, node):
+        # add node as the most recently used clean node
+        if node._id in self._pinned:
+            pass  # pinned nodes can't be evicted
+        elif self._policy == "2q" and not node._protected:
+            self._probation[node._id] = None
+        else:
+            self._clean_lru[node._id] = None
+
+    def _removeClean(self, key):
+        if key in self._pinned:
+            pass
+        elif key in self._probation:
+            del self._probation[key]
+        else:
+            del self._clean_lru[key]
+
+    def _promote(self, node):
+        # 2q - item has been used again, move to the main LRU list
+        node._protected = True
+        if node._id in self._probation:
+            log.debug(f"LRU {self._name} promoting node: {node._id}")
+            del self._probation[node._id]
+            self._clean_lru[node._id] = None
+
+    def _addGhost(self, key):
+        # remember about as many evicted keys as there are items cached
+        self._ghosts[key] = None
+        max_ghosts = max(len(self._hash), 1024)
+        while len(self._ghosts) > max_ghosts:
+            self._ghosts.popitem(last=False)
+
     def _hasKey(self, key, ignore_expire=False):
         """check if key is present node"""
         if key not in self._hash:
@@ -108,10 +240,13 @@ class LruCache(object):
         now = time.time()
         if self._expire_time:
             age = now - node._last_access
-            if age > self._expire_time and not node._isdirty:
+            if age > self._expire_time and not node._isdirty and key not in self._pinned:
                 msg = f"LRU {self._name} node {key} has been in cache for "
                 msg += f"{now - node._last_access:.3f} seconds, expiring"
                 log.debug(msg)
+                # remove the stale node so it is only counted once
+                self.__delitem__(key)
+                self._expiration_count += 1
                 return False
             else:
                 return True
@@ -126,10 +261,15 @@ class LruCache(object):
         self._mem_size -= node._mem_size
         if key in self._dirty_set:
             log.warning(f"LRU {self._name} removing dirty node: {key}")
-            self._dirty_set.remove(key)
+            del self._dirty_set[key]
             self._dirty_size -= node._mem_size
             if self._dirty_size < 0:
                 self._dirty_size = 0
+        else:
+            self._removeClean(key)
+        if key in self._pinned:
+            del self._pinned[key]
+            self._pinned_size -= node._mem_size
 
     def __len__(self):
         """Number of nodes in the cache"""
@@ -151,19 +291,27 @@ class LruCache(object):
         # doing a getitem has the side effect of moving this node
         # up in the LRU list
         if not self._hasKey(key):
+            self._miss_count += 1
             raise KeyError(key)
         node = self._moveToFront(key)
+        if self._policy == "2q" and not node._protected:
+            self._promote(node)
+        self._hit_count += 1
         return node._data
 
     def __setitem__(self, key, data):
         log.debug(f"setitem, key: {key}")
         if isinstance(data, numpy.ndarray):
-            # can just compute size for numpy array
-            mem_size = getArraySize(data)
+            if data.dtype.hasobject:
+                # include the vlen elements
+                mem_size = getObjectSize(data)
+            else:
+                # can just compute size for numpy array
+                mem_size = getArraySize(data)
         elif isinstance(data, dict):
-            # TBD - come up with a way to get the actual data size
-            # for dict objects
-            mem_size = 1024
+            # objects that are modified get set again, so the
+            # size will be updated
+            mem_size = getObjectSize(data)
         elif isinstance(data, bytes):
             mem_size = len(data)
         else:
@@ -173,15 +321,18 @@ class LruCache(object):
             # key is already in the LRU - update mem size, data and
             # move to front
             node = self._hash[key]
-            old_size = self._hash[key]._mem_size
-            mem_delta = node._mem_size - old_size
+            old_size = node._mem_size
+            mem_delta = mem_size - old_size
             self._mem_size += mem_delta
             node._data = data
             node._mem_size = mem_size
             self._moveToFront(key)
             if node._isdirty:
                 self._dirty_size += mem_delta
-            node._last_access = time.time()
+            if key in self._pinned:
+                self._pinned_size += mem_delta
+            if self._expire_time:
+                node._last_access = time.time()
             msg = f"LRU {self._name} updated node: {key}, "
             msg += f"was {old_size} bytes now {node._mem_size} bytes, "
             msg += f"dirty_size: {self._dirty_size}"
@@ -199,6 +350,11 @@ class LruCache(object):
                 next_node._prev = node
                 self._lru_head = node
             self._hash[key] = node
+            if key in self._ghosts:
+                # evicted before it could be used again, skip probation
+                del self._ghosts[key]
+                node._protected = True
+            self._addClean(node)
             self._mem_size += node._mem_size
             msg = f"LRU {self._name} adding {node._mem_size} to cache, "
             msg += f"mem_size is now: {self._mem_size}"
@@ -213,60 +369,94 @@ class LruCache(object):
             log.debug(msg)
 
         if self._mem_size > self._mem_target:
-            # set dirty temporarily so we can't remove this node in reduceCache
             msg = f"LRU {self._name} mem_size greater than target "
             msg += f"{self._mem_target} reducing cache"
             log.debug(msg)
-            isdirty = node._isdirty
-            node._isdirty = True
-            self._reduceCache()
-            node._isdirty = isdirty
-
-    def _reduceCache(self):
-        # remove nodes from cache (if not dirty) until we are under
-        # memory mem_target
+            self._reduceCache(keep=key)
+        if self._rss_limit:
+            self._checkRss(keep=key)
+
+    def _getVictim(self, keep=None):
+        # return the id of the next clean node to evict or None
+        probation = self._probation
+        clean_lru = self._clean_lru
+        if probation and (len(probation) * 4 > len(self._hash) or not clean_lru):
+            # probation items get evicted first as long as they make up
+            # a quarter or more of the cache
+            candidates = (probation, clean_lru)
+        else:
+            candidates = (clean_lru, probation)
+        for ids in candidates:
+            for key in ids:
+                if key != keep:
+                    return key
+        return None
+
+    def _reduceCache(self, keep=None):
+        # remove clean nodes from cache (least recently used first) until
+        # we are under memory mem_target.  The node given by keep
+        # (if any) is not removed.
         log.debug(f"LRU {self._name} reduceCache")
-
-        node = self._lru_tail  # start from the back
-        while node is not None:
-            next_node = node._prev
-            if not node._isdirty:
-                log.debug(f"LRU {self._name} removing node: {node._id}")
-                self.__delitem__(node._id)
-                if self._mem_size <= self._mem_target:
-                    msg = f"LRU {self._name} mem_size reduced below target"
-                    log.debug(msg)
-                    break
-            else:
-                pass  # can't remove dirty nodes
-            node = next_node
+        self._expirePins()
+
+        while self._mem_size > self._mem_target:
+            key = self._getVictim(keep=keep)
+            if key is None:
+                break
+            log.debug(f"LRU {self._name} removing node: {key}")
+            in_probation = key in self._probation
+            self.__delitem__(key)
+            self._eviction_count += 1
+            if in_probation:
+                self._addGhost(key)
         if self._mem_size > self._mem_target:
             msg = f"LRU {self._name} mem size of {self._mem_size} "
             msg += f"not reduced below target {self._mem_target}"
             log.debug(msg)
         # done reduceCache
 
+    def _checkRss(self, keep=None):
+        # evict clean items if the process is using more memory than
+        # rss_limit, regardless of the cache's own accounting
+        now = time.time()
+        if now - self._rss_check_time < RSS_CHECK_INTERVAL:
+            return
+        self._rss_check_time = now
+        rss = psutil.Process().memory_info().rss
+        if rss <= self._rss_limit:
+            return
+        target = self._mem_size - (rss - self._rss_limit)
+        msg = f"LRU {self._name} process rss: {rss} exceeds limit: {self._rss_limit}, "
+        msg += f"reducing cache from {self._mem_size} to {max(target, 0)} bytes"
+        log.warn(msg)
+        self._expirePins()
+        while self._mem_size > target:
+            key = self._getVictim(keep=keep)
+            if key is None:
+                break
+            self.__delitem__(key)
+            self._rss_eviction_count += 1
+
     def clearCache(self):
         # remove all nodes from cache
         log.debug(f"LRU {self._name} clearCache")
 
-        node = self._lru_tail  # start from the back
-        while node is not None:
-            next_node = node._prev
-            if node._isdirty:
-                msg = f"LRU {self._name} found dirty node during clear: "
-                msg += f"{node._id}"
-                log.error(msg)
-                raise ValueError("Unable to clear cache")
-            log.debug(f"LRU {self._name} removing node: {node._id}")
-            self.__delitem__(node._id)
-            node = next_node
+        if self._dirty_set:
+            key = next(iter(self._dirty_set))
+            msg = f"LRU {self._name} found dirty node during clear: {key}"
+            log.error(msg)
+            raise ValueError("Unable to clear cache")
+        for key in list(self._hash):
+            log.debug(f"LRU {self._name} removing node: {key}")
+            self.__delitem__(key)
+        self._ghosts.clear()
         self._dirty_size = 0
         # done clearCache
 
     def consistencyCheck(self):
         """verify that the data structure is self-consistent"""
         id_list = []
+        clean_list = []
         dirty_count = 0
         mem_usage = 0
         dirty_usage = 0
@@ -283,6 +473,8 @@ class LruCache(object):
                     msg = f"expected to find id: {node._id} in dirty set"
                     raise ValueError(msg)
                 dirty_usage += node._mem_size
+            elif node._id not in self._pinned:
+                clean_list.append(node._id)
             mem_usage += node._mem_size
             if node_type is None:
                 node_type = type(node._data)
@@ -296,10 +488,19 @@ class LruCache(object):
             raise ValueError()
         if dirty_count != len(self._dirty_set):
             raise ValueError("unexpected number of dirty nodes")
+        clean_list.reverse()  # clean LRU is ordered oldest first
+        if len(clean_list) != len(self._clean_lru) + len(self._probation):
+            raise ValueError("unexpected number of clean nodes")
+        for ids in (self._clean_lru, self._probation):
+            if [key for key in clean_list if key in ids] != list(ids):
+                raise ValueError("clean LRU list does not match LRU order")
         if mem_usage != self._mem_size:
             raise ValueError("unexpected memory size")
         if dirty_usage != self._dirty_size:
             raise ValueError("unexpected dirty size")
+        pinned_usage = sum(self._hash[key]._mem_size for key in self._pinned)
+        if pinned_usage != self._pinned_size:
+            raise ValueError("unexpected pinned size")
         # go back through list
         node = self._lru_tail
         pos = len(id_list)
@@ -326,10 +527,11 @@ class LruCache(object):
         node = self._moveToFront(key)
         if not node._isdirty:
             self._dirty_size += node._mem_size
+            node._dirty_time = time.time()
             log.debug(f"LRU {self._name} - update dirty_size to: {self._dirty_size}")
-        node._isdirty = True
-
-        self._dirty_set.add(key)
+            node._isdirty = True
+            self._removeClean(key)
+            self._dirty_set[key] = None
 
     def clearDirty(self, key):
         """clear the dirty flag"""
@@ -343,18 +545,102 @@ class LruCache(object):
             self._dirty_size -= node._mem_size
         log.debug(f"LRU {self._name} dirty_size: {self._dirty_size}")
         node._isdirty = False
+        node._dirty_time = None
 
         if key in self._dirty_set:
-            self._dirty_set.remove(key)
+            del self._dirty_set[key]
+            self._addClean(node)  # most recently used
             if self._mem_size > self._mem_target:
                 # maybe we can free up some memory now
                 self._reduceCache()
 
+    def pin(self, key, ttl):
+        """keep the node from being evicted or expired for ttl seconds.
+        Return False if the node can't be pinned without going over
+        max_pinned bytes"""
+        if key not in self._hash:
+            raise KeyError(key)
+        node = self._hash[key]
+        expire_time = time.time() + ttl
+        if key in self._pinned:
+            expire_time = max(expire_time, self._pinned[key])
+        else:
+            self._expirePins()
+            pinned_size = self._pinned_size + node._mem_size
+            if self._max_pinned is not None and pinned_size > self._max_pinned:
+                msg = f"LRU {self._name} not pinning node: {key}, pinned size "
+                msg += f"would be over {self._max_pinned} bytes"
+                log.debug(msg)
+                return False
+            if not node._isdirty:
+                self._removeClean(key)
+            self._pinned_size = pinned_size
+        log.debug(f"LRU {self._name} pinning node: {key} for {ttl} seconds")
+        self._pinned[key] = expire_time
+        return True
+
+    def unpin(self, key):
+        """allow the node to be evicted again"""
+        if key not in self._pinned:
+            return
+        log.debug(f"LRU {self._name} unpinning node: {key}")
+        del self._pinned[key]
+        node = self._hash[key]
+        self._pinned_size -= node._mem_size
+        if not node._isdirty:
+            # treat as most recently used
+            self._addClean(node)
+            self._moveToFront(key)
+
+    def _expirePins(self):
+        if not self._pinned:
+            return
+        now = time.time()
+        expired = [key for key in self._pinned if self._pinned[key] <= now]
+        for key in expired:
+            self.unpin(key)
+
+    def isPinned(self, key):
+        """return true if the node is pinned"""
+        return key in self._pinned
+
     def isDirty(self, key):
         """return dirty flag"""
         # don't adjust LRU position
         return key in self._dirty_set
 
+    def countMiss(self):
+        """record a lookup that wasn't satisfied by the cache"""
+        # callers typically test with "in" before fetching, so misses
+        # are counted by the caller rather than in __contains__
+        self._miss_count += 1
+
+    def countSkip(self):
+        """record an item that was not added due to lack of free space"""
+        self._skip_count += 1
+
+    def getStats(self):
+        """return dict of cache statistics"""
+        stats = {}
+        stats["policy"] = self._policy
+        stats["count"] = len(self)
+        stats["dirty_count"] = self.dirtyCount
+        stats["utililization_per"] = self.cacheUtilizationPercent
+        stats["mem_used"] = self.memUsed
+        stats["mem_target"] = self.memTarget
+        stats["mem_dirty"] = self.memDirty
+        stats["hit_count"] = self._hit_count
+        stats["miss_count"] = self._miss_count
+        stats["hit_ratio"] = self.hitRatio
+        stats["eviction_count"] = self._eviction_count
+        stats["expiration_count"] = self._expiration_count
+        stats["skip_count"] = self._skip_count
+        stats["pinned_count"] = len(self._pinned)
+        stats["mem_pinned"] = self._pinned_size
+        stats["rss_eviction_count"] = self._rss_eviction_count
+        stats["oldest_dirty_age"] = self.oldestDirtyAge
+        return stats
+
     def dump_lru(self):
         """Return LRU list as a string
         (for debugging)
@@ -402,3 +688,39 @@ class LruCache(object):
     @property
     def memDirty(self):
         return self._dirty_size
+
+    @property
+    def hitCount(self):
+        return self._hit_count
+
+    @property
+    def missCount(self):
+        return self._miss_count
+
+    @property
+    def hitRatio(self):
+        lookups = self._hit_count + self._miss_count
+        if lookups == 0:
+            return 0.0
+        return self._hit_count / lookups
+
+    @property
+    def evictionCount(self):
+        return self._eviction_count
+
+    @property
+    def expirationCount(self):
+        return self._expiration_count
+
+    @property
+    def skipCount(self):
+        return self._skip_count
+
+    @property
+    def oldestDirtyAge(self):
+        """seconds since the longest-dirty item was set dirty"""
+        if not self._dirty_set:
+            return 0.0
+        # dirty set is ordered by the time items were set dirty
+        key = next(iter(self._dirty_set))
+        return time.time() - self._hash[key]._dirty_time
@@ -0,0 +1,286 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+#
+# profileUtil:
+# statistical sampling profiler and stall detection for the event loop thread
+#
+import asyncio
+import os
+import sys
+import threading
+import time
+import types
+from collections import deque
+
+import numpy as np
+from aiohttp.web import middleware
+
+from .. import hsds_logger as log
+
+
+def _frameLabel(frame):
+    """ return a "file:function" label for the given frame """
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{filename}:{code.co_name}"
+
+
+def getFrameStack(frame, max_depth=128):
+    """ return list of frame labels from outermost to innermost """
+    stack = []
+    while frame is not None and len(stack) < max_depth:
+        stack.append(_frameLabel(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class StackSampler(threading.Thread):
+    """ Thread that periodically samples the stack of the target thread
+    and counts the occurrences of each distinct stack """
+
+    def __init__(self, thread_id, interval=0.01):
+        super().__init__(name="hsds-stack-sampler", daemon=True)
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self.sample_count = 0
+        self.stack_counts = {}
+
+    def run(self):
+        while not self._stop_event.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            key = ";".join(getFrameStack(frame))
+            self.stack_counts[key] = self.stack_counts.get(key, 0) + 1
+            self.sample_count += 1
+            del frame
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def getCollapsedStacks(self):
+        """ return stacks in the collapsed format used by flame graph
+        tools, i.e. "outer;inner;leaf <count>", most frequent first """
+        items = sorted(self.stack_counts.items(), key=lambda x: x[1], reverse=True)
+        return [f"{stack} {count}" for stack, count in items]
+
+
+def getTaskStacks(max_depth=32):
+    """ return a list of the pending asyncio tasks grouped by coroutine
+    and current await stack, largest groups first """
+    groups = {}
+    for task in asyncio.all_tasks():
+        if task.done():
+            continue
+        coro = task.get_coro()
+        coro_name = getattr(coro, "__qualname__", str(coro))
+        stack = [_frameLabel(frame) for frame in task.get_stack(limit=max_depth)]
+        key = (coro_name, tuple(stack))
+        groups[key] = groups.get(key, 0) + 1
+    task_stacks = []
+    for key in groups:
+        coro_name, stack = key
+        task_stacks.append({"coro": coro_name, "stack": list(stack), "count": groups[key]})
+    task_stacks.sort(key=lambda x: x["count"], reverse=True)
+    return task_stacks
+
+
+async def sampleEventLoop(duration, interval=0.01):
+    """ sample the stack of the thread running the event loop for
+    duration seconds and return the profile results """
+    sampler = StackSampler(threading.get_ident(), interval=interval)
+    start_time = time.time()
+    sampler.start()
+    try:
+        await asyncio.sleep(duration)
+        task_stacks = getTaskStacks()
+    finally:
+        sampler.stop()
+    profile = {}
+    profile["start_time"] = start_time
+    profile["duration"] = time.time() - start_time
+    profile["interval"] = interval
+    profile["sample_count"] = sampler.sample_count
+    profile["stacks"] = sampler.getCollapsedStacks()
+    profile["tasks"] = task_stacks
+    return profile
+
+
+class LoopMonitor(object):
+    """ Measures event loop lag (how late a sleep of interval seconds
+    wakes up) and keeps recent values for percentile stats.  If the
+    stall_threshold is non-zero, a watchdog thread captures the stack and
+    request of the loop thread when the loop has not run for longer than
+    stall_threshold seconds, so that the cause can be logged. """
+
+    def __init__(self, interval=0.1, stall_threshold=1.0, max_samples=1000):
+        self._interval = interval
+        self._stall_threshold = stall_threshold
+        self._lags = deque(maxlen=max_samples)
+        self._thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._lock = threading.Lock()
+        self._stall = None  # stall captured by the watchdog
+        self._request = None  # request being run by the loop thread
+        self._stop_event = threading.Event()
+        self._watchdog = None
+        self.stall_count = 0
+        self.max_lag = 0.0
+        self.recent_stalls = deque(maxlen=10)
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @types.coroutine
+    def runRequest(self, coro, label):
+        """ run the given coroutine, recording label as the current request
+        whenever the loop thread is executing it.  Only the loop thread
+        writes the label, the watchdog just reads it. """
+        value = None
+        exc = None
+        while True:
+            prev = self._request
+            self._request = label
+            try:
+                if exc is None:
+                    future = coro.send(value)
+                else:
+                    future = coro.throw(exc)
+            except StopIteration as si:
+                return si.value
+            finally:
+                self._request = prev
+            try:
+                value = yield future
+                exc = None
+            except BaseException as e:
+                value = None
+                exc = e
+
+    def start(self):
+        """ start the watchdog thread - call from the event loop thread """
+        self._thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        if self._stall_threshold > 0 and self._watchdog is None:
+            kwargs = {"name": "hsds-loop-watchdog", "daemon": True}
+            self._watchdog = threading.Thread(target=self._watch, **kwargs)
+            self._watchdog.start()
+
+    def stop(self):
+        if self._watchdog is not None:
+            self._stop_event.set()
+            self._watchdog.join()
+            self._watchdog = None
+
+    def _watch(self):
+        check_interval = max(self._stall_threshold / 4.0, 0.01)
+        while not self._stop_event.wait(check_interval):
+            with self._lock:
+                if self._stall is not None:
+                    continue  # already captured this stall
+                stalled_time = time.monotonic() - self._heartbeat
+                if stalled_time < self._stall_threshold:
+                    continue
+                frame = sys._current_frames().get(self._thread_id)
+                if frame is None:
+                    continue
+                stall = {"start_time": time.time() - stalled_time}
+                stall["stack"] = getFrameStack(frame)
+                stall["request"] = self._request
+                del frame
+                self._stall = stall
+            msg = f"event loop blocked for more than {stalled_time:.2f}s in: "
+            msg += f"{stall['stack'][-1] if stall['stack'] else '?'}"
+            if stall["request"]:
+                msg += f", request: {stall['request']}"
+            log.warn(msg)
+
+    def update(self, lag):
+        """ record the lag for one interval.  If the lag exceeded the
+        stall threshold, return a dict describing the stall """
+        with self._lock:
+            self._heartbeat = time.monotonic()
+            stall = self._stall
+            self._stall = None
+        self._lags.append(lag)
+        if lag > self.max_lag:
+            self.max_lag = lag
+        if self._stall_threshold <= 0 or lag < self._stall_threshold:
+            return None
+        if stall is None:
+            # watchdog didn't catch it (or isn't running)
+            stall = {"start_time": time.time() - lag, "stack": [], "request": None}
+        stall["duration"] = lag
+        self.stall_count += 1
+        self.recent_stalls.append(stall)
+        return stall
+
+    def getStats(self):
+        """ return lag percentiles and stall counts """
+        stats = {}
+        if self._lags:
+            lags = np.array(self._lags)
+            p50, p90, p99 = np.percentile(lags, [50, 90, 99])
+            stats["lag_p50"] = float(p50)
+            stats["lag_p90"] = float(p90)
+            stats["lag_p99"] = float(p99)
+        else:
+            stats["lag_p50"] = stats["lag_p90"] = stats["lag_p99"] = 0.0
+        stats["lag_max"] = self.max_lag
+        stats["sample_count"] = len(self._lags)
+        stats["stall_threshold"] = self._stall_threshold
+        stats["stall_count"] = self.stall_count
+        recent_stalls = []
+        for stall in self.recent_stalls:
+            item = {"start_time": stall["start_time"], "duration": stall["duration"]}
+            item["request"] = stall["request"]
+            # just the innermost frames
+            item["stack"] = stall["stack"][-8:]
+            recent_stalls.append(item)
+        stats["recent_stalls"] = recent_stalls
+        return stats
+
+
+@middleware
+async def loopMonitorMiddleware(request, handler):
+    """ track the request being run by the event loop, so the loop
+    monitor can report it when the loop stalls """
+    monitor = request.app.get("loop_monitor")
+    if monitor is None:
+        return await handler(request)
+    label = f"{request.method} {request.path}"
+    return await monitor.runRequest(handler(request), label)
+
+
+async def monitorEventLoop(monitor):
+    """ Periodic method that measures event loop lag and logs stalls """
+    monitor.start()
+    interval = monitor.interval
+    try:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            lag = max(time.monotonic() - start - interval, 0.0)
+            stall = monitor.update(lag)
+            if stall:
+                msg = f"event loop stalled for {lag:.2f}s"
+                if stall["request"]:
+                    msg += f" during request: {stall['request']}"
+                if stall["stack"]:
+                    msg += f", stack: {';'.join(stall['stack'][-8:])}"
+                log.warn(msg)
+    finally:
+        monitor.stop()
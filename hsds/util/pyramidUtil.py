@@ -0,0 +1,145 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+#
+# pyramidUtil:
+# Functions for datasets with downsampled pyramid levels.
+#
+# A dataset is created with a pyramid by setting the "pyramid" creation
+# property, e.g.: {"factor": 4, "levels": 2}.  Each level is stored as an
+# anonymous dataset whose ids are added to the property.  Level L holds the
+# dataset values decimated by factor**L along each dimension, i.e. the values
+# of dset[::factor**L, ::factor**L, ...].  Each level dataset has a
+# pyramid property for the levels that follow it, so that level L+1 can
+# be updated from the chunks of level L.
+#
+# Level updates are queued in DN memory and run pyramid_wait_time after the
+# last write to a chunk.  If a DN restarts or chunk ownership changes before
+# a queued update runs, that region of the levels stays stale until the
+# chunk is written again, or until the levels are rebuilt by an admin with
+# POST /datasets/{id}/pyramid.
+#
+import math
+
+from .chunkUtil import getChunkIndex
+from .dsetUtil import getShapeDims
+
+
+def getPyramid(dset_json):
+    """ return the pyramid creation property for the dataset or None """
+    cprops = dset_json.get("creationProperties")
+    if not cprops:
+        return None
+    pyramid = cprops.get("pyramid")
+    if not pyramid or not pyramid.get("ids"):
+        return None
+    return pyramid
+
+
+def getLevelDims(dims, factor):
+    """ return the shape of the next pyramid level """
+    return [max(math.ceil(extent / factor), 1) for extent in dims]
+
+
+def getLevelJson(dset_json):
+    """ return the dataset json for the next level of the dataset's pyramid """
+    pyramid = getPyramid(dset_json)
+    if pyramid is None:
+        raise ValueError("dataset has no pyramid")
+    factor = pyramid["factor"]
+    ids = pyramid["ids"]
+    dims = getLevelDims(getShapeDims(dset_json["shape"]), factor)
+    layout = dset_json["layout"]
+    layout_dims = [min(layout["dims"][i], dims[i]) for i in range(len(dims))]
+    cprops = dset_json["creationProperties"].copy()
+    cprops.pop("layout", None)  # the level layout is set below
+    cprops["pyramid"] = {"factor": factor, "levels": len(ids) - 1, "ids": ids[1:]}
+    level_json = {"id": ids[0]}
+    if "root" in dset_json:
+        level_json["root"] = dset_json["root"]
+    level_json["type"] = dset_json["type"]
+    level_json["shape"] = {"class": "H5S_SIMPLE", "dims": dims}
+    level_json["layout"] = {"class": layout["class"], "dims": layout_dims}
+    level_json["creationProperties"] = cprops
+    return level_json
+
+
+def getDecimatedChunk(chunk_id, chunk_arr, dims, layout, factor):
+    """ return the selection of the next pyramid level and the values for
+    the given chunk of the dataset as a tuple.  Return None if no element
+    of the chunk is included in the level. """
+    index = getChunkIndex(chunk_id)
+    level_slices = []
+    chunk_sel = []
+    for dim in range(len(dims)):
+        start = index[dim] * layout[dim]
+        stop = min(start + layout[dim], dims[dim])
+        # dataset indices that are multiples of factor are in the level
+        level_start = math.ceil(start / factor)
+        level_stop = math.ceil(stop / factor)
+        if level_stop <= level_start:
+            return None
+        level_slices.append(slice(level_start, level_stop, 1))
+        offset = level_start * factor - start
+        count = level_stop - level_start
+        chunk_sel.append(slice(offset, offset + (count - 1) * factor + 1, factor))
+    return tuple(level_slices), chunk_arr[tuple(chunk_sel)]
+
+
+def _getSliceCount(s):
+    return len(range(s.start, s.stop, s.step or 1))
+
+
+def getLevelSelection(slices, factor, levels):
+    """ return the coarsest pyramid level that holds every element of the
+    selection and the equivalent selection in that level as a tuple.
+    Return None if no level can be used. """
+    for level in range(levels, 0, -1):
+        scale = factor ** level
+        level_slices = []
+        for s in slices:
+            step = s.step or 1
+            count = _getSliceCount(s)
+            if count == 0 or s.start % scale != 0:
+                break
+            if count == 1:
+                start = s.start // scale
+                level_slices.append(slice(start, start + 1, 1))
+            elif step % scale == 0:
+                stop = math.ceil(s.stop / scale)
+                level_slices.append(slice(s.start // scale, stop, step // scale))
+            else:
+                break
+        if len(level_slices) == len(slices):
+            return level, tuple(level_slices)
+    return None
+
+
+def getPreviewSelect(dims, factor, levels, max_elements=10000):
+    """ return a select param for a strided preview of the dataset that can
+    be served from a pyramid level.  The last two dimensions are sampled over
+    their full extent, and the first index of any other dimension is used. """
+    rank = len(dims)
+    scale = factor ** levels
+    for level in range(levels + 1):
+        count = 1
+        for dim in range(max(rank - 2, 0), rank):
+            count *= math.ceil(dims[dim] / factor ** level)
+        if count <= max_elements:
+            scale = factor ** level
+            break
+    sel = []
+    for dim in range(rank):
+        if dim < rank - 2:
+            sel.append("0:1")
+        else:
+            sel.append(f"0:{dims[dim]}:{scale}")
+    return "[" + ",".join(sel) + "]"
@@ -0,0 +1,224 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+#
+# reduceUtil:
+# Reductions over dataset selections.  DN nodes compute partial aggregates
+# (stats) for the selection within each chunk, and the SN combines the
+# partials into the final result.
+#
+# Results have the type of the accumulator rather than the dataset type:
+# int64 for counts, 64-bit integers (or float64) for sums, float64 for
+# means, and the dataset type for min and max.  Binary responses give the result
+# type and shape in the X-HSDS-Result-Type (numpy type string, e.g. "<i8")
+# and X-HSDS-Result-Shape (comma separated extents, empty for a scalar)
+# headers.
+#
+import warnings
+
+import numpy as np
+
+REDUCE_OPS = ("sum", "mean", "min", "max", "count", "histogram")
+REDUCE_STATS = ("sum", "count", "min", "max", "histogram")
+
+# stats needed for each op.  "range" is used to find the histogram range
+# when the client doesn't provide one
+_OP_STATS = {
+    "sum": ("sum",),
+    "mean": ("sum", "count"),
+    "min": ("min",),
+    "max": ("max",),
+    "count": ("count",),
+    "histogram": ("histogram",),
+    "range": ("min", "max"),
+}
+
+
+def isReducibleType(dtype):
+    """ return True if reductions are supported for the given numpy type """
+    return dtype.kind in ("i", "u", "f")
+
+
+def _getSumType(dtype):
+    if dtype.kind == "f":
+        return np.dtype("f8")
+    elif dtype.kind == "u":
+        return np.dtype("u8")
+    else:
+        return np.dtype("i8")
+
+
+def getPartial(arr, stats, axis=None, skipnan=False, bins=None, hist_range=None):
+    """ return a dict of the requested stats for the array.  If axis is set,
+    each stat is an array with that axis removed, otherwise a scalar """
+    if not isReducibleType(arr.dtype):
+        raise TypeError(f"reductions not supported for type: {arr.dtype}")
+    skipnan = skipnan and arr.dtype.kind == "f"
+    partial = {}
+    with warnings.catch_warnings():
+        # all-NaN slices return NaN for nanmin and nanmax
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for stat in stats:
+            if stat == "count":
+                if skipnan:
+                    value = np.count_nonzero(~np.isnan(arr), axis=axis)
+                elif axis is None:
+                    value = arr.size
+                else:
+                    shape = arr.shape[:axis] + arr.shape[axis + 1:]
+                    value = np.full(shape, arr.shape[axis], dtype="i8")
+            elif stat == "sum":
+                func = np.nansum if skipnan else np.sum
+                value = func(arr, axis=axis, dtype=_getSumType(arr.dtype))
+            elif stat == "min":
+                func = np.nanmin if skipnan else np.min
+                value = func(arr, axis=axis)
+            elif stat == "max":
+                func = np.nanmax if skipnan else np.max
+                value = func(arr, axis=axis)
+            elif stat == "histogram":
+                if axis is not None:
+                    raise ValueError("histogram can not be used with axis")
+                values = arr.reshape((arr.size,))
+                if arr.dtype.kind == "f":
+                    values = values[np.isfinite(values)]
+                value = np.histogram(values, bins=bins, range=hist_range)[0]
+            else:
+                raise ValueError(f"unexpected reduce stat: {stat}")
+            partial[stat] = value
+    return partial
+
+
+class Reduction(object):
+    """ Combines the partial stats from each chunk of a selection """
+
+    def __init__(self, op, dtype, shape, axis=None, skipnan=False, bins=10, hist_range=None):
+        if op not in _OP_STATS:
+            raise ValueError(f"unexpected reduce op: {op}")
+        if not isReducibleType(dtype):
+            raise TypeError(f"reductions not supported for type: {dtype}")
+        shape = tuple(shape)
+        if axis is None:
+            shape = ()
+        else:
+            if op == "histogram":
+                raise ValueError("histogram can not be used with axis")
+            if axis < 0 or axis >= len(shape):
+                raise ValueError(f"invalid axis: {axis}")
+            shape = shape[:axis] + shape[axis + 1:]
+        if op == "histogram":
+            if bins < 1:
+                raise ValueError("bins must be positive")
+            if hist_range is None:
+                raise ValueError("histogram range not set")
+            lo, hi = hist_range
+            if lo > hi:
+                raise ValueError("invalid histogram range")
+            if lo == hi:
+                # same adjustment np.histogram makes
+                hist_range = (lo - 0.5, hi + 0.5)
+        self._op = op
+        self._dtype = dtype
+        self._axis = axis
+        self._skipnan = skipnan and dtype.kind == "f"
+        self._bins = bins
+        self._hist_range = hist_range
+        self._stats = _OP_STATS[op]
+        self._acc = {}
+        for stat in self._stats:
+            if stat == "sum":
+                acc = np.zeros(shape, dtype=_getSumType(dtype))
+            elif stat == "count":
+                acc = np.zeros(shape, dtype="i8")
+            elif stat == "histogram":
+                acc = np.zeros((bins,), dtype="i8")
+            elif dtype.kind == "f":
+                if self._skipnan:
+                    init = np.nan  # np.fmin/fmax ignore NaNs
+                elif stat == "min":
+                    init = np.inf
+                else:
+                    init = -np.inf
+                acc = np.full(shape, init, dtype=dtype)
+            else:
+                info = np.iinfo(dtype)
+                init = info.max if stat == "min" else info.min
+                acc = np.full(shape, init, dtype=dtype)
+            self._acc[stat] = acc
+
+    @property
+    def op(self):
+        return self._op
+
+    @property
+    def axis(self):
+        return self._axis
+
+    def getParams(self):
+        """ return the query params for DN requests """
+        params = {"reduce": ",".join(self._stats)}
+        if self._axis is not None:
+            params["axis"] = self._axis
+        if self._skipnan:
+            params["skipnan"] = 1
+        if self._op == "histogram":
+            params["bins"] = self._bins
+            params["range"] = f"{self._hist_range[0]}:{self._hist_range[1]}"
+        return params
+
+    def getPartial(self, arr):
+        """ return the partial stats for the given array """
+        kwargs = {"axis": self._axis, "skipnan": self._skipnan}
+        if self._op == "histogram":
+            kwargs["bins"] = self._bins
+            kwargs["hist_range"] = self._hist_range
+        return getPartial(arr, self._stats, **kwargs)
+
+    def addPartial(self, partial, data_sel=None):
+        """ combine the partial for a chunk. data_sel is the location of
+        the chunk selection within the dataset selection """
+        if self._axis is None or data_sel is None:
+            index = ()
+        else:
+            index = []
+            for dim in range(len(data_sel)):
+                if dim != self._axis:
+                    index.append(data_sel[dim])
+            index = tuple(index)
+        for stat in self._stats:
+            acc = self._acc[stat]
+            if stat == "histogram":
+                acc += np.asarray(partial[stat], dtype=acc.dtype)
+                continue
+            value = np.asarray(partial[stat], dtype=acc.dtype)
+            if stat in ("sum", "count"):
+                acc[index] += value
+            elif stat == "min":
+                func = np.fmin if self._skipnan else np.minimum
+                acc[index] = func(acc[index], value)
+            else:
+                func = np.fmax if self._skipnan else np.maximum
+                acc[index] = func(acc[index], value)
+
+    def getResult(self):
+        """ return the reduction result as a numpy array (zero-dimensional
+        if no axis was given).  For range, return a tuple of min and max """
+        if self._op == "mean":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return self._acc["sum"] / self._acc["count"]
+        if self._op == "range":
+            return (self._acc["min"].item(), self._acc["max"].item())
+        return self._acc[self._stats[0]]
+
+    def getBinEdges(self):
+        """ return the histogram bin edges """
+        lo, hi = self._hist_range
+        return np.linspace(lo, hi, self._bins + 1)
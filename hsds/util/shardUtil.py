@@ -0,0 +1,124 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+#
+# shardUtil:
+# Functions for storing the links or attributes of large objects in
+# separate shard objects.
+#
+# The stored object json for a sharded object has a "shards" key in place
+# of the sharded collections, giving the number of shards for each.  E.g.:
+#   {"id": "g-...", ..., "attributes": {}, "shards": {"links": 64}}
+# Items are assigned to shards by the crc32 of their name, and each shard
+# is stored at: <object key prefix>/.shards/<collection>.<index>.json
+#
+import asyncio
+import json
+import zlib
+
+from aiohttp.web_exceptions import HTTPNotFound, HTTPInternalServerError
+
+from .idUtil import getS3Key, getObjId
+from .storUtil import getStorJSONObj, deleteStorObj
+from .. import hsds_logger as log
+
+SHARD_COLLECTIONS = ("links", "attributes")
+
+# json object name for each collection directory of a schema v2 key
+_OBJ_JSON_NAMES = {"g": ".group.json", "d": ".dataset.json", "t": ".datatype.json"}
+
+
+def getShardIndex(name, shard_count):
+    """ return the shard the item with the given name is stored in """
+    return zlib.crc32(name.encode("utf8")) % shard_count
+
+
+def getShardKey(obj_id, collection, index):
+    """ return the storage key for the given shard of an object """
+    s3key = getS3Key(obj_id)
+    prefix = s3key[:s3key.rfind("/")]
+    return f"{prefix}/.shards/{collection}.{index}.json"
+
+
+def getShardObjId(s3key):
+    """ return the id of the object the given shard key belongs to, or None
+    if s3key is not a shard key """
+    index = s3key.find("/.shards/")
+    if index < 0:
+        return None
+    prefix = s3key[:index]
+    parts = prefix.split("/")
+    if len(parts) == 4 and parts[2] in _OBJ_JSON_NAMES:
+        obj_key = f"{prefix}/{_OBJ_JSON_NAMES[parts[2]]}"
+    else:
+        obj_key = f"{prefix}/.group.json"  # root group
+    try:
+        return getObjId(obj_key)
+    except ValueError:
+        return None
+
+
+def getShards(items, shard_count):
+    """ split the items dict into a list of shard_count dicts """
+    shards = []
+    for i in range(shard_count):
+        shards.append({})
+    for name in items:
+        shards[getShardIndex(name, shard_count)][name] = items[name]
+    return shards
+
+
+def getShardChecksum(shard):
+    """ checksum used to determine if a shard has changed since it was
+    last read or written """
+    return zlib.crc32(json.dumps(shard).encode("utf8"))
+
+
+async def _getShard(app, key, bucket=None):
+    try:
+        shard = await getStorJSONObj(app, key, bucket=bucket)
+    except HTTPNotFound:
+        log.warn(f"shard: {key} not found, assuming no items")
+        shard = {}
+    return shard
+
+
+async def readShards(app, obj_id, obj_json, bucket=None):
+    """ read the shards of a stored object and add the items to obj_json.
+    Returns a dict of shard checksums for each sharded collection """
+    layout = obj_json["shards"]
+    del obj_json["shards"]
+    checksums = {}
+    for collection in layout:
+        shard_count = layout[collection]
+        log.debug(f"readShards {obj_id} - reading {shard_count} {collection} shards")
+        keys = [getShardKey(obj_id, collection, i) for i in range(shard_count)]
+        shards = await asyncio.gather(*[_getShard(app, key, bucket=bucket) for key in keys])
+        items = {}
+        crcs = []
+        for shard in shards:
+            items.update(shard)
+            crcs.append(getShardChecksum(shard))
+        obj_json[collection] = items
+        checksums[collection] = crcs
+    return checksums
+
+
+async def deleteShards(app, obj_id, layout, bucket=None):
+    """ remove the shard objects given by layout (a dict of shard counts
+    for each sharded collection) """
+    for collection in layout:
+        for i in range(layout[collection]):
+            key = getShardKey(obj_id, collection, i)
+            try:
+                await deleteStorObj(app, key, bucket=bucket)
+            except (HTTPNotFound, HTTPInternalServerError):
+                log.warn(f"deleteShards - unable to delete shard: {key}")
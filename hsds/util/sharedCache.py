@@ -0,0 +1,174 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+#
+# Read cache for clean chunks in a shared memory segment that can be used
+# by all the DN processes on a host.
+#
+# The segment is divided into equal sized slots and a chunk is stored in
+# the slot given by the hash of its bucket and id, so no shared index or
+# allocator is needed.  Each slot starts with a header of:
+#   key digest, sequence number, data length, crc32 of data
+# Writers set the sequence number to an odd value while updating the
+# slot, readers give up if the sequence number changes or the
+# crc doesn't match, so a torn read is reported as a miss.
+#
+# The segment outlives the DN processes, so that a restarted DN reattaches
+# to it rather than leaving the others with a segment no process can find.
+# It is only removed by an explicit unlink once all the DNs on the host
+# have stopped.
+#
+import hashlib
+import struct
+import zlib
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .. import hsds_logger as log
+
+HEADER_FORMAT = "<16sQQI"
+HEADER_SIZE = 64  # header is padded to keep the data aligned
+SEQ_OFFSET = 16  # offset of the sequence number in the header
+
+
+def _getDigest(key, bucket):
+    key = f"{bucket}/{key}" if bucket else key
+    return hashlib.md5(key.encode("utf-8"), usedforsecurity=False).digest()
+
+
+class SharedChunkCache(object):
+    """Host level read cache for chunk arrays.
+    Only arrays of fixed size types are cached."""
+
+    def __init__(self, name, mem_size, slot_size=4 * 1024 * 1024):
+        if slot_size <= HEADER_SIZE:
+            raise ValueError("slot_size is too small")
+        slot_count = mem_size // slot_size
+        if slot_count < 1:
+            raise ValueError("mem_size must be at least slot_size")
+        self._name = name
+        self._slot_size = slot_size
+        self._slot_count = slot_count
+        self._max_data_size = slot_size - HEADER_SIZE
+        self._hit_count = 0
+        self._miss_count = 0
+        self._put_count = 0
+        size = slot_count * slot_size
+        try:
+            self._shm = SharedMemory(name=name, create=True, size=size)
+            log.info(f"SharedChunkCache created segment: {name} size: {size}")
+        except FileExistsError:
+            self._shm = SharedMemory(name=name)
+            if self._shm.size < size:
+                msg = f"SharedChunkCache segment: {name} has size {self._shm.size}, "
+                msg += f"expected {size}"
+                log.warn(msg)
+                self._slot_count = self._shm.size // slot_size
+            log.info(f"SharedChunkCache attached to segment: {name}")
+        # don't let the resource tracker remove the segment when this
+        # process exits, other processes may still be using it
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._buf = self._shm.buf
+
+    def _getSlotOffset(self, digest):
+        index = int.from_bytes(digest[:8], "little") % self._slot_count
+        return index * self._slot_size
+
+    def _getHeader(self, offset):
+        return struct.unpack_from(HEADER_FORMAT, self._buf, offset)
+
+    def _setSeq(self, offset, seq):
+        struct.pack_into("<Q", self._buf, offset + SEQ_OFFSET, seq)
+
+    def get(self, key, dtype, dims, bucket=None):
+        """Return a copy of the array stored for key in bucket or None"""
+        if dtype.hasobject:
+            return None
+        nbytes = dtype.itemsize * int(np.prod(dims))
+        digest = _getDigest(key, bucket)
+        offset = self._getSlotOffset(digest)
+        slot_digest, seq, length, crc = self._getHeader(offset)
+        if slot_digest != digest or seq % 2 == 1 or length != nbytes:
+            self._miss_count += 1
+            return None
+        data_offset = offset + HEADER_SIZE
+        data = bytes(self._buf[data_offset:data_offset + length])
+        if self._getHeader(offset) != (slot_digest, seq, length, crc):
+            # slot was updated while we were reading
+            self._miss_count += 1
+            return None
+        if zlib.crc32(data) != crc:
+            log.warn(f"SharedChunkCache crc mismatch for {key}")
+            self._miss_count += 1
+            return None
+        self._hit_count += 1
+        arr = np.frombuffer(data, dtype=dtype).reshape(dims)
+        return arr.copy()
+
+    def put(self, key, arr, bucket=None):
+        """Store the array for key in bucket, replacing whatever is in the slot"""
+        if arr.dtype.hasobject:
+            return False
+        data = np.ascontiguousarray(arr).tobytes()
+        if len(data) > self._max_data_size:
+            log.debug(f"SharedChunkCache - {key} too large to cache")
+            return False
+        digest = _getDigest(key, bucket)
+        offset = self._getSlotOffset(digest)
+        seq = self._getHeader(offset)[1]
+        if seq % 2 == 0:
+            seq += 1
+        self._setSeq(offset, seq)  # odd while the slot is being written
+        data_offset = offset + HEADER_SIZE
+        self._buf[data_offset:data_offset + len(data)] = data
+        header = (digest, seq + 1, len(data), zlib.crc32(data))
+        struct.pack_into(HEADER_FORMAT, self._buf, offset, *header)
+        self._put_count += 1
+        return True
+
+    def invalidate(self, key, bucket=None):
+        """Remove any entry for key in bucket"""
+        digest = _getDigest(key, bucket)
+        offset = self._getSlotOffset(digest)
+        slot_digest, seq, length, crc = self._getHeader(offset)
+        if slot_digest != digest:
+            return
+        log.debug(f"SharedChunkCache - invalidating {key}")
+        header = (bytes(16), seq + 2 - seq % 2, 0, 0)
+        struct.pack_into(HEADER_FORMAT, self._buf, offset, *header)
+
+    def close(self):
+        """Detach from the segment.  The segment itself is left in place
+        for the other processes attached to it"""
+        self._buf = None
+        self._shm.close()
+
+    def unlink(self):
+        """Remove the segment.  Only call this as part of a coordinated
+        teardown, once no other process is using the segment"""
+        # re-register so the unlink below can unregister it again
+        resource_tracker.register(self._shm._name, "shared_memory")
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        log.info(f"SharedChunkCache removed segment: {self._name}")
+
+    def getStats(self):
+        stats = {}
+        stats["slot_count"] = self._slot_count
+        stats["slot_size"] = self._slot_size
+        stats["hit_count"] = self._hit_count
+        stats["miss_count"] = self._miss_count
+        stats["put_count"] = self._put_count
+        return stats
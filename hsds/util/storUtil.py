@@ -25,6 +25,8 @@ from aiohttp.web_exceptions import HTTPInternalServerError, HTTPNotFound
 
 from .. import hsds_logger as log
 from .s3Client import S3Client
+from .traceUtil import traceSpan
+from .costUtil import addRequestCost
 
 try:
     from .azureBlobClient import AzureBlobClient
@@ -471,7 +473,13 @@ async def getStorBytes(app,
     log.info(msg)
 
     kwargs = {"bucket": bucket, "key": key, "offset": offset, "length": length}
-    data = await client.get_object(**kwargs)
+    with traceSpan("storage_get", bucket=bucket, key=key) as span:
+        data = await client.get_object(**kwargs)
+        if data is not None:
+            span.setTag("bytes", len(data))
+    addRequestCost("storage_gets")
+    if data is not None:
+        addRequestCost("storage_bytes", len(data))
     if data is None or len(data) == 0:
         log.info(f"no data found for {key}")
         return data
@@ -516,7 +524,8 @@ async def getStorBytes(app,
         return chunk_bytes
     elif filter_ops:
         # uncompress and return
-        data = _uncompress(data, **filter_ops)
+        with traceSpan("uncompress", key=key, bytes=len(data)):
+            data = _uncompress(data, **filter_ops)
         return data
     else:
         return data
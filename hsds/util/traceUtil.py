@@ -0,0 +1,301 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+#
+# traceUtil:
+# request tracing across SN -> DN -> storage
+#
+# Trace context is propagated between nodes with the W3C "traceparent"
+# header.  Finished spans are buffered and exported periodically in the
+# Zipkin v2 JSON format, either to a file (one span per line) or POSTed to
+# a Zipkin-compatible collector.
+#
+import json
+import os
+import random
+import time
+from contextvars import ContextVar
+
+import aiofiles
+from aiohttp.web import middleware
+from aiohttp.web_exceptions import HTTPException
+
+from .. import hsds_logger as log
+from .. import config
+
+TRACE_HEADER = "traceparent"
+
+# paths that are never traced (node state and health check traffic)
+UNTRACED_PATHS = ("/about", "/info", "/nodeinfo", "/nodestate", "/register", "/prestop")
+
+# the span that is active for the current asyncio task
+_active_span = ContextVar("hsds_active_span", default=None)
+
+# finished spans waiting to be exported
+_finished_spans = []
+_dropped_span_count = 0
+
+
+def isTracingEnabled():
+    """ return True if a trace exporter has been configured """
+    if config.get("trace_file", default=None):
+        return True
+    if config.get("trace_collector", default=None):
+        return True
+    return False
+
+
+def _newTraceId():
+    return os.urandom(16).hex()
+
+
+def _newSpanId():
+    return os.urandom(8).hex()
+
+
+def parseTraceHeader(value):
+    """ parse a traceparent header value and return a tuple of
+    trace_id and parent span id, or None if the value is not valid """
+    if not value:
+        return None
+    fields = value.strip().split("-")
+    if len(fields) < 4:
+        return None
+    trace_id = fields[1]
+    span_id = fields[2]
+    if len(trace_id) != 32 or len(span_id) != 16:
+        return None
+    try:
+        int(trace_id, 16)
+        int(span_id, 16)
+    except ValueError:
+        return None
+    if int(trace_id, 16) == 0 or int(span_id, 16) == 0:
+        return None
+    return trace_id, span_id
+
+
+def getTraceHeaders():
+    """ return headers to propagate the active trace to another node,
+    or None if there is no active trace """
+    span = _active_span.get()
+    if span is None:
+        return None
+    return {TRACE_HEADER: f"00-{span.trace_id}-{span.span_id}-01"}
+
+
+def getActiveSpan():
+    """ return the active span for the current task or None """
+    return _active_span.get()
+
+
+class Span(object):
+    """ A timed operation within a trace.  Starting a span makes it the
+    active span (and so the parent of spans started after it) for the
+    current task until finish is called. """
+
+    def __init__(self, name, trace_id, parent_id=None, service=None, kind=None, tags=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _newSpanId()
+        self.parent_id = parent_id
+        self.service = service
+        self.kind = kind
+        self.tags = {}
+        if tags:
+            for k in tags:
+                self.setTag(k, tags[k])
+        self._start_time = time.time()
+        self._start_counter = time.perf_counter()
+        self._token = _active_span.set(self)
+        self._finished = False
+
+    def setTag(self, key, value):
+        """ add a key/value annotation to the span """
+        self.tags[key] = str(value)
+
+    def finish(self, **tags):
+        """ end the span and queue it for export """
+        if self._finished:
+            return
+        self._finished = True
+        duration = time.perf_counter() - self._start_counter
+        for k in tags:
+            self.setTag(k, tags[k])
+        try:
+            _active_span.reset(self._token)
+        except ValueError:
+            # finished in a different context than it was started in
+            _active_span.set(None)
+        span_json = {
+            "traceId": self.trace_id,
+            "id": self.span_id,
+            "name": self.name,
+            "timestamp": int(self._start_time * 1000000),
+            "duration": max(int(duration * 1000000), 1),
+            "localEndpoint": {"serviceName": self.service},
+        }
+        if self.parent_id:
+            span_json["parentId"] = self.parent_id
+        if self.kind:
+            span_json["kind"] = self.kind
+        if self.tags:
+            span_json["tags"] = self.tags
+        _queueSpan(span_json)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.setTag("error", exc_type.__name__)
+        self.finish()
+        return False
+
+
+class _NullSpan(object):
+    """ stand-in returned by startSpan when there is no active trace """
+
+    def setTag(self, key, value):
+        pass
+
+    def finish(self, **tags):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+def startSpan(name, **tags):
+    """ start a child span of the active span.  If no trace is active
+    for this task, a no-op span is returned. """
+    parent = _active_span.get()
+    if parent is None:
+        return _null_span
+    kwargs = {"parent_id": parent.span_id, "service": parent.service, "tags": tags}
+    return Span(name, parent.trace_id, **kwargs)
+
+
+def traceSpan(name, **tags):
+    """ context manager version of startSpan, e.g.:
+          with traceSpan("get_chunk", chunk_id=chunk_id):
+              ...
+    """
+    return startSpan(name, **tags)
+
+
+def _queueSpan(span_json):
+    global _dropped_span_count
+    max_spans = int(config.get("trace_max_spans", default=10000))
+    if len(_finished_spans) >= max_spans:
+        _dropped_span_count += 1
+        return
+    _finished_spans.append(span_json)
+
+
+def getTraceStats():
+    """ return counts of pending and dropped spans """
+    return {"pending_spans": len(_finished_spans), "dropped_spans": _dropped_span_count}
+
+
+def _takeSpans():
+    """ remove and return all finished spans """
+    spans = _finished_spans.copy()
+    _finished_spans.clear()
+    return spans
+
+
+async def flushSpans(client=None):
+    """ export any finished spans to the trace file and/or collector.
+    client is the aiohttp ClientSession to use for the collector. """
+    global _dropped_span_count
+    spans = _takeSpans()
+    if not spans:
+        return 0
+    trace_file = config.get("trace_file", default=None)
+    if trace_file:
+        data = "".join(json.dumps(span) + "\n" for span in spans)
+        try:
+            # aiofiles does the blocking file io in a worker thread
+            async with aiofiles.open(trace_file, mode="a") as f:
+                await f.write(data)
+        except OSError as oe:
+            log.warn(f"unable to write trace spans to {trace_file}: {oe}")
+    trace_collector = config.get("trace_collector", default=None)
+    if trace_collector and client is not None:
+        timeout = config.get("timeout")
+        try:
+            async with client.post(trace_collector, json=spans, timeout=timeout) as rsp:
+                if rsp.status >= 300:
+                    msg = f"trace collector {trace_collector} returned status: "
+                    msg += f"{rsp.status} for {len(spans)} spans"
+                    log.warn(msg)
+                    _dropped_span_count += len(spans)
+        except Exception as e:
+            msg = f"unable to post {len(spans)} trace spans to {trace_collector}: "
+            msg += f"{type(e).__name__} {e}"
+            log.warn(msg)
+            _dropped_span_count += len(spans)
+    log.debug(f"flushSpans - exported {len(spans)} spans")
+    return len(spans)
+
+
+def _getRouteName(request):
+    """ return the route pattern (e.g. /datasets/{id}/value) for the
+    request, falling back to the path """
+    try:
+        resource = request.match_info.route.resource
+    except AttributeError:
+        resource = None
+    if resource is not None and resource.canonical:
+        return resource.canonical
+    return request.path
+
+
+@middleware
+async def traceMiddleware(request, handler):
+    """ start a server span for each incoming request, continuing the
+    trace from the traceparent header if present """
+    if request.path in UNTRACED_PATHS:
+        return await handler(request)
+    parent = parseTraceHeader(request.headers.get(TRACE_HEADER))
+    if parent is None:
+        sample_rate = float(config.get("trace_sample_rate", default=1.0))
+        if sample_rate <= 0.0 or random.random() >= sample_rate:
+            return await handler(request)
+        trace_id = _newTraceId()
+        parent_id = None
+    else:
+        trace_id, parent_id = parent
+
+    app = request.app
+    node_type = app["node_type"]
+    name = f"{request.method} {_getRouteName(request)}"
+    tags = {"http.method": request.method, "http.path": request.path}
+    tags["node.id"] = app["id"]
+    kwargs = {"parent_id": parent_id, "service": f"hsds-{node_type}", "kind": "SERVER"}
+    span = Span(name, trace_id, tags=tags, **kwargs)
+    status_code = 500
+    try:
+        resp = await handler(request)
+        status_code = resp.status
+        return resp
+    except HTTPException as he:
+        status_code = he.status_code
+        raise
+    finally:
+        span.finish(**{"http.status_code": status_code})
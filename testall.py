@@ -17,7 +17,14 @@ PYTHON_CMD = "python"  # change to "python3" if "python" invokes python version
 
 unit_tests = ('array_util_test', 'chunk_util_test', 'compression_test', 'domain_util_test',
               'dset_util_test', 'hdf5_dtype_test', 'id_util_test', 'lru_cache_test',
-              'shuffle_test', 'rangeget_util_test')
+              'shuffle_test', 'rangeget_util_test', 'trace_util_test',
+              'cost_util_test', 'profile_util_test', 'jwt_util_test',
+              'auth_util_test', 'acl_cache_test', 'dset_json_test',
+              'shared_cache_test', 'read_ahead_test', 'link_cache_test',
+              'link_index_test', 'shard_util_test',
+              'reduce_util_test', 'pyramid_util_test', 'arrow_util_test',
+              'json_util_test', 'domain_crawl_test',
+              'folder_cache_test')
 
 integ_tests = ('uptest', 'setup_test', 'domain_test', 'group_test',
                'link_test', 'attr_test', 'datatype_test', 'dataset_test',
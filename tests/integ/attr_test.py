@@ -1952,6 +1952,54 @@ class AttributeTest(unittest.TestCase):
         dset_attrs = attributes[dset_id]
         self.assertEqual(len(dset_attrs), 2)
 
+    def testPostAttributeNdjson(self):
+        """ Get attributes for multiple objs as newline delimited json """
+        domain = helper.getTestDomain("tall.h5")
+        print("testPostAttributeNdjson", domain)
+        headers = helper.getRequestHeaders(domain=domain)
+        headers["accept"] = "application/x-ndjson"
+
+        # verify domain exists
+        req = helper.getEndpoint() + "/"
+        rsp = self.session.get(req, headers=headers)
+        if rsp.status_code != 200:
+            msg = f"WARNING: Failed to get domain: {domain}. Is test data setup?"
+            print(msg)
+            return  # abort rest of test
+        domainJson = rsp.json()
+        root_id = domainJson["root"]
+        dset_id = self.getUUIDByPath(domain, "/g1/g1.1/dset1.1.1")
+
+        items = {}
+        items[root_id] = ["attr1", "attr2"]
+        items[dset_id] = ["attr2", "foobar"]
+        data = {"obj_ids": items}
+        req = helper.getEndpoint() + "/groups/" + root_id + "/attributes"
+        rsp = self.session.post(req, data=json.dumps(data), headers=headers)
+        # the missing attribute is returned as the status for dset_id
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers["Content-Type"], "application/x-ndjson")
+        attributes = {}
+        for line in rsp.text.splitlines():
+            attributes.update(json.loads(line))
+        self.assertEqual(len(attributes), 2)
+        root_attrs = attributes[root_id]
+        self.assertEqual([attr["name"] for attr in root_attrs], ["attr1", "attr2"])
+        self.assertEqual(attributes[dset_id], {"status": 404})
+
+        # with follow_links, a line is returned for each object in the domain
+        params = {"follow_links": 1}
+        rsp = self.session.get(req, params=params, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        lines = rsp.text.splitlines()
+        self.assertEqual(len(lines), 10)  # 10 objects in the domain
+        for line in lines:
+            line_json = json.loads(line)
+            self.assertEqual(len(line_json), 1)
+            obj_id = list(line_json.keys())[0]
+            helper.validateId(obj_id)
+            self.assertTrue(isinstance(line_json[obj_id], list))
+
     def testPutAttributeMultiple(self):
         print("testPutAttributeMultiple", self.base_domain)
         headers = helper.getRequestHeaders(domain=self.base_domain)
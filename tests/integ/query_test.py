@@ -576,6 +576,89 @@ class QueryTest(unittest.TestCase):
         readData = rspJson["value"]
         self.assertEqual(len(readData), 0)
 
+    def testArrowQuery(self):
+        # Test query with an arrow stream response
+        print("testArrowQuery", self.base_domain)
+        try:
+            import pyarrow
+        except ImportError:
+            print("pyarrow not installed, skipping")
+            return
+
+        headers = helper.getRequestHeaders(domain=self.base_domain)
+        headers_arrow_rsp = helper.getRequestHeaders(domain=self.base_domain)
+        headers_arrow_rsp["accept"] = "application/vnd.apache.arrow.stream"
+        req = self.endpoint + "/"
+
+        # Get root uuid
+        rsp = self.session.get(req, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        root_uuid = rspJson["root"]
+        helper.validateId(root_uuid)
+
+        fixed_str4_type = {
+            "charSet": "H5T_CSET_ASCII",
+            "class": "H5T_STRING",
+            "length": 4,
+            "strPad": "H5T_STR_NULLPAD",
+        }
+        fields = (
+            {"name": "stock_symbol", "type": fixed_str4_type},
+            {"name": "open", "type": "H5T_STD_I32LE"},
+            {"name": "close", "type": "H5T_STD_I32LE"},
+        )
+        datatype = {"class": "H5T_COMPOUND", "fields": fields}
+        payload = {"type": datatype, "shape": 6}
+        req = self.endpoint + "/datasets"
+        rsp = self.session.post(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)  # create dataset
+        rspJson = json.loads(rsp.text)
+        dset_uuid = rspJson["id"]
+        self.assertTrue(helper.validateId(dset_uuid))
+
+        # link new dataset
+        name = "dset" + helper.getRandomName()
+        req = self.endpoint + "/groups/" + root_uuid + "/links/" + name
+        payload = {"id": dset_uuid}
+        rsp = self.session.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+
+        value = [
+            ("EBAY", 3023, 3088),
+            ("AAPL", 3054, 2933),
+            ("AMZN", 2973, 3011),
+            ("EBAY", 3042, 3128),
+            ("AAPL", 3182, 3034),
+            ("AMZN", 3021, 2788),
+        ]
+        payload = {"value": value}
+        req = self.endpoint + "/datasets/" + dset_uuid + "/value"
+        rsp = self.session.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)  # write value
+
+        # read the whole table
+        rsp = self.session.get(req, headers=headers_arrow_rsp)
+        self.assertEqual(rsp.status_code, 200)
+        if rsp.headers["Content-Type"] != "application/vnd.apache.arrow.stream":
+            # server doesn't have pyarrow installed
+            print("arrow responses not supported by server, skipping")
+            return
+        table = pyarrow.ipc.open_stream(rsp.content).read_all()
+        self.assertEqual(table.column_names, ["stock_symbol", "open", "close"])
+        self.assertEqual(table.num_rows, 6)
+        self.assertEqual(table.column("open").to_pylist(), [row[1] for row in value])
+
+        # query results include the index column
+        params = {"query": "stock_symbol == b'AAPL'"}
+        rsp = self.session.get(req, params=params, headers=headers_arrow_rsp)
+        self.assertEqual(rsp.status_code, 200)
+        table = pyarrow.ipc.open_stream(rsp.content).read_all()
+        self.assertEqual(table.column_names, ["index", "stock_symbol", "open", "close"])
+        self.assertEqual(table.column("index").to_pylist(), [1, 4])
+        self.assertEqual(table.column("stock_symbol").to_pylist(), [b"AAPL", b"AAPL"])
+        self.assertEqual(table.column("close").to_pylist(), [2933, 3034])
+
 
 if __name__ == "__main__":
     # setup test files
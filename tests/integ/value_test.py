@@ -4216,6 +4216,270 @@ class ValueTest(unittest.TestCase):
         self.assertEqual(shape["class"], "H5S_SIMPLE")
         self.assertEqual(shape["dims"], [num_nested_arrays])
 
+    def testPrewarm(self):
+        # Test loading chunks into the DN caches ahead of reads
+        print("testPrewarm", self.base_domain)
+
+        headers = helper.getRequestHeaders(domain=self.base_domain)
+        req = self.endpoint + "/"
+
+        # Get root uuid
+        rsp = self.session.get(req, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        root_uuid = rspJson["root"]
+        helper.validateId(root_uuid)
+
+        # create dataset with 4 chunks
+        layout = {"class": "H5D_CHUNKED", "dims": [10, 10]}
+        data = {"type": "H5T_STD_I32LE", "shape": [20, 20], "creationProperties": {}}
+        data["creationProperties"]["layout"] = layout
+        req = self.endpoint + "/datasets"
+        rsp = self.session.post(req, data=json.dumps(data), headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        rspJson = json.loads(rsp.text)
+        dset_id = rspJson["id"]
+        self.assertTrue(helper.validateId(dset_id))
+
+        # link new dataset as 'dset_prewarm'
+        name = "dset_prewarm"
+        req = self.endpoint + "/groups/" + root_uuid + "/links/" + name
+        payload = {"id": dset_id}
+        rsp = self.session.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+
+        # write to the first row of chunks
+        req = self.endpoint + "/datasets/" + dset_id + "/value"
+        payload = {"start": [0, 0], "stop": [10, 20], "value": 42}
+        rsp = self.session.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+
+        req = self.endpoint + "/datasets/" + dset_id + "/prewarm"
+        payload = {"select": "[0:20, 0:20]", "pin_ttl": 60}
+        # only admin users can prewarm
+        rsp = self.session.post(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 403)
+
+        admin_username = config.get("admin_username")
+        admin_passwd = config.get("admin_password")
+        if not admin_username:
+            msg = "Skipping admin prewarm test, set ADMIN_USERNAME and ADMIN_PASSWORD"
+            print(msg)
+            return
+        kwargs = {"domain": self.base_domain, "username": admin_username}
+        kwargs["password"] = admin_passwd
+        admin_headers = helper.getRequestHeaders(**kwargs)
+
+        payload["pin_ttl"] = -1
+        rsp = self.session.post(req, data=json.dumps(payload), headers=admin_headers)
+        self.assertEqual(rsp.status_code, 400)
+
+        payload["pin_ttl"] = 60
+        rsp = self.session.post(req, data=json.dumps(payload), headers=admin_headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson["chunk_count"], 4)
+        # only the first two chunks have been written
+        self.assertEqual(rspJson["not_found"], 2)
+        self.assertEqual(rspJson["cached"] + rspJson["loaded"], 2)
+        self.assertEqual(rspJson["pinned"], 2)
+
+    def testReduce(self):
+        # Test server-side reductions over a selection
+        print("testReduce", self.base_domain)
+
+        headers = helper.getRequestHeaders(domain=self.base_domain)
+        req = self.endpoint + "/"
+
+        # Get root uuid
+        rsp = self.session.get(req, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        root_uuid = rspJson["root"]
+        helper.validateId(root_uuid)
+
+        # create dataset with 4 chunks
+        layout = {"class": "H5D_CHUNKED", "dims": [10, 10]}
+        data = {"type": "H5T_IEEE_F64LE", "shape": [20, 20], "creationProperties": {}}
+        data["creationProperties"]["layout"] = layout
+        data["creationProperties"]["fillValue"] = 1.0
+        req = self.endpoint + "/datasets"
+        rsp = self.session.post(req, data=json.dumps(data), headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        rspJson = json.loads(rsp.text)
+        dset_id = rspJson["id"]
+        self.assertTrue(helper.validateId(dset_id))
+
+        # link new dataset as 'dset_reduce'
+        name = "dset_reduce"
+        req = self.endpoint + "/groups/" + root_uuid + "/links/" + name
+        payload = {"id": dset_id}
+        rsp = self.session.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+
+        # write rows of i to the first 10 rows, the rest are fill value
+        value = []
+        for i in range(10):
+            value.append([i, ] * 20)
+        req = self.endpoint + "/datasets/" + dset_id + "/value"
+        payload = {"start": [0, 0], "stop": [10, 20], "value": value}
+        rsp = self.session.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+
+        expected = {"sum": 20 * 45 + 200, "count": 400, "min": 0, "max": 9}
+        expected["mean"] = expected["sum"] / 400
+        for op in expected:
+            params = {"reduce": op}
+            rsp = self.session.get(req, params=params, headers=headers)
+            self.assertEqual(rsp.status_code, 200)
+            rspJson = json.loads(rsp.text)
+            self.assertEqual(rspJson["value"], expected[op])
+
+        # reduce along an axis with a selection
+        params = {"reduce": "sum", "axis": 1, "select": "[5:15, 0:20]"}
+        rsp = self.session.get(req, params=params, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        expected = [i * 20 for i in range(5, 10)] + [20, ] * 5
+        self.assertEqual(rspJson["value"], expected)
+
+        params = {"reduce": "max", "axis": 0}
+        rsp = self.session.get(req, params=params, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson["value"], [9, ] * 20)
+
+        # binary responses give the result type and shape, since they can
+        # differ from the dataset type
+        headers_bin_rsp = helper.getRequestHeaders(domain=self.base_domain)
+        headers_bin_rsp["accept"] = "application/octet-stream"
+        params = {"reduce": "count", "axis": 1, "select": "[0:4, 0:20]"}
+        rsp = self.session.get(req, params=params, headers=headers_bin_rsp)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers["X-HSDS-Result-Type"], "<i8")
+        self.assertEqual(rsp.headers["X-HSDS-Result-Shape"], "4")
+        arr = np.frombuffer(rsp.content, dtype=rsp.headers["X-HSDS-Result-Type"])
+        self.assertEqual(arr.tolist(), [20, ] * 4)
+
+        params = {"reduce": "histogram", "bins": 10, "range": "0:10"}
+        rsp = self.session.get(req, params=params, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        expected = [20, ] * 10
+        expected[1] += 200  # fill values
+        self.assertEqual(rspJson["value"], expected)
+        self.assertEqual(len(rspJson["bin_edges"]), 11)
+
+        # invalid requests
+        for params in ({"reduce": "median"}, {"reduce": "sum", "axis": 2},
+                       {"reduce": "histogram", "axis": 0}):
+            rsp = self.session.get(req, params=params, headers=headers)
+            self.assertEqual(rsp.status_code, 400)
+
+    def testPyramid(self):
+        # Test strided reads served from a dataset pyramid
+        print("testPyramid", self.base_domain)
+
+        headers = helper.getRequestHeaders(domain=self.base_domain)
+        req = self.endpoint + "/"
+
+        # Get root uuid
+        rsp = self.session.get(req, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        root_uuid = rspJson["root"]
+        helper.validateId(root_uuid)
+
+        # create dataset with a two level pyramid
+        data = {"type": "H5T_STD_I32LE", "shape": [40, 40]}
+        cprops = {"layout": {"class": "H5D_CHUNKED", "dims": [10, 10]}}
+        cprops["pyramid"] = {"factor": 2, "levels": 2}
+        data["creationProperties"] = cprops
+        req = self.endpoint + "/datasets"
+        rsp = self.session.post(req, data=json.dumps(data), headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        rspJson = json.loads(rsp.text)
+        dset_id = rspJson["id"]
+        self.assertTrue(helper.validateId(dset_id))
+
+        # link new dataset as 'dset_pyramid'
+        name = "dset_pyramid"
+        req = self.endpoint + "/groups/" + root_uuid + "/links/" + name
+        payload = {"id": dset_id}
+        rsp = self.session.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+
+        req = self.endpoint + "/datasets/" + dset_id
+        rsp = self.session.get(req, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        pyramid = rspJson["creationProperties"]["pyramid"]
+        self.assertEqual(pyramid["factor"], 2)
+        self.assertEqual(len(pyramid["ids"]), 2)
+        level_ids = pyramid["ids"]
+        preview = [href for href in rspJson["hrefs"] if href["rel"] == "preview"]
+        self.assertEqual(len(preview), 1)
+        self.assertTrue("pyramid=1" in preview[0]["href"])
+
+        # write values
+        arr = np.arange(1600, dtype="i4").reshape((40, 40))
+        req = self.endpoint + "/datasets/" + dset_id + "/value"
+        payload = {"value": arr.tolist()}
+        rsp = self.session.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+
+        # the strided read is the same with or without the pyramid once
+        # the levels are updated
+        expected = arr[::4, ::4].tolist()
+        params = {"select": "[0:40:4, 0:40:4]"}
+        rsp = self.session.get(req, params=params, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)["value"], expected)
+        params["pyramid"] = 1
+        for i in range(30):
+            rsp = self.session.get(req, params=params, headers=headers)
+            self.assertEqual(rsp.status_code, 200)
+            rspJson = json.loads(rsp.text)
+            if rspJson["value"] == expected:
+                break
+            time.sleep(1)  # wait for the levels to be updated
+        self.assertEqual(rspJson["value"], expected)
+
+        # selections that don't match a level are read from the dataset
+        params["select"] = "[1:40:4, 0:40:3]"
+        rsp = self.session.get(req, params=params, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)["value"], arr[1::4, ::3].tolist())
+
+        # only admin users can rebuild the levels
+        req = self.endpoint + "/datasets/" + dset_id + "/pyramid"
+        rsp = self.session.post(req, headers=headers)
+        self.assertEqual(rsp.status_code, 403)
+        admin_username = config.get("admin_username")
+        if admin_username:
+            kwargs = {"domain": self.base_domain, "username": admin_username}
+            kwargs["password"] = config.get("admin_password")
+            admin_headers = helper.getRequestHeaders(**kwargs)
+            rsp = self.session.post(req, headers=admin_headers)
+            self.assertEqual(rsp.status_code, 200)
+            self.assertTrue(json.loads(rsp.text)["chunk_count"] > 0)
+
+        # deleting the dataset removes the levels
+        req = self.endpoint + "/datasets/" + dset_id
+        rsp = self.session.delete(req, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        for level_id in level_ids:
+            req = self.endpoint + "/datasets/" + level_id
+            rsp = self.session.get(req, headers=headers)
+            self.assertEqual(rsp.status_code, 410)
+
+        # pyramid can't be used with extensible datasets
+        data = {"type": "H5T_STD_I32LE", "shape": [40], "maxdims": [0]}
+        data["creationProperties"] = {"pyramid": {"factor": 2, "levels": 2}}
+        req = self.endpoint + "/datasets"
+        rsp = self.session.post(req, data=json.dumps(data), headers=headers)
+        self.assertEqual(rsp.status_code, 400)
+
 
 if __name__ == "__main__":
     # setup test files
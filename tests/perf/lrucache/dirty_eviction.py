@@ -0,0 +1,52 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+#
+# Time LruCache inserts that trigger evictions with a varying number of
+# dirty items in the cache.  The time per insert should not grow with the
+# dirty count.
+#
+# usage: python dirty_eviction.py [clean_count]
+#
+import sys
+import time
+import numpy as np
+
+sys.path.append("../../..")
+from hsds.util.lruCache import LruCache  # noqa: E402
+from hsds import hsds_logger as log  # noqa: E402
+
+
+def timeEvictions(dirty_count, clean_count):
+    arr = np.zeros((16, 16), dtype="i4")  # 1024 bytes
+    cc = LruCache(mem_target=1024 * (dirty_count + 10))
+    for i in range(dirty_count):
+        id = f"d-{i}"
+        cc[id] = arr
+        cc.setDirty(id)
+    start = time.time()
+    for i in range(clean_count):
+        cc[f"c-{i}"] = arr
+    return time.time() - start
+
+
+if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+    print("usage: python dirty_eviction.py [clean_count]")
+    sys.exit(0)
+clean_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+log.setLogConfig("ERROR")
+
+for dirty_count in (0, 100, 1000, 10000, 50000):
+    elapsed = timeEvictions(dirty_count, clean_count)
+    per_insert = elapsed * 1000000 / clean_count
+    msg = f"dirty: {dirty_count:6d}  inserts: {clean_count}  "
+    msg += f"{elapsed:.3f}s  ({per_insert:.1f} us/insert)"
+    print(msg)
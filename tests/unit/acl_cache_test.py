@@ -0,0 +1,90 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import asyncio
+import sys
+import unittest
+
+from aiohttp.web_exceptions import HTTPForbidden
+
+sys.path.append("../..")
+from hsds.util.lruCache import LruCache
+from hsds.util.idUtil import createObjId
+from hsds.servicenode_lib import validateAction, invalidateAclCache, _getAclDecision
+from hsds import config
+
+
+class AclCacheTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(AclCacheTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testValidateAction(self):
+        config.get("admin_user")  # make sure config is loaded
+        domain = "/home/joe/acl_test.h5"
+        root_id = createObjId("roots")
+        acl_all = {"create": True, "read": True, "update": True, "delete": True,
+                   "readACL": True, "updateACL": True}
+        acl_read = {"create": False, "read": True, "update": False, "delete": False,
+                    "readACL": False, "updateACL": False}
+        domain_json = {"root": root_id, "owner": "joe"}
+        domain_json["acls"] = {"joe": acl_all, "default": acl_read}
+
+        app = {"node_type": "sn", "bucket_name": None, "user_group_db": {}}
+        app["meta_cache"] = LruCache(name="MetaCache")
+        app["domain_cache"] = LruCache(name="DomainCache")
+        app["acl_cache"] = LruCache(name="AclCache", expire_time=10)
+        app["domain_cache"][domain] = domain_json
+        app["meta_cache"][root_id] = {"id": root_id, "root": root_id}
+        acl_cache = app["acl_cache"]
+
+        async def run():
+            await validateAction(app, domain, root_id, "joe", "update")
+            await validateAction(app, domain, root_id, "bob", "read")
+            # decisions are kept in one entry for the domain
+            self.assertEqual(len(acl_cache), 1)
+            self.assertEqual(acl_cache.missCount, 2)
+
+            # decisions are served from the cache without the domain or
+            # object being fetched
+            domain_json["acls"]["default"] = {}
+            del app["domain_cache"][domain]
+            del app["meta_cache"][root_id]
+            dset_id = createObjId("datasets", rootid=root_id)
+            await validateAction(app, domain, root_id, "bob", "read")
+            await validateAction(app, domain, dset_id, "bob", "read")
+            self.assertEqual(acl_cache.missCount, 2)
+
+            # objects from other domains aren't matched
+            other_id = createObjId("datasets", rootid=createObjId("roots"))
+            acl_entry = acl_cache[domain]
+            self.assertEqual(_getAclDecision(acl_entry, root_id, "bob", "read"), True)
+            self.assertEqual(_getAclDecision(acl_entry, other_id, "bob", "read"), None)
+
+            # cached denial doesn't reload the domain
+            entry = acl_cache[domain]
+            entry["decisions"]["bob|update"] = False
+            with self.assertRaises(HTTPForbidden):
+                await validateAction(app, domain, root_id, "bob", "update")
+            self.assertEqual(acl_cache.missCount, 2)
+
+            invalidateAclCache(app, "/home/joe/other.h5")
+            self.assertEqual(len(acl_cache), 1)
+            invalidateAclCache(app, domain)
+            self.assertEqual(len(acl_cache), 0)
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
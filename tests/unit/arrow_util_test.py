@@ -0,0 +1,130 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append("../..")
+from hsds.util.arrowUtil import isArrowAvailable, getArrowSchema
+from hsds.util.arrowUtil import ArrowStreamEncoder, arrayToArrowStream
+from hsds.util.hdf5dtype import createDataType
+from hsds.util.chunkUtil import getQueryDtype
+
+if isArrowAvailable():
+    import pyarrow
+
+
+def _readStream(data):
+    reader = pyarrow.ipc.open_stream(data)
+    return reader.read_all()
+
+
+@unittest.skipUnless(isArrowAvailable(), "pyarrow not installed")
+class ArrowUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(ArrowUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testSimpleType(self):
+        arr = np.arange(20, dtype="f4").reshape((4, 5))
+        table = _readStream(arrayToArrowStream(arr))
+        self.assertEqual(table.column_names, ["value"])
+        self.assertEqual(table.schema.field("value").type, pyarrow.float32())
+        # multi-dimensional arrays are flattened in row-major order
+        self.assertEqual(table.column("value").to_pylist(), arr.reshape((20,)).tolist())
+
+        # scalar
+        arr = np.array(42, dtype="i8")
+        table = _readStream(arrayToArrowStream(arr))
+        self.assertEqual(table.column("value").to_pylist(), [42])
+
+    def testCompoundType(self):
+        type_json = {"class": "H5T_COMPOUND", "fields": [
+            {"name": "symbol", "type": {"class": "H5T_STRING", "charSet": "H5T_CSET_ASCII",
+                                        "strPad": "H5T_STR_NULLPAD", "length": 8}},
+            {"name": "date", "type": "H5T_STD_U32LE"},
+            {"name": "price", "type": "H5T_IEEE_F64LE"},
+            {"name": "note", "type": {"class": "H5T_STRING", "charSet": "H5T_CSET_UTF8",
+                                      "length": "H5T_VARIABLE"}},
+            {"name": "counts", "type": {"class": "H5T_ARRAY", "dims": [2],
+                                        "base": "H5T_STD_I16LE"}},
+            {"name": "samples", "type": {"class": "H5T_VLEN", "base": "H5T_STD_I32LE"}},
+        ]}
+        dt = createDataType(type_json)
+        arr = np.zeros((3,), dtype=dt)
+        for i in range(3):
+            samples = np.arange(i, dtype="i4")
+            symbol = f"S{i}".encode("ascii")
+            arr[i] = (symbol, 20240101 + i, i * 1.5, f"note {i}", (i, -i), samples)
+
+        schema = getArrowSchema(dt)
+        self.assertEqual(schema.names, list(dt.names))
+        self.assertEqual(schema.field("symbol").type, pyarrow.binary())
+        self.assertEqual(schema.field("date").type, pyarrow.uint32())
+        self.assertEqual(schema.field("note").type, pyarrow.string())
+        self.assertEqual(schema.field("counts").type, pyarrow.list_(pyarrow.int16(), 2))
+        self.assertEqual(schema.field("samples").type, pyarrow.list_(pyarrow.int32()))
+
+        table = _readStream(arrayToArrowStream(arr))
+        self.assertEqual(table.schema, schema)
+        self.assertEqual(table.column("symbol").to_pylist(), [b"S0", b"S1", b"S2"])
+        self.assertEqual(table.column("date").to_pylist(), [20240101, 20240102, 20240103])
+        self.assertEqual(table.column("price").to_pylist(), [0.0, 1.5, 3.0])
+        self.assertEqual(table.column("note").to_pylist(), ["note 0", "note 1", "note 2"])
+        self.assertEqual(table.column("counts").to_pylist(), [[0, 0], [1, -1], [2, -2]])
+        self.assertEqual(table.column("samples").to_pylist(), [[], [0], [0, 1]])
+
+    def testNestedType(self):
+        dt_inner = np.dtype([("x", "i4"), ("y", "i4")])
+        dt = np.dtype([("pos", dt_inner), ("tag", "V2")])
+        arr = np.zeros((2,), dtype=dt)
+        arr[1] = ((3, 4), b"ab")
+        table = _readStream(arrayToArrowStream(arr))
+        self.assertEqual(table.column("pos").to_pylist(), [{"x": 0, "y": 0}, {"x": 3, "y": 4}])
+        self.assertEqual(table.column("tag").to_pylist(), [b"\x00\x00", b"ab"])
+
+    def testStreamEncoder(self):
+        dt = getQueryDtype(np.dtype([("symbol", "S4"), ("price", "f4")]))
+        encoder = ArrowStreamEncoder(dt)
+        data = b""
+        for page in range(3):
+            arr = np.zeros((4,), dtype=dt)
+            for i in range(4):
+                arr[i] = (page * 10 + i, b"AAPL", page + i * 0.5)
+            data += encoder.encode(arr)
+        data += encoder.close()
+        reader = pyarrow.ipc.open_stream(data)
+        batches = list(reader)
+        self.assertEqual(len(batches), 3)
+        table = pyarrow.Table.from_batches(batches)
+        self.assertEqual(table.column_names, ["index", "symbol", "price"])
+        self.assertEqual(table.column("index").to_pylist()[4:8], [10, 11, 12, 13])
+
+        # stream with no batches still has a schema
+        encoder = ArrowStreamEncoder(dt)
+        table = _readStream(encoder.close())
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.column_names, ["index", "symbol", "price"])
+
+        # batches must match the stream type
+        try:
+            encoder.encode(np.zeros((2,), dtype="i4"))
+            self.assertTrue(False)
+        except TypeError:
+            pass  # expected
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
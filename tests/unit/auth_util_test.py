@@ -0,0 +1,68 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import sys
+import time
+import unittest
+
+sys.path.append("../..")
+from hsds.util import authUtil
+from hsds.util.authUtil import _checkTokenCache, _setTokenCache, setPassword
+from hsds import config
+
+
+class AuthUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(AuthUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testTokenCache(self):
+        config.get("auth_expiration")  # make sure config is loaded
+        config.cfg["auth_expiration"] = 0
+        app = {"user_db": {}, "token_cache": {}}
+        now = time.time()
+        self.assertEqual(_checkTokenCache(app, "token1"), None)
+
+        setPassword(app, "joe", "token1", scheme="bearer", exp=now + 60)
+        _setTokenCache(app, "token1", "joe", exp=now + 60)
+        self.assertEqual(_checkTokenCache(app, "token1"), "joe")
+
+        # a second token for the same user
+        setPassword(app, "joe", "token2", scheme="bearer", exp=now + 60)
+        _setTokenCache(app, "token2", "joe", exp=now + 60)
+        self.assertEqual(_checkTokenCache(app, "token2"), "joe")
+        # the first token is still valid and becomes the current password
+        self.assertEqual(_checkTokenCache(app, "token1"), "joe")
+        self.assertEqual(app["user_db"]["joe"]["pwd"], "token1")
+
+        # expired tokens are removed
+        _setTokenCache(app, "token3", "bob", exp=now - 1)
+        self.assertEqual(_checkTokenCache(app, "token3"), None)
+        self.assertFalse("token3" in app["token_cache"])
+        _setTokenCache(app, "token3", "bob", exp=now - 1)
+        authUtil._token_sweep_time = 0.0
+        _checkTokenCache(app, "token1")
+        self.assertFalse("token3" in app["token_cache"])
+        self.assertEqual(len(app["token_cache"]), 2)
+
+        # tokens without an expiration aren't cached unless
+        # auth_expiration is set
+        _setTokenCache(app, "token4", "sam")
+        self.assertEqual(_checkTokenCache(app, "token4"), None)
+        config.cfg["auth_expiration"] = 60
+        _setTokenCache(app, "token4", "sam")
+        self.assertEqual(_checkTokenCache(app, "token4"), "sam")
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
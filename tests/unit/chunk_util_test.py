@@ -27,6 +27,7 @@ from hsds.util.chunkUtil import (
     getNumChunks,
     getChunkIds,
     getChunkId,
+    groupPointsByChunk,
     getPartitionKey,
     getChunkPartition,
     getChunkIndex,
@@ -1332,6 +1333,45 @@ class ChunkUtilTest(unittest.TestCase):
         self.assertEqual(chunk_id[2:-4], dset_id[2:])
         self.assertEqual(len(chunk_id), 2 + 36 + 4)
 
+    def testGroupPointsByChunk(self):
+        dset_id = "d-12345678-1234-1234-1234-1234567890ab"
+
+        layout = (10,)
+        points = np.array([23, 5, 61, 29, 7], dtype=np.uint64)
+        chunk_map = groupPointsByChunk(dset_id, points, layout)
+        self.assertEqual(len(chunk_map), 3)
+        for chunk_id in chunk_map:
+            point_index = chunk_map[chunk_id]
+            for i in point_index:
+                self.assertEqual(getChunkId(dset_id, points[i], layout), chunk_id)
+        chunk_id = getChunkId(dset_id, 23, layout)
+        # points are kept in request order within a chunk
+        self.assertEqual(chunk_map[chunk_id].tolist(), [0, 3])
+
+        layout = (10, 20)
+        points = np.array([[23, 61], [1, 1], [25, 70], [3, 4], [99, 0]], dtype=np.uint64)
+        chunk_map = groupPointsByChunk(dset_id, points, layout)
+        self.assertEqual(len(chunk_map), 3)
+        chunk_id = getChunkId(dset_id, (23, 61), layout)
+        self.assertEqual(chunk_map[chunk_id].tolist(), [0, 2])
+        chunk_id = getChunkId(dset_id, (1, 1), layout)
+        self.assertEqual(chunk_map[chunk_id].tolist(), [1, 3])
+        chunk_id = getChunkId(dset_id, (99, 0), layout)
+        self.assertEqual(chunk_map[chunk_id].tolist(), [4])
+
+        # large point selection
+        layout = (100, 100)
+        num_points = 100000
+        points = np.random.randint(0, 1000, size=(num_points, 2)).astype(np.uint64)
+        chunk_map = groupPointsByChunk(dset_id, points, layout)
+        self.assertEqual(sum(len(x) for x in chunk_map.values()), num_points)
+        for chunk_id in list(chunk_map.keys())[:10]:
+            i = chunk_map[chunk_id][0]
+            self.assertEqual(getChunkId(dset_id, points[i], layout), chunk_id)
+
+        chunk_map = groupPointsByChunk(dset_id, np.zeros((0,), dtype=np.uint64), (10,))
+        self.assertEqual(chunk_map, {})
+
     def testDimQuery(self):
         request = {"dim_0": 23, "dim_1": 54, "dim_2": 2}
         dims = []
@@ -1550,6 +1590,25 @@ class ChunkUtilTest(unittest.TestCase):
         except IndexError:
             pass  # expected
 
+    def testChunkReadPointsFields(self):
+        chunk_id = "c-00de6a9c-6aff5c35-15d5-3864dd-0740f8_1"
+        chunk_layout = (10,)
+        dset_dt = np.dtype([("a", "i4"), ("b", "f8"), ("c", "i2")])
+        chunk_arr = np.zeros((10,), dtype=dset_dt)
+        for i in range(10):
+            chunk_arr[i] = (i, i * 0.5, -i)
+        point_arr = np.array([[17], [12], [19]], dtype=np.uint64)
+        select_dt = np.dtype([("a", "i4"), ("c", "i2")])
+        arr = chunkReadPoints(
+            chunk_id=chunk_id,
+            chunk_layout=chunk_layout,
+            chunk_arr=chunk_arr,
+            point_arr=point_arr,
+            select_dt=select_dt,
+        )
+        self.assertEqual(arr.dtype, select_dt)
+        self.assertEqual(arr.tolist(), [(7, -7), (2, -2), (9, -9)])
+
     def testChunkWritePoints1D(self):
         chunk_id = "c-00de6a9c-6aff5c35-15d5-3864dd-0740f8_12"
         chunk_layout = (100,)
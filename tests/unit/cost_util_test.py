@@ -0,0 +1,78 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import asyncio
+import sys
+import unittest
+
+sys.path.append("../..")
+from hsds.util.costUtil import startRequestCost, getRequestCost, addRequestCost
+from hsds.util.costUtil import updateRequestCost, getRequestCostHeaders
+
+
+class CostUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(CostUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testNoRequest(self):
+        async def run():
+            # no-op if startRequestCost hasn't been called
+            addRequestCost("chunks")
+            updateRequestCost({"X-HSDS-Chunks": "4"})
+            return getRequestCost(), getRequestCostHeaders()
+
+        cost, headers = asyncio.run(run())
+        self.assertEqual(cost, None)
+        self.assertEqual(headers, {})
+
+    def testRequestCost(self):
+        async def worker(chunk_count):
+            for i in range(chunk_count):
+                addRequestCost("chunks")
+                addRequestCost("dn_requests")
+            addRequestCost("retries")
+
+        async def run():
+            cost = startRequestCost()
+            # counts from tasks started by the handler are included
+            tasks = [asyncio.ensure_future(worker(n)) for n in (1, 2, 3)]
+            await asyncio.gather(*tasks)
+            # dn responses
+            dn_headers = {"X-HSDS-Cache-Hits": "2", "X-HSDS-Cache-Misses": "1"}
+            dn_headers["X-HSDS-Storage-Gets"] = "1"
+            dn_headers["X-HSDS-Storage-Bytes"] = "4096"
+            updateRequestCost(dn_headers)
+            updateRequestCost({"X-HSDS-Storage-Bytes": "xyz"})  # ignored
+            return cost
+
+        cost = asyncio.run(run())
+        self.assertEqual(cost["chunks"], 6)
+        self.assertEqual(cost["dn_requests"], 6)
+        self.assertEqual(cost["retries"], 3)
+        self.assertEqual(cost["cache_hits"], 2)
+        self.assertEqual(cost["cache_misses"], 1)
+        self.assertEqual(cost["storage_gets"], 1)
+        self.assertEqual(cost["storage_bytes"], 4096)
+
+        headers = getRequestCostHeaders(cost)
+        self.assertEqual(headers["X-HSDS-Chunks"], "6")
+        self.assertEqual(headers["X-HSDS-Storage-Bytes"], "4096")
+
+        cost["cache_hits"] = 0
+        headers = getRequestCostHeaders(cost)
+        self.assertFalse("X-HSDS-Cache-Hits" in headers)
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
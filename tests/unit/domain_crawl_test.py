@@ -0,0 +1,286 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import asyncio
+import sys
+import unittest
+from unittest.mock import patch
+
+from aiohttp.web_exceptions import HTTPNotFound, HTTPServiceUnavailable
+
+sys.path.append("../..")
+from hsds.util.idUtil import createObjId
+from hsds.domain_crawl import DomainCrawler
+from hsds.link_sn import _filterLinks
+from hsds import config
+
+
+def hardLink(title, obj_id):
+    return {"title": title, "class": "H5L_TYPE_HARD", "id": obj_id}
+
+
+class DomainCrawlTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(DomainCrawlTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        config.get("crawler_stream_queue_size")  # make sure config is loaded
+        self._queue_size = config.cfg.get("crawler_stream_queue_size")
+        root_id = createObjId("groups")
+        g1_id = createObjId("groups", rootid=root_id)
+        g2_id = createObjId("groups", rootid=root_id)
+        d1_id = createObjId("datasets", rootid=root_id)
+        self.root_id = root_id
+        self.links = {
+            root_id: [hardLink("g1", g1_id), hardLink("g2", g2_id)],
+            g1_id: [hardLink("d1", d1_id), hardLink("root", root_id)],
+            g2_id: [hardLink("self", g2_id), hardLink("d1", d1_id)],
+        }
+        self.obj_ids = set((root_id, g1_id, g2_id, d1_id))
+        self.fetch_count = 0
+        self.active_count = 0
+        self.max_active_count = 0
+        self.batch_requests = []
+
+    def tearDown(self):
+        if self._queue_size is None:
+            config.cfg.pop("crawler_stream_queue_size", None)
+        else:
+            config.cfg["crawler_stream_queue_size"] = self._queue_size
+
+    async def getObjectJson(self, app, obj_id, **kwargs):
+        self.fetch_count += 1
+        self.active_count += 1
+        self.max_active_count = max(self.active_count, self.max_active_count)
+        await asyncio.sleep(0)
+        self.active_count -= 1
+        if obj_id not in self.obj_ids:
+            raise HTTPNotFound()
+        obj_json = {"id": obj_id}
+        if kwargs.get("include_links") and obj_id in self.links:
+            obj_json["links"] = list(self.links[obj_id])
+        return obj_json
+
+    async def getAttributes(self, app, obj_id, **kwargs):
+        await asyncio.sleep(0)
+        if obj_id not in self.obj_ids:
+            raise HTTPNotFound()
+        return [{"name": "a1", "value": 42}, ]
+
+    def getBatchApp(self):
+        app = {"dn_urls": ["http://dn1", "http://dn2"], "dn_ids": ["dn-1", "dn-2"]}
+        app["node_state"] = "READY"
+        app["meta_cache"] = {}
+        return app
+
+    async def httpPost(self, app, url, data=None, params=None):
+        # fake DN batch requests
+        await asyncio.sleep(0)
+        self.batch_requests.append((url, list(data["obj_ids"])))
+        if url.endswith("/objects"):
+            key = "objects"
+        elif url.endswith("/objects/attributes"):
+            key = "attributes"
+        else:
+            key = "links"
+        results = {}
+        for obj_id in data["obj_ids"]:
+            if obj_id not in self.obj_ids:
+                results[obj_id] = {"status": 404}
+            elif key == "objects":
+                obj_json = {"id": obj_id}
+                if params.get("include_links") and obj_id in self.links:
+                    obj_json["links"] = list(self.links[obj_id])
+                results[obj_id] = obj_json
+            elif key == "attributes":
+                results[obj_id] = [{"name": "a1", "value": 42}, ]
+            else:
+                results[obj_id] = list(self.links.get(obj_id, []))
+        return {key: results}
+
+    async def collect(self, crawler, max_count=None):
+        results = {}
+        async for obj_id, item in crawler.results():
+            self.assertTrue(obj_id not in results)  # each object once
+            results[obj_id] = item
+            if max_count and len(results) >= max_count:
+                break
+        return results
+
+    def testCrawl(self):
+        kwargs = {"action": "get_obj", "bucket": "b", "follow_links": True}
+        with patch("hsds.domain_crawl.getObjectJson", new=self.getObjectJson):
+            crawler = DomainCrawler({}, [self.root_id, ], **kwargs)
+            asyncio.run(crawler.crawl())
+        self.assertEqual(set(crawler._obj_dict.keys()), self.obj_ids)
+        self.assertEqual(self.fetch_count, len(self.obj_ids))
+        for obj_id in self.obj_ids:
+            self.assertEqual(crawler._obj_dict[obj_id]["id"], obj_id)
+            self.assertTrue("links" not in crawler._obj_dict[obj_id])
+
+    def testStreamCrawl(self):
+        kwargs = {"action": "get_obj", "bucket": "b", "follow_links": True}
+        kwargs["include_links"] = True
+        kwargs["stream"] = True
+        with patch("hsds.domain_crawl.getObjectJson", new=self.getObjectJson):
+            crawler = DomainCrawler({}, [self.root_id, ], **kwargs)
+            results = asyncio.run(self.collect(crawler))
+        self.assertEqual(set(results.keys()), self.obj_ids)
+        self.assertEqual(self.fetch_count, len(self.obj_ids))
+        self.assertEqual(crawler._obj_dict, {})  # results aren't kept
+        self.assertEqual(crawler.get_object_count(), len(self.obj_ids))
+        self.assertEqual(len(results[self.root_id]["links"]), 2)
+        self.assertEqual(crawler.get_status(), None)
+
+        # results can't be iterated without stream mode
+        del kwargs["stream"]
+        crawler = DomainCrawler({}, [self.root_id, ], **kwargs)
+
+        async def getResults():
+            async for _ in crawler.results():
+                pass
+
+        with self.assertRaises(ValueError):
+            asyncio.run(getResults())
+
+    def testStreamStatus(self):
+        missing_id = createObjId("groups", rootid=self.root_id)
+        items = {self.root_id: None, missing_id: None}
+        kwargs = {"action": "get_attr", "bucket": "b", "stream": True}
+        with patch("hsds.domain_crawl.getAttributes", new=self.getAttributes):
+            crawler = DomainCrawler({}, items, **kwargs)
+            results = asyncio.run(self.collect(crawler))
+        # errors are returned for the object rather than raised
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[missing_id], {"status": 404})
+        self.assertEqual(len(results[self.root_id]), 1)
+        self.assertEqual(crawler.get_status(), 404)
+
+    def testStreamBackPressure(self):
+        config.cfg["crawler_stream_queue_size"] = 2
+        max_tasks = 4
+        root_id = self.root_id
+        for i in range(100):
+            dset_id = createObjId("datasets", rootid=root_id)
+            self.links[root_id].append(hardLink(f"dset{i}", dset_id))
+            self.obj_ids.add(dset_id)
+        kwargs = {"action": "get_obj", "bucket": "b", "follow_links": True}
+        kwargs["stream"] = True
+        kwargs["max_tasks"] = max_tasks
+
+        async def readSlowly(crawler):
+            fetch_counts = []
+            async for _ in crawler.results():
+                await asyncio.sleep(0.001)
+                fetch_counts.append(self.fetch_count)
+                if len(fetch_counts) == 10:
+                    break
+            # let any workers that weren't canceled run
+            await asyncio.sleep(0.01)
+            return fetch_counts
+
+        with patch("hsds.domain_crawl.getObjectJson", new=self.getObjectJson):
+            crawler = DomainCrawler({}, [root_id, ], **kwargs)
+            fetch_counts = asyncio.run(readSlowly(crawler))
+        # fetches are limited by the queue size and number of workers
+        for i in range(len(fetch_counts)):
+            self.assertTrue(fetch_counts[i] <= i + 1 + 2 + max_tasks)
+        # crawl is stopped when the consumer goes away
+        self.assertTrue(self.fetch_count <= 10 + 2 + max_tasks)
+
+    def testFilterLinksClose(self):
+        state = {"closed": False}
+
+        async def results():
+            try:
+                for obj_id in self.links:
+                    yield obj_id, list(self.links[obj_id])
+            finally:
+                state["closed"] = True
+
+        async def readOne():
+            filtered = _filterLinks(results(), "g*")
+            async for grp_id, grp_links in filtered:
+                self.assertEqual([link["title"] for link in grp_links], ["g1", "g2"])
+                break
+            # closing the filter closes the results it wraps right away,
+            # rather than when they are garbage collected
+            await filtered.aclose()
+            self.assertTrue(state["closed"])
+
+        asyncio.run(readOne())
+
+    def testBatchCrawl(self):
+        root_id = self.root_id
+        for i in range(50):
+            dset_id = createObjId("datasets", rootid=root_id)
+            self.links[root_id].append(hardLink(f"dset{i}", dset_id))
+            self.obj_ids.add(dset_id)
+        kwargs = {"action": "get_obj", "bucket": "b", "follow_links": True}
+        kwargs["include_attrs"] = True
+        kwargs["batch_size"] = 20
+        app = self.getBatchApp()
+        with patch("hsds.domain_crawl.getObjectJson", new=self.getObjectJson):
+            with patch("hsds.servicenode_lib.http_post", new=self.httpPost):
+                crawler = DomainCrawler(app, [root_id, ], **kwargs)
+                asyncio.run(crawler.crawl())
+        self.assertEqual(set(crawler._obj_dict.keys()), self.obj_ids)
+        self.assertEqual(self.fetch_count, 0)  # no requests for single objects
+        obj_count = 0
+        for url, obj_ids in self.batch_requests:
+            self.assertTrue(url in ("http://dn1/objects", "http://dn2/objects"))
+            self.assertTrue(len(obj_ids) <= 20)
+            obj_count += len(obj_ids)
+        self.assertEqual(obj_count, len(self.obj_ids))
+        self.assertTrue(len(self.batch_requests) < len(self.obj_ids))
+        # objects are cached without links
+        self.assertEqual(app["meta_cache"][root_id], {"id": root_id})
+        self.assertEqual(len(crawler._prefetched["obj"]), 0)
+
+    def testBatchStatus(self):
+        missing_id = createObjId("datasets", rootid=self.root_id)
+        items = {self.root_id: None, missing_id: None}
+        kwargs = {"action": "get_attr", "bucket": "b", "ignore_error": True}
+        app = self.getBatchApp()
+        with patch("hsds.domain_crawl.getAttributes", new=self.getAttributes):
+            with patch("hsds.servicenode_lib.http_post", new=self.httpPost):
+                crawler = DomainCrawler(app, items, **kwargs)
+                asyncio.run(crawler.crawl())
+        self.assertEqual(crawler._obj_dict[missing_id], {"status": 404})
+        self.assertEqual(len(crawler._obj_dict[self.root_id]), 1)
+        self.assertEqual(crawler.get_status(), 404)
+
+        # if a batch request fails, objects are fetched one at a time
+        async def failPost(app, url, data=None, params=None):
+            raise HTTPServiceUnavailable()
+
+        for i in range(50):
+            dset_id = createObjId("datasets", rootid=self.root_id)
+            self.links[self.root_id].append(hardLink(f"dset{i}", dset_id))
+            self.obj_ids.add(dset_id)
+        self.fetch_count = 0
+        kwargs = {"action": "get_obj", "bucket": "b", "follow_links": True}
+        kwargs["max_tasks"] = 8
+        with patch("hsds.domain_crawl.getObjectJson", new=self.getObjectJson):
+            with patch("hsds.servicenode_lib.http_post", new=failPost):
+                crawler = DomainCrawler(app, [self.root_id, ], **kwargs)
+                asyncio.run(crawler.crawl())
+        self.assertEqual(set(crawler._obj_dict.keys()), self.obj_ids)
+        self.assertEqual(self.fetch_count, len(self.obj_ids))
+        # fallback fetches still run concurrently, up to max_tasks
+        self.assertEqual(self.max_active_count, 8)
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
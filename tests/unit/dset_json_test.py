@@ -0,0 +1,100 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import asyncio
+import sys
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+sys.path.append("../..")
+from hsds.util.lruCache import LruCache
+from hsds.util.idUtil import createObjId
+from hsds.util.httpUtil import getETag
+from hsds.servicenode_lib import getDsetJson
+from hsds import config
+
+
+class DsetJsonTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(DsetJsonTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testGetETag(self):
+        obj1 = {"id": "d-123", "lastModified": 1700000000.5, "shape": {"dims": [10, ]}}
+        obj2 = {"id": "d-123", "lastModified": 1700000000.5, "shape": {"dims": [20, ]}}
+        # the tag only depends on the id and timestamp
+        self.assertEqual(getETag(obj1), getETag(obj2))
+        self.assertTrue(getETag(obj1).startswith('"'))
+        obj2["lastModified"] = 1700000001.25
+        self.assertNotEqual(getETag(obj1), getETag(obj2))
+        obj2["id"] = "d-456"
+        obj2["lastModified"] = obj1["lastModified"]
+        self.assertNotEqual(getETag(obj1), getETag(obj2))
+        # no tag without a timestamp
+        del obj2["lastModified"]
+        self.assertIsNone(getETag(obj2))
+
+    def testRevalidate(self):
+        root_id = createObjId("groups")
+        dset_id = createObjId("datasets", rootid=root_id)
+        shape_json = {"class": "H5S_SIMPLE", "dims": [10, ], "maxdims": [0, ]}
+        dset_json = {"id": dset_id, "root": root_id, "shape": shape_json}
+        dset_json["lastModified"] = 1700000000.0
+        requests = []
+
+        async def get_dataset(request):
+            # emulate the DN GET_Dataset handler
+            etag = getETag(dset_json)
+            requests.append(request.headers.get("If-None-Match"))
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304, headers={"ETag": etag})
+            return web.json_response(dset_json, headers={"ETag": etag})
+
+        async def run():
+            server_app = web.Application()
+            server_app.router.add_get("/datasets/{id}", get_dataset)
+            server = TestServer(server_app)
+            await server.start_server()
+            app = {"node_state": "READY", "meta_cache": LruCache(name="MetaCache")}
+            app["dn_urls"] = [str(server.make_url("")).rstrip("/"), ]
+            try:
+                rsp_json = await getDsetJson(app, dset_id)
+                self.assertEqual(rsp_json["shape"]["dims"], [10, ])
+                self.assertEqual(requests, [None, ])
+
+                # cached json is revalidated for extensible datasets
+                rsp_json = await getDsetJson(app, dset_id)
+                self.assertEqual(rsp_json["shape"]["dims"], [10, ])
+                self.assertEqual(requests, [None, getETag(dset_json)])
+
+                # changed shape on the DN is picked up
+                shape_json["dims"] = [20, ]
+                dset_json["lastModified"] = 1700000010.0
+                rsp_json = await getDsetJson(app, dset_id)
+                self.assertEqual(rsp_json["shape"]["dims"], [20, ])
+                self.assertEqual(app["meta_cache"][dset_id]["shape"]["dims"], [20, ])
+            finally:
+                if "client" in app:
+                    await app["client"].close()
+                await server.close()
+
+        config.get("timeout")  # make sure config is loaded
+        if not config.get("max_tcp_connections"):
+            config.cfg["max_tcp_connections"] = 100
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
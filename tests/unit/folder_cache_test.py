@@ -0,0 +1,96 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import asyncio
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.append("../..")
+from hsds.util.lruCache import LruCache
+from hsds.servicenode_lib import getFolderDomains, updateFolderCache
+
+
+class FolderCacheTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(FolderCacheTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        # keys in the home folder, emulating the storage listing
+        self.keys = ["home/joe/", "home/ann/", "home/a.h5/", "home/.domain.json"]
+        self.list_count = 0
+
+    async def getStorKeys(self, app, prefix="", deliminator="", bucket=None, **kwargs):
+        self.list_count += 1
+        await asyncio.sleep(0)
+        return list(self.keys)
+
+    def testGetFolderDomains(self):
+        app = {"bucket_name": "mybucket"}
+        app["folder_cache"] = LruCache(name="FolderCache", expire_time=10)
+        expected = ["/home/a.h5", "/home/ann", "/home/joe"]
+        with patch("hsds.servicenode_lib.getStorKeys", new=self.getStorKeys):
+            domains = asyncio.run(getFolderDomains(app, "/home/"))
+            self.assertEqual(domains, expected)
+            self.assertEqual(self.list_count, 1)
+
+            # second listing is from the cache, with or without trailing slash
+            domains = asyncio.run(getFolderDomains(app, "/home", bucket="mybucket"))
+            self.assertEqual(domains, expected)
+            self.assertEqual(self.list_count, 1)
+
+            # other buckets are listed separately
+            asyncio.run(getFolderDomains(app, "/home/", bucket="otherbucket"))
+            self.assertEqual(self.list_count, 2)
+
+            # without the cache the keys are listed each time
+            del app["folder_cache"]
+            domains = asyncio.run(getFolderDomains(app, "/home/"))
+            self.assertEqual(domains, expected)
+            self.assertEqual(self.list_count, 3)
+
+    def testUpdateFolderCache(self):
+        app = {"bucket_name": "mybucket"}
+        folder_cache = LruCache(name="FolderCache", expire_time=10)
+        app["folder_cache"] = folder_cache
+        with patch("hsds.servicenode_lib.getStorKeys", new=self.getStorKeys):
+            domains = asyncio.run(getFolderDomains(app, "/home/"))
+        self.assertEqual(len(domains), 3)
+
+        # new domains are added in sorted order
+        updateFolderCache(app, "mybucket/home/b.h5")
+        updateFolderCache(app, "/home/zed/")
+        expected = ["/home/a.h5", "/home/ann", "/home/b.h5", "/home/joe", "/home/zed"]
+        self.assertEqual(folder_cache["mybucket/home/"]["domains"], expected)
+        # the list returned earlier isn't modified
+        self.assertEqual(len(domains), 3)
+
+        # adding an existing domain has no effect
+        updateFolderCache(app, "mybucket/home/joe")
+        self.assertEqual(len(folder_cache["mybucket/home/"]["domains"]), 5)
+
+        # deleted domains are removed
+        updateFolderCache(app, "mybucket/home/ann", deleted=True)
+        updateFolderCache(app, "mybucket/home/missing", deleted=True)
+        expected = ["/home/a.h5", "/home/b.h5", "/home/joe", "/home/zed"]
+        self.assertEqual(folder_cache["mybucket/home/"]["domains"], expected)
+
+        # folders that aren't cached are ignored
+        updateFolderCache(app, "mybucket/home/joe/c.h5")
+        updateFolderCache(app, "otherbucket/home/d.h5")
+        self.assertEqual(len(folder_cache), 1)
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
@@ -0,0 +1,135 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import json
+import sys
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.append("../..")
+from hsds.util.jsonUtil import JsonArrayWriter, dumpJson, toJsonValue, isFastJsonAvailable
+from hsds.util.arrayUtil import squeezeArray
+from hsds import config
+
+
+class JsonUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(JsonUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        config.get("fast_json")  # make sure config is loaded
+        self._fast_json = config.cfg.get("fast_json")
+
+    def tearDown(self):
+        config.cfg["fast_json"] = self._fast_json
+
+    def _dumpBoth(self, arr, ignore_nan=False):
+        """ return the JSON for the array with and without the fast encoder """
+        texts = []
+        for fast_json in (True, False):
+            config.cfg["fast_json"] = fast_json
+            data = {"value": toJsonValue(arr), "hrefs": []}
+            texts.append(dumpJson(data, ignore_nan=ignore_nan))
+        return texts
+
+    def testValues(self):
+        arrays = [
+            np.arange(12, dtype="i4").reshape((3, 4)),
+            np.arange(12, dtype=">i8"),
+            np.arange(6, dtype="<u2"),
+            np.array([0.1, 1.5, -2.25], dtype="f4"),
+            np.array([0.1, 1e300, -2.25], dtype=">f8"),
+            np.array([True, False]),
+            np.array([b"abc", b"de"], dtype="S3"),
+            np.zeros((2,), dtype=[("a", "i4"), ("b", "S2")]),
+        ]
+        for arr in arrays:
+            fast_text, text = self._dumpBoth(arr)
+            self.assertEqual(json.loads(fast_text), json.loads(text))
+            expected = json.loads(json.dumps(arr.tolist(), default=lambda x: x.decode()))
+            self.assertEqual(json.loads(text)["value"], expected)
+
+    def testNaN(self):
+        arr = np.array([1.0, np.nan, np.inf], dtype="f4")
+        for text in self._dumpBoth(arr):
+            self.assertTrue("NaN" in text)
+            self.assertTrue("Infinity" in text)
+        for text in self._dumpBoth(arr, ignore_nan=True):
+            self.assertEqual(json.loads(text)["value"], [1.0, None, None])
+
+        # None values don't change the encoding of NaNs
+        data = {"a": None, "b": float("nan")}
+        for fast_json in (True, False):
+            config.cfg["fast_json"] = fast_json
+            self.assertTrue("NaN" in dumpJson(data))
+            self.assertEqual(json.loads(dumpJson(data, ignore_nan=True)), {"a": None, "b": None})
+
+    def testNulls(self):
+        # nulls and strings containing "null" are encoded once
+        config.cfg["fast_json"] = True
+        if not isFastJsonAvailable():
+            return  # orjson not installed
+        data = {"title": "nullable", "value": None, "dims": [1.5, None]}
+        with patch("hsds.util.jsonUtil.simplejson.dumps") as dumps:
+            text = dumpJson(data)
+            self.assertFalse(dumps.called)
+        self.assertEqual(json.loads(text), data)
+        # float values are checked for NaN, with or without numpy
+        for value in (np.float32("nan"), [1.0, float("inf")], np.array([np.nan])):
+            with patch("hsds.util.jsonUtil.simplejson.dumps") as dumps:
+                dumpJson({"value": value})
+                self.assertTrue(dumps.called)
+
+    def testMetadata(self):
+        data = {"id": "d-1234", "shape": {"dims": [10, 20]}, 1: b"bytes", "big": 2 ** 70,
+                "np": np.int64(5), "nested": [{"x": 1.5}, None]}
+        for fast_json in (True, False):
+            config.cfg["fast_json"] = fast_json
+            rsp = json.loads(dumpJson(data))
+            self.assertEqual(rsp["1"], "bytes")
+            self.assertEqual(rsp["big"], 2 ** 70)
+            self.assertEqual(rsp["np"], 5)
+            self.assertEqual(rsp["nested"], [{"x": 1.5}, None])
+
+    def testArrayWriter(self):
+        for shape, page_dim in (((10,), 0), ((12, 3), 0), ((1, 9, 1, 2), 1), ((1, 1, 7), 2)):
+            arr = np.arange(np.prod(shape), dtype="f8").reshape(shape)
+            arr[0, ...] = np.nan
+            for squeeze in (False, True):
+                for fast_json in (True, False):
+                    config.cfg["fast_json"] = fast_json
+                    writer = JsonArrayWriter(shape, page_dim, squeeze=squeeze)
+                    text = writer.start()
+                    # uneven pages along page_dim, including an empty one
+                    for start, stop in ((0, 2), (2, 2), (2, 5), (5, shape[page_dim])):
+                        index = [slice(None)] * len(shape)
+                        index[page_dim] = slice(start, stop)
+                        text += writer.encode(arr[tuple(index)])
+                    text += writer.end()
+                    expected = squeezeArray(arr) if squeeze else arr
+                    expected = json.loads(json.dumps(expected.tolist()))
+                    # NaN != NaN, so compare the text
+                    self.assertEqual(json.dumps(json.loads(text)), json.dumps(expected))
+
+        try:
+            JsonArrayWriter((2, 5), 1)
+            self.assertTrue(False)
+        except ValueError:
+            pass  # expected
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
@@ -0,0 +1,118 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import asyncio
+import base64
+import sys
+import time
+import unittest
+
+import jwt
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from aiohttp.web_exceptions import HTTPInternalServerError
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+sys.path.append("../..")
+from hsds.util import jwtUtil
+from hsds.util.jwtUtil import verifyBearerToken
+from hsds import config
+
+
+def _b64(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+class JwtUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(JwtUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testVerifyBearerToken(self):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        public_numbers = private_key.public_key().public_numbers()
+        jwk = {"kid": "key1", "n": _b64(public_numbers.n), "e": _b64(public_numbers.e)}
+        hits = {"config": 0, "keys": 0}
+
+        async def openid_config(request):
+            hits["config"] += 1
+            base_url = f"http://{request.host}"
+            return web.json_response({"jwks_uri": f"{base_url}/keys"})
+
+        async def keys(request):
+            hits["keys"] += 1
+            return web.json_response({"keys": [jwk, ]})
+
+        def makeToken(kid="key1"):
+            claims = {"unique_name": "joe", "aud": "hsds", "exp": int(time.time()) + 600}
+            kwargs = {"algorithm": "RS256", "headers": {"kid": kid}}
+            return jwt.encode(claims, private_key, **kwargs)
+
+        async def run():
+            server_app = web.Application()
+            server_app.router.add_get("/.well-known/openid-configuration", openid_config)
+            server_app.router.add_get("/keys", keys)
+            server = TestServer(server_app)
+            await server.start_server()
+            app = {}
+            try:
+                config.cfg["openid_provider"] = "test"
+                openid_url = server.make_url("/.well-known/openid-configuration")
+                config.cfg["openid_url"] = str(openid_url)
+                config.cfg["openid_audience"] = "hsds"
+                config.cfg["openid_claims"] = "unique_name,appid,roles"
+                if not config.get("max_tcp_connections"):
+                    config.cfg["max_tcp_connections"] = 100
+                jwtUtil._openid_cache.clear()
+
+                # concurrent requests share one fetch
+                tasks = [verifyBearerToken(app, makeToken()) for i in range(4)]
+                results = await asyncio.gather(*tasks)
+                for username, exp, roles in results:
+                    self.assertEqual(username, "joe")
+                    self.assertTrue(exp > time.time())
+                self.assertEqual(hits, {"config": 1, "keys": 1})
+
+                # cached
+                username, exp, roles = await verifyBearerToken(app, makeToken())
+                self.assertEqual(username, "joe")
+                self.assertEqual(hits, {"config": 1, "keys": 1})
+
+                # unknown key id, JWK set was just fetched so don't refresh
+                with self.assertRaises(HTTPInternalServerError):
+                    await verifyBearerToken(app, makeToken(kid="key2"))
+                self.assertEqual(hits, {"config": 1, "keys": 1})
+
+                # stale entries are used while they get refreshed
+                config.cfg["openid_cache_ttl"] = 0
+                username, exp, roles = await verifyBearerToken(app, makeToken())
+                self.assertEqual(username, "joe")
+                await asyncio.sleep(0.2)
+                self.assertEqual(hits, {"config": 2, "keys": 2})
+            finally:
+                config.cfg["openid_cache_ttl"] = 3600
+                config.cfg["openid_provider"] = "azure"
+                config.cfg["openid_url"] = None
+                config.cfg["openid_audience"] = None
+                jwtUtil._openid_cache.clear()
+                if "client" in app:
+                    await app["client"].close()
+                await server.close()
+
+        config.get("openid_provider")  # make sure config is loaded
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
@@ -0,0 +1,120 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import asyncio
+import sys
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+sys.path.append("../..")
+from hsds.util.lruCache import LruCache
+from hsds.util.idUtil import createObjId
+from hsds.servicenode_lib import getObjectIdByPath, deleteLinks, invalidateLinkCache
+from hsds import config
+
+
+class LinkCacheTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(LinkCacheTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testPathLookup(self):
+        root_id = createObjId("groups")
+        g1_id = createObjId("groups", rootid=root_id)
+        g2_id = createObjId("groups", rootid=root_id)
+        dset_id = createObjId("datasets", rootid=root_id)
+        # links of each group, emulating the DN
+        group_links = {}
+        group_links[root_id] = {"g1": g1_id}
+        group_links[g1_id] = {"g2": g2_id}
+        group_links[g2_id] = {"dset": dset_id}
+        requests = []
+
+        async def post_links(request):
+            group_id = request.match_info.get("id")
+            body = await request.json()
+            requests.append(group_id)
+            links = []
+            for title in body["titles"]:
+                if title not in group_links[group_id]:
+                    raise web.HTTPNotFound()
+                tgt_id = group_links[group_id][title]
+                links.append({"title": title, "class": "H5L_TYPE_HARD", "id": tgt_id})
+            return web.json_response({"links": links})
+
+        async def delete_links(request):
+            group_id = request.match_info.get("id")
+            for title in request.query["titles"].split("/"):
+                del group_links[group_id][title]
+            return web.json_response({})
+
+        async def run():
+            server_app = web.Application()
+            server_app.router.add_post("/groups/{id}/links", post_links)
+            server_app.router.add_delete("/groups/{id}/links", delete_links)
+            server = TestServer(server_app)
+            await server.start_server()
+            app = {"node_state": "READY", "meta_cache": LruCache(name="MetaCache")}
+            app["link_cache"] = LruCache(name="LinkCache", expire_time=10)
+            app["dn_urls"] = [str(server.make_url("")).rstrip("/"), ]
+            kwargs = {"bucket": "mybucket"}
+            try:
+                h5path = "/g1/g2/dset"
+                obj_id, _, link_json = await getObjectIdByPath(app, root_id, h5path, **kwargs)
+                self.assertEqual(obj_id, dset_id)
+                self.assertEqual(link_json["title"], "dset")
+                self.assertEqual(requests, [root_id, g1_id, g2_id])
+                self.assertEqual(len(app["link_cache"]), 3)
+
+                # second lookup is resolved from the cache
+                obj_id, _, _ = await getObjectIdByPath(app, root_id, h5path, **kwargs)
+                self.assertEqual(obj_id, dset_id)
+                self.assertEqual(len(requests), 3)
+
+                # refresh goes back to the DN
+                kwargs["refresh"] = True
+                obj_id, _, _ = await getObjectIdByPath(app, root_id, h5path, **kwargs)
+                del kwargs["refresh"]
+                self.assertEqual(obj_id, dset_id)
+                self.assertEqual(len(requests), 6)
+
+                # deleting a link removes it from the cache
+                await deleteLinks(app, g2_id, titles=["dset", ], **kwargs)
+                self.assertEqual(len(app["link_cache"]), 2)
+                try:
+                    await getObjectIdByPath(app, root_id, h5path, **kwargs)
+                    self.assertTrue(False)
+                except web.HTTPNotFound:
+                    pass  # expected
+                self.assertEqual(requests[-1], g2_id)
+
+                # invalidate all links of a group
+                invalidateLinkCache(app, root_id)
+                self.assertEqual(len(app["link_cache"]), 1)
+                invalidateLinkCache(app, g1_id, titles=["g2", "missing"])
+                self.assertEqual(len(app["link_cache"]), 0)
+            finally:
+                if "client" in app:
+                    await app["client"].close()
+                await server.close()
+
+        config.get("timeout")  # make sure config is loaded
+        if not config.get("max_tcp_connections"):
+            config.cfg["max_tcp_connections"] = 100
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
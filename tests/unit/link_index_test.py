@@ -0,0 +1,121 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import sys
+import unittest
+
+sys.path.append("../..")
+from hsds.util.linkIndex import LinkIndex, getPatternPrefix
+
+
+class LinkIndexTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(LinkIndexTest, self).__init__(*args, **kwargs)
+        # main
+
+    def _getLinks(self, count):
+        links = {}
+        # create titles in reverse name order
+        for i in range(count):
+            title = f"link_{count - i:04d}"
+            links[title] = {"class": "H5L_TYPE_SOFT", "h5path": "/x", "created": 100.0 + i}
+        return links
+
+    def testPatternPrefix(self):
+        self.assertEqual(getPatternPrefix("abc*"), "abc")
+        self.assertEqual(getPatternPrefix("ab?c"), "ab")
+        self.assertEqual(getPatternPrefix("[a-c]*"), "")
+        self.assertEqual(getPatternPrefix("abc"), "abc")
+        self.assertEqual(getPatternPrefix("*"), "")
+
+    def testGetTitles(self):
+        links = self._getLinks(100)
+        index = LinkIndex(links)
+        self.assertTrue(index.isValidFor(links))
+        self.assertFalse(index.isValidFor(self._getLinks(100)))
+
+        titles = index.getTitles()
+        self.assertEqual(titles, sorted(links.keys()))
+        titles = index.getTitles(limit=10)
+        self.assertEqual(titles, [f"link_{i:04d}" for i in range(1, 11)])
+        titles = index.getTitles(limit=10, marker="link_0010")
+        self.assertEqual(titles, [f"link_{i:04d}" for i in range(11, 21)])
+        titles = index.getTitles(marker="link_0100")
+        self.assertEqual(titles, [])
+        titles = index.getTitles(limit=0)
+        self.assertEqual(titles, [])
+        try:
+            index.getTitles(marker="xyz")
+            self.assertTrue(False)
+        except KeyError:
+            pass  # expected
+
+        # create order is the reverse of name order
+        titles = index.getTitles(create_order=True, limit=3)
+        self.assertEqual(titles, ["link_0100", "link_0099", "link_0098"])
+        titles = index.getTitles(create_order=True, limit=2, marker="link_0098")
+        self.assertEqual(titles, ["link_0097", "link_0096"])
+
+        # patterns
+        titles = index.getTitles(pattern="link_005*")
+        self.assertEqual(titles, [f"link_{i:04d}" for i in range(50, 60)])
+        titles = index.getTitles(pattern="link_005*", marker="link_0055", limit=2)
+        self.assertEqual(titles, ["link_0056", "link_0057"])
+        titles = index.getTitles(pattern="*9")
+        self.assertEqual(len(titles), 10)
+        titles = index.getTitles(pattern="link_00[1-2]0")
+        self.assertEqual(titles, ["link_0010", "link_0020"])
+        titles = index.getTitles(pattern="link_00[1-2]0", create_order=True)
+        self.assertEqual(titles, ["link_0020", "link_0010"])
+        titles = index.getTitles(pattern="xyz*")
+        self.assertEqual(titles, [])
+        try:
+            # marker doesn't match pattern
+            index.getTitles(pattern="link_005*", marker="link_0010")
+            self.assertTrue(False)
+        except KeyError:
+            pass  # expected
+        try:
+            index.getTitles(pattern="l*n*")
+            self.assertTrue(False)
+        except ValueError:
+            pass  # expected
+
+    def testUpdate(self):
+        links = self._getLinks(10)
+        index = LinkIndex(links)
+        # build the create order index
+        self.assertEqual(index.getTitles(create_order=True, limit=1), ["link_0010"])
+
+        links["a_new_link"] = {"class": "H5L_TYPE_SOFT", "h5path": "/x", "created": 200.0}
+        index.add("a_new_link")
+        index.add("a_new_link")  # no-op
+        self.assertTrue(index.isValidFor(links))
+        self.assertEqual(index.getTitles(limit=1), ["a_new_link"])
+        self.assertEqual(index.getTitles(create_order=True)[-1], "a_new_link")
+
+        index.remove("link_0005")
+        del links["link_0005"]
+        index.remove("link_0005")  # no-op
+        self.assertTrue(index.isValidFor(links))
+        self.assertFalse("link_0005" in index.getTitles())
+        self.assertFalse("link_0005" in index.getTitles(create_order=True))
+        self.assertEqual(len(index.getTitles(create_order=True)), 10)
+
+        # modifying links without updating the index is detected
+        links["zzz"] = {"class": "H5L_TYPE_SOFT", "h5path": "/x", "created": 300.0}
+        self.assertFalse(index.isValidFor(links))
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
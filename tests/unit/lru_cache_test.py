@@ -9,13 +9,15 @@
 # distribution tree.  If you do not have access to this file, you may        #
 # request a copy from help@hdfgroup.org.                                     #
 ##############################################################################
+from collections import OrderedDict
 import unittest
 import random
 import sys
+import time
 import numpy as np
 
 sys.path.append("../..")
-from hsds.util.lruCache import LruCache
+from hsds.util.lruCache import LruCache, getArraySize, getObjectSize
 from hsds.util.idUtil import createObjId
 
 
@@ -265,9 +267,9 @@ class LruCacheTest(unittest.TestCase):
         mem_tgt = cc.memTarget
         self.assertEqual(mem_tgt, 1024 * 10)
         mem_used = cc.memUsed
-        self.assertEqual(mem_used, 1024)  # not based on actual size
+        self.assertEqual(mem_used, getObjectSize(data))
         mem_per = cc.cacheUtilizationPercent
-        self.assertEqual(mem_per, 10)  # have used 10% of target memory
+        self.assertEqual(mem_per, int(mem_used * 100 / mem_tgt))
         # try out the dirty flags
         self.assertFalse(cc.isDirty(rand_id))
         self.assertEqual(cc.dirtyCount, 0)
@@ -296,6 +298,276 @@ class LruCacheTest(unittest.TestCase):
         mem_per = cc.cacheUtilizationPercent
         self.assertEqual(mem_per, 0)  # no memory used
 
+    def testStats(self):
+        """check hit, miss, eviction, expiration and dirty age counters"""
+        cc = LruCache(mem_target=1024 * 4, expire_time=0.1)
+        stats = cc.getStats()
+        self.assertEqual(stats["hit_count"], 0)
+        self.assertEqual(stats["miss_count"], 0)
+        self.assertEqual(stats["hit_ratio"], 0.0)
+        self.assertEqual(stats["oldest_dirty_age"], 0.0)
+        ids = []
+        for i in range(6):
+            id = createObjId("chunks")
+            ids.append(id)
+            arr = np.empty((16, 16), dtype="i4")  # 1024 bytes
+            arr[...] = i
+            cc[id] = arr
+        # only 4 chunks fit in the mem target
+        self.assertEqual(len(cc), 4)
+        self.assertEqual(cc.evictionCount, 2)
+        cc[ids[5]]
+        cc[ids[4]]
+        with self.assertRaises(KeyError):
+            cc[ids[0]]
+        cc.countMiss()
+        self.assertEqual(cc.hitCount, 2)
+        self.assertEqual(cc.missCount, 2)
+        self.assertEqual(cc.hitRatio, 0.5)
+        cc.countSkip()
+        self.assertEqual(cc.skipCount, 1)
+
+        cc.setDirty(ids[5])
+        time.sleep(0.2)
+        self.assertTrue(cc.oldestDirtyAge >= 0.2)
+        # clean items expire, dirty items don't
+        self.assertFalse(ids[4] in cc)
+        self.assertTrue(ids[5] in cc)
+        self.assertEqual(cc.expirationCount, 1)
+        self.assertEqual(len(cc), 3)
+        cc.consistencyCheck()
+        cc.clearDirty(ids[5])
+        self.assertEqual(cc.oldestDirtyAge, 0.0)
+
+        stats = cc.getStats()
+        self.assertEqual(stats["count"], 3)
+        self.assertEqual(stats["eviction_count"], 2)
+        self.assertEqual(stats["expiration_count"], 1)
+        self.assertEqual(stats["skip_count"], 1)
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def testDirtyEviction(self):
+        """evictions shouldn't need to scan past dirty items"""
+        arr = np.zeros((16, 16), dtype="i4")  # 1024 bytes
+
+        class CountingDict(OrderedDict):
+            # counts the ids looked at when searching for an eviction victim
+            visit_count = 0
+
+            def __iter__(self):
+                for key in super().__iter__():
+                    CountingDict.visit_count += 1
+                    yield key
+
+        def checkEvictions(dirty_count, clean_count=1000):
+            cc = LruCache(mem_target=1024 * (dirty_count + 10))
+            cc._clean_lru = CountingDict(cc._clean_lru)
+            for i in range(dirty_count):
+                id = f"d-{i}"
+                cc[id] = arr
+                cc.setDirty(id)
+            CountingDict.visit_count = 0
+            for i in range(clean_count):
+                cc[f"c-{i}"] = arr
+            self.assertEqual(cc.dirtyCount, dirty_count)
+            self.assertEqual(len(cc), dirty_count + 10)
+            self.assertEqual(cc.evictionCount, clean_count - 10)
+            # dirty items are never candidates for eviction
+            self.assertEqual(len(cc._clean_lru), 10)
+            # the most recently added items are retained
+            self.assertTrue(f"c-{clean_count - 1}" in cc)
+            self.assertFalse("c-0" in cc)
+            cc.consistencyCheck()
+            return CountingDict.visit_count
+
+        # each eviction looks at no more than the oldest clean item and
+        # the item being inserted, regardless of the number of dirty items
+        small = checkEvictions(100)
+        large = checkEvictions(5000)
+        self.assertEqual(small, large)
+        self.assertTrue(large <= 2 * 1000)
+
+        # items that become clean are evictable again, oldest first
+        cc = LruCache(mem_target=1024 * 4)
+        for i in range(4):
+            cc[f"d-{i}"] = arr
+            cc.setDirty(f"d-{i}")
+        cc[f"c-{0}"] = arr
+        self.assertEqual(len(cc), 5)  # can't evict dirty items
+        cc.clearDirty("d-2")
+        self.assertEqual(len(cc), 4)
+        self.assertFalse("c-0" in cc)
+        cc.clearDirty("d-0")
+        cc.clearDirty("d-1")
+        cc["c-1"] = arr
+        self.assertFalse("d-2" in cc)
+        self.assertTrue("d-0" in cc)
+        cc.consistencyCheck()
+
+    def test2QPolicy(self):
+        """a scan of one-time items shouldn't evict the working set"""
+        arr = np.zeros((16, 16), dtype="i4")  # 1024 bytes
+        with self.assertRaises(ValueError):
+            LruCache(policy="mru")
+
+        for policy in ("lru", "2q"):
+            cc = LruCache(mem_target=1024 * 20, policy=policy)
+            hot_ids = [f"h-{i}" for i in range(10)]
+            for id in hot_ids:
+                cc[id] = arr
+                cc[id]  # read again
+            for i in range(100):
+                cc[f"s-{i}"] = arr  # streaming read
+                if i % 10 == 0:
+                    cc.consistencyCheck()
+            self.assertEqual(len(cc), 20)
+            hot_count = len([id for id in hot_ids if id in cc])
+            if policy == "lru":
+                self.assertEqual(hot_count, 0)
+            else:
+                self.assertEqual(hot_count, 10)
+                self.assertEqual(cc.getStats()["policy"], "2q")
+            cc.consistencyCheck()
+
+        # recently evicted items skip probation when added back
+        cc = LruCache(mem_target=1024 * 4, policy="2q")
+        for i in range(8):
+            cc[f"s-{i}"] = arr
+        self.assertFalse("s-0" in cc)
+        cc["s-0"] = arr
+        self.assertTrue(cc._hash["s-0"]._protected)
+        self.assertFalse(cc._hash["s-7"]._protected)
+        # dirty items remain in probation when cleaned
+        cc.setDirty("s-7")
+        cc.clearDirty("s-7")
+        self.assertTrue("s-7" in cc._probation)
+        cc.consistencyCheck()
+        cc.clearCache()
+        self.assertEqual(len(cc), 0)
+        cc.consistencyCheck()
+
+    def testObjectSize(self):
+        """check size estimates for json objects and vlen arrays"""
+        small = {"id": "g-123", "attributes": {}}
+        attrs = {}
+        for i in range(1000):
+            attrs[f"attr_{i:04d}"] = {"type": "H5T_STD_I32LE", "value": list(range(100))}
+        large = {"id": "g-123", "attributes": attrs}
+        small_size = getObjectSize(small)
+        large_size = getObjectSize(large)
+        self.assertTrue(small_size < 1024)
+        # each attribute value is a list of 100 ints
+        self.assertTrue(large_size > 1000 * 100 * 8)
+        self.assertTrue(large_size < 1000 * 100 * 100)
+
+        dt = np.dtype("O")
+        arr = np.empty((10,), dtype=dt)
+        arr[...] = b""
+        empty_size = getObjectSize(arr)
+        for i in range(10):
+            arr[i] = b"x" * 10000
+        self.assertEqual(getObjectSize(arr), empty_size + 10 * 10000)
+        # compound type with a vlen field
+        dt = np.dtype([("a", "i4"), ("b", np.dtype("O"))])
+        arr = np.zeros((1000,), dtype=dt)
+        arr["b"] = "hello world"
+        self.assertTrue(getObjectSize(arr) > getArraySize(arr) + 1000 * 11)
+
+        cc = LruCache(mem_target=1024 * 1024, name="MetaCache")
+        cc["g-123"] = large
+        self.assertEqual(cc.memUsed, large_size)
+        self.assertTrue(cc.cacheUtilizationPercent > 50)
+        cc["g-123"] = small
+        self.assertEqual(cc.memUsed, small_size)
+
+    def testRssLimit(self):
+        """clean items are evicted when the process uses too much memory"""
+        arr = np.zeros((16, 16), dtype="i4")  # 1024 bytes
+        cc = LruCache(mem_target=1024 * 1024, rss_limit=1)
+        cc["d-0"] = arr
+        cc.setDirty("d-0")
+        cc._rss_check_time = 0.0
+        cc["c-0"] = arr
+        # the dirty item and the item just added can't be removed
+        self.assertEqual(len(cc), 2)
+        for i in range(1, 10):
+            cc[f"c-{i}"] = arr
+        # checks are limited to one a second
+        self.assertEqual(len(cc), 11)
+        cc._rss_check_time = 0.0
+        cc["c-10"] = arr
+        self.assertEqual(len(cc), 2)
+        self.assertTrue("d-0" in cc)
+        self.assertTrue("c-10" in cc)
+        self.assertEqual(cc.getStats()["rss_eviction_count"], 10)
+        cc.consistencyCheck()
+
+    def testPin(self):
+        """pinned items aren't evicted until the pin expires"""
+        arr = np.zeros((16, 16), dtype="i4")  # 1024 bytes
+        cc = LruCache(mem_target=1024 * 4, expire_time=0.1)
+        for i in range(4):
+            cc[f"c-{i}"] = arr
+        with self.assertRaises(KeyError):
+            cc.pin("c-99", 10)
+        cc.pin("c-0", 0.2)
+        cc.pin("c-1", 10)
+        cc.setDirty("c-1")
+        self.assertTrue(cc.isPinned("c-0"))
+        cc.consistencyCheck()
+        for i in range(4, 8):
+            cc[f"c-{i}"] = arr
+        self.assertEqual(len(cc), 4)
+        self.assertTrue("c-0" in cc)
+        self.assertTrue("c-1" in cc)
+        self.assertEqual(cc.getStats()["pinned_count"], 2)
+        cc.clearDirty("c-1")
+        cc.consistencyCheck()
+        time.sleep(0.25)
+        # pinned items don't expire
+        self.assertTrue("c-1" in cc)
+        self.assertFalse("c-7" in cc)
+        cc["c-8"] = arr
+        cc["c-9"] = arr
+        cc["c-10"] = arr
+        cc["c-11"] = arr
+        # pin on c-0 has run out
+        self.assertFalse(cc.isPinned("c-0"))
+        self.assertFalse("c-0" in cc)
+        self.assertTrue("c-1" in cc)
+        cc.unpin("c-1")
+        cc.consistencyCheck()
+        del cc["c-1"]
+        self.assertEqual(cc.getStats()["pinned_count"], 0)
+        cc.consistencyCheck()
+
+    def testMaxPinned(self):
+        """pins beyond max_pinned bytes are refused"""
+        arr = np.zeros((16, 16), dtype="i4")  # 1024 bytes
+        cc = LruCache(mem_target=1024 * 4, max_pinned=1024 * 2)
+        for i in range(4):
+            cc[f"c-{i}"] = arr
+        self.assertTrue(cc.pin("c-0", 10))
+        self.assertTrue(cc.pin("c-1", 10))
+        self.assertFalse(cc.pin("c-2", 10))
+        self.assertFalse(cc.isPinned("c-2"))
+        # extending an existing pin is allowed
+        self.assertTrue(cc.pin("c-1", 20))
+        self.assertEqual(cc.getStats()["mem_pinned"], 1024 * 2)
+        cc.consistencyCheck()
+        # unpinned items can still be evicted to make room
+        for i in range(4, 8):
+            cc[f"c-{i}"] = arr
+        self.assertEqual(len(cc), 4)
+        self.assertTrue("c-0" in cc)
+        self.assertTrue("c-1" in cc)
+        self.assertFalse("c-2" in cc)
+        cc.unpin("c-0")
+        self.assertTrue(cc.pin("c-7", 10))
+        del cc["c-1"]
+        self.assertEqual(cc.getStats()["mem_pinned"], 1024)
+        cc.consistencyCheck()
+
 
 if __name__ == "__main__":
     # setup test files
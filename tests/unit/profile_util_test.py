@@ -0,0 +1,145 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import asyncio
+import sys
+import time
+import unittest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+sys.path.append("../..")
+from hsds.util.profileUtil import sampleEventLoop, getTaskStacks
+from hsds.util.profileUtil import LoopMonitor, monitorEventLoop, loopMonitorMiddleware
+
+
+def busy_wait(seconds):
+    # block the event loop
+    start = time.time()
+    while time.time() - start < seconds:
+        pass
+
+
+async def busy_task():
+    for i in range(10):
+        busy_wait(0.05)
+        await asyncio.sleep(0.01)
+
+
+async def idle_task(seconds):
+    await asyncio.sleep(seconds)
+
+
+class ProfileUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(ProfileUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testTaskStacks(self):
+        async def run():
+            tasks = [asyncio.ensure_future(idle_task(0.2)) for i in range(3)]
+            await asyncio.sleep(0)
+            task_stacks = getTaskStacks()
+            await asyncio.gather(*tasks)
+            return task_stacks
+
+        task_stacks = asyncio.run(run())
+        idle_stacks = [x for x in task_stacks if x["coro"] == "idle_task"]
+        self.assertEqual(len(idle_stacks), 1)
+        item = idle_stacks[0]
+        self.assertEqual(item["count"], 3)
+        self.assertEqual(item["stack"], ["profile_util_test.py:idle_task"])
+        # largest group first
+        self.assertEqual(task_stacks[0]["coro"], "idle_task")
+
+    def testSampleEventLoop(self):
+        async def run():
+            task = asyncio.ensure_future(busy_task())
+            profile = await sampleEventLoop(0.3, interval=0.005)
+            await task
+            return profile
+
+        profile = asyncio.run(run())
+        self.assertTrue(profile["duration"] >= 0.3)
+        self.assertEqual(profile["interval"], 0.005)
+        self.assertTrue(profile["sample_count"] > 0)
+        stacks = profile["stacks"]
+        self.assertTrue(len(stacks) > 0)
+        total = 0
+        busy_count = 0
+        for line in stacks:
+            stack, count = line.rsplit(" ", 1)
+            total += int(count)
+            if stack.endswith("profile_util_test.py:busy_wait"):
+                busy_count += int(count)
+        self.assertEqual(total, profile["sample_count"])
+        self.assertTrue(busy_count > 0)
+        coros = [x["coro"] for x in profile["tasks"]]
+        self.assertTrue("busy_task" in coros)
+
+    def testLoopMonitor(self):
+        async def blocking_handler(request):
+            await asyncio.sleep(0.2)
+            busy_wait(0.4)  # stall the loop
+            return web.Response()
+
+        async def idle_handler(request):
+            await asyncio.sleep(0.5)
+            return web.Response()
+
+        async def run():
+            monitor = LoopMonitor(interval=0.02, stall_threshold=0.2)
+            app = {"loop_monitor": monitor}
+            monitor_task = asyncio.ensure_future(monitorEventLoop(monitor))
+            await asyncio.sleep(0.1)
+            request = make_mocked_request("GET", "/datasets/d-123/value", app=app)
+            blocking = loopMonitorMiddleware(request, blocking_handler)
+            blocking_task = asyncio.ensure_future(blocking)
+            await asyncio.sleep(0.1)
+            # a request that started later, but isn't the one blocking the loop
+            request = make_mocked_request("GET", "/groups/g-123", app=app)
+            await asyncio.gather(blocking_task, loopMonitorMiddleware(request, idle_handler))
+            await asyncio.sleep(0.1)
+            monitor_task.cancel()
+            try:
+                await monitor_task
+            except asyncio.CancelledError:
+                pass
+            self.assertIsNone(monitor._request)
+            return monitor.getStats()
+
+        stats = asyncio.run(run())
+        self.assertTrue(stats["sample_count"] > 5)
+        self.assertTrue(stats["lag_max"] >= 0.2)
+        self.assertTrue(stats["lag_p50"] < 0.2)
+        self.assertTrue(stats["lag_p99"] <= stats["lag_max"])
+        self.assertEqual(stats["stall_count"], 1)
+        stall = stats["recent_stalls"][0]
+        self.assertTrue(stall["duration"] >= 0.2)
+        # the watchdog should have caught the loop in busy_wait
+        self.assertEqual(stall["stack"][-1], "profile_util_test.py:busy_wait")
+        self.assertTrue("profile_util_test.py:blocking_handler" in stall["stack"])
+        self.assertEqual(stall["request"], "GET /datasets/d-123/value")
+
+    def testLoopMonitorNoWatchdog(self):
+        monitor = LoopMonitor(interval=0.1, stall_threshold=0)
+        self.assertEqual(monitor.update(0.01), None)
+        self.assertEqual(monitor.update(5.0), None)
+        stats = monitor.getStats()
+        self.assertEqual(stats["stall_count"], 0)
+        self.assertEqual(stats["lag_max"], 5.0)
+        self.assertEqual(stats["sample_count"], 2)
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
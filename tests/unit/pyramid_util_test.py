@@ -0,0 +1,149 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append("../..")
+from hsds.util.chunkUtil import getChunkIds, getChunkSelection
+from hsds.util.pyramidUtil import getPyramid, getLevelJson, getDecimatedChunk
+from hsds.util.pyramidUtil import getLevelSelection, getPreviewSelect
+
+DSET_ID = "d-12345678-1234-1234-1234-1234567890ab"
+LEVEL_IDS = ["d-22345678-1234-1234-1234-1234567890ab", "d-32345678-1234-1234-1234-1234567890ab"]
+
+
+def _getDsetJson(dims, layout, factor=2):
+    dset_json = {"id": DSET_ID, "root": "g-12345678-1234-1234-1234-1234567890ab"}
+    dset_json["type"] = "H5T_STD_I32LE"
+    dset_json["shape"] = {"class": "H5S_SIMPLE", "dims": dims}
+    dset_json["layout"] = {"class": "H5D_CHUNKED", "dims": layout}
+    pyramid = {"factor": factor, "levels": len(LEVEL_IDS), "ids": LEVEL_IDS}
+    dset_json["creationProperties"] = {"fillValue": 0, "pyramid": pyramid}
+    return dset_json
+
+
+def _buildLevel(arr, dset_json):
+    """ build the next pyramid level from the chunks of arr """
+    dims = list(arr.shape)
+    layout = dset_json["layout"]["dims"]
+    factor = dset_json["creationProperties"]["pyramid"]["factor"]
+    level_json = getLevelJson(dset_json)
+    level_arr = np.zeros(level_json["shape"]["dims"], dtype=arr.dtype)
+    slices = tuple(slice(0, extent, 1) for extent in dims)
+    for chunk_id in getChunkIds(dset_json["id"], slices, layout):
+        chunk_sel = tuple(getChunkSelection(chunk_id, slices, layout))
+        chunk_arr = np.zeros(layout, dtype=arr.dtype)
+        index = tuple(slice(0, s.stop - s.start) for s in chunk_sel)
+        chunk_arr[index] = arr[chunk_sel]
+        item = getDecimatedChunk(chunk_id, chunk_arr, dims, layout, factor)
+        if item is None:
+            continue
+        level_slices, values = item
+        level_arr[level_slices] = values
+    return level_json, level_arr
+
+
+class PyramidUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(PyramidUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testGetPyramid(self):
+        dset_json = _getDsetJson([100, 50], [10, 10])
+        self.assertEqual(getPyramid(dset_json)["ids"], LEVEL_IDS)
+        del dset_json["creationProperties"]["pyramid"]
+        self.assertEqual(getPyramid(dset_json), None)
+        del dset_json["creationProperties"]
+        self.assertEqual(getPyramid(dset_json), None)
+
+    def testLevelJson(self):
+        dset_json = _getDsetJson([100, 45], [40, 10], factor=4)
+        dset_json["creationProperties"]["layout"] = {"class": "H5D_CHUNKED", "dims": [40, 10]}
+        level_json = getLevelJson(dset_json)
+        self.assertEqual(level_json["id"], LEVEL_IDS[0])
+        self.assertEqual(level_json["root"], dset_json["root"])
+        self.assertEqual(level_json["type"], dset_json["type"])
+        self.assertEqual(level_json["shape"]["dims"], [25, 12])
+        self.assertEqual(level_json["layout"]["dims"], [25, 10])
+        cprops = level_json["creationProperties"]
+        self.assertEqual(cprops["fillValue"], 0)
+        self.assertFalse("layout" in cprops)
+        self.assertEqual(cprops["pyramid"], {"factor": 4, "levels": 1, "ids": LEVEL_IDS[1:]})
+        # creation properties of the dataset are unchanged
+        self.assertEqual(dset_json["creationProperties"]["pyramid"]["ids"], LEVEL_IDS)
+
+        level_json = getLevelJson(level_json)
+        self.assertEqual(level_json["id"], LEVEL_IDS[1])
+        self.assertEqual(level_json["shape"]["dims"], [7, 3])
+        self.assertEqual(level_json["layout"]["dims"], [7, 3])
+        self.assertEqual(getPyramid(level_json), None)
+        try:
+            getLevelJson(level_json)
+            self.assertTrue(False)
+        except ValueError:
+            pass  # expected
+
+    def testDecimatedChunks(self):
+        for dims, layout, factor in (([100, 50], [10, 10], 2), ([97, 31], [7, 9], 3),
+                                     ([20], [6], 4), ([9, 10, 11], [4, 4, 4], 2)):
+            arr = np.arange(np.prod(dims), dtype="i4").reshape(dims)
+            dset_json = _getDsetJson(dims, layout, factor=factor)
+            level_json, level_arr = _buildLevel(arr, dset_json)
+            expected = arr[tuple(slice(0, extent, factor) for extent in dims)]
+            self.assertEqual(level_arr.shape, expected.shape)
+            self.assertTrue(np.array_equal(level_arr, expected))
+
+            # the next level built from level 1 is the dataset decimated by factor**2
+            level2_json, level2_arr = _buildLevel(level_arr, level_json)
+            expected = arr[tuple(slice(0, extent, factor ** 2) for extent in dims)]
+            self.assertTrue(np.array_equal(level2_arr, expected))
+
+        # chunk with no element at a multiple of factor
+        chunk_arr = np.zeros((3,), dtype="i4")
+        item = getDecimatedChunk(DSET_ID.replace("d-", "c-") + "_1", chunk_arr, [7], [3], 8)
+        self.assertEqual(item, None)
+
+    def testLevelSelection(self):
+        dims = [64, 48]
+        arr = np.arange(64 * 48).reshape(dims)
+        levels = {1: arr[::2, ::2], 2: arr[::4, ::4]}
+        for slices, level in (((slice(0, 64, 4), slice(0, 48, 4)), 2),
+                              ((slice(8, 61, 8), slice(4, 47, 4)), 2),
+                              ((slice(0, 64, 2), slice(0, 48, 4)), 1),
+                              ((slice(6, 7, 1), slice(0, 48, 2)), 1),
+                              ((slice(4, 5, 1), slice(12, 13, 1)), 2)):
+            item = getLevelSelection(slices, 2, 2)
+            self.assertEqual(item[0], level)
+            level_slices = item[1]
+            self.assertTrue(np.array_equal(levels[level][level_slices], arr[slices]))
+
+        for slices in ((slice(0, 64, 1), slice(0, 48, 4)),
+                       (slice(1, 64, 4), slice(0, 48, 4)),
+                       (slice(0, 64, 3), slice(0, 48, 4)),
+                       (slice(3, 4, 1), slice(0, 48, 4))):
+            self.assertEqual(getLevelSelection(slices, 2, 2), None)
+
+    def testPreviewSelect(self):
+        self.assertEqual(getPreviewSelect([1000, 1000], 2, 4), "[0:1000:16,0:1000:16]")
+        self.assertEqual(getPreviewSelect([50, 60], 2, 4), "[0:50:1,0:60:1]")
+        self.assertEqual(getPreviewSelect([10, 100000, 100000], 10, 2),
+                         "[0:1,0:100000:100,0:100000:100]")
+        select = getPreviewSelect([1000, 1000], 2, 3, max_elements=100)
+        self.assertEqual(select, "[0:1000:8,0:1000:8]")
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
@@ -0,0 +1,143 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import sys
+import unittest
+import numpy as np
+
+sys.path.append("../..")
+from hsds.util.lruCache import LruCache
+from hsds.util.idUtil import createObjId, getObjPartition
+from hsds.util.chunkUtil import getChunkIdForPartition
+from hsds.datanode_lib import getReadAheadChunkIds
+from hsds import config
+
+
+class ReadAheadTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(ReadAheadTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        config.get("read_ahead_chunks")  # make sure config is loaded
+        self.read_ahead_chunks = config.cfg.get("read_ahead_chunks")
+        config.cfg["read_ahead_chunks"] = 2
+
+    def tearDown(self):
+        if self.read_ahead_chunks is None:
+            config.cfg.pop("read_ahead_chunks", None)
+        else:
+            config.cfg["read_ahead_chunks"] = self.read_ahead_chunks
+
+    def getApp(self):
+        app = {"node_type": "dn", "id": "dn-1", "dn_ids": ["dn-1", ]}
+        app["dn_urls"] = ["http://dn1", ]
+        app["chunk_cache"] = LruCache(name="ChunkCache")
+        app["pending_s3_read"] = {}
+        return app
+
+    def getDsetJson(self, rows=100):
+        dset_id = createObjId("datasets")
+        dset_json = {"id": dset_id, "type": "H5T_STD_I32LE"}
+        dset_json["shape"] = {"class": "H5S_SIMPLE", "dims": [rows * 10, 20]}
+        dset_json["layout"] = {"class": "H5D_CHUNKED", "dims": [10, 10]}
+        return dset_json
+
+    def testGetReadAheadChunkIds(self):
+        app = self.getApp()
+        dset_json = self.getDsetJson(rows=10)
+        prefix = "c-" + dset_json["id"][2:]
+
+        def getIds(row, col=0):
+            chunk_id = f"{prefix}_{row}_{col}"
+            return getReadAheadChunkIds(app, chunk_id, dset_json)
+
+        # random access doesn't trigger read ahead
+        for row in (3, 0, 5, 8):
+            self.assertEqual(getIds(row), [])
+
+        # sequential access does
+        app["read_ahead_state"].clear()
+        self.assertEqual(getIds(0), [])
+        self.assertEqual(getIds(1), [])
+        self.assertEqual(getIds(2), [f"{prefix}_3_0", f"{prefix}_4_0"])
+        # another chunk from the same row doesn't count
+        self.assertEqual(getIds(2, col=1), [])
+        self.assertEqual(getIds(3), [f"{prefix}_4_0", f"{prefix}_5_0"])
+
+        # chunks already in the cache or being read are skipped
+        app["chunk_cache"][f"{prefix}_5_0"] = np.zeros((10, 10), dtype="i4")
+        app["pending_s3_read"][f"{prefix}_6_0"] = 0
+        self.assertEqual(getIds(4), [])
+        self.assertEqual(getIds(5), [f"{prefix}_7_0"])
+        self.assertEqual(getIds(6), [f"{prefix}_7_0", f"{prefix}_8_0"])
+        # no rows past the end of the dataset
+        self.assertEqual(getIds(7), [f"{prefix}_8_0", f"{prefix}_9_0"])
+        self.assertEqual(getIds(8), [f"{prefix}_9_0"])
+        self.assertEqual(getIds(9), [])
+
+        # with two DNs, only chunks owned by this node are returned
+        app["dn_ids"] = ["dn-1", "dn-2"]
+        app["dn_urls"] = ["http://dn1", "http://dn2"]
+        app["read_ahead_state"].clear()
+        for row in (0, 2, 4):
+            chunk_ids = getIds(row, col=1)
+        for chunk_id in chunk_ids:
+            self.assertEqual(getObjPartition(chunk_id, 2), 0)
+        self.assertTrue(len(chunk_ids) <= 2)
+
+        config.cfg["read_ahead_chunks"] = 0
+        self.assertEqual(getIds(6, col=1), [])
+
+    def testInterleavedReaders(self):
+        app = self.getApp()
+        dset_json = self.getDsetJson()
+        prefix = "c-" + dset_json["id"][2:]
+
+        def getIds(row):
+            return getReadAheadChunkIds(app, f"{prefix}_{row}_0", dset_json)
+
+        # two clients paging through different parts of the dataset
+        for row in range(2):
+            self.assertEqual(getIds(row), [])
+            self.assertEqual(getIds(50 + row), [])
+        self.assertEqual(getIds(2), [f"{prefix}_3_0", f"{prefix}_4_0"])
+        self.assertEqual(getIds(52), [f"{prefix}_53_0", f"{prefix}_54_0"])
+
+    def testPartitionedDataset(self):
+        app = self.getApp()
+        dset_json = self.getDsetJson()
+        dset_json["layout"]["partition_count"] = 4
+
+        def getId(row):
+            chunk_id = "c-" + dset_json["id"][2:] + f"_{row}_0"
+            return getChunkIdForPartition(chunk_id, dset_json)
+
+        for row in range(2):
+            self.assertEqual(getReadAheadChunkIds(app, getId(row), dset_json), [])
+        chunk_ids = getReadAheadChunkIds(app, getId(2), dset_json)
+        # each id gets the partition of its own row
+        self.assertEqual(chunk_ids, [getId(3), getId(4)])
+
+    def testDisabledByDefault(self):
+        config.cfg.pop("read_ahead_chunks", None)
+        app = self.getApp()
+        dset_json = self.getDsetJson()
+        prefix = "c-" + dset_json["id"][2:]
+        for row in range(5):
+            chunk_id = f"{prefix}_{row}_0"
+            self.assertEqual(getReadAheadChunkIds(app, chunk_id, dset_json), [])
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
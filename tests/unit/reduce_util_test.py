@@ -0,0 +1,150 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import json
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append("../..")
+from hsds.util.reduceUtil import Reduction, getPartial, isReducibleType
+
+
+def _reduce(arr, chunk_shape, reduction):
+    """ combine partials over each chunk as the SN would """
+    rows, cols = chunk_shape
+    for i in range(0, arr.shape[0], rows):
+        for j in range(0, arr.shape[1], cols):
+            data_sel = (slice(i, i + rows), slice(j, j + cols))
+            partial = reduction.getPartial(arr[data_sel])
+            # partials are returned as JSON by the DN
+            partial = json.loads(json.dumps({k: np.asarray(v).tolist() for k, v in
+                                             partial.items()}))
+            reduction.addPartial(partial, data_sel=data_sel)
+    return reduction.getResult()
+
+
+class ReduceUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(ReduceUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testTypes(self):
+        self.assertTrue(isReducibleType(np.dtype("i4")))
+        self.assertTrue(isReducibleType(np.dtype("u2")))
+        self.assertTrue(isReducibleType(np.dtype("f8")))
+        self.assertFalse(isReducibleType(np.dtype("S10")))
+        self.assertFalse(isReducibleType(np.dtype([("a", "i4"), ("b", "f4")])))
+        try:
+            Reduction("sum", np.dtype("S10"), (10,))
+            self.assertTrue(False)
+        except TypeError:
+            pass  # expected
+        try:
+            Reduction("median", np.dtype("i4"), (10,))
+            self.assertTrue(False)
+        except ValueError:
+            pass  # expected
+        try:
+            Reduction("histogram", np.dtype("i4"), (10, 10), axis=0, hist_range=(0, 1))
+            self.assertTrue(False)
+        except ValueError:
+            pass  # expected
+
+    def testPartial(self):
+        arr = np.arange(12, dtype="i4").reshape((3, 4))
+        partial = getPartial(arr, ("sum", "count", "min", "max"))
+        self.assertEqual(partial["sum"], 66)
+        self.assertEqual(partial["count"], 12)
+        self.assertEqual(partial["min"], 0)
+        self.assertEqual(partial["max"], 11)
+        partial = getPartial(arr, ("sum", "count"), axis=1)
+        self.assertEqual(partial["sum"].tolist(), [6, 22, 38])
+        self.assertEqual(partial["count"].tolist(), [4, 4, 4])
+
+        arr = np.array([1.0, np.nan, 3.0])
+        partial = getPartial(arr, ("sum", "count", "min"))
+        self.assertTrue(np.isnan(partial["sum"]))
+        self.assertEqual(partial["count"], 3)
+        partial = getPartial(arr, ("sum", "count", "min"), skipnan=True)
+        self.assertEqual(partial["sum"], 4.0)
+        self.assertEqual(partial["count"], 2)
+        self.assertEqual(partial["min"], 1.0)
+
+    def testReduction(self):
+        arr = np.random.rand(20, 30) * 100
+        arr = arr.astype("f4")
+        chunk_shape = (8, 7)  # chunks don't divide the array evenly
+        for op in ("sum", "mean", "min", "max", "count"):
+            reduction = Reduction(op, arr.dtype, arr.shape)
+            result = _reduce(arr, chunk_shape, reduction)
+            if op == "count":
+                expected = arr.size
+            else:
+                expected = getattr(np, op)(arr.astype("f8"))
+            self.assertTrue(np.allclose(result, expected))
+            for axis in (0, 1):
+                reduction = Reduction(op, arr.dtype, arr.shape, axis=axis)
+                result = _reduce(arr, chunk_shape, reduction)
+                if op == "count":
+                    expected = np.full(result.shape, arr.shape[axis])
+                else:
+                    expected = getattr(np, op)(arr.astype("f8"), axis=axis)
+                self.assertEqual(result.shape, expected.shape)
+                self.assertTrue(np.allclose(result, expected))
+
+        arr = np.arange(200, dtype="u2").reshape((10, 20))
+        reduction = Reduction("min", arr.dtype, arr.shape, axis=1)
+        result = _reduce(arr, (3, 3), reduction)
+        self.assertEqual(result.tolist(), list(range(0, 200, 20)))
+        reduction = Reduction("sum", arr.dtype, arr.shape)
+        self.assertEqual(_reduce(arr, (3, 3), reduction), np.sum(arr))
+
+    def testNaN(self):
+        arr = np.ones((6, 6), dtype="f8")
+        arr[0:3, 0:3] = np.nan  # first chunk is all NaN
+        arr[4, 5] = np.nan
+        reduction = Reduction("mean", arr.dtype, arr.shape)
+        self.assertTrue(np.isnan(_reduce(arr, (3, 3), reduction)))
+        reduction = Reduction("mean", arr.dtype, arr.shape, skipnan=True)
+        self.assertEqual(_reduce(arr, (3, 3), reduction), 1.0)
+        reduction = Reduction("min", arr.dtype, arr.shape, axis=1, skipnan=True)
+        result = _reduce(arr, (3, 3), reduction)
+        self.assertEqual(result.tolist(), [1.0, ] * 6)
+        reduction = Reduction("count", arr.dtype, arr.shape, skipnan=True)
+        self.assertEqual(_reduce(arr, (3, 3), reduction), 26)
+        reduction = Reduction("range", arr.dtype, arr.shape, skipnan=True)
+        self.assertEqual(_reduce(arr, (3, 3), reduction), (1.0, 1.0))
+
+    def testHistogram(self):
+        arr = np.random.normal(size=(50, 40))
+        arr[0, 0] = np.nan
+        hist_range = (-2.0, 2.0)
+        reduction = Reduction("histogram", arr.dtype, arr.shape, bins=16, hist_range=hist_range)
+        result = _reduce(arr, (16, 16), reduction)
+        values = arr[np.isfinite(arr)]
+        expected, edges = np.histogram(values, bins=16, range=hist_range)
+        self.assertEqual(result.tolist(), expected.tolist())
+        self.assertTrue(np.allclose(reduction.getBinEdges(), edges))
+        self.assertEqual(reduction.getParams()["range"], "-2.0:2.0")
+
+        # range with a single value
+        arr = np.full((4, 4), 3, dtype="i4")
+        reduction = Reduction("histogram", arr.dtype, arr.shape, bins=3, hist_range=(3, 3))
+        result = _reduce(arr, (2, 2), reduction)
+        self.assertEqual(result.tolist(), [0, 16, 0])
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
@@ -0,0 +1,147 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append("../..")
+from hsds.util.idUtil import createObjId, getS3Key, isS3ObjKey
+from hsds.util.lruCache import LruCache
+from hsds.util.shardUtil import getShardIndex, getShardKey, getShards, getShardChecksum
+from hsds.util.shardUtil import getShardObjId
+from hsds.util.storUtil import getStorJSONObj, isStorObj, releaseStorageClient
+from hsds.datanode_lib import _put_metadata_json, get_metadata_obj, delete_metadata_obj
+from hsds import config
+
+
+class ShardUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(ShardUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testShards(self):
+        root_id = createObjId("roots")
+        group_id = createObjId("groups", rootid=root_id)
+        dset_id = createObjId("datasets", rootid=root_id)
+        for obj_id in (root_id, group_id, dset_id):
+            shard_key = getShardKey(obj_id, "links", 3)
+            s3key = getS3Key(obj_id)
+            prefix = s3key[:s3key.rfind("/")]
+            self.assertEqual(shard_key, f"{prefix}/.shards/links.3.json")
+            # shard keys are not object keys
+            self.assertTrue(isS3ObjKey(s3key))
+            self.assertFalse(isS3ObjKey(shard_key))
+            # shard keys map back to the owning object
+            self.assertEqual(getShardObjId(shard_key), obj_id)
+            self.assertEqual(getShardObjId(s3key), None)
+
+        self.assertEqual(getShardIndex("abc", 16), getShardIndex("abc", 16))
+        items = {}
+        for i in range(100):
+            items[f"link_{i}"] = {"class": "H5L_TYPE_HARD", "id": group_id}
+        shards = getShards(items, 8)
+        self.assertEqual(len(shards), 8)
+        self.assertEqual(sum([len(shard) for shard in shards]), 100)
+        for index in range(8):
+            for name in shards[index]:
+                self.assertEqual(getShardIndex(name, 8), index)
+
+        crc = getShardChecksum(shards[0])
+        name = list(shards[0].keys())[0]
+        shards[0][name] = {"class": "H5L_TYPE_SOFT", "h5path": "/x"}
+        self.assertNotEqual(getShardChecksum(shards[0]), crc)
+
+    def testShardedStorage(self):
+        root_id = createObjId("roots")
+        group_id = createObjId("groups", rootid=root_id)
+        group_json = {"id": group_id, "root": root_id, "created": 1, "lastModified": 1}
+        group_json["attributes"] = {}
+        links = {}
+        for i in range(100):
+            links[f"link_{i}"] = {"class": "H5L_TYPE_SOFT", "h5path": f"/x/{i}", "created": i}
+        group_json["links"] = links
+        bucket = "shard_test"
+        shard_count = 8
+
+        async def run(root_dir):
+            app = {"storage_clients": {}, "meta_shards": {}, "deleted_ids": set()}
+            app["meta_cache"] = LruCache(name="MetaCache")
+            app["pending_s3_read"] = {}
+            app["dirty_ids"] = {}
+            app["dn_urls"] = ["http://dn1", ]
+            app["dn_ids"] = ["dn1", ]
+            app["id"] = "dn1"
+            app["node_type"] = "dn"
+            s3key = getS3Key(group_id)
+            try:
+                await _put_metadata_json(app, group_id, group_json, bucket=bucket)
+                stored_json = await getStorJSONObj(app, s3key, bucket=bucket)
+                self.assertFalse("links" in stored_json)
+                self.assertEqual(stored_json["attributes"], {})
+                self.assertEqual(stored_json["shards"], {"links": shard_count})
+                self.assertEqual(len(app["meta_shards"][group_id]["links"]), shard_count)
+
+                # only the shard with a new link gets re-written
+                shard_paths = []
+                for index in range(shard_count):
+                    shard_key = getShardKey(group_id, "links", index)
+                    shard_paths.append(os.path.join(root_dir, bucket, shard_key))
+                    os.utime(shard_paths[index], (0, 0))
+                links["new_link"] = {"class": "H5L_TYPE_SOFT", "h5path": "/y", "created": 200}
+                await _put_metadata_json(app, group_id, group_json, bucket=bucket)
+                new_index = getShardIndex("new_link", shard_count)
+                for index in range(shard_count):
+                    mtime = os.stat(shard_paths[index]).st_mtime
+                    if index == new_index:
+                        self.assertTrue(mtime > 0)
+                    else:
+                        self.assertEqual(mtime, 0)
+
+                # reading the object brings in the links from each shard
+                app["meta_shards"] = {}
+                obj_json = await get_metadata_obj(app, group_id, bucket=bucket)
+                self.assertFalse("shards" in obj_json)
+                self.assertEqual(obj_json["links"], links)
+                self.assertEqual(obj_json["attributes"], {})
+                self.assertTrue(group_id in app["meta_shards"])
+
+                # deleting the object removes the shards
+                await delete_metadata_obj(app, group_id, notify=False, bucket=bucket)
+                self.assertFalse(await isStorObj(app, s3key, bucket=bucket))
+                for index in range(shard_count):
+                    shard_key = getShardKey(group_id, "links", index)
+                    self.assertFalse(await isStorObj(app, shard_key, bucket=bucket))
+            finally:
+                await releaseStorageClient(app)
+
+        config.get("root_dir")  # make sure config is loaded
+        saved_cfg = {}
+        for key in ("root_dir", "metadata_shard_threshold", "metadata_shard_count"):
+            saved_cfg[key] = config.cfg.get(key)
+        with tempfile.TemporaryDirectory() as root_dir:
+            os.mkdir(os.path.join(root_dir, bucket))
+            config.cfg["root_dir"] = root_dir
+            config.cfg["metadata_shard_threshold"] = 50
+            config.cfg["metadata_shard_count"] = shard_count
+            try:
+                asyncio.run(run(root_dir))
+            finally:
+                for key in saved_cfg:
+                    config.cfg[key] = saved_cfg[key]
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
@@ -0,0 +1,97 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.append("../..")
+from hsds.util.sharedCache import SharedChunkCache, HEADER_SIZE
+from hsds.util.idUtil import createObjId
+
+
+class SharedCacheTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(SharedCacheTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testSharedCache(self):
+        name = f"hsds_test_{os.getpid()}"
+        slot_size = 1024 + HEADER_SIZE
+        cache = SharedChunkCache(name, slot_size * 8, slot_size=slot_size)
+        # a second instance attaches to the same segment
+        other = SharedChunkCache(name, slot_size * 8, slot_size=slot_size)
+        try:
+            dt = np.dtype("i4")
+            chunk_id = createObjId("chunks")
+            arr = np.arange(256, dtype=dt).reshape((16, 16))
+            self.assertEqual(cache.get(chunk_id, dt, (16, 16)), None)
+            self.assertTrue(cache.put(chunk_id, arr))
+            rsp = other.get(chunk_id, dt, (16, 16))
+            self.assertTrue(np.array_equal(rsp, arr))
+            # returned array is a copy
+            rsp[0, 0] = 42
+            self.assertEqual(cache.get(chunk_id, dt, (16, 16))[0, 0], 0)
+            # shape mismatch is a miss
+            self.assertEqual(cache.get(chunk_id, dt, (8, 8)), None)
+
+            other.invalidate(chunk_id)
+            self.assertEqual(cache.get(chunk_id, dt, (16, 16)), None)
+
+            # too big or vlen types are not cached
+            big = np.zeros((32, 32), dtype=dt)
+            self.assertFalse(cache.put(chunk_id, big))
+            vlen = np.zeros((4,), dtype=np.dtype("O"))
+            self.assertFalse(cache.put(chunk_id, vlen))
+
+            # a slot with a bad crc is treated as a miss
+            cache.put(chunk_id, arr)
+            index = [i for i in range(8) if cache._getHeader(i * slot_size)[2] > 0]
+            self.assertEqual(len(index), 1)
+            offset = index[0] * slot_size
+            cache._buf[offset + HEADER_SIZE] = 255
+            self.assertEqual(other.get(chunk_id, dt, (16, 16)), None)
+
+            stats = cache.getStats()
+            self.assertEqual(stats["slot_count"], 8)
+            self.assertEqual(stats["put_count"], 2)
+
+            # the same chunk id in different buckets are separate entries
+            cache.put(chunk_id, arr, bucket="bucket1")
+            self.assertEqual(other.get(chunk_id, dt, (16, 16), bucket="bucket2"), None)
+            rsp = other.get(chunk_id, dt, (16, 16), bucket="bucket1")
+            self.assertTrue(np.array_equal(rsp, arr))
+            other.invalidate(chunk_id, bucket="bucket2")
+            self.assertTrue(cache.get(chunk_id, dt, (16, 16), bucket="bucket1") is not None)
+
+            # closing the process that created the segment keeps it for the others
+            cache.close()
+            cache = SharedChunkCache(name, slot_size * 8, slot_size=slot_size)
+            rsp = cache.get(chunk_id, dt, (16, 16), bucket="bucket1")
+            self.assertTrue(np.array_equal(rsp, arr))
+        finally:
+            other.close()
+            cache.close()
+            cache.unlink()
+        # after unlink, a new segment is created
+        cache = SharedChunkCache(name, slot_size * 8, slot_size=slot_size)
+        try:
+            self.assertEqual(cache.get(chunk_id, dt, (16, 16), bucket="bucket1"), None)
+        finally:
+            cache.close()
+            cache.unlink()
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()
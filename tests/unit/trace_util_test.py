@@ -0,0 +1,106 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of HSDS (HDF5 Scalable Data Service), Libraries and      #
+# Utilities.  The full HSDS copyright notice, including                      #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append("../..")
+from hsds.util.traceUtil import Span, startSpan, traceSpan, getTraceHeaders
+from hsds.util.traceUtil import getActiveSpan, parseTraceHeader, flushSpans
+from hsds.util.traceUtil import TRACE_HEADER
+from hsds import config
+
+
+class TraceUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(TraceUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testParseTraceHeader(self):
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        span_id = "00f067aa0ba902b7"
+        value = f"00-{trace_id}-{span_id}-01"
+        self.assertEqual(parseTraceHeader(value), (trace_id, span_id))
+        self.assertEqual(parseTraceHeader(None), None)
+        self.assertEqual(parseTraceHeader(""), None)
+        self.assertEqual(parseTraceHeader("00-1234-5678-01"), None)
+        bad_value = f"00-{trace_id[:-1]}x-{span_id}-01"
+        self.assertEqual(parseTraceHeader(bad_value), None)
+        zero_value = f"00-{'0' * 32}-{span_id}-01"
+        self.assertEqual(parseTraceHeader(zero_value), None)
+
+    def testNoActiveTrace(self):
+        self.assertEqual(getActiveSpan(), None)
+        self.assertEqual(getTraceHeaders(), None)
+        # spans outside of a trace are no-ops
+        with traceSpan("noop", a=1) as span:
+            span.setTag("b", 2)
+            self.assertEqual(getActiveSpan(), None)
+        span = startSpan("noop")
+        span.finish()
+
+    def testSpanNesting(self):
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        root = Span("root", trace_id, service="hsds-sn", kind="SERVER")
+        self.assertEqual(getActiveSpan(), root)
+        headers = getTraceHeaders()
+        self.assertEqual(headers[TRACE_HEADER], f"00-{trace_id}-{root.span_id}-01")
+
+        with traceSpan("child", chunk_id="c-123") as child:
+            self.assertEqual(getActiveSpan(), child)
+            self.assertEqual(child.trace_id, trace_id)
+            self.assertEqual(child.parent_id, root.span_id)
+            self.assertEqual(child.service, "hsds-sn")
+            self.assertEqual(child.tags["chunk_id"], "c-123")
+            value = getTraceHeaders()[TRACE_HEADER]
+            self.assertEqual(parseTraceHeader(value), (trace_id, child.span_id))
+        self.assertEqual(getActiveSpan(), root)
+        root.finish()
+        self.assertEqual(getActiveSpan(), None)
+
+    def testFlushSpans(self):
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            trace_file = os.path.join(tmpdir, "trace.json")
+            config.get("trace_file")  # make sure config is loaded
+            asyncio.run(flushSpans())  # clear out any previous spans
+            config.cfg["trace_file"] = trace_file
+            try:
+                with Span("GET /datasets/{id}/value", trace_id, service="hsds-sn"):
+                    with traceSpan("storage_get", bytes=42):
+                        pass
+                count = asyncio.run(flushSpans())
+                self.assertEqual(count, 2)
+                with open(trace_file) as f:
+                    spans = [json.loads(line) for line in f]
+            finally:
+                config.cfg["trace_file"] = None
+
+        self.assertEqual(len(spans), 2)
+        child, root = spans
+        self.assertEqual(root["traceId"], trace_id)
+        self.assertEqual(child["traceId"], trace_id)
+        self.assertEqual(child["parentId"], root["id"])
+        self.assertFalse("parentId" in root)
+        self.assertEqual(child["name"], "storage_get")
+        self.assertEqual(child["tags"]["bytes"], "42")
+        self.assertEqual(child["localEndpoint"]["serviceName"], "hsds-sn")
+        self.assertTrue(root["duration"] >= child["duration"])
+
+
+if __name__ == "__main__":
+    # setup test files
+
+    unittest.main()